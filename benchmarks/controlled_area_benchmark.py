@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+import numpy as np
+from shapely.geometry import MultiPoint
+from shapely.geometry import Point
+from shapely.geometry import Polygon
+from sklearn.cluster import HDBSCAN
+
+from src.utils import Utils
+
+
+def legacy_polygons_from_labels(
+    cone_positions: np.ndarray,
+    labels: np.ndarray,
+) -> list[Polygon]:
+    """
+    Builds cone polygons with the former per-cone Python loop.
+
+    Args:
+        cone_positions (np.ndarray): The cone centres.
+        labels (np.ndarray): The cluster label of each cone.
+
+    Returns:
+        list[Polygon]: The hull of each cluster of three or more cones.
+    """
+    clusters: dict[int, list[np.ndarray]] = {}
+    for point, label in zip(cone_positions, labels):
+        if label == -1:
+            continue
+        clusters.setdefault(label, []).append(point)
+    return [
+        MultiPoint(points).convex_hull
+        for points in clusters.values() if len(points) >= 3
+    ]
+
+
+def legacy_people_in_controlled_area(
+    polygons: list[Polygon],
+    datas: list[list[float]],
+) -> int:
+    """
+    Counts people in the controlled area with one Point per person.
+
+    Args:
+        polygons (list[Polygon]): The controlled areas.
+        datas (list[list[float]]): The detections.
+
+    Returns:
+        int: The number of people inside any area.
+    """
+    unique_people = set()
+    for data in datas:
+        if data[5] == 5:
+            x_center = (data[0] + data[2]) / 2
+            y_center = (data[1] + data[3]) / 2
+            point = Point(x_center, y_center)
+            for polygon in polygons:
+                if polygon.contains(point):
+                    unique_people.add((x_center, y_center))
+                    break
+    return len(unique_people)
+
+
+class FixedClusterer:
+    """
+    Returns precomputed labels so only polygon building is timed.
+    """
+
+    def __init__(self, labels: np.ndarray):
+        self.labels = labels
+
+    def fit_predict(self, positions: np.ndarray) -> np.ndarray:
+        return self.labels
+
+
+def generate_frame(
+    cones: int,
+    people: int,
+    zones: int,
+    rng: np.random.Generator,
+) -> list[list[float]]:
+    """
+    Synthesises the detections of a busy site.
+
+    Args:
+        cones (int): The number of safety cones.
+        people (int): The number of people.
+        zones (int): The number of coned-off zones.
+        rng (np.random.Generator): The random generator.
+
+    Returns:
+        list[list[float]]: The detections.
+    """
+    centres = rng.uniform(200, 3640, (zones, 2))
+    datas = []
+    for index in range(cones):
+        x, y = centres[index % zones] + rng.normal(0, 80, 2)
+        datas.append([x - 10, y - 15, x + 10, y + 15, 0.9, 6])
+    for _ in range(people):
+        x, y = rng.uniform(0, 3840, 2)
+        datas.append([x - 25, y - 60, x + 25, y + 60, 0.9, 5])
+    return datas
+
+
+def time_call(func: Callable[[], object], repeats: int) -> float:
+    """
+    Returns the median time of a call in milliseconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    """
+    Compares the legacy and vectorised controlled-area checks.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark cone polygons and controlled-area counts.',
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=20,
+        help='Number of timed runs per case',
+    )
+    parser.add_argument(
+        '--zones',
+        type=int,
+        default=20,
+        help='Number of coned-off zones per frame',
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'cones':>6} {'people':>7} {'polygons':>9} "
+        f"{'build legacy':>13} {'build new':>10} "
+        f"{'count legacy':>13} {'count new':>10} {'inside':>7}",
+    )
+    for cones, people in [(50, 50), (200, 200), (500, 500), (1000, 1000)]:
+        datas = generate_frame(cones, people, args.zones, rng)
+        positions = np.array([
+            ((d[0] + d[2]) / 2, (d[1] + d[3]) / 2)
+            for d in datas if d[5] == 6
+        ])
+        labels = HDBSCAN(min_samples=3, min_cluster_size=3).fit_predict(
+            positions,
+        )
+        clusterer = FixedClusterer(labels)
+        polygons = Utils.detect_polygon_from_cones(datas, clusterer)
+
+        legacy_count = legacy_people_in_controlled_area(polygons, datas)
+        count = Utils.calculate_people_in_controlled_area(polygons, datas)
+        if count != legacy_count:
+            raise AssertionError(f"Counts differ: {count} != {legacy_count}")
+
+        build_legacy = time_call(
+            lambda: legacy_polygons_from_labels(positions, labels),
+            args.repeats,
+        )
+        build_new = time_call(
+            lambda: Utils.detect_polygon_from_cones(datas, clusterer),
+            args.repeats,
+        )
+        count_legacy = time_call(
+            lambda: legacy_people_in_controlled_area(polygons, datas),
+            args.repeats,
+        )
+        count_new = time_call(
+            lambda: Utils.calculate_people_in_controlled_area(
+                polygons, datas,
+            ),
+            args.repeats,
+        )
+        print(
+            f"{cones:>6} {people:>7} {len(polygons):>9} "
+            f"{build_legacy:>13.3f} {build_new:>10.3f} "
+            f"{count_legacy:>13.3f} {count_new:>10.3f} {count:>7}",
+        )
+
+
+if __name__ == '__main__':
+    main()
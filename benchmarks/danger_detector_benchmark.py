@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from src.danger_detector import DangerDetector
+
+
+def generate_detections(
+    count: int,
+    seed: int = 0,
+    width: int = 1920,
+    height: int = 1080,
+) -> list[list[float]]:
+    """
+    Generates a synthetic crowded frame of detections.
+
+    Roughly 60% of the detections are persons, 25% are PPE violations
+    and the rest are machinery or vehicles.
+
+    Args:
+        count (int): The number of detections to generate.
+        seed (int): The random seed.
+        width (int): The frame width.
+        height (int): The frame height.
+
+    Returns:
+        list[list[float]]: Detections in [x1, y1, x2, y2, conf, label] form.
+    """
+    rng = random.Random(seed)
+    datas: list[list[float]] = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            label, w, h = 5, rng.uniform(20, 60), rng.uniform(50, 150)
+        elif roll < 0.85:
+            label = rng.choice([2, 4])
+            w, h = rng.uniform(10, 40), rng.uniform(10, 40)
+        else:
+            label = rng.choice([8, 9])
+            w, h = rng.uniform(150, 400), rng.uniform(150, 400)
+        x1 = rng.uniform(0, width - w)
+        y1 = rng.uniform(0, height - h)
+        datas.append([x1, y1, x1 + w, y1 + h, rng.uniform(0.3, 1.0), label])
+    return datas
+
+
+def time_engine(
+    detector: DangerDetector,
+    datas: list[list[float]],
+    repeats: int,
+) -> tuple[float, list[str]]:
+    """
+    Times `detect_danger` for a detector.
+
+    Args:
+        detector (DangerDetector): The detector to time.
+        datas (list[list[float]]): The detections to analyse.
+        repeats (int): The number of timed runs.
+
+    Returns:
+        tuple[float, list[str]]: Mean latency in milliseconds and the
+            warnings of the last run.
+    """
+    warnings: list[str] = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        warnings, _ = detector.detect_danger(datas)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeats * 1000, warnings
+
+
+def main() -> None:
+    """
+    Compares the Python and NumPy engines at increasing detection counts.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark DangerDetector engines.',
+    )
+    parser.add_argument(
+        '--counts',
+        type=int,
+        nargs='+',
+        default=[10, 50, 100, 200, 500, 1000],
+        help='Detection counts per frame to benchmark',
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=20,
+        help='Timed runs per engine and count',
+    )
+    args = parser.parse_args()
+
+    # The restricted area check is shared by both engines, so leave it out
+    detection_items = {
+        'detect_no_safety_vest_or_helmet': True,
+        'detect_near_machinery_or_vehicle': True,
+        'detect_in_restricted_area': False,
+    }
+    detectors = {
+        engine: DangerDetector(detection_items, engine=engine)
+        for engine in DangerDetector.ENGINES
+    }
+
+    print(f"{'detections':>10} {'python ms':>10} {'numpy ms':>10} "
+          f"{'speed-up':>9} {'same':>5}")
+    for count in args.counts:
+        datas = generate_detections(count)
+        python_ms, python_warnings = time_engine(
+            detectors['python'], datas, args.repeats,
+        )
+        numpy_ms, numpy_warnings = time_engine(
+            detectors['numpy'], datas, args.repeats,
+        )
+        same = sorted(python_warnings) == sorted(numpy_warnings)
+        print(
+            f"{count:>10} {python_ms:>10.3f} {numpy_ms:>10.3f} "
+            f"{python_ms / numpy_ms:>8.1f}x {str(same):>5}",
+        )
+
+
+if __name__ == '__main__':
+    main()
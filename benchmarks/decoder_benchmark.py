@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import cv2
+
+from src.video_decoders import PyAVCapture
+
+#: Backends compared by default, as (name, backend, keyframes only).
+DEFAULT_MODES: list[tuple[str, str, bool]] = [
+    ('opencv', 'opencv', False),
+    ('pyav', 'pyav', False),
+    ('pyav keyframes', 'pyav', True),
+]
+
+
+def open_capture(
+    source: str,
+    backend: str,
+    keyframes_only: bool,
+) -> cv2.VideoCapture | PyAVCapture:
+    """
+    Opens the source with a decoder backend.
+
+    Args:
+        source (str): The video file or stream URL.
+        backend (str): 'opencv' or 'pyav'.
+        keyframes_only (bool): Whether PyAV decodes keyframes only.
+
+    Returns:
+        cv2.VideoCapture | PyAVCapture: The opened capture.
+    """
+    if backend == 'pyav':
+        return PyAVCapture(source, keyframes_only=keyframes_only)
+    return cv2.VideoCapture(source)
+
+
+def get_frame_time(cap: cv2.VideoCapture | PyAVCapture) -> float:
+    """
+    Returns the media time of the grabbed frame in seconds.
+    """
+    if isinstance(cap, PyAVCapture):
+        return cap.frame.time or 0.0
+    return cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+
+def get_media_duration(source: str) -> float | None:
+    """
+    Returns the duration of a video file, or None for a live stream.
+    """
+    cap = cv2.VideoCapture(source)
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if frames <= 0 or fps <= 0:
+        return None
+    return frames / fps
+
+
+def run_mode(
+    source: str,
+    backend: str,
+    keyframes_only: bool,
+    capture_interval: float,
+    duration: float,
+) -> dict[str, float]:
+    """
+    Reads a stream the way `FrameGrabber` does and measures its cost.
+
+    Every frame is grabbed, and one is converted per capture interval of
+    media time.
+
+    Args:
+        source (str): The video file or stream URL.
+        backend (str): 'opencv' or 'pyav'.
+        keyframes_only (bool): Whether PyAV decodes keyframes only.
+        capture_interval (float): Seconds of media between captures.
+        duration (float): The maximum wall time to read for.
+
+    Returns:
+        dict[str, float]: Frames grabbed and retrieved, CPU and wall time.
+    """
+    cap = open_capture(source, backend, keyframes_only)
+    grabbed = retrieved = 0
+    next_capture = 0.0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    while time.perf_counter() - wall_start < duration and cap.grab():
+        grabbed += 1
+        if get_frame_time(cap) >= next_capture:
+            ret, _ = cap.retrieve()
+            retrieved += int(ret)
+            next_capture += capture_interval
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    cap.release()
+    return {
+        'grabbed': grabbed,
+        'retrieved': retrieved,
+        'cpu': cpu,
+        'wall': wall,
+    }
+
+
+def main() -> None:
+    """
+    Compares CPU per stream of the OpenCV and PyAV decoder backends.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark decoder backends of StreamCapture.',
+    )
+    parser.add_argument(
+        '--source',
+        type=str,
+        default='tests/videos/test.mp4',
+        help='Video file, or an RTSP/HTTP URL standing in for a camera',
+    )
+    parser.add_argument(
+        '--capture_interval',
+        type=float,
+        default=5.0,
+        help='Seconds of video between captured frames',
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=60.0,
+        help='Maximum seconds to read a live stream for per backend',
+    )
+    args = parser.parse_args()
+
+    # Files are decoded as fast as possible, so CPU is scaled to real time
+    media_duration = get_media_duration(args.source)
+    print(
+        f"{'backend':>15} {'grabbed':>8} {'retrieved':>10} "
+        f"{'CPU s':>7} {'wall s':>7} {'CPU % at real time':>19}",
+    )
+    for name, backend, keyframes_only in DEFAULT_MODES:
+        result = run_mode(
+            args.source,
+            backend,
+            keyframes_only,
+            args.capture_interval,
+            args.duration,
+        )
+        media = media_duration or result['wall']
+        print(
+            f"{name:>15} {result['grabbed']:>8} {result['retrieved']:>10} "
+            f"{result['cpu']:>7.2f} {result['wall']:>7.2f} "
+            f"{result['cpu'] / media * 100:>19.2f}",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import numpy as np
+from aiohttp import web
+
+from src.live_stream_detection import LiveStreamDetector
+
+
+def create_stub_app(connections: set[tuple]) -> web.Application:
+    """
+    Creates a stub of the YOLO server API's token and detect endpoints.
+
+    Args:
+        connections (set[tuple]): Collects the client addresses seen by
+            the stub, one per TCP connection.
+
+    Returns:
+        web.Application: The stub application.
+    """
+    async def token(request: web.Request) -> web.Response:
+        connections.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'access_token': 'benchmark'})
+
+    async def detect(request: web.Request) -> web.Response:
+        connections.add(request.transport.get_extra_info('peername'))
+        await request.post()
+        return web.json_response([[10, 10, 50, 50, 0.9, 0]])
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post('/api/token', token)
+    app.router.add_post('/api/detect', detect)
+    return app
+
+
+async def time_requests(
+    detector: LiveStreamDetector,
+    frame: np.ndarray,
+    requests: int,
+    pooled: bool,
+) -> list[float]:
+    """
+    Times detection requests sent through the detector.
+
+    Args:
+        detector (LiveStreamDetector): The detector sending the requests.
+        frame (np.ndarray): The frame to send.
+        requests (int): The number of requests to time.
+        pooled (bool): Whether connections are kept between requests. If
+            not, the session is closed after each request, as it was when
+            every request opened its own session.
+
+    Returns:
+        list[float]: The latency of each request in milliseconds.
+    """
+    # Log in once so only detection requests are timed
+    await detector.authenticate()
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await detector.generate_detections_cloud(frame)
+        if not pooled:
+            await detector.close()
+        latencies.append((time.perf_counter() - start) * 1000)
+    await detector.close()
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Runs the benchmark with and without connection pooling.
+
+    Args:
+        args (argparse.Namespace): The benchmark arguments.
+    """
+    os.environ.setdefault('API_USERNAME', 'benchmark')
+    os.environ.setdefault('API_PASSWORD', 'benchmark')
+
+    connections: set[tuple] = set()
+    runner: web.AppRunner | None = None
+    api_url = args.api_url
+    if api_url is None:
+        runner = web.AppRunner(create_stub_app(connections))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', args.port)
+        await site.start()
+        api_url = f"http://127.0.0.1:{args.port}"
+
+    frame = np.random.default_rng(0).integers(
+        0, 255, (args.height, args.width, 3), dtype=np.uint8,
+    )
+
+    print(
+        f"{'mode':>10} {'mean ms':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'connections':>12}",
+    )
+    try:
+        for pooled in (False, True):
+            connections.clear()
+            detector = LiveStreamDetector(
+                api_url=api_url,
+                model_key=args.model_key,
+                detect_with_server=True,
+            )
+            latencies = await time_requests(
+                detector, frame, args.requests, pooled,
+            )
+            p95 = statistics.quantiles(latencies, n=20)[18]
+            mode = 'pooled' if pooled else 'unpooled'
+            # Connections are only counted by the local stub
+            opened = len(connections) if runner else '-'
+            print(
+                f"{mode:>10} {statistics.mean(latencies):>9.2f} "
+                f"{statistics.median(latencies):>9.2f} {p95:>9.2f} "
+                f"{opened:>12}",
+            )
+    finally:
+        if runner:
+            await runner.cleanup()
+
+
+def main() -> None:
+    """
+    Compares detection request latency with and without pooled sessions.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark pooled HTTP sessions for cloud detection.',
+    )
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=200,
+        help='Number of detection requests per mode',
+    )
+    parser.add_argument(
+        '--api_url',
+        type=str,
+        default=None,
+        help='API URL to benchmark instead of the local stub server',
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8765,
+        help='Port of the local stub server',
+    )
+    parser.add_argument(
+        '--model_key',
+        type=str,
+        default='yolo11n',
+        help='Model key sent with each request',
+    )
+    parser.add_argument(
+        '--width',
+        type=int,
+        default=640,
+        help='Width of the synthetic frames',
+    )
+    parser.add_argument(
+        '--height',
+        type=int,
+        default=360,
+        help='Height of the synthetic frames',
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
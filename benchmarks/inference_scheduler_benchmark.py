@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from functools import partial
+from typing import Any
+
+import numpy as np
+
+from src.inference_scheduler import default_detector_factory
+from src.inference_scheduler import InferenceScheduler
+
+
+class SimulatedDetector:
+    """
+    Stand-in for a model that costs a fixed time per frame.
+    """
+
+    def __init__(self, model_key: str, inference_ms: float):
+        """
+        Initialises the simulated detector.
+
+        Args:
+            model_key (str): The model key.
+            inference_ms (float): The simulated inference time per frame.
+        """
+        self.model_key = model_key
+        self.inference_ms = inference_ms
+
+    async def generate_detections_local(
+        self,
+        frame: np.ndarray,
+    ) -> list[list[float]]:
+        """
+        Simulates local inference on a frame.
+
+        Args:
+            frame (np.ndarray): The frame to detect objects in.
+
+        Returns:
+            list[list[float]]: A single fixed detection.
+        """
+        time.sleep(self.inference_ms / 1000)
+        return [[0, 0, 10, 10, 0.9, 5]]
+
+
+def simulated_factory(model_key: str, inference_ms: float) -> Any:
+    """
+    Builds a simulated detector.
+
+    Args:
+        model_key (str): The model key.
+        inference_ms (float): The simulated inference time per frame.
+
+    Returns:
+        Any: The simulated detector.
+    """
+    return SimulatedDetector(model_key, inference_ms)
+
+
+def run_stream(
+    scheduler: InferenceScheduler,
+    stream_id: str,
+    model_key: str,
+    frame: np.ndarray,
+    duration: float,
+    counter: Any,
+) -> None:
+    """
+    Pushes frames through the scheduler as fast as results come back.
+
+    Args:
+        scheduler (InferenceScheduler): The shared inference scheduler.
+        stream_id (str): The identifier of the stream.
+        model_key (str): The model key used for detection.
+        frame (np.ndarray): The frame to submit.
+        duration (float): How long to run, in seconds.
+        counter (Any): A shared counter of completed frames.
+    """
+    # Create the client inside the stream process, as MainApp does
+    client = scheduler.create_client(stream_id, model_key)
+
+    async def loop() -> None:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            await client.generate_detections(frame)
+            with counter.get_lock():
+                counter.value += 1
+
+    asyncio.run(loop())
+
+
+def benchmark(
+    streams: int,
+    args: argparse.Namespace,
+    manager: Any,
+) -> float:
+    """
+    Measures scheduler throughput for a number of concurrent streams.
+
+    Args:
+        streams (int): The number of concurrent streams.
+        args (argparse.Namespace): The benchmark arguments.
+        manager (Any): The multiprocessing manager.
+
+    Returns:
+        float: Frames per second across all streams.
+    """
+    factory = (
+        default_detector_factory if args.real
+        else partial(simulated_factory, inference_ms=args.inference_ms)
+    )
+    scheduler = InferenceScheduler(
+        manager,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        num_workers=args.workers,
+        detector_factory=factory,
+    )
+    scheduler.start()
+
+    frame = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    counter: Any = multiprocessing.Value('i', 0)
+    processes = [
+        multiprocessing.Process(
+            target=run_stream,
+            args=(
+                scheduler,
+                f"stream_{i}",
+                args.model_key,
+                frame,
+                args.duration,
+                counter,
+            ),
+        )
+        for i in range(streams)
+    ]
+    start = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.time() - start
+    scheduler.stop()
+    return counter.value / elapsed
+
+
+def main() -> None:
+    """
+    Reports scheduler throughput in frames/s for N streams.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the batched inference scheduler.',
+    )
+    parser.add_argument(
+        '--streams',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8, 16],
+        help='Numbers of concurrent streams to benchmark',
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=10.0,
+        help='Seconds to run each measurement',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of model-owning inference workers',
+    )
+    parser.add_argument(
+        '--max_batch_size',
+        type=int,
+        default=8,
+        help='Maximum number of frames per batch',
+    )
+    parser.add_argument(
+        '--max_wait_ms',
+        type=float,
+        default=20.0,
+        help='Maximum time in milliseconds to wait for a full batch',
+    )
+    parser.add_argument(
+        '--model_key',
+        type=str,
+        default='yolo11n',
+        help='Model key to use for detection',
+    )
+    parser.add_argument(
+        '--width',
+        type=int,
+        default=1920,
+        help='Width of the synthetic frames',
+    )
+    parser.add_argument(
+        '--height',
+        type=int,
+        default=1080,
+        help='Height of the synthetic frames',
+    )
+    parser.add_argument(
+        '--inference_ms',
+        type=float,
+        default=30.0,
+        help='Simulated inference time per frame',
+    )
+    parser.add_argument(
+        '--real',
+        action='store_true',
+        help='Use the real local model instead of a simulated one',
+    )
+    args = parser.parse_args()
+
+    manager = multiprocessing.Manager()
+    print(f"{'streams':>8} {'frames/s':>10} {'model copies':>13}")
+    for streams in args.streams:
+        fps = benchmark(streams, args, manager)
+        # Each worker loads one copy of the model, however many streams
+        print(f"{streams:>8} {fps:>10.2f} {args.workers:>13}")
+
+
+if __name__ == '__main__':
+    main()
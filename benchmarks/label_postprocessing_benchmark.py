@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from src.label_postprocessing import remove_conflicting_labels
+from src.label_postprocessing import SERVER_IOU_THRESHOLD
+
+#: (positive, negative) class pairs, as in the post-processing.
+PAIRS = ((0, 2), (7, 4))
+
+
+def generate_detections(
+    count: int,
+    width: int = 1920,
+    height: int = 1080,
+    seed: int = 0,
+) -> list[list[float]]:
+    """
+    Synthesises detections of workers with hardhat and vest labels.
+
+    Args:
+        count (int): The number of detections.
+        width (int): The frame width.
+        height (int): The frame height.
+        seed (int): The random seed.
+
+    Returns:
+        list[list[float]]: Detections of [x1, y1, x2, y2, score, class].
+    """
+    rng = random.Random(seed)
+    datas = []
+    for _ in range(count):
+        x, y = rng.randint(0, width - 80), rng.randint(0, height - 80)
+        w, h = rng.randint(10, 80), rng.randint(10, 80)
+        label = rng.choice([0, 2, 4, 5, 7])
+        datas.append([x, y, x + w, y + h, rng.random(), label])
+    return datas
+
+
+async def legacy_overlaps(datas: list, threshold: float) -> list:
+    """
+    The overlap pass of the server before, awaiting each pair.
+    """
+    async def overlaps(i: int, j: int) -> bool:
+        a, b = datas[i][:4], datas[j][:4]
+        x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+        x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+        inter = max(0, x2 - x1 + 1) * max(0, y2 - y1 + 1)
+        area1 = (a[2] - a[0] + 1) * (a[3] - a[1] + 1)
+        area2 = (b[2] - b[0] + 1) * (b[3] - b[1] + 1)
+        return inter / float(area1 + area2 - inter) > threshold
+
+    to_remove = set()
+    for positive, negative in PAIRS:
+        positives = [i for i, d in enumerate(datas) if d[5] == positive]
+        negatives = [i for i, d in enumerate(datas) if d[5] == negative]
+        for i in positives:
+            for j in negatives:
+                if await overlaps(i, j):
+                    to_remove.add(j)
+    return [d for i, d in enumerate(datas) if i not in to_remove]
+
+
+async def legacy_contained(datas: list) -> list:
+    """
+    The containment pass of the server before, awaiting each pair.
+    """
+    def inside(inner: list, outer: list) -> bool:
+        return (
+            inner[0] >= outer[0] and inner[2] <= outer[2]
+            and inner[1] >= outer[1] and inner[3] <= outer[3]
+        )
+
+    async def check(i: int, j: int) -> set[int]:
+        if inside(datas[j][:4], datas[i][:4]):
+            return {j}
+        if inside(datas[i][:4], datas[j][:4]):
+            return {i}
+        return set()
+
+    to_remove: set[int] = set()
+    for positive, negative in PAIRS:
+        positives = [i for i, d in enumerate(datas) if d[5] == positive]
+        negatives = [i for i, d in enumerate(datas) if d[5] == negative]
+        for i in positives:
+            for j in negatives:
+                to_remove |= await check(i, j)
+    return [d for i, d in enumerate(datas) if i not in to_remove]
+
+
+async def legacy_process_labels(datas: list, threshold: float) -> list:
+    """
+    The three passes of the server before.
+    """
+    datas = await legacy_overlaps(datas, threshold)
+    datas = await legacy_contained(datas)
+    return await legacy_overlaps(datas, threshold)
+
+
+def time_runs(function, repeats: int) -> float:
+    """
+    Returns the median time of a function in milliseconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    """
+    Compares the per-pair and vectorised label post-processing.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark Hardhat/Safety Vest label post-processing.',
+    )
+    parser.add_argument(
+        '--counts',
+        type=int,
+        nargs='+',
+        default=[10, 100, 1000],
+        help='Numbers of detections per frame to benchmark',
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=20,
+        help='Runs per count, of which the median is reported',
+    )
+    parser.add_argument(
+        '--iou_threshold',
+        type=float,
+        default=SERVER_IOU_THRESHOLD,
+        help='IoU above which overlapping negative labels are dropped',
+    )
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    print(
+        f"{'detections':>10} {'per-pair ms':>12} {'vectorised ms':>14} "
+        f"{'speed-up':>9} {'same':>5}",
+    )
+    for count in args.counts:
+        datas = generate_detections(count)
+        legacy = loop.run_until_complete(
+            legacy_process_labels(datas, args.iou_threshold),
+        )
+        vectorised = remove_conflicting_labels(datas, args.iou_threshold)
+        legacy_ms = time_runs(
+            lambda: loop.run_until_complete(
+                legacy_process_labels(datas, args.iou_threshold),
+            ),
+            args.repeats,
+        )
+        vectorised_ms = time_runs(
+            lambda: remove_conflicting_labels(datas, args.iou_threshold),
+            args.repeats,
+        )
+        print(
+            f"{count:>10} {legacy_ms:>12.3f} {vectorised_ms:>14.3f} "
+            f"{legacy_ms / vectorised_ms:>8.1f}x "
+            f"{str(legacy == vectorised):>5}",
+        )
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
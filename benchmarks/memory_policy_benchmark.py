@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import random
+import statistics
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from examples.YOLO_server_api.backend import detection
+from src.label_postprocessing import CONFLICTING_LABELS
+from src.memory_policy import MemoryPolicy
+
+
+def generate_ppe_detections(
+    count: int,
+    seed: int = 0,
+    width: int = 1920,
+    height: int = 1080,
+) -> list[list[float | int]]:
+    """
+    Generates PPE detections where half of the labels have a conflicting
+    twin, as the server's `process_labels` sees them.
+
+    Args:
+        count (int): The number of detections to generate.
+        seed (int): The random seed.
+        width (int): The frame width.
+        height (int): The frame height.
+
+    Returns:
+        list[list[float | int]]: Detections in [x1, y1, x2, y2, conf,
+            label] form.
+    """
+    rng = random.Random(seed)
+    datas: list[list[float | int]] = []
+    while len(datas) < count:
+        label, twin = rng.choice([(0, 2), (7, 4)])
+        w, h = rng.randint(20, 80), rng.randint(20, 80)
+        x1, y1 = rng.randint(0, width - w), rng.randint(0, height - h)
+        datas.append([x1, y1, x1 + w, y1 + h, rng.uniform(0.3, 1.0), label])
+        if rng.random() < 0.5:
+            datas.append(
+                [x1 + 1, y1 + 1, x1 + w, y1 + h, rng.uniform(0.3, 1.0), twin],
+            )
+    return datas[:count]
+
+
+@contextlib.contextmanager
+def per_call_collections() -> Iterator[None]:
+    """
+    Restores the previous behaviour of collecting after every overlap
+    calculation and every `remove_overlapping_labels` call, of which the
+    server made about one per conflicting pair and one per pass over two
+    overlap passes.
+    """
+    process_labels = detection.process_labels
+
+    async def collecting_process(
+        datas: list[list[float | int]],
+        iou_threshold: float | None = None,
+    ) -> list[list[float | int]]:
+        classes = [data[5] for data in datas]
+        pairs = sum(
+            classes.count(positive) * classes.count(negative)
+            for positive, negative in CONFLICTING_LABELS
+        )
+        for _ in range(2 * (pairs + 1)):
+            gc.collect()
+        return await process_labels(datas, iou_threshold)
+
+    detection.process_labels = collecting_process
+    try:
+        yield
+    finally:
+        detection.process_labels = process_labels
+
+
+def time_requests(
+    datas: list[list[float | int]],
+    requests: int,
+    policy: MemoryPolicy | None,
+) -> list[float]:
+    """
+    Times the label post-processing of the `/detect` path per request.
+
+    Args:
+        datas (list[list[float | int]]): The detections of one request.
+        requests (int): The number of requests to time.
+        policy (MemoryPolicy | None): The policy applied after each request.
+
+    Returns:
+        list[float]: The latency of each request in milliseconds.
+    """
+    loop = asyncio.new_event_loop()
+    latencies = []
+    try:
+        for _ in range(requests):
+            request_datas = [list(d) for d in datas]
+            start = time.perf_counter()
+            loop.run_until_complete(detection.process_labels(request_datas))
+            if policy is not None:
+                policy.step()
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        loop.close()
+    return latencies
+
+
+def main() -> None:
+    """
+    Compares `/detect` post-processing latency across memory policies.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark garbage collection policies on /detect.',
+    )
+    parser.add_argument(
+        '--detections',
+        type=int,
+        default=20,
+        help='Number of detections per request',
+    )
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=200,
+        help='Number of requests to time per policy',
+    )
+    parser.add_argument(
+        '--before_requests',
+        type=int,
+        default=5,
+        help='Number of requests to time with per-call collections',
+    )
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default=20,
+        help='Requests between collections in interval mode',
+    )
+    parser.add_argument(
+        '--rss_threshold_mb',
+        type=float,
+        default=1024.0,
+        help='RSS threshold in MB for rss mode',
+    )
+    parser.add_argument(
+        '--heap_objects',
+        type=int,
+        default=0,
+        help='Extra live objects to emulate a larger server heap',
+    )
+    args = parser.parse_args()
+
+    # Live objects make every full collection more expensive
+    heap: list[Any] = [[i] for i in range(args.heap_objects)]
+    datas = generate_ppe_detections(args.detections)
+
+    results: dict[str, tuple[list[float], int]] = {}
+    with per_call_collections():
+        # Count full collections of the oldest generation
+        collections_before = gc.get_stats()[2]['collections']
+        latencies = time_requests(datas, args.before_requests, None)
+        collections = gc.get_stats()[2]['collections'] - collections_before
+    results['per-call (before)'] = (latencies, collections)
+
+    for mode in MemoryPolicy.MODES:
+        policy = MemoryPolicy(
+            mode=mode,
+            interval=args.interval,
+            rss_threshold_mb=args.rss_threshold_mb,
+        )
+        latencies = time_requests(datas, args.requests, policy)
+        results[mode] = (latencies, policy.collections)
+
+    print(
+        f"{'policy':>18} {'mean ms':>9} {'p50 ms':>9} "
+        f"{'p99 ms':>9} {'full GCs':>9}",
+    )
+    for name, (latencies, collections) in results.items():
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(
+            f"{name:>18} {statistics.mean(latencies):>9.3f} "
+            f"{statistics.median(latencies):>9.3f} {p99:>9.3f} "
+            f"{collections:>9}",
+        )
+    print(f"RSS: {MemoryPolicy(mode='off').get_rss_mb():.1f} MB")
+    del heap
+
+
+if __name__ == '__main__':
+    main()
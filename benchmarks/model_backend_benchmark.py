@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from sahi.predict import get_sliced_prediction
+
+from src.model_backends import load_detection_model
+from src.replay_benchmark import summarise_latencies
+
+
+def read_frames(source: str, count: int, stride: int) -> list[np.ndarray]:
+    """
+    Reads frames spread over a video, or a single image.
+
+    Args:
+        source (str): The video or image file.
+        count (int): The most frames to read.
+        stride (int): Frames skipped between two read frames.
+
+    Returns:
+        list[np.ndarray]: The frames.
+    """
+    image = cv2.imread(source)
+    if image is not None:
+        return [image]
+
+    cap = cv2.VideoCapture(source)
+    frames: list[np.ndarray] = []
+    index = 0
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % stride == 0:
+            frames.append(frame)
+        index += 1
+    cap.release()
+    return frames
+
+
+def detect(model, frame: np.ndarray) -> np.ndarray:
+    """
+    Runs the sliced inference of `LiveStreamDetector` on a frame.
+
+    Args:
+        model: The SAHI detection model.
+        frame (np.ndarray): The frame.
+
+    Returns:
+        np.ndarray: An (N, 6) array of [x1, y1, x2, y2, score, class].
+    """
+    result = get_sliced_prediction(
+        frame,
+        model,
+        slice_height=376,
+        slice_width=376,
+        overlap_height_ratio=0.3,
+        overlap_width_ratio=0.3,
+        verbose=0,
+    )
+    return np.array(
+        [
+            [
+                *obj.bbox.to_voc_bbox(),
+                obj.score.value,
+                obj.category.id,
+            ]
+            for obj in result.object_prediction_list
+        ],
+        dtype=np.float32,
+    ).reshape(-1, 6)
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Computes the IoU of every pair of boxes.
+
+    Args:
+        boxes1 (np.ndarray): An (N, 4+) array of [x1, y1, x2, y2, ...].
+        boxes2 (np.ndarray): An (M, 4+) array of [x1, y1, x2, y2, ...].
+
+    Returns:
+        np.ndarray: The (N, M) IoU matrix.
+    """
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:4], boxes2[None, :, 2:4])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area1 = np.prod(boxes1[:, 2:4] - boxes1[:, :2], axis=1)
+    area2 = np.prod(boxes2[:, 2:4] - boxes2[:, :2], axis=1)
+    union = area1[:, None] + area2[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def match_detections(
+    reference: np.ndarray,
+    candidate: np.ndarray,
+    iou_threshold: float,
+) -> list[float]:
+    """
+    Greedily pairs candidate boxes with reference boxes of the same class.
+
+    Args:
+        reference (np.ndarray): The boxes of the reference backend.
+        candidate (np.ndarray): The boxes of the compared backend.
+        iou_threshold (float): The IoU a pair needs to match.
+
+    Returns:
+        list[float]: The IoU of each matched pair.
+    """
+    if not len(reference) or not len(candidate):
+        return []
+    iou = box_iou(reference, candidate)
+    iou[reference[:, None, 5] != candidate[None, :, 5]] = 0
+    matches = []
+    while iou.size and iou.max() >= iou_threshold:
+        row, column = np.unravel_index(iou.argmax(), iou.shape)
+        matches.append(float(iou[row, column]))
+        iou[row, :] = 0
+        iou[:, column] = 0
+    return matches
+
+
+def main() -> None:
+    """
+    Compares the latency and detections of the ONNX and PyTorch backends.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark ONNX Runtime against the PyTorch backend.',
+    )
+    parser.add_argument(
+        '--source',
+        type=str,
+        default='tests/videos/test.mp4',
+        help='Video or image file to detect on',
+    )
+    parser.add_argument(
+        '--model_key',
+        type=str,
+        default='yolo11n',
+        help='Model key, with weights in models/pt and models/onnx',
+    )
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=50,
+        help='Number of frames to read from a video',
+    )
+    parser.add_argument(
+        '--stride',
+        type=int,
+        default=10,
+        help='Video frames skipped between two benchmarked frames',
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        default=None,
+        help='Intra-op threads of ONNX Runtime, one per core by default',
+    )
+    parser.add_argument(
+        '--iou_threshold',
+        type=float,
+        default=0.5,
+        help='IoU an ONNX box needs with a PyTorch box to agree with it',
+    )
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames, args.stride)
+    if not frames:
+        raise SystemExit(f"No frames could be read from {args.source}")
+
+    results: dict[str, list[np.ndarray]] = {}
+    print(
+        f"{'backend':>8} {'frames':>7} {'p50 ms':>8} {'p90 ms':>8} "
+        f"{'mean ms':>8} {'boxes':>6}",
+    )
+    for backend in ('torch', 'onnx'):
+        model = load_detection_model(
+            args.model_key, backend, num_threads=args.num_threads,
+        )
+        # Leave lazy initialisation out of the timings
+        detect(model, frames[0])
+        latencies = []
+        results[backend] = []
+        for frame in frames:
+            start = time.perf_counter()
+            results[backend].append(detect(model, frame))
+            latencies.append(time.perf_counter() - start)
+        stats = summarise_latencies(latencies)
+        boxes = sum(len(detections) for detections in results[backend])
+        print(
+            f"{backend:>8} {stats['count']:>7} {stats['p50_ms']:>8.1f} "
+            f"{stats['p90_ms']:>8.1f} {stats['mean_ms']:>8.1f} {boxes:>6}",
+        )
+
+    # Agreement of the ONNX detections with the PyTorch ones
+    ious = []
+    torch_boxes = onnx_boxes = 0
+    for reference, candidate in zip(results['torch'], results['onnx']):
+        ious += match_detections(reference, candidate, args.iou_threshold)
+        torch_boxes += len(reference)
+        onnx_boxes += len(candidate)
+    precision = len(ious) / onnx_boxes if onnx_boxes else 1.0
+    recall = len(ious) / torch_boxes if torch_boxes else 1.0
+    mean_iou = float(np.mean(ious)) if ious else 0.0
+    print(
+        f"ONNX vs PyTorch at IoU {args.iou_threshold}: "
+        f"precision {precision:.3f}, recall {recall:.3f}, "
+        f"mean IoU {mean_iou:.3f}",
+    )
+
+
+if __name__ == '__main__':
+    main()
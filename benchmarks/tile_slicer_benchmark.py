@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any
+
+import numpy as np
+
+from src.tile_slicer import TileSlicer
+
+
+class StubDetectionModel:
+    """
+    Stands in for a SAHI detection model with a fixed cost per inference.
+    """
+
+    def __init__(self, inference_ms: float):
+        """
+        Initialises the stub model.
+
+        Args:
+            inference_ms (float): The time each inference takes.
+        """
+        self.inference_ms = inference_ms
+        self.confidence_threshold = 0.25
+        self.object_prediction_list: list[Any] = []
+        self.object_prediction_list_per_image: list[list[Any]] = []
+        self.inferences = 0
+
+    def perform_inference(self, image: np.ndarray) -> None:
+        self.inferences += 1
+        time.sleep(self.inference_ms / 1000)
+
+    def perform_batch_inference(self, images: list[np.ndarray]) -> None:
+        for image in images:
+            self.perform_inference(image)
+        self.object_prediction_list_per_image = [[] for _ in images]
+
+    def convert_original_predictions(self, **kwargs: Any) -> None:
+        self.object_prediction_list = []
+
+
+def generate_frames(
+    width: int,
+    height: int,
+    count: int,
+    moving: int,
+) -> list[np.ndarray]:
+    """
+    Synthesises a static CCTV-like scene with a few moving objects.
+
+    Args:
+        width (int): The frame width.
+        height (int): The frame height.
+        count (int): The number of frames.
+        moving (int): The number of moving objects.
+
+    Returns:
+        list[np.ndarray]: The frames.
+    """
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    starts = rng.integers(0, min(width, height) // 2, (moving, 2))
+    frames = []
+    for index in range(count):
+        # Mild sensor noise on every pixel
+        noise = rng.integers(-2, 3, background.shape)
+        frame = np.clip(background + noise, 0, 255).astype(np.uint8)
+        for x, y in starts:
+            # Each object walks slowly to the right
+            x = (x + index * 4) % (width - 60)
+            frame[y:y + 120, x:x + 60] = 200
+        frames.append(frame)
+    return frames
+
+
+def run_mode(
+    slicer: TileSlicer,
+    frames: list[np.ndarray],
+    inference_ms: float,
+) -> tuple[list[float], int]:
+    """
+    Runs every frame through a slicer.
+
+    Args:
+        slicer (TileSlicer): The slicer to benchmark.
+        frames (list[np.ndarray]): The frames.
+        inference_ms (float): The cost of each model call.
+
+    Returns:
+        tuple[list[float], int]: The latency of each frame in milliseconds
+            and the number of model calls.
+    """
+    model = StubDetectionModel(inference_ms)
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        slicer.predict(frame, model)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, model.inferences
+
+
+def main() -> None:
+    """
+    Compares full and incremental slicing on a mostly static scene.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark incremental SAHI slicing.',
+    )
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=100,
+        help='Number of frames per mode',
+    )
+    parser.add_argument(
+        '--width',
+        type=int,
+        default=1920,
+        help='Width of the synthetic frames',
+    )
+    parser.add_argument(
+        '--height',
+        type=int,
+        default=1080,
+        help='Height of the synthetic frames',
+    )
+    parser.add_argument(
+        '--moving',
+        type=int,
+        default=2,
+        help='Number of moving objects in the scene',
+    )
+    parser.add_argument(
+        '--slice_size',
+        type=int,
+        default=376,
+        help='Width and height of each slice',
+    )
+    parser.add_argument(
+        '--inference_ms',
+        type=float,
+        default=5.0,
+        help='Simulated cost of each model call in milliseconds',
+    )
+    parser.add_argument(
+        '--diff_threshold',
+        type=float,
+        default=4.0,
+        help='Mean pixel difference above which a tile is re-run',
+    )
+    args = parser.parse_args()
+
+    frames = generate_frames(args.width, args.height, args.frames, args.moving)
+    print(
+        f"{'mode':>12} {'mean ms':>9} {'p95 ms':>9} {'model calls':>12}",
+    )
+    for incremental in (False, True):
+        slicer = TileSlicer(
+            slice_size=args.slice_size,
+            incremental=incremental,
+            diff_threshold=args.diff_threshold,
+        )
+        latencies, calls = run_mode(slicer, frames, args.inference_ms)
+        p95 = statistics.quantiles(latencies, n=20)[18]
+        mode = 'incremental' if incremental else 'full'
+        print(
+            f"{mode:>12} {statistics.mean(latencies):>9.2f} "
+            f"{p95:>9.2f} {calls:>12}",
+        )
+        if incremental:
+            stats = slicer.get_stats()
+            print(
+                f"Tiles inferred: {stats['tiles_inferred']}, "
+                f"reused: {stats['tiles_reused']}",
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+from aiohttp import web
+
+from src.live_stream_detection import LiveStreamDetector
+
+#: Upload options compared by default, as (codec, quality, max side).
+DEFAULT_OPTIONS: list[tuple[str, int, int | None]] = [
+    ('png', 90, None),
+    ('jpeg', 95, None),
+    ('jpeg', 85, None),
+    ('jpeg', 85, 1280),
+    ('webp', 85, None),
+    ('webp', 85, 1280),
+]
+
+
+def create_stub_app() -> web.Application:
+    """
+    Creates a stub `/api/detect` server that decodes the upload like the
+    YOLO server API does.
+
+    Returns:
+        web.Application: The stub application.
+    """
+    async def token(request: web.Request) -> web.Response:
+        return web.json_response({'access_token': 'benchmark'})
+
+    async def detect(request: web.Request) -> web.Response:
+        form = await request.post()
+        image = form['image']
+        data = image.file.read()  # type: ignore[union-attr]
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise web.HTTPBadRequest(text='Unsupported or corrupt image.')
+        return web.json_response([[10, 10, 50, 50, 0.9, 0]])
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post('/api/token', token)
+    app.router.add_post('/api/detect', detect)
+    return app
+
+
+def load_frame(path: str | None, width: int, height: int) -> np.ndarray:
+    """
+    Loads the benchmark frame, or synthesises a textured one.
+
+    Args:
+        path (str | None): Path to a real frame to use.
+        width (int): Width of the synthetic frame.
+        height (int): Height of the synthetic frame.
+
+    Returns:
+        np.ndarray: The frame.
+    """
+    if path:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise ValueError(f"Cannot read frame from {path}")
+        return frame
+
+    # Smooth gradients with noise compress roughly like a CCTV frame
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + y * 0, x * 0 + y, (x + y) / 2], axis=-1)
+    noise = rng.normal(0, 12, (height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+async def benchmark_option(
+    api_url: str,
+    frame: np.ndarray,
+    codec: str,
+    quality: int,
+    max_side: int | None,
+    requests: int,
+) -> dict[str, float]:
+    """
+    Measures one upload option.
+
+    Args:
+        api_url (str): The detection API URL.
+        frame (np.ndarray): The frame to upload.
+        codec (str): The upload codec.
+        quality (int): The JPEG/WebP quality.
+        max_side (int | None): The maximum side of the uploaded frame.
+        requests (int): The number of requests to time.
+
+    Returns:
+        dict[str, float]: Mean encode time and end-to-end latency in
+            milliseconds, and payload size in kilobytes.
+    """
+    detector = LiveStreamDetector(
+        api_url=api_url,
+        detect_with_server=True,
+        upload_codec=codec,
+        upload_quality=quality,
+        upload_max_side=max_side,
+    )
+    await detector.authenticate()
+
+    encode_times = []
+    latencies = []
+    payload = b''
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            payload, _ = detector.encode_frame(frame)
+            encode_times.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await detector.generate_detections_cloud(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        await detector.close()
+
+    return {
+        'encode_ms': statistics.mean(encode_times),
+        'payload_kb': len(payload) / 1024,
+        'latency_ms': statistics.mean(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Runs the benchmark for every upload option.
+
+    Args:
+        args (argparse.Namespace): The benchmark arguments.
+    """
+    os.environ.setdefault('API_USERNAME', 'benchmark')
+    os.environ.setdefault('API_PASSWORD', 'benchmark')
+
+    runner: web.AppRunner | None = None
+    api_url = args.api_url
+    if api_url is None:
+        runner = web.AppRunner(create_stub_app())
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', args.port).start()
+        api_url = f"http://127.0.0.1:{args.port}"
+
+    frame = load_frame(args.frame, args.width, args.height)
+    print(f"Frame: {frame.shape[1]}x{frame.shape[0]}")
+    print(
+        f"{'codec':>6} {'quality':>8} {'max side':>9} {'encode ms':>10} "
+        f"{'payload KB':>11} {'end-to-end ms':>14}",
+    )
+    try:
+        for codec, quality, max_side in DEFAULT_OPTIONS:
+            result = await benchmark_option(
+                api_url, frame, codec, quality, max_side, args.requests,
+            )
+            print(
+                f"{codec:>6} {quality:>8} {str(max_side or '-'):>9} "
+                f"{result['encode_ms']:>10.2f} "
+                f"{result['payload_kb']:>11.1f} "
+                f"{result['latency_ms']:>14.2f}",
+            )
+    finally:
+        if runner:
+            await runner.cleanup()
+
+
+def main() -> None:
+    """
+    Reports encode time, payload size and latency per upload option.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark upload codecs for cloud detection.',
+    )
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=20,
+        help='Number of requests per upload option',
+    )
+    parser.add_argument(
+        '--frame',
+        type=str,
+        default=None,
+        help='Path to a real frame instead of a synthetic one',
+    )
+    parser.add_argument(
+        '--api_url',
+        type=str,
+        default=None,
+        help='API URL to benchmark instead of the local stub server',
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8766,
+        help='Port of the local stub server',
+    )
+    parser.add_argument(
+        '--width',
+        type=int,
+        default=1920,
+        help='Width of the synthetic frame',
+    )
+    parser.add_argument(
+        '--height',
+        type=int,
+        default=1080,
+        help='Height of the synthetic frame',
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@ from sahi import AutoDetectionModel
 from sahi.predict import get_sliced_prediction
 from sahi.utils.coco import Coco
 
+from src.model_backends import OnnxDetectionModel
+
 
 class COCOEvaluator:
     """
@@ -27,6 +29,7 @@ class COCOEvaluator:
         slice_width: int = 370,
         overlap_height_ratio: float = 0.3,
         overlap_width_ratio: float = 0.3,
+        model_backend: str = 'torch',
     ):
         """
         Initialises the evaluator with model and dataset parameters.
@@ -45,13 +48,23 @@ class COCOEvaluator:
                 Defaults to 0.3.
             overlap_width_ratio (float, optional): Width slice overlap ratio.
                 Defaults to 0.3.
+            model_backend (str, optional): 'torch' for a .pt model or 'onnx'
+                for an ONNX model, quantised or not, run on the CPU.
+                Defaults to 'torch'.
         """
-        self.model = AutoDetectionModel.from_pretrained(
-            model_type='yolov8',
-            model_path=model_path,
-            confidence_threshold=confidence_threshold,
-            # device="cpu",  # Uncomment this to force CPU usage
-        )
+        if model_backend == 'onnx':
+            self.model = OnnxDetectionModel(
+                model_path=model_path,
+                confidence_threshold=confidence_threshold,
+                device='cpu',
+            )
+        else:
+            self.model = AutoDetectionModel.from_pretrained(
+                model_type='yolov8',
+                model_path=model_path,
+                confidence_threshold=confidence_threshold,
+                # device="cpu",  # Uncomment this to force CPU usage
+            )
         self.coco_json = coco_json
         self.image_dir = image_dir
         self.slice_height = slice_height
@@ -1,419 +1,376 @@
 from __future__ import annotations
 
-import gc
+import logging
+import os
+from collections import OrderedDict
 from typing import Any
 
 import cv2
 import numpy as np
 from sahi.predict import get_sliced_prediction
 
+from src.cascade_detector import CascadeDetector
+from src.label_postprocessing import remove_conflicting_labels
+from src.label_postprocessing import SERVER_IOU_THRESHOLD
+from src.tile_slicer import TileSlicer
+
+from .inference_executor import InferenceExecutor
+from .inference_executor import InferenceTimings
 from .models import DetectionModelManager
 
+logger = logging.getLogger(__name__)
+
 model_loader = DetectionModelManager()
 
+#: Runs blocking SAHI inference off the event loop with a bounded queue.
+inference_executor = InferenceExecutor(
+    max_workers=int(os.getenv('INFERENCE_WORKERS', '1')),
+    max_queue_size=int(os.getenv('INFERENCE_QUEUE_SIZE', '8')),
+)
+
+#: IoU above which a NO-Hardhat or NO-Safety Vest label overlapping a
+#: Hardhat or Safety Vest label is dropped.
+LABEL_IOU_THRESHOLD = float(
+    os.getenv('LABEL_IOU_THRESHOLD', str(SERVER_IOU_THRESHOLD)),
+)
+
+#: The number of streams whose incremental slicing state is kept.
+MAX_STREAM_SLICERS = 64
+
+#: Incremental slicers by user, stream, model and slice settings, oldest
+#: first.
+stream_slicers: OrderedDict[tuple, TileSlicer] = OrderedDict()
+
+#: The cascade fallback of requests that do not ask for one, 'sliced' or
+#: 'regions'. Empty always runs sliced inference.
+CASCADE_MODE = os.getenv('CASCADE_MODE', '')
+
+#: Cascades with their statistics by user, stream, model and fallback,
+#: oldest first.
+stream_cascades: OrderedDict[tuple, CascadeDetector] = OrderedDict()
+
 
 async def convert_to_image(data: bytes) -> np.ndarray:
     """
     Converts raw image bytes into an OpenCV image format.
 
+    Any format OpenCV can decode is accepted, including the PNG, JPEG and
+    WebP uploads sent by the stream clients.
+
     Args:
         data (bytes): The image data in bytes.
 
     Returns:
         np.ndarray: The decoded image in OpenCV format.
+
+    Raises:
+        ValueError: If the data is not a decodable image.
     """
     # Convert image bytes to a NumPy array
     npimg = np.frombuffer(data, np.uint8)
     # Decode the NumPy array into an OpenCV image
     img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError('Unsupported or corrupt image data.')
     return img
 
 
-async def get_prediction_result(
-    img: np.ndarray,
-    model: DetectionModelManager,
-) -> Any:
+def pack_detections(results: list[list[list[float | int]]]) -> bytes:
     """
-    Generates sliced predictions for an image using the specified model.
+    Packs the detections of several images into a compact binary format.
+
+    The layout is little-endian: a uint32 image count, one uint32
+    detection count per image, then every detection as six float32 values
+    [x1, y1, x2, y2, confidence, label], image after image.
 
     Args:
-        img (np.ndarray): The image in OpenCV format.
-        model (DetectionModelManager): The object detection model instance.
+        results (list[list[list[float | int]]]): The detections per image.
 
     Returns:
-        Any: The prediction result from the model.
+        bytes: The packed detections.
     """
-    # Use the SAHI library's get_sliced_prediction function for detection
-    return get_sliced_prediction(
-        img,
-        model,
-        slice_height=370,
-        slice_width=370,
-        overlap_height_ratio=0.3,
-        overlap_width_ratio=0.3,
+    header = np.array(
+        [len(results), *(len(datas) for datas in results)],
+        dtype='<u4',
     )
+    rows = np.array(
+        [data for datas in results for data in datas],
+        dtype='<f4',
+    ).reshape(-1, 6)
+    return header.tobytes() + rows.tobytes()
 
 
-def compile_detection_data(result: Any) -> list[list[float | int]]:
+def keep_stream_state(
+    states: OrderedDict[tuple, Any],
+    key: tuple,
+    state: Any,
+    kind: str,
+) -> None:
     """
-    Compiles detection data from the model's prediction results.
+    Adds the state of a stream, dropping the least recently used ones.
 
     Args:
-        result (Any): The result of the model prediction.
-
-    Returns:
-        list[list[float | int]]: Detection data including bounding boxes,
-        confidence, and label IDs.
-    """
-    datas = []
-    # Extract bounding box, confidence, and label ID for each prediction
-    for object_prediction in result.object_prediction_list:
-        label = int(object_prediction.category.id)
-        x1, y1, x2, y2 = (int(x) for x in object_prediction.bbox.to_voc_bbox())
-        confidence = float(object_prediction.score.value)
-        datas.append([x1, y1, x2, y2, confidence, label])
-    return datas
+        states (OrderedDict[tuple, Any]): The states by key, oldest first.
+        key (tuple): The key of the new state.
+        state (Any): The slicer or cascade to keep.
+        kind (str): What the state is, for the log.
+    """
+    states[key] = state
+    while len(states) > MAX_STREAM_SLICERS:
+        (owner, stream_id, *_), _ = states.popitem(last=False)
+        logger.warning(
+            f"Dropped the {kind} of stream '{stream_id}' of user "
+            f"'{owner}' beyond {MAX_STREAM_SLICERS} streams.",
+        )
 
 
-async def process_labels(
-    datas: list[list[float | int]],
-) -> list[list[float | int]]:
+def get_slicer(
+    model_key: str,
+    stream_id: str | None = None,
+    slice_size: int | None = None,
+    slice_overlap: float | None = None,
+    diff_threshold: float | None = None,
+    owner: str | None = None,
+) -> TileSlicer | None:
     """
-    Processes detection data to remove overlapping and contained labels.
+    Returns the slicer for the slice settings sent with a request.
+
+    Requests with a stream identifier get an incremental slicer that is
+    kept between requests, so unchanged tiles of that stream reuse their
+    detections. Stream identifiers are scoped to the user sending them.
+    The least recently used slicers are dropped, and logged, beyond
+    `MAX_STREAM_SLICERS`.
 
     Args:
-        datas (list[list[float | int]]): The detection data to process.
+        model_key (str): The model the request runs.
+        stream_id (str | None): The identifier of the client's stream.
+        slice_size (int | None): The width and height of each slice.
+        slice_overlap (float | None): The overlap between slices.
+        diff_threshold (float | None): The mean pixel difference above
+            which a tile is inferred again.
+        owner (str | None): The authenticated user sending the stream.
 
     Returns:
-        list[list[float | int]]: The processed detection data.
-    """
-    # Remove overlapping and completely contained labels
-    datas = await remove_overlapping_labels(datas)
-    datas = await remove_completely_contained_labels(datas)
-    datas = await remove_overlapping_labels(datas)
-    return datas
+        TileSlicer | None: The slicer, or None for the default slicing.
 
-
-async def remove_overlapping_labels(
-    datas: list[list[float | int]],
-) -> list[list[float | int]]:
+    Raises:
+        ValueError: If the slice settings are out of range.
     """
-    Removes overlapping labels based on predefined thresholds.
+    if stream_id is None and slice_size is None and slice_overlap is None:
+        return None
 
-    Args:
-        datas (list[list[float | int]]): The detection data to process.
+    slice_size = slice_size or 370
+    slice_overlap = 0.3 if slice_overlap is None else slice_overlap
+    diff_threshold = 4.0 if diff_threshold is None else diff_threshold
+    if stream_id is None:
+        return TileSlicer(slice_size=slice_size, overlap_ratio=slice_overlap)
 
-    Returns:
-        list[list[float | int]]: The detection data
-        with overlapping labels removed.
-    """
-    # Organise data by category indices for efficient processing
-    category_indices = get_category_indices(datas)
-
-    # Identify overlapping labels to remove
-    to_remove = set()
-    to_remove.update(
-        await find_overlaps(
-            category_indices['hardhat'],
-            category_indices['no_hardhat'],
-            datas,
-            0.5,
-        ),
-    )
-    to_remove.update(
-        await find_overlaps(
-            category_indices['safety_vest'],
-            category_indices['no_safety_vest'],
-            datas,
-            0.5,
-        ),
+    key = (
+        owner, stream_id, model_key, slice_size, slice_overlap,
+        diff_threshold,
     )
-
-    # Remove overlapping entries from the data list
-    for index in sorted(to_remove, reverse=True):
-        datas.pop(index)
-
-    # Run garbage collection to free memory
-    gc.collect()
-    return datas
+    slicer = stream_slicers.get(key)
+    if slicer is None:
+        slicer = TileSlicer(
+            slice_size=slice_size,
+            overlap_ratio=slice_overlap,
+            incremental=True,
+            diff_threshold=diff_threshold,
+        )
+        keep_stream_state(stream_slicers, key, slicer, 'slicer')
+    stream_slicers.move_to_end(key)
+    return slicer
 
 
-def get_category_indices(
-    datas: list[list[float | int]],
-) -> dict[str, list[int]]:
+def get_cascade(
+    model_key: str,
+    stream_id: str | None = None,
+    fallback: str | None = None,
+    owner: str | None = None,
+) -> CascadeDetector | None:
     """
-    Organises detection data by category indices for quicker access.
-
-    Args:
-        datas (list[list[float | int]]): The detection data.
+    Returns the cascade for the fallback asked for by a request.
 
-    Returns:
-        dict[str, list[int]]:
-            A dictionary mapping category names to lists of indices.
-    """
-    # Create a dictionary with lists of indices for each category
-    return {
-        'hardhat': [i for i, d in enumerate(datas) if d[5] == 0],
-        'no_hardhat': [i for i, d in enumerate(datas) if d[5] == 2],
-        'safety_vest': [i for i, d in enumerate(datas) if d[5] == 7],
-        'no_safety_vest': [i for i, d in enumerate(datas) if d[5] == 4],
-    }
-
-
-async def find_overlaps(
-    indices1: list[int],
-    indices2: list[int],
-    datas: list[list[float | int]],
-    threshold: float,
-) -> set[int]:
-    """
-    Finds overlaps between two sets of category indices.
+    Requests with a stream identifier share one cascade per stream of a
+    user, so the statistics of each stage add up per stream. The least
+    recently used cascades are dropped, and logged, beyond
+    `MAX_STREAM_SLICERS`.
 
     Args:
-        indices1 (list[int]): The first set of indices.
-        indices2 (list[int]): The second set of indices.
-        datas (list[list[float | int]]): The detection data.
-        threshold (float): The overlap threshold.
+        model_key (str): The model the request runs.
+        stream_id (str | None): The identifier of the client's stream.
+        fallback (str | None): 'sliced' or 'regions'. Defaults to
+            `CASCADE_MODE`.
+        owner (str | None): The authenticated user sending the stream.
 
     Returns:
-        set[int]: Indices of overlapping labels to be removed.
-    """
-    to_remove = set()
-    # Check for overlaps between two sets of indices
-    for index1 in indices1:
-        to_remove.update(
-            await find_overlapping_indices(
-                index1, indices2, datas, threshold,
-            ),
-        )
-    return to_remove
-
+        CascadeDetector | None: The cascade, or None to always slice.
 
-async def find_overlapping_indices(
-    index1: int,
-    indices2: list[int],
-    datas: list[list[float | int]], threshold: float,
-) -> set[int]:
+    Raises:
+        ValueError: If the fallback is not supported.
     """
-    Finds overlapping indices for a single detection index.
+    fallback = fallback or CASCADE_MODE
+    if not fallback:
+        return None
+    if stream_id is None:
+        return CascadeDetector(fallback=fallback, slice_size=370)
 
-    Args:
-        index1 (int): The index of the first detection.
-        indices2 (list[int]): The indices of potential overlapping detections.
-        datas (list[list[float | int]]): The detection data.
-        threshold (float): The overlap threshold.
+    key = (owner, stream_id, model_key, fallback)
+    cascade = stream_cascades.get(key)
+    if cascade is None:
+        cascade = CascadeDetector(fallback=fallback, slice_size=370)
+        keep_stream_state(stream_cascades, key, cascade, 'cascade')
+    stream_cascades.move_to_end(key)
+    return cascade
 
-    Returns:
-        set[int]: Indices of overlapping labels.
-    """
-    # Calculate overlaps for a specific detection
-    # and return those exceeding the threshold
-    return {
-        index2 for index2 in indices2
-        if calculate_overlap(
-            [int(x) for x in datas[index1][:4]],
-            [int(x) for x in datas[index2][:4]],
-        ) > threshold
-    }
-
-
-def calculate_overlap(bbox1: list[int], bbox2: list[int]) -> float:
-    """
-    Calculates the overlap between two bounding boxes.
-
-    Args:
-        bbox1 (list[int]): The first bounding box.
-        bbox2 (list[int]): The second bounding box.
-
-    Returns:
-        float: The overlap percentage.
-    """
-    # Calculate intersection coordinates and area
-    x1, y1, x2, y2 = calculate_intersection(bbox1, bbox2)
-    intersection_area = calculate_area(x1, y1, x2, y2)
-    # Calculate area of each bounding box
-    bbox1_area = calculate_area(*bbox1)
-    bbox2_area = calculate_area(*bbox2)
-
-    # Calculate the overlap percentage
-    overlap_percentage = intersection_area / \
-        float(bbox1_area + bbox2_area - intersection_area)
-    gc.collect()
-    return overlap_percentage
-
-
-def calculate_intersection(
-    bbox1: list[int],
-    bbox2: list[int],
-) -> tuple[int, int, int, int]:
-    """
-    Calculates the intersection coordinates of two bounding boxes.
-
-    Args:
-        bbox1 (list[int]): The first bounding box.
-        bbox2 (list[int]): The second bounding box.
 
-    Returns:
-        tuple[int, int, int, int]: The intersection coordinates.
+async def get_prediction_result(
+    img: np.ndarray,
+    model: DetectionModelManager,
+    timings: InferenceTimings | None = None,
+    slicer: TileSlicer | None = None,
+    cascade: CascadeDetector | None = None,
+) -> Any:
     """
-    # Determine the coordinates for the intersection area
-    x1 = max(bbox1[0], bbox2[0])
-    y1 = max(bbox1[1], bbox2[1])
-    x2 = min(bbox1[2], bbox2[2])
-    y2 = min(bbox1[3], bbox2[3])
-    return x1, y1, x2, y2
-
+    Generates sliced predictions for an image using the specified model.
 
-def calculate_area(x1: int, y1: int, x2: int, y2: int) -> int:
-    """
-    Calculates the area of a bounding box.
+    The blocking prediction runs on the bounded inference executor, so
+    the event loop keeps serving other requests meanwhile.
 
     Args:
-        x1 (int): The x-coordinate of the top-left corner.
-        y1 (int): The y-coordinate of the top-left corner.
-        x2 (int): The x-coordinate of the bottom-right corner.
-        y2 (int): The y-coordinate of the bottom-right corner.
+        img (np.ndarray): The image in OpenCV format.
+        model (DetectionModelManager): The object detection model instance.
+        timings (InferenceTimings | None): If given, filled with the time
+            spent waiting in the queue and running the model.
+        slicer (TileSlicer | None): The slicer to run the image through
+            instead of the default slicing.
+        cascade (CascadeDetector | None): If given, runs a full-frame pass
+            first and slices only when small objects are likely.
 
     Returns:
-        int: The area of the bounding box.
+        Any: The prediction result from the model.
+
+    Raises:
+        InferenceQueueFullError: If the inference queue is full.
     """
-    # Calculate area, ensuring no negative dimensions
-    return max(0, x2 - x1 + 1) * max(0, y2 - y1 + 1)
+    # The model and the stream's slicing state are used by one thread at
+    # a time
+    result, run_timings = await inference_executor.run(
+        predict_sliced, img, model, slicer, cascade,
+        exclusive=(model, slicer, cascade),
+    )
+    if timings is not None:
+        timings.update(run_timings)
+    return result
 
 
-def is_contained(inner_bbox: list[int], outer_bbox: list[int]) -> bool:
+def predict_sliced(
+    img: np.ndarray,
+    model: DetectionModelManager,
+    slicer: TileSlicer | None = None,
+    cascade: CascadeDetector | None = None,
+) -> Any:
     """
-    Checks if one bounding box is fully contained within another.
+    Runs the blocking sliced prediction of SAHI.
 
     Args:
-        inner_bbox (list[int]): The inner bounding box.
-        outer_bbox (list[int]): The outer bounding box.
+        img (np.ndarray): The image in OpenCV format.
+        model (DetectionModelManager): The object detection model instance.
+        slicer (TileSlicer | None): The slicer to run the image through
+            instead of the default slicing.
+        cascade (CascadeDetector | None): The cascade deciding whether
+            to slice at all.
 
     Returns:
-        bool: True if the inner bounding box is fully contained in
-        the outer bounding box.
+        Any: The prediction result from the model.
     """
-    # Verify if each coordinate of inner_bbox is within outer_bbox
-    return (
-        inner_bbox[0] >= outer_bbox[0]
-        and inner_bbox[2] <= outer_bbox[2]
-        and inner_bbox[1] >= outer_bbox[1]
-        and inner_bbox[3] <= outer_bbox[3]
+    if cascade is not None:
+        return cascade.predict(img, model, slicer)
+    if slicer is not None:
+        return slicer.predict(img, model)
+
+    # Use the SAHI library's get_sliced_prediction function for detection
+    return get_sliced_prediction(
+        img,
+        model,
+        slice_height=370,
+        slice_width=370,
+        overlap_height_ratio=0.3,
+        overlap_width_ratio=0.3,
     )
 
 
-async def remove_completely_contained_labels(
-    datas: list[list[float | int]],
-) -> list[list[float | int]]:
+def compile_detection_data(result: Any) -> list[list[float | int]]:
     """
-    Removes labels that are fully contained within other labels.
+    Compiles detection data from the model's prediction results.
 
     Args:
-        datas (list[list[float | int]]): The detection data.
+        result (Any): The result of the model prediction.
 
     Returns:
-        list[list[float | int]]: The detection data
-        with contained labels removed.
+        list[list[float | int]]: Detection data including bounding boxes,
+        confidence, and label IDs.
     """
-    # Get indices of each category for comparison
-    category_indices = get_category_indices(datas)
-
-    # Identify labels that are contained within others
-    to_remove = set()
-    to_remove.update(
-        await find_contained_labels(
-            category_indices['hardhat'],
-            category_indices['no_hardhat'],
-            datas,
-        ),
-    )
-    to_remove.update(
-        await find_contained_labels(
-            category_indices['safety_vest'],
-            category_indices['no_safety_vest'],
-            datas,
-        ),
-    )
-
-    # Remove fully contained labels
-    for index in sorted(to_remove, reverse=True):
-        datas.pop(index)
-
+    datas = []
+    # Extract bounding box, confidence, and label ID for each prediction
+    for object_prediction in result.object_prediction_list:
+        label = int(object_prediction.category.id)
+        x1, y1, x2, y2 = (int(x) for x in object_prediction.bbox.to_voc_bbox())
+        confidence = float(object_prediction.score.value)
+        datas.append([x1, y1, x2, y2, confidence, label])
     return datas
 
 
-async def find_contained_labels(
-    indices1: list[int],
-    indices2: list[int],
+async def process_labels(
     datas: list[list[float | int]],
-) -> set[int]:
+    iou_threshold: float | None = None,
+) -> list[list[float | int]]:
     """
-    Finds labels that are fully contained within other labels.
+    Processes detection data to remove overlapping and contained labels.
 
     Args:
-        indices1 (list[int]): The indices of the first category.
-        indices2 (list[int]): The indices of the second category.
-        datas (list[list[float | int]]): The detection data.
+        datas (list[list[float | int]]): The detection data to process.
+        iou_threshold (float | None): The IoU above which overlapping
+            labels are removed. Defaults to `LABEL_IOU_THRESHOLD`.
 
     Returns:
-        set[int]: Indices of contained labels to be removed.
+        list[list[float | int]]: The processed detection data.
     """
-    to_remove = set()
-    # Check for containment of labels across two sets of indices
-    for index1 in indices1:
-        to_remove.update(await find_contained_indices(index1, indices2, datas))
-    return to_remove
+    return remove_conflicting_labels(
+        datas,
+        LABEL_IOU_THRESHOLD if iou_threshold is None else iou_threshold,
+    )
 
 
-async def find_contained_indices(
-    index1: int,
-    indices2: list[int],
+async def remove_overlapping_labels(
     datas: list[list[float | int]],
-) -> set[int]:
+) -> list[list[float | int]]:
     """
-    Finds indices of detections that are fully contained within others.
+    Removes overlapping labels based on predefined thresholds.
 
     Args:
-        index1 (int): The index of the first detection.
-        indices2 (list[int]): The indices of potential containing detections.
-        datas (list[list[float | int]]): The detection data.
+        datas (list[list[float | int]]): The detection data to process.
 
     Returns:
-        set[int]: Indices of contained labels.
+        list[list[float | int]]: The detection data
+        with overlapping labels removed.
     """
-    to_remove = set()
-    # Determine if one detection is fully contained within another
-    for index2 in indices2:
-        to_remove.update(await check_containment(index1, index2, datas))
-    return to_remove
+    return remove_conflicting_labels(
+        datas, LABEL_IOU_THRESHOLD, remove_contained=False,
+    )
 
 
-async def check_containment(
-    index1: int,
-    index2: int,
+async def remove_completely_contained_labels(
     datas: list[list[float | int]],
-) -> set[int]:
+) -> list[list[float | int]]:
     """
-    Checks if one detection is fully contained within another.
+    Removes labels that are fully contained within other labels.
 
     Args:
-        index1 (int): The index of the first detection.
-        index2 (int): The index of the second detection.
         datas (list[list[float | int]]): The detection data.
 
     Returns:
-        set[int]: Indices of contained labels.
+        list[list[float | int]]: The detection data
+        with contained labels removed.
     """
-    to_remove = set()
-    # Verify if either index1 or index2 is contained within the other
-    if is_contained(
-        [int(x) for x in datas[index2][:4]],
-        [int(x) for x in datas[index1][:4]],
-    ):
-        to_remove.add(index2)
-    elif is_contained(
-        [int(x) for x in datas[index1][:4]],
-        [int(x) for x in datas[index2][:4]],
-    ):
-        to_remove.add(index1)
-    return to_remove
+    return remove_conflicting_labels(datas, iou_threshold=None)
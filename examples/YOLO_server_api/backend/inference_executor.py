@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any
+from typing import TypedDict
+
+
+class InferenceTimings(TypedDict):
+    queue_wait: float
+    inference: float
+
+
+class InferenceQueueFullError(Exception):
+    """
+    Raised when the inference queue cannot take another request.
+    """
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference on a bounded pool of threads.
+
+    The event loop stays free to serve authentication and other requests
+    while a model runs. Requests beyond the workers wait in a queue of
+    limited depth, and are rejected once the queue is full so the caller
+    can answer with 503 instead of letting latency grow without bound.
+
+    Models and the per-stream slicing state are not safe to use from
+    several threads at once, so a request names the objects it uses and
+    runs only while it holds the lock of each of them. Requests for other
+    models still run in parallel.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue_size: int = 8):
+        """
+        Initialises the executor.
+
+        Args:
+            max_workers (int): The number of inference threads.
+            max_queue_size (int): The number of requests allowed to wait
+                for a free thread.
+
+        Raises:
+            ValueError: If the worker count or queue size is invalid.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        if max_queue_size < 0:
+            raise ValueError('max_queue_size must not be negative.')
+
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='inference',
+        )
+        # Requests running or waiting, released when their thread is done
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        # Locks of the objects in use, only created on the event loop
+        self.locks: weakref.WeakKeyDictionary[Any, threading.Lock] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Returns the number of requests waiting for a free thread.
+
+        Returns:
+            int: The queue depth.
+        """
+        return max(0, self.pending - self.max_workers)
+
+    def get_lock(self, resource: Any) -> threading.Lock:
+        """
+        Returns the lock serialising the use of an object.
+
+        Args:
+            resource (Any): The model, slicer or cascade to lock.
+
+        Returns:
+            threading.Lock: The lock of the object.
+        """
+        lock = self.locks.get(resource)
+        if lock is None:
+            lock = self.locks[resource] = threading.Lock()
+        return lock
+
+    def release_slot(self, future: Future | None = None) -> None:
+        """
+        Frees the slot of a finished or cancelled request.
+
+        Args:
+            future (Future | None): The finished future, if any.
+        """
+        with self.pending_lock:
+            self.pending -= 1
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        exclusive: Iterable[Any] = (),
+    ) -> tuple[Any, InferenceTimings]:
+        """
+        Runs a blocking function on the pool without blocking the loop.
+
+        Args:
+            func (Callable[..., Any]): The blocking function to run.
+            *args (Any): The arguments of the function.
+            exclusive (Iterable[Any]): The objects no other request may
+                use while the function runs. None entries are skipped.
+
+        Returns:
+            tuple[Any, InferenceTimings]: The result of the function, the
+                time it waited in the queue and for its locks, and the
+                time it ran, in seconds.
+
+        Raises:
+            InferenceQueueFullError: If the queue is already full.
+        """
+        with self.pending_lock:
+            if self.pending >= self.max_workers + self.max_queue_size:
+                raise InferenceQueueFullError(
+                    f"Inference queue is full "
+                    f"({self.max_queue_size} waiting).",
+                )
+            self.pending += 1
+
+        # Always taken in the same order so requests cannot deadlock
+        resources = {
+            id(resource): resource
+            for resource in exclusive
+            if resource is not None
+        }
+        locks = [self.get_lock(resources[key]) for key in sorted(resources)]
+        submitted = time.perf_counter()
+
+        def timed() -> tuple[Any, float, float]:
+            with ExitStack() as stack:
+                for lock in locks:
+                    stack.enter_context(lock)
+                started = time.perf_counter()
+                result = func(*args)
+                finished = time.perf_counter()
+            return result, started - submitted, finished - started
+
+        try:
+            future = self.executor.submit(timed)
+        except BaseException:
+            self.release_slot()
+            raise
+        # The thread keeps running if the awaiting request is cancelled,
+        # so the slot is only freed once it is done
+        future.add_done_callback(self.release_slot)
+        result, queue_wait, inference = await asyncio.wrap_future(future)
+        return result, {'queue_wait': queue_wait, 'inference': inference}
+
+    def shutdown(self) -> None:
+        """
+        Waits for running inferences and stops the threads.
+        """
+        self.executor.shutdown(wait=True)
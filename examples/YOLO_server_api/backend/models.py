@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import os
 import threading
 from pathlib import Path
 
-from sahi.predict import AutoDetectionModel
+from sahi.models.base import DetectionModel
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from src.model_backends import get_model_path
+from src.model_backends import load_detection_model
+from src.model_backends import MODEL_FILES
+from src.model_backends import QUANTISED_SUFFIX
+
 
 class ModelFileChangeHandler(FileSystemEventHandler):
     """
@@ -36,8 +42,8 @@ class ModelFileChangeHandler(FileSystemEventHandler):
         if event.is_directory:
             return
 
-        # Reload model if it is a .pt file
-        if event.src_path.endswith('.pt'):
+        # Reload model if it is a .pt or .onnx file
+        if Path(event.src_path).suffix in ('.pt', '.onnx'):
             model_name = Path(event.src_path).stem.split('best_')[-1]
             if model_name in self.model_manager.model_names:
                 # Reload the model in the manager
@@ -53,19 +59,50 @@ class DetectionModelManager:
     with file system monitoring.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        model_backend: str | None = None,
+        num_threads: int | None = None,
+    ) -> None:
         """
         Initialises the model manager, loading models
         and setting up a file monitor.
+
+        Args:
+            model_backend (str | None): The backend the models run on,
+                'torch' or 'onnx'. Defaults to the MODEL_BACKEND
+                environment variable, or 'torch'.
+            num_threads (int | None): Intra-op threads of ONNX Runtime.
+                Defaults to the ONNX_THREADS environment variable.
+
+        Raises:
+            ValueError: If the model backend is not supported.
         """
-        self.base_model_path: Path = Path('models/pt/')
-        self.model_names: list[str] = [
+        self.model_backend: str = (
+            model_backend or os.getenv('MODEL_BACKEND') or 'torch'
+        )
+        self.num_threads: int | None = num_threads or (
+            int(os.environ['ONNX_THREADS'])
+            if os.getenv('ONNX_THREADS') else None
+        )
+        if self.model_backend not in MODEL_FILES:
+            raise ValueError(
+                f"Unsupported model backend '{self.model_backend}'. "
+                f"Expected one of {tuple(MODEL_FILES)}.",
+            )
+        self.base_model_path: Path = Path(MODEL_FILES[self.model_backend][0])
+        self.base_model_names: list[str] = [
             'yolo11x',
             'yolo11l', 'yolo11m', 'yolo11s', 'yolo11n',
         ]
+        # Quantised variants are only served once they have been published
+        self.model_names: list[str] = self.base_model_names + [
+            f"{name}{QUANTISED_SUFFIX}" for name in self.base_model_names
+            if get_model_path(f"{name}{QUANTISED_SUFFIX}", 'onnx').is_file()
+        ]
 
         # Load each model
-        self.models: dict[str, AutoDetectionModel] = {
+        self.models: dict[str, DetectionModel] = {
             name: self.load_single_model(name) for name in self.model_names
         }
 
@@ -77,40 +114,60 @@ class DetectionModelManager:
                 self.base_model_path,
             ), recursive=False,
         )
+        # Quantised variants are ONNX models whatever the backend
+        quantised_model_path = Path(MODEL_FILES['onnx'][0])
+        if (
+            quantised_model_path != self.base_model_path
+            and quantised_model_path.is_dir()
+        ):
+            self.observer.schedule(
+                self.event_handler, str(quantised_model_path),
+                recursive=False,
+            )
 
         # Run the observer in a separate thread
         self.observer_thread = threading.Thread(target=self.observer.start)
         self.observer_thread.start()
 
-    def load_single_model(self, model_name: str) -> AutoDetectionModel:
+    def load_single_model(self, model_name: str) -> DetectionModel:
         """
-        Loads a specified model from a file and returns it
-        as an AutoDetectionModel.
+        Loads a specified model from a file on the model backend.
 
         Args:
             model_name (str): The name of the model to load.
 
         Returns:
-            AutoDetectionModel: The loaded model ready for predictions.
+            DetectionModel: The loaded model ready for predictions.
         """
-        return AutoDetectionModel.from_pretrained(
-            'yolo11',
-            model_path=str(self.base_model_path / f"best_{model_name}.pt"),
-            device='cuda:0',
+        return load_detection_model(
+            model_name, self.model_backend, self.num_threads,
         )
 
-    def get_model(self, model_key: str) -> AutoDetectionModel | None:
+    def get_model(self, model_key: str) -> DetectionModel | None:
         """
         Retrieves a model by its key if it exists within the loaded models.
 
+        Quantised variants published after the server started, such as
+        'yolo11n-int8', are loaded on first use.
+
         Args:
             model_key (str): The key name of the model to retrieve.
 
         Returns:
-            AutoDetectionModel | None: The requested model
+            DetectionModel | None: The requested model
             or None if it does not exist.
         """
-        return self.models.get(model_key)
+        model = self.models.get(model_key)
+        if (
+            model is None
+            and model_key.endswith(QUANTISED_SUFFIX)
+            and model_key.removesuffix(QUANTISED_SUFFIX)
+            in self.base_model_names
+            and get_model_path(model_key, 'onnx').is_file()
+        ):
+            model = self.models[model_key] = self.load_single_model(model_key)
+            self.model_names.append(model_key)
+        return model
 
     def __del__(self) -> None:
         """
@@ -4,11 +4,15 @@ import base64
 import datetime
 from asyncio.log import logger
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 from fastapi import APIRouter
 from fastapi import Body
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Response
+from fastapi.responses import JSONResponse
 from fastapi_jwt import JwtAuthorizationCredentials
 from werkzeug.utils import secure_filename
 
@@ -16,14 +20,26 @@ from examples.auth.cache import custom_rate_limiter
 from examples.auth.jwt_config import jwt_access
 from examples.YOLO_server_api.backend.detection import compile_detection_data
 from examples.YOLO_server_api.backend.detection import convert_to_image
+from examples.YOLO_server_api.backend.detection import get_cascade
 from examples.YOLO_server_api.backend.detection import get_prediction_result
+from examples.YOLO_server_api.backend.detection import get_slicer
+from examples.YOLO_server_api.backend.detection import pack_detections
 from examples.YOLO_server_api.backend.detection import process_labels
+from examples.YOLO_server_api.backend.inference_executor import (
+    InferenceQueueFullError,
+)
+from examples.YOLO_server_api.backend.inference_executor import (
+    InferenceTimings,
+)
 from examples.YOLO_server_api.backend.model_files import get_new_model_file
 from examples.YOLO_server_api.backend.model_files import update_model_file
 from examples.YOLO_server_api.backend.models import DetectionModelManager
+from examples.YOLO_server_api.backend.schemas import DetectionBatchRequest
 from examples.YOLO_server_api.backend.schemas import DetectionRequest
 from examples.YOLO_server_api.backend.schemas import ModelFileUpdate
 from examples.YOLO_server_api.backend.schemas import UpdateModelRequest
+from src.cascade_detector import CascadeDetector
+from src.tile_slicer import TileSlicer
 
 #: APIRouter for object detection endpoints.
 detection_router = APIRouter()
@@ -34,9 +50,68 @@ model_management_router = APIRouter()
 #: A manager for loading and retrieving detection models.
 model_loader = DetectionModelManager()
 
+#: The maximum number of images accepted by /detect_batch.
+MAX_BATCH_SIZE = 16
+
+
+async def run_prediction(
+    img: np.ndarray,
+    model_instance: Any,
+    timings: InferenceTimings,
+    slicer: TileSlicer | None = None,
+    cascade: CascadeDetector | None = None,
+) -> Any:
+    """
+    Runs a prediction and adds its queue wait and inference time.
+
+    Args:
+        img (np.ndarray): The decoded image.
+        model_instance (Any): The detection model.
+        timings (InferenceTimings): The totals to add the timings to.
+        slicer (TileSlicer | None): The slicer of the client's stream.
+        cascade (CascadeDetector | None): The cascade of the client's
+            stream.
+
+    Returns:
+        Any: The prediction result.
+
+    Raises:
+        HTTPException: If the inference queue is full (503).
+    """
+    run_timings: InferenceTimings = {'queue_wait': 0.0, 'inference': 0.0}
+    try:
+        result = await get_prediction_result(
+            img, model_instance, run_timings,
+            slicer=slicer, cascade=cascade,
+        )
+    except InferenceQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={'Retry-After': '1'},
+        )
+    timings['queue_wait'] += run_timings['queue_wait']
+    timings['inference'] += run_timings['inference']
+    return result
+
+
+def set_timing_headers(response: Response, timings: InferenceTimings) -> None:
+    """
+    Reports the queue wait and inference time in the response headers.
+
+    Args:
+        response (Response): The response to add the headers to.
+        timings (InferenceTimings): The timings in seconds.
+    """
+    queue_wait_ms = timings['queue_wait'] * 1000
+    inference_ms = timings['inference'] * 1000
+    response.headers['X-Queue-Wait-Ms'] = f"{queue_wait_ms:.1f}"
+    response.headers['X-Inference-Ms'] = f"{inference_ms:.1f}"
+
 
 @detection_router.post('/detect')
 async def detect(
+    response: Response,
     detection_request: DetectionRequest = Depends(DetectionRequest.as_form),
     credentials: JwtAuthorizationCredentials = Depends(jwt_access),
     remaining_requests: int = Depends(custom_rate_limiter),
@@ -44,7 +119,16 @@ async def detect(
     """
     Perform object detection on an uploaded image using a specified model.
 
+    The queue wait and inference time are returned in the
+    `X-Queue-Wait-Ms` and `X-Inference-Ms` headers. Clients may send
+    `slice_size` and `slice_overlap` to override the slicing, and a
+    `stream_id` to only re-run the tiles that changed since that stream's
+    previous frame. A `cascade` of 'sliced' or 'regions' runs a full-frame
+    pass first and slices only when small objects are likely.
+
     Args:
+        response (Response):
+            The response, used to add the timing headers.
         image (UploadFile):
             The uploaded image file to be processed.
         model (str, optional):
@@ -61,22 +145,51 @@ async def detect(
 
     Raises:
         HTTPException: If the specified model is not found (404).
+        HTTPException: If the image or slice settings are invalid (400).
+        HTTPException: If the inference queue is full (503).
     """
     # Log user info and remaining requests
     print(f"Authenticated user: {credentials.subject}")
     print(f"Remaining requests: {remaining_requests}")
 
-    # Read image data and convert to a format compatible with the model
-    data: bytes = await detection_request.image.read()
-    img = await convert_to_image(data)
-
     # Retrieve the specified model
     model_instance = model_loader.get_model(detection_request.model)
     if model_instance is None:
         raise HTTPException(status_code=404, detail='Model not found')
 
-    # Perform detection
-    result = await get_prediction_result(img, model_instance)
+    # Read image data and convert to a format compatible with the model
+    data: bytes = await detection_request.image.read()
+    try:
+        img = await convert_to_image(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Stream identifiers are only unique per user
+    owner = credentials.subject.get('username')
+    try:
+        slicer = get_slicer(
+            detection_request.model,
+            stream_id=detection_request.stream_id,
+            slice_size=detection_request.slice_size,
+            slice_overlap=detection_request.slice_overlap,
+            diff_threshold=detection_request.diff_threshold,
+            owner=owner,
+        )
+        cascade = get_cascade(
+            detection_request.model,
+            stream_id=detection_request.stream_id,
+            fallback=detection_request.cascade,
+            owner=owner,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Perform detection off the event loop
+    timings: InferenceTimings = {'queue_wait': 0.0, 'inference': 0.0}
+    result = await run_prediction(
+        img, model_instance, timings, slicer, cascade,
+    )
+    set_timing_headers(response, timings)
 
     # Compile and post-process detection data
     datas = compile_detection_data(result)
@@ -84,6 +197,90 @@ async def detect(
     return datas
 
 
+@detection_router.post('/detect_batch')
+async def detect_batch(
+    detection_request: DetectionBatchRequest = Depends(
+        DetectionBatchRequest.as_form,
+    ),
+    credentials: JwtAuthorizationCredentials = Depends(jwt_access),
+    remaining_requests: int = Depends(custom_rate_limiter),
+) -> Response:
+    """
+    Perform object detection on several uploaded images in one request.
+
+    One request pays for authentication and rate limiting once for the
+    whole batch, and the results can be returned as a packed float32
+    array instead of JSON.
+
+    Args:
+        detection_request (DetectionBatchRequest):
+            The model name, the images and the response format.
+        credentials (JwtAuthorizationCredentials):
+            JWT credentials to verify the user. Injected by FastAPI.
+        remaining_requests (int):
+            The remaining rate limit for the user. Injected by FastAPI.
+
+    Returns:
+        Response: The detections per image, as JSON lists or packed with
+            `pack_detections` ('application/octet-stream').
+
+    Raises:
+        HTTPException: If the specified model is not found (404).
+        HTTPException: If the format, batch size or an image is invalid
+            (400).
+        HTTPException: If the inference queue is full (503).
+    """
+    print(f"Authenticated user: {credentials.subject}")
+    print(f"Remaining requests: {remaining_requests}")
+
+    if detection_request.response_format not in ('json', 'packed'):
+        raise HTTPException(
+            status_code=400,
+            detail="response_format must be 'json' or 'packed'",
+        )
+    if len(detection_request.images) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} images per batch",
+        )
+
+    # Retrieve the specified model
+    model_instance = model_loader.get_model(detection_request.model)
+    if model_instance is None:
+        raise HTTPException(status_code=404, detail='Model not found')
+
+    # Decode every image before running the model
+    imgs = []
+    for index, image in enumerate(detection_request.images):
+        data: bytes = await image.read()
+        try:
+            imgs.append(await convert_to_image(data))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Image {index}: {e}",
+            )
+
+    # Run the batch through the model image by image
+    timings: InferenceTimings = {'queue_wait': 0.0, 'inference': 0.0}
+    results = []
+    for img in imgs:
+        result = await run_prediction(img, model_instance, timings)
+        datas = compile_detection_data(result)
+        results.append(await process_labels(datas))
+
+    response: Response
+    if detection_request.response_format == 'packed':
+        response = Response(
+            content=pack_detections(results),
+            media_type='application/octet-stream',
+        )
+    else:
+        response = JSONResponse(content=results)
+    set_timing_headers(response, timings)
+    return response
+
+
 @model_management_router.post('/model_file_update')
 async def model_file_update(
     data: ModelFileUpdate = Depends(ModelFileUpdate.as_form),
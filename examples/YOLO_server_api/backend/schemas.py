@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Annotated
 
 from fastapi import File
 from fastapi import Form
@@ -11,14 +12,73 @@ from pydantic import BaseModel
 class DetectionRequest(BaseModel):
     model: str
     image: UploadFile
+    stream_id: str | None = None
+    slice_size: int | None = None
+    slice_overlap: float | None = None
+    diff_threshold: float | None = None
+    cascade: str | None = None
 
     @classmethod
     def as_form(
         cls,
         model: str = Form(...),
         image: UploadFile = File(...),
+        stream_id: Annotated[str | None, Form()] = None,
+        slice_size: Annotated[int | None, Form()] = None,
+        slice_overlap: Annotated[float | None, Form()] = None,
+        diff_threshold: Annotated[float | None, Form()] = None,
+        cascade: Annotated[str | None, Form()] = None,
     ) -> DetectionRequest:
-        return cls(model=model, image=image)
+        return cls(
+            model=model,
+            image=image,
+            stream_id=stream_id,
+            slice_size=slice_size,
+            slice_overlap=slice_overlap,
+            diff_threshold=diff_threshold,
+            cascade=cascade,
+        )
+
+
+class DetectionBatchRequest(BaseModel):
+    """
+    Represents several images to run through one model in a single request.
+
+    Attributes:
+        model (str): The model identifier (e.g., 'yolo11n').
+        images (list[UploadFile]): The uploaded images.
+        response_format (str): 'json' for nested lists, or 'packed' for
+            a binary float32 array.
+    """
+
+    model: str
+    images: list[UploadFile]
+    response_format: str = 'json'
+
+    @classmethod
+    def as_form(
+        cls,
+        model: str = Form(...),
+        images: list[UploadFile] = File(...),
+        response_format: str = Form('json'),
+    ) -> DetectionBatchRequest:
+        """
+        Enables FastAPI to handle this model as FormData.
+
+        Args:
+            model (str): The model name.
+            images (list[UploadFile]): The uploaded images.
+            response_format (str): The format of the detection results.
+
+        Returns:
+            DetectionBatchRequest:
+                An instance of this class populated with the form data.
+        """
+        return cls(
+            model=model,
+            images=images,
+            response_format=response_format,
+        )
 
 
 class ModelFileUpdate(BaseModel):
@@ -0,0 +1,498 @@
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import TypedDict
+
+import cv2
+import numpy as np
+import onnx
+
+from examples.YOLO_evaluation.evaluate_sahi_yolo import COCOEvaluator
+from examples.YOLO_train.train import YOLOModelHandler
+from src.model_backends import get_model_path
+from src.model_backends import letterbox
+from src.model_backends import OnnxDetectionModel
+from src.model_backends import QUANTISED_SUFFIX
+from src.replay_benchmark import summarise_latencies
+
+#: How weights and activations are quantised to INT8.
+QUANTISATION_MODES = ('dynamic', 'static')
+
+#: Image files read for calibration and latency measurement.
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class QuantisationReport(TypedDict):
+    model_key: str
+    mode: str
+    metric: str
+    baseline_score: float
+    quantised_score: float
+    drop: float
+    baseline_ms: float
+    quantised_ms: float
+    speedup: float
+    passed: bool
+    published: bool
+    model_path: str | None
+
+
+def list_images(image_dir: str, limit: int | None = None) -> list[Path]:
+    """
+    Lists the images of a folder in a stable order.
+
+    Args:
+        image_dir (str): The folder.
+        limit (int | None): The most images to list.
+
+    Returns:
+        list[Path]: The image files.
+    """
+    paths = sorted(
+        path for path in Path(image_dir).iterdir()
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    )
+    return paths[:limit]
+
+
+def read_rgb_image(path: Path) -> np.ndarray:
+    """
+    Reads an image in the RGB order SAHI passes to the models.
+
+    Args:
+        path (Path): The image file.
+
+    Returns:
+        np.ndarray: The RGB image.
+
+    Raises:
+        ValueError: If the file is not a readable image.
+    """
+    image = cv2.imread(str(path))
+    if image is None:
+        raise ValueError(f"Cannot read image {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+class CalibrationImageReader:
+    """
+    Feeds letterboxed images to ONNX Runtime static quantisation, which
+    records the range of every activation over them.
+    """
+
+    def __init__(
+        self,
+        image_dir: str,
+        input_name: str,
+        input_shape: tuple[int, int],
+        max_images: int = 100,
+    ):
+        """
+        Initialises the reader.
+
+        Args:
+            image_dir (str): The calibration images.
+            input_name (str): The name of the model input.
+            input_shape (tuple[int, int]): The model input height and width.
+            max_images (int): The most images to calibrate on.
+
+        Raises:
+            ValueError: If the folder holds no images.
+        """
+        self.paths = list_images(image_dir, max_images)
+        if not self.paths:
+            raise ValueError(f"No calibration images in {image_dir}")
+        self.input_name = input_name
+        self.input_shape = input_shape
+        self.index = 0
+
+    def get_next(self) -> dict[str, np.ndarray] | None:
+        """
+        Returns the input of the next image.
+
+        Returns:
+            dict[str, np.ndarray] | None: The model input, or None once
+                every image has been read.
+        """
+        if self.index >= len(self.paths):
+            return None
+        image = read_rgb_image(self.paths[self.index])
+        self.index += 1
+        blob, _, _ = letterbox(image, self.input_shape)
+        return {self.input_name: blob}
+
+    def rewind(self) -> None:
+        """
+        Starts reading from the first image again.
+        """
+        self.index = 0
+
+
+def copy_metadata(source_path: str, target_path: str) -> None:
+    """
+    Copies the class names and input size of a model to its quantised
+    variant, as the ONNX Runtime backend reads them from the metadata.
+
+    Args:
+        source_path (str): The original model.
+        target_path (str): The quantised model.
+    """
+    source = onnx.load(source_path, load_external_data=False)
+    target = onnx.load(target_path)
+    existing = {prop.key for prop in target.metadata_props}
+    missing = {
+        prop.key: prop.value for prop in source.metadata_props
+        if prop.key not in existing
+    }
+    if missing:
+        onnx.helper.set_model_props(
+            target,
+            {
+                **{prop.key: prop.value for prop in target.metadata_props},
+                **missing,
+            },
+        )
+        onnx.save(target, target_path)
+
+
+def quantise_model(
+    model_path: str,
+    output_path: str,
+    mode: str = 'dynamic',
+    calibration_dir: str | None = None,
+    max_calibration_images: int = 100,
+) -> str:
+    """
+    Quantises an ONNX model to INT8 with ONNX Runtime.
+
+    Dynamic quantisation stores INT8 weights and quantises activations on
+    the fly. Static quantisation also fixes the activation ranges from
+    calibration images, which is faster on the CPU but more sensitive to
+    the calibration set.
+
+    Args:
+        model_path (str): The FP32 ONNX model.
+        output_path (str): Where to write the INT8 model.
+        mode (str): 'dynamic' or 'static'.
+        calibration_dir (str | None): The calibration images, required by
+            static quantisation.
+        max_calibration_images (int): The most images to calibrate on.
+
+    Returns:
+        str: The path of the INT8 model.
+
+    Raises:
+        ValueError: If the mode is not supported, or static quantisation
+            has no calibration images.
+    """
+    if mode not in QUANTISATION_MODES:
+        raise ValueError(
+            f"Unsupported quantisation mode '{mode}'. "
+            f"Expected one of {QUANTISATION_MODES}.",
+        )
+    from onnxruntime.quantization import CalibrationMethod
+    from onnxruntime.quantization import QuantFormat
+    from onnxruntime.quantization import QuantType
+    from onnxruntime.quantization import quantize_dynamic
+    from onnxruntime.quantization import quantize_static
+
+    if mode == 'dynamic':
+        quantize_dynamic(
+            model_path, output_path, weight_type=QuantType.QUInt8,
+        )
+    else:
+        if calibration_dir is None:
+            raise ValueError('Static quantisation needs calibration_dir.')
+        model = OnnxDetectionModel(model_path=model_path, device='cpu')
+        reader = CalibrationImageReader(
+            calibration_dir,
+            model.input_name,
+            model.input_shape,
+            max_calibration_images,
+        )
+        quantize_static(
+            model_path,
+            output_path,
+            reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    copy_metadata(model_path, output_path)
+    return output_path
+
+
+def measure_latency(
+    model_path: str,
+    image_dir: str,
+    runs: int = 20,
+    num_threads: int | None = None,
+) -> float:
+    """
+    Measures the median time of one full-frame inference on the CPU.
+
+    Args:
+        model_path (str): The ONNX model.
+        image_dir (str): The images to run on, in turn.
+        runs (int): The number of timed inferences.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
+
+    Returns:
+        float: The median inference time in milliseconds.
+    """
+    model = OnnxDetectionModel(
+        model_path=model_path, device='cpu', num_threads=num_threads,
+    )
+    images = [read_rgb_image(path) for path in list_images(image_dir)]
+    # Leave session warm-up out of the timings
+    model.perform_inference(images[0])
+    latencies = []
+    for run in range(runs):
+        start = time.perf_counter()
+        model.perform_inference(images[run % len(images)])
+        latencies.append(time.perf_counter() - start)
+    return summarise_latencies(latencies)['p50_ms']
+
+
+def evaluate_model(
+    model_path: str,
+    coco_json: str,
+    image_dir: str,
+    metric: str,
+) -> float:
+    """
+    Scores an ONNX model with `COCOEvaluator`.
+
+    Args:
+        model_path (str): The ONNX model.
+        coco_json (str): The COCO annotations.
+        image_dir (str): The evaluation images.
+        metric (str): The metric of `COCOEvaluator.evaluate` to return.
+
+    Returns:
+        float: The value of the metric.
+    """
+    evaluator = COCOEvaluator(
+        model_path=model_path,
+        coco_json=coco_json,
+        image_dir=image_dir,
+        model_backend='onnx',
+    )
+    return float(evaluator.evaluate()[metric])
+
+
+def build_quantised_variant(
+    model_key: str,
+    coco_json: str,
+    image_dir: str,
+    calibration_dir: str,
+    mode: str = 'dynamic',
+    tolerance: float = 0.01,
+    min_speedup: float = 1.0,
+    metric: str = 'mAP at IoU=50-95',
+    num_threads: int | None = None,
+    publish: bool = True,
+) -> QuantisationReport:
+    """
+    Quantises a model and publishes it only if it stays accurate enough.
+
+    The INT8 model is compared with the FP32 ONNX model it was quantised
+    from, so the gate measures the quantisation alone. It is published as
+    `models/onnx/best_<model_key>-int8.onnx`, served under the key
+    '<model_key>-int8', when its metric drops by at most `tolerance` and
+    it runs at least `min_speedup` times as fast.
+
+    Args:
+        model_key (str): The model key, e.g. 'yolo11n'. The FP32 model is
+            read from models/onnx, or exported from models/pt.
+        coco_json (str): The COCO annotations of the evaluation images.
+        image_dir (str): The evaluation images.
+        calibration_dir (str): The calibration images.
+        mode (str): 'dynamic' or 'static' quantisation.
+        tolerance (float): The largest accepted drop of the metric.
+        min_speedup (float): The smallest accepted FP32 to INT8 latency
+            ratio.
+        metric (str): The metric of `COCOEvaluator.evaluate` to gate on.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
+        publish (bool): Whether to copy a passing model to models/onnx.
+
+    Returns:
+        QuantisationReport: The scores, latencies and outcome.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        baseline_path = get_model_path(model_key, 'onnx')
+        if not baseline_path.is_file():
+            handler = YOLOModelHandler(
+                str(get_model_path(model_key, 'torch')),
+            )
+            baseline_path = Path(
+                handler.export_model(
+                    'onnx',
+                    output_path=os.path.join(work_dir, 'fp32.onnx'),
+                ),
+            )
+        quantised_key = f"{model_key}{QUANTISED_SUFFIX}"
+        quantised_path = quantise_model(
+            str(baseline_path),
+            os.path.join(work_dir, f"best_{quantised_key}.onnx"),
+            mode=mode,
+            calibration_dir=calibration_dir,
+        )
+
+        baseline_score = evaluate_model(
+            str(baseline_path), coco_json, image_dir, metric,
+        )
+        quantised_score = evaluate_model(
+            quantised_path, coco_json, image_dir, metric,
+        )
+        baseline_ms = measure_latency(
+            str(baseline_path), image_dir, num_threads=num_threads,
+        )
+        quantised_ms = measure_latency(
+            quantised_path, image_dir, num_threads=num_threads,
+        )
+        drop = baseline_score - quantised_score
+        speedup = baseline_ms / quantised_ms if quantised_ms else 0.0
+        passed = drop <= tolerance and speedup >= min_speedup
+
+        model_path = None
+        if passed and publish:
+            destination = get_model_path(quantised_key, 'onnx')
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            # Copy in place so the server's file watcher reloads the model
+            shutil.copyfile(quantised_path, destination)
+            model_path = str(destination)
+
+    return {
+        'model_key': model_key,
+        'mode': mode,
+        'metric': metric,
+        'baseline_score': baseline_score,
+        'quantised_score': quantised_score,
+        'drop': drop,
+        'baseline_ms': baseline_ms,
+        'quantised_ms': quantised_ms,
+        'speedup': speedup,
+        'passed': passed,
+        'published': model_path is not None,
+        'model_path': model_path,
+    }
+
+
+def main() -> None:
+    """
+    Builds INT8 variants of models behind an accuracy and latency gate.
+    """
+    parser = argparse.ArgumentParser(
+        description='Quantise YOLO models to INT8 and publish the ones '
+        'that stay accurate.',
+    )
+    parser.add_argument(
+        '--model_keys',
+        type=str,
+        nargs='+',
+        default=['yolo11n', 'yolo11s', 'yolo11m', 'yolo11l', 'yolo11x'],
+        help='Models to quantise, read from models/onnx or models/pt',
+    )
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=QUANTISATION_MODES,
+        default='static',
+        help='Dynamic, or static quantisation calibrated on images',
+    )
+    parser.add_argument(
+        '--calibration_dir',
+        type=str,
+        default='tests/dataset/train/images',
+        help='Images to calibrate static quantisation on',
+    )
+    parser.add_argument(
+        '--coco_json',
+        type=str,
+        default='tests/dataset/coco_annotations.json',
+        help='COCO annotations of the evaluation images',
+    )
+    parser.add_argument(
+        '--image_dir',
+        type=str,
+        default='tests/dataset/val/images',
+        help='Images to evaluate and time the models on',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.01,
+        help='Largest accepted drop of the metric, e.g. 0.01 for 1 point',
+    )
+    parser.add_argument(
+        '--min_speedup',
+        type=float,
+        default=1.0,
+        help='Smallest accepted FP32 to INT8 latency ratio',
+    )
+    parser.add_argument(
+        '--metric',
+        type=str,
+        default='mAP at IoU=50-95',
+        help='Metric of COCOEvaluator to gate on',
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        default=None,
+        help='Intra-op threads of ONNX Runtime when timing the models',
+    )
+    parser.add_argument(
+        '--dry_run',
+        action='store_true',
+        help='Evaluate the variants without publishing them',
+    )
+    args = parser.parse_args()
+
+    for model_key in args.model_keys:
+        report = build_quantised_variant(
+            model_key,
+            coco_json=args.coco_json,
+            image_dir=args.image_dir,
+            calibration_dir=args.calibration_dir,
+            mode=args.mode,
+            tolerance=args.tolerance,
+            min_speedup=args.min_speedup,
+            metric=args.metric,
+            num_threads=args.num_threads,
+            publish=not args.dry_run,
+        )
+        if report['published']:
+            outcome = f"published to {report['model_path']}"
+        else:
+            outcome = 'passed' if report['passed'] else 'rejected'
+        print(
+            f"{model_key}{QUANTISED_SUFFIX}: {report['metric']} "
+            f"{report['baseline_score']:.4f} -> "
+            f"{report['quantised_score']:.4f} "
+            f"(drop {report['drop']:.4f}), "
+            f"{report['baseline_ms']:.1f} -> {report['quantised_ms']:.1f} ms "
+            f"(x{report['speedup']:.2f}), {outcome}",
+        )
+
+
+if __name__ == '__main__':
+    main()
+
+"""example usage
+python -m examples.YOLO_train.quantise_model \
+    --model_keys yolo11n yolo11s \
+    --mode static \
+    --calibration_dir tests/dataset/train/images \
+    --coco_json tests/dataset/coco_annotations.json \
+    --image_dir tests/dataset/val/images \
+    --tolerance 0.01
+"""
@@ -171,12 +171,26 @@ class YOLOModelHandler:
         # Return the SAHI formatted results
         return object_prediction_list
 
-    def export_model(self, export_format: str = 'onnx') -> str:
+    def export_model(
+        self,
+        export_format: str = 'onnx',
+        output_path: str | None = None,
+        **export_args: Any,
+    ) -> str:
         """
         Exports the YOLO model to the specified format.
 
+        ONNX exports keep the class names and input size in their metadata,
+        which the ONNX Runtime backend of `src.model_backends` reads, so an
+        exported model can be copied to `models/onnx/best_<model_key>.onnx`
+        as it is.
+
         Args:
             export_format (str): The format to export the model to.
+            output_path (str | None): Where to move the exported file. By
+                default it stays next to the source model.
+            **export_args (Any): Further Ultralytics export arguments, e.g.
+                `imgsz` or `simplify`.
 
         Returns:
             The path to the exported model file.
@@ -187,7 +201,14 @@ class YOLOModelHandler:
         if self.model is None:
             raise RuntimeError('The model is not loaded properly.')
         # Export the model to the desired format
-        return self.model.export(format=export_format)
+        export_path = self.model.export(format=export_format, **export_args)
+        if output_path is not None:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(output_path)), exist_ok=True,
+            )
+            shutil.move(export_path, output_path)
+            export_path = output_path
+        return export_path
 
     def save_model(self, save_path: str) -> None:
         """
@@ -414,10 +435,24 @@ def main():
         help='Number of folds for cross-validation',
     )
 
+    parser.add_argument(
+        '--export_only',
+        action='store_true',
+        help='Export the model without training it',
+    )
+
     args = parser.parse_args()
 
     handler = YOLOModelHandler(args.model_name, args.batch_size)
 
+    if args.export_only:
+        export_path = handler.export_model(
+            export_format=args.export_format,
+            output_path=args.onnx_path,
+        )
+        print(f"{args.export_format.upper()} model exported to:", export_path)
+        return
+
     try:
         if args.cross_validate:
             handler.cross_validate_model(
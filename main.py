@@ -8,20 +8,40 @@ import logging
 import os
 import time
 from datetime import datetime
+from functools import partial
 from multiprocessing import Manager
 from multiprocessing import Process
+from typing import Any
 from typing import TypedDict
 
 import cv2
 from dotenv import load_dotenv
 from watchdog.observers import Observer
 
+from src.capture_hub import CaptureHub
+from src.cascade_detector import CascadeDetector
+from src.clip_recorder import ClipRecorder
+from src.compute_budget import ComputeBudgetScheduler
 from src.danger_detector import DangerDetector
+from src.detection_tracker import DetectionTracker
 from src.drawing_manager import DrawingManager
+from src.endpoint_pool import EndpointPool
+from src.frame_cache import FrameCache
+from src.inference_scheduler import default_detector_factory
+from src.inference_scheduler import InferenceScheduler
+from src.inference_scheduler import SchedulerClient
 from src.live_stream_detection import LiveStreamDetector
+from src.memory_policy import MemoryPolicy
+from src.model_backends import MODEL_BACKENDS
 from src.monitor_logger import LoggerConfig
 from src.notifiers.line_notifier import LineNotifier
+from src.quality_controller import QualityController
+from src.quality_controller import QualityLevel
+from src.replay_benchmark import format_report
+from src.replay_benchmark import run_replay
+from src.replay_benchmark import write_report
 from src.stream_capture import StreamCapture
+from src.tile_slicer import TileSlicer
 from src.utils import FileEventHandler
 from src.utils import RedisManager
 from src.utils import Utils
@@ -47,6 +67,19 @@ class AppConfig(TypedDict, total=False):
     work_start_hour: int | None
     work_end_hour: int | None
     store_in_redis: bool
+    danger_engine: str | None
+    memory_policy: dict[str, Any] | None
+    upload_encoding: dict[str, Any] | None
+    slicing: dict[str, Any] | None
+    decoder: dict[str, Any] | None
+    clip: dict[str, Any] | None
+    schedule: dict[str, float] | None
+    model_backend: str | None
+    frame_cache: dict[str, Any] | None
+    endpoints: dict[str, Any] | None
+    tracking: dict[str, Any] | None
+    cascade: dict[str, Any] | None
+    qos: dict[str, Any] | None
 
 
 class MainApp:
@@ -54,14 +87,41 @@ class MainApp:
     Main application class for managing multiple video streams.
     """
 
-    def __init__(self, config_file: str):
+    def __init__(
+        self,
+        config_file: str,
+        batched_inference: bool = False,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        inference_workers: int = 1,
+        throughput_report_interval: int = 60,
+        clip_buffer_mb: float = 512.0,
+        compute_budget: float | None = None,
+        onnx_threads: int | None = None,
+    ):
         """
         Initialise the MainApp class.
 
         Args:
             config_file (str): The path to the JSON configuration file.
+            batched_inference (bool): Whether local detection goes through
+                a shared inference scheduler instead of loading a model in
+                every stream process.
+            max_batch_size (int): The maximum number of frames per batch.
+            max_wait_ms (float): The maximum time to wait for a full batch.
+            inference_workers (int): The number of model-owning workers.
+            throughput_report_interval (int): Seconds between throughput
+                reports of the inference scheduler.
+            clip_buffer_mb (float): The memory shared by the clip buffers
+                of all streams on this node.
+            compute_budget (float | None): Device-seconds per second shared
+                by the streams of this node, e.g. 1.0 for one GPU. None
+                lets every stream pace itself on its own latency.
+            onnx_threads (int | None): Intra-op threads of each model run
+                on the ONNX Runtime backend. None uses one per core.
         """
         self.config_file = config_file
+        # One process per video source, running all of its configurations
         self.running_processes: dict[str, dict] = {}
         self.current_config_hashes: dict[str, str] = {}
         self.lock = asyncio.Lock()
@@ -71,11 +131,40 @@ class MainApp:
         # Build shared token for API access
         self.shared_token = manager.dict()
         self.shared_token['access_token'] = None
+        self.shared_token['refresh_token'] = None
         self.shared_token['token_expiry'] = 0
 
         # Build shared lock for API access
         self.shared_lock = manager.Lock()
 
+        # Build the shared inference scheduler for local detection
+        self.inference_scheduler: InferenceScheduler | None = None
+        if batched_inference:
+            self.inference_scheduler = InferenceScheduler(
+                manager,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                num_workers=inference_workers,
+                detector_factory=partial(
+                    default_detector_factory, num_threads=onnx_threads,
+                ),
+            )
+        self.throughput_report_interval = throughput_report_interval
+        self.onnx_threads = onnx_threads
+
+        # Build shared clip buffer usage, capped for the whole node
+        self.clip_buffer_usage = manager.dict()
+        self.clip_buffer_mb = clip_buffer_mb
+
+        # Build the node scheduler of capture intervals
+        self.compute_budget_scheduler: ComputeBudgetScheduler | None = None
+        if compute_budget:
+            self.compute_budget_scheduler = ComputeBudgetScheduler(
+                compute_budget,
+                demands=manager.dict(),
+                allocations=manager.dict(),
+            )
+
     def compute_config_hash(self, config: dict) -> str:
         """
         Compute a hash based on relevant configuration parameters.
@@ -99,9 +188,51 @@ class MainApp:
             'work_start_hour': config.get('work_start_hour'),
             'work_end_hour': config.get('work_end_hour'),
             'store_in_redis': config.get('store_in_redis', False),
+            'danger_engine': config.get('danger_engine'),
+            'memory_policy': config.get('memory_policy'),
+            'upload_encoding': config.get('upload_encoding'),
+            'slicing': config.get('slicing'),
+            'decoder': config.get('decoder'),
+            'clip': config.get('clip'),
+            'schedule': config.get('schedule'),
+            'model_backend': config.get('model_backend'),
+            'frame_cache': config.get('frame_cache'),
+            'endpoints': config.get('endpoints'),
+            'tracking': config.get('tracking'),
+            'cascade': config.get('cascade'),
+            'qos': config.get('qos'),
         }
         return str(relevant_config)  # Convert to string for hashing
 
+    def compute_source_hash(self, configs: list[AppConfig]) -> str:
+        """
+        Compute a hash of every configuration reading a video source.
+
+        Args:
+            configs (list[AppConfig]): The configurations of the source.
+
+        Returns:
+            str: A hash representing the configurations.
+        """
+        return str([self.compute_config_hash(config) for config in configs])
+
+    @staticmethod
+    def get_redis_key(config: AppConfig) -> str:
+        """
+        Get the Redis key the frames of a configuration are stored under.
+
+        Args:
+            config (AppConfig): The configuration of the stream.
+
+        Returns:
+            str: The Redis key.
+        """
+        site = Utils.encode(config.get('site') or 'default site')
+        stream_name = Utils.encode(
+            config.get('stream_name') or 'default stream name',
+        )
+        return f"stream_frame:{site}|{stream_name}"
+
     async def reload_configurations(self):
         async with self.lock:
             redis_manager = RedisManager()
@@ -110,96 +241,82 @@ class MainApp:
             with open(self.config_file, encoding='utf-8') as file:
                 configurations = json.load(file)
 
-            current_configs = {
-                config['video_url']: config for config in configurations
-            }
+            # Group the configurations by video source, so that every
+            # source is opened and decoded once for all of its streams
+            current_configs: dict[str, list[AppConfig]] = {}
+            for config in configurations:
+                if Utils.is_expired(config.get('expire_date')):
+                    self.logger.info(
+                        f"Skip expired configuration: {config['video_url']}",
+                    )
+                    continue
+                current_configs.setdefault(config['video_url'], []).append(
+                    config,
+                )
 
             # Track keys that exist in the current config
             current_keys = {
-                (
-                    f"{config['site']}_"
-                    f"{config.get('stream_name', 'prediction_visual')}"
-                )
-                for config in configurations
+                self.get_redis_key(config)
+                for configs in current_configs.values()
+                for config in configs
             }
 
             # Stop processes for removed or updated configurations
             for video_url in list(self.running_processes.keys()):
-                config_data = self.running_processes[video_url]
-                config = current_configs.get(video_url)
-
-                # Get the key to be deleted
-                # if config has been removed or modified
-                site = config_data['config']['site']
-                stream_name = config_data['config'].get(
-                    'stream_name', 'prediction_visual',
-                )
+                source_data = self.running_processes[video_url]
+                configs = current_configs.get(video_url)
 
-                site = Utils.encode(site)
-                stream_name = Utils.encode(stream_name)
-
-                key_to_delete = f"stream_frame:{site}|{stream_name}"
-
-                # Stop the process if the configuration is removed
-                if not config or Utils.is_expired(config.get('expire_date')):
+                # Stop the process if the configurations are removed
+                if not configs:
                     self.logger.info(f"Stop workflow: {video_url}")
-                    self.stop_process(config_data['process'])
+                    self.stop_process(source_data['process'])
+                    self.release_compute_budget(source_data['configs'])
                     del self.running_processes[video_url]
                     del self.current_config_hashes[video_url]
 
-                    # Delete old key in Redis
-                    # if it no longer exists in the config
-                    if key_to_delete not in current_keys:
-                        await redis_manager.delete(key_to_delete)
-                        self.logger.info(f"Deleted Redis key: {key_to_delete}")
-
-                # Restart the process if the configuration is updated
-                elif self.compute_config_hash(config) != (
-                    self.current_config_hashes.get(
-                        video_url,
-                    )
+                # Restart the process if a configuration is updated
+                elif self.compute_source_hash(configs) != (
+                    self.current_config_hashes.get(video_url)
                 ):
                     self.logger.info(
                         f"Config changed for {video_url}. "
                         'Restarting workflow.',
                     )
-                    self.stop_process(config_data['process'])
-
-                    # Delete old key in Redis
-                    # if it no longer exists in the config
-                    if key_to_delete not in current_keys:
-                        await redis_manager.delete(key_to_delete)
-                        self.logger.info(f"Deleted Redis key: {key_to_delete}")
+                    self.stop_process(source_data['process'])
+                    self.release_compute_budget(source_data['configs'])
 
                     # Start the new process
                     self.running_processes[video_url] = {
-                        'process': self.start_process(config),
-                        'config': config,
+                        'process': self.start_process(configs),
+                        'configs': configs,
                     }
                     self.current_config_hashes[video_url] = (
-                        self.compute_config_hash(
-                            config,
-                        )
-                    )
-
-            # Start processes for new configurations
-            for video_url, config in current_configs.items():
-                if Utils.is_expired(config.get('expire_date')):
-                    self.logger.info(
-                        f"Skip expired configuration: {video_url}",
+                        self.compute_source_hash(configs)
                     )
+                else:
                     continue
 
+                # Delete old keys in Redis
+                # if they no longer exist in the config
+                for config in source_data['configs']:
+                    key_to_delete = self.get_redis_key(config)
+                    if key_to_delete not in current_keys:
+                        await redis_manager.delete(key_to_delete)
+                        self.logger.info(f"Deleted Redis key: {key_to_delete}")
+
+            # Start processes for new video sources
+            for video_url, configs in current_configs.items():
                 if video_url not in self.running_processes:
-                    self.logger.info(f"Launch new workflow: {video_url}")
+                    self.logger.info(
+                        f"Launch new workflow: {video_url} "
+                        f"({len(configs)} stream(s))",
+                    )
                     self.running_processes[video_url] = {
-                        'process': self.start_process(config),
-                        'config': config,
+                        'process': self.start_process(configs),
+                        'configs': configs,
                     }
                     self.current_config_hashes[video_url] = (
-                        self.compute_config_hash(
-                            config,
-                        )
+                        self.compute_source_hash(configs)
                     )
 
             # Close Redis connection
@@ -209,6 +326,10 @@ class MainApp:
         """
         Manage multiple video streams based on a config file.
         """
+        # Start the model-owning workers before any stream is launched
+        if self.inference_scheduler:
+            self.inference_scheduler.start()
+
         # Initial load of configurations
         await self.reload_configurations()
 
@@ -228,8 +349,25 @@ class MainApp:
         observer.start()
 
         try:
+            last_report = time.time()
             while True:
                 await asyncio.sleep(1)
+
+                # Reassign the capture intervals of the streams
+                if self.compute_budget_scheduler:
+                    self.compute_budget_scheduler.allocate()
+
+                # Report the throughput of the shared inference scheduler
+                # and the memory held by the clip buffers
+                if (
+                    time.time() - last_report
+                    >= self.throughput_report_interval
+                ):
+                    if self.inference_scheduler:
+                        self.inference_scheduler.report_throughput()
+                    self.report_clip_buffers()
+                    self.report_compute_budget()
+                    last_report = time.time()
         except KeyboardInterrupt:
             self.logger.info(
                 '\n[INFO] Received KeyboardInterrupt. Stopping observer...',
@@ -244,6 +382,61 @@ class MainApp:
             self.running_processes.clear()
             self.logger.info('[INFO] All processes stopped.')
 
+            # Stop the inference scheduler workers
+            if self.inference_scheduler:
+                self.inference_scheduler.stop()
+                self.logger.info('[INFO] Inference scheduler stopped.')
+
+    def report_clip_buffers(self) -> None:
+        """
+        Log the memory held by the clip buffers of the node.
+        """
+        usage = dict(self.clip_buffer_usage)
+        if not usage:
+            return
+        total_mb = sum(usage.values()) / (1024 * 1024)
+        self.logger.info(
+            f"Clip buffers: {total_mb:.1f} of {self.clip_buffer_mb:.0f} MB "
+            f"({total_mb / self.clip_buffer_mb:.0%}) "
+            f"across {len(usage)} stream(s)",
+        )
+
+    def report_compute_budget(self) -> None:
+        """
+        Log the capture interval and budget share of every stream.
+        """
+        if not self.compute_budget_scheduler:
+            return
+        allocations = self.compute_budget_scheduler.get_allocations()
+        if not allocations:
+            return
+        streams = ', '.join(
+            f"{stream_id}: {allocation['fps']:.2f} fps "
+            f"(every {allocation['interval']:.1f}s, "
+            f"{allocation['share']:.0%})"
+            for stream_id, allocation in sorted(allocations.items())
+        )
+        self.logger.info(
+            'Compute budget: '
+            f"{self.compute_budget_scheduler.get_utilisation():.0%} of "
+            f"{self.compute_budget_scheduler.budget} allocated; {streams}",
+        )
+
+    def release_compute_budget(self, configs: list[AppConfig]) -> None:
+        """
+        Remove the streams of stopped configurations from the budget.
+
+        Args:
+            configs (list[AppConfig]): The stopped configurations.
+        """
+        if not self.compute_budget_scheduler:
+            return
+        for config in configs:
+            self.compute_budget_scheduler.unregister(
+                f"{config.get('site')}_"
+                f"{config.get('stream_name', 'prediction_visual')}",
+            )
+
     async def process_single_stream(
         self,
         logger: logging.Logger,
@@ -257,6 +450,20 @@ class MainApp:
         work_start_hour: int = 7,
         work_end_hour: int = 18,
         store_in_redis: bool = False,
+        danger_engine: str = 'python',
+        memory_policy: dict[str, Any] | None = None,
+        upload_encoding: dict[str, Any] | None = None,
+        slicing: dict[str, Any] | None = None,
+        decoder: dict[str, Any] | None = None,
+        capture_hub: CaptureHub | None = None,
+        clip: dict[str, Any] | None = None,
+        schedule: dict[str, float] | None = None,
+        model_backend: str = 'torch',
+        frame_cache: dict[str, Any] | None = None,
+        endpoints: dict[str, Any] | None = None,
+        tracking: dict[str, Any] | None = None,
+        cascade: dict[str, Any] | None = None,
+        qos: dict[str, Any] | None = None,
     ) -> None:
         """
         Process a single video stream with hazard detection, notifications,
@@ -274,24 +481,125 @@ class MainApp:
             work_start_hour (int): Start hour for notifications.
             work_end_hour (int): End hour for notifications.
             store_in_redis (bool): Whether to store frames in Redis.
+            danger_engine (str): Engine used by the DangerDetector,
+                either 'python' or 'numpy'.
+            memory_policy (dict): When to run garbage collection, see
+                `MemoryPolicy`.
+            upload_encoding (dict): Codec, quality and max side of frames
+                uploaded for server detection.
+            slicing (dict): Slice size, overlap and incremental slicing
+                settings, see `TileSlicer.from_config`.
+            decoder (dict): Decoder backend of the stream and whether it
+                decodes keyframes only.
+            capture_hub (CaptureHub | None): The hub of a source shared
+                with other streams. None opens the video URL for this
+                stream alone.
+            clip (dict): Seconds kept before and after violations, frame
+                rate, format and buffer size of clips, see
+                `ClipRecorder.from_config`.
+            schedule (dict): Priority and minimum and maximum frame rates
+                of the stream in the node compute budget.
+            model_backend (str): Backend of local detection, 'torch' or
+                'onnx' for ONNX Runtime on the CPU.
+            frame_cache (dict): Hash size, distance, maximum age and frozen
+                camera threshold of reusing the results of unchanged
+                frames, see `FrameCache`. None processes every frame.
+            endpoints (dict): Detection server URLs with their selection,
+                circuit breaker, hedging and retry settings, see
+                `EndpointPool`. None sends server detection to API_URL.
+            tracking (dict): Range of K and adaptation settings of running
+                full detection every K frames and tracking boxes in
+                between, see `DetectionTracker`. None detects every frame.
+            cascade (dict): Fallback and thresholds of running a full-frame
+                pass first and slicing only when small objects are likely,
+                see `CascadeDetector`. None always slices.
+            qos (dict): Latency SLO, floor and ceiling models, coarser
+                slice sizes and hysteresis of moving the stream to cheaper
+                detection under load, see `QualityController`. None keeps
+                the configured model.
         """
         if store_in_redis:
             redis_manager = RedisManager()
 
-        # Initialise the stream capture object
-        streaming_capture = StreamCapture(stream_url=video_url)
+        # Subscribe to the capture of the video source
+        if capture_hub is None:
+            capture_hub = self.create_capture_hub(video_url, decoder)
+        streaming_capture = capture_hub.subscribe(f"{site}_{stream_name}")
+
+        # Keep recent frames to write clips of violations
+        clip_recorder: ClipRecorder | None = None
+        if clip:
+            clip_recorder = ClipRecorder.from_config(
+                clip,
+                capture_hub,
+                name=f"{site}_{stream_name}",
+                node_usage=self.clip_buffer_usage,
+                node_limit_mb=self.clip_buffer_mb,
+            )
+            clip_recorder.start()
+
+        # Initialise the garbage collection policy of the stream
+        stream_memory_policy = MemoryPolicy.from_config(memory_policy)
+
+        # Reuse the results of frames that did not change
+        stream_frame_cache: FrameCache | None = None
+        if frame_cache is not None:
+            stream_frame_cache = FrameCache.from_config(frame_cache)
+        camera_frozen = False
+
+        # Track boxes between full detections
+        stream_tracker: DetectionTracker | None = None
+        if tracking is not None:
+            stream_tracker = DetectionTracker.from_config(tracking)
 
         # Initialise the live stream detector
-        live_stream_detector = LiveStreamDetector(
-            api_url=os.getenv('API_URL', 'http://localhost:5000'),
-            model_key=model_key,
-            output_folder=site,
-            detect_with_server=detect_with_server,
-            # Pass shared token and lock for API access
-            shared_token=self.shared_token,
-            # Pass shared lock for API access
-            shared_lock=self.shared_lock,
-        )
+        live_stream_detector: LiveStreamDetector | SchedulerClient
+        if self.inference_scheduler and not detect_with_server:
+            # Local detection is served by the shared inference scheduler
+            live_stream_detector = self.inference_scheduler.create_client(
+                stream_id=f"{site}_{stream_name}",
+                model_key=model_key,
+                slicing=slicing,
+                model_backend=model_backend,
+                cascade=cascade,
+            )
+        else:
+            upload_encoding = upload_encoding or {}
+            api_url = os.getenv('API_URL', 'http://localhost:5000')
+            live_stream_detector = LiveStreamDetector(
+                api_url=api_url,
+                model_key=model_key,
+                output_folder=site,
+                detect_with_server=detect_with_server,
+                # Pass shared token and lock for API access
+                shared_token=self.shared_token,
+                # Pass shared lock for API access
+                shared_lock=self.shared_lock,
+                upload_codec=upload_encoding.get('codec', 'png'),
+                upload_quality=upload_encoding.get('quality', 90),
+                upload_max_side=upload_encoding.get('max_side'),
+                slicer=TileSlicer.from_config(slicing) if slicing else None,
+                stream_id=f"{site}_{stream_name}",
+                model_backend=model_backend,
+                num_threads=self.onnx_threads,
+                endpoint_pool=(
+                    EndpointPool.from_config(endpoints, api_url)
+                    if endpoints
+                    else None
+                ),
+                cascade=(
+                    CascadeDetector.from_config(cascade)
+                    if cascade is not None
+                    else None
+                ),
+            )
+
+        # Move the stream to cheaper detection while it misses its SLO
+        quality_controller: QualityController | None = None
+        if qos is not None:
+            quality_controller = QualityController.from_config(
+                qos, model_key, slicing,
+            )
 
         # Initialise the drawing manager
         drawing_manager = DrawingManager()
@@ -300,7 +608,9 @@ class MainApp:
         line_notifier = LineNotifier()
 
         # Initialise the DangerDetector
-        danger_detector = DangerDetector(detection_items or {})
+        danger_detector = DangerDetector(
+            detection_items or {}, engine=danger_engine,
+        )
 
         # Notifications setup
         last_notification_times = {
@@ -315,7 +625,7 @@ class MainApp:
         )
 
         # Use the generator function to process detections
-        async for frame, timestamp in streaming_capture.execute_capture():
+        async for frame, timestamp in streaming_capture.frames():
             timestamp = int(timestamp)
             start_time = time.time()
 
@@ -327,15 +637,49 @@ class MainApp:
                 work_start_hour <= detection_time.hour < work_end_hour
             )
 
+            # Reuse the results of an effectively identical frame
+            cached = None
+            if stream_frame_cache:
+                cached = stream_frame_cache.lookup(frame, timestamp)
+                if stream_frame_cache.frozen != camera_frozen:
+                    camera_frozen = stream_frame_cache.frozen
+                    logger.warning(
+                        f"Camera {site}-{stream_name} "
+                        + (
+                            'is frozen'
+                            if camera_frozen
+                            else 'is no longer frozen'
+                        ),
+                    )
+
             # Detection step
-            datas, _ = await live_stream_detector.generate_detections(frame)
-            warnings, controlled_zone_polygon = danger_detector.detect_danger(
-                datas,
-            )
+            inference_time = 0.0
+            if cached is not None:
+                datas, warnings, controlled_zone_polygon, cached_bytes = cached
+            else:
+                inference_start = time.time()
+                datas = (
+                    stream_tracker.propagate(frame) if stream_tracker else None
+                )
+                if datas is None:
+                    datas, _ = await live_stream_detector.generate_detections(
+                        frame,
+                    )
+                    if stream_tracker:
+                        # Attach track IDs to the detections
+                        datas = stream_tracker.update(frame, datas)
+                inference_time = time.time() - inference_start
+                warnings, controlled_zone_polygon = (
+                    danger_detector.detect_danger(datas)
+                )
             controlled_zone_warning = [
                 w for w in warnings if 'controlled area' in w
             ]
 
+            # Record a clip around the violation in the background
+            if clip_recorder and warnings:
+                clip_recorder.trigger(timestamp)
+
             # Notification step
             for token, lang in (notifications or {}).items():
                 # Check if it is time to send a notification
@@ -378,13 +722,28 @@ class MainApp:
                     last_notification_times[token] = timestamp
 
             # Draw detections for Redis storage
-            frame_with_detections = drawing_manager.draw_detections_on_frame(
-                frame,
-                controlled_zone_polygon,
-                datas,
-                language=redis_storage_language or 'en',
-            )
-            frame_bytes = Utils.encode_frame(frame_with_detections)
+            if cached is not None:
+                frame_bytes = cached_bytes
+            else:
+                frame_with_detections = (
+                    drawing_manager.draw_detections_on_frame(
+                        frame,
+                        controlled_zone_polygon,
+                        datas,
+                        language=redis_storage_language or 'en',
+                    )
+                )
+                frame_bytes = Utils.encode_frame(frame_with_detections)
+                if stream_frame_cache:
+                    stream_frame_cache.store(
+                        (
+                            datas,
+                            warnings,
+                            controlled_zone_polygon,
+                            frame_bytes,
+                        ),
+                        timestamp,
+                    )
 
             # Store the frame bytes to Redis
             if store_in_redis:
@@ -396,19 +755,127 @@ class MainApp:
                     language=redis_storage_language,
                 )
 
-            # Update the capture interval based on processing time
+            # Update the capture interval based on processing time, or on
+            # the share of the node compute budget given to the stream
             processing_time = time.time() - start_time
-            streaming_capture.update_capture_interval(
-                max(1, int(processing_time) + 1),
-            )
-
-            # Log the detection results
+            if quality_controller:
+                switch = quality_controller.update(processing_time)
+                if switch:
+                    self.apply_quality_level(
+                        live_stream_detector, switch['current'], slicing,
+                    )
+                    previous = self.describe_quality_level(switch['previous'])
+                    current = self.describe_quality_level(switch['current'])
+                    logger.warning(
+                        f"Switched {site}-{stream_name} from {previous} to "
+                        f"{current} ({switch['reason']}, latency "
+                        f"{switch['latency']:.2f}s, SLO "
+                        f"{quality_controller.latency_slo:.2f}s)",
+                    )
+            capture_interval = max(1, int(processing_time) + 1)
+            if self.compute_budget_scheduler:
+                stream_id = f"{site}_{stream_name}"
+                self.compute_budget_scheduler.report(
+                    stream_id,
+                    cost=inference_time,
+                    latency=processing_time,
+                    **(schedule or {}),
+                )
+                capture_interval = self.compute_budget_scheduler.get_interval(
+                    stream_id, default=capture_interval,
+                )
+            streaming_capture.update_capture_interval(capture_interval)
+
+            # Collect garbage if the memory policy asks for it
+            stream_memory_policy.step()
+            memory_stats = stream_memory_policy.get_stats()
+
+            # Log the detection results and the frames skipped meanwhile
+            counters = streaming_capture.get_frame_counters()
+            clip_info = ''
+            if clip_recorder:
+                clip_stats = clip_recorder.get_stats()
+                clip_info = (
+                    f", clip buffer {clip_stats['frames']} frames "
+                    f"{clip_stats['buffer_bytes'] / (1024 * 1024):.1f} MB "
+                    f"({clip_stats['occupancy']:.0%}), "
+                    f"{clip_stats['clips_written']} clips"
+                )
+            tracking_info = ''
+            if stream_tracker:
+                tracker_stats = stream_tracker.get_stats()
+                tracking_info = (
+                    f", detected {tracker_stats['detections']}/"
+                    f"{tracker_stats['frames']} frames, "
+                    f"K={tracker_stats['interval']}, "
+                    f"{tracker_stats['tracks']} tracks"
+                )
+            endpoint_info = ''
+            if endpoints and isinstance(
+                live_stream_detector, LiveStreamDetector,
+            ):
+                pool_stats = live_stream_detector.endpoint_pool.get_stats()
+                open_count = sum(
+                    endpoint['state'] != 'closed'
+                    for endpoint in pool_stats['endpoints']
+                )
+                endpoint_info = (
+                    f", {open_count}/{len(pool_stats['endpoints'])} "
+                    f"endpoints open, {pool_stats['retries']} retries, "
+                    f"{pool_stats['hedges']} hedges"
+                )
+            cascade_info = ''
+            if isinstance(
+                live_stream_detector, LiveStreamDetector,
+            ) and live_stream_detector.cascade:
+                cascade_stats = live_stream_detector.cascade.get_stats()
+                cascade_info = (
+                    f", cascade {cascade_stats['full_frame']} full-frame "
+                    f"{cascade_stats['regions']} regions "
+                    f"{cascade_stats['sliced']} sliced, saved "
+                    f"{cascade_stats['latency_saved']:.1f}s"
+                )
+            qos_info = ''
+            if quality_controller:
+                qos_stats = quality_controller.get_stats()
+                qos_info = (
+                    f", QoS {self.describe_quality_level(qos_stats)}"
+                    + (' (degraded)' if qos_stats['degraded'] else '')
+                    + f", {qos_stats['switches']} switches"
+                )
+            cache_info = ''
+            if stream_frame_cache:
+                cache_stats = stream_frame_cache.get_stats()
+                cache_info = (
+                    f", frame cache {cache_stats['hits']} hits "
+                    f"{cache_stats['misses']} misses "
+                    f"({cache_stats['hit_rate']:.0%})"
+                    + (', camera frozen' if cache_stats['frozen'] else '')
+                )
             logger.info(
-                f"Processed {site}-{stream_name} in {processing_time:.2f}s",
+                f"Processed {site}-{stream_name} in {processing_time:.2f}s "
+                f"(decoded {counters['frames_decoded']}, "
+                f"dropped {counters['frames_dropped']} frames, "
+                f"RSS {memory_stats['rss_mb']:.1f} MB, "
+                f"GC {memory_stats['collections']} runs in "
+                f"{memory_stats['collection_time'] * 1000:.1f} ms"
+                f"{clip_info}{cache_info}{tracking_info}{cascade_info}"
+                f"{endpoint_info}{qos_info})",
             )
 
-        # Release resources after processing
-        await streaming_capture.release_resources()
+        # Leave the compute budget of the node
+        if self.compute_budget_scheduler:
+            self.compute_budget_scheduler.unregister(f"{site}_{stream_name}")
+
+        # Finish pending clips, then leave the source, which is released
+        # after its last stream
+        if clip_recorder:
+            await clip_recorder.stop()
+        await streaming_capture.close()
+
+        # Close the pooled connections to the detection API
+        if isinstance(live_stream_detector, LiveStreamDetector):
+            await live_stream_detector.close()
 
         # Close the Redis connection
         if store_in_redis:
@@ -416,12 +883,103 @@ class MainApp:
 
         gc.collect()
 
-    async def process_streams(self, config: AppConfig) -> None:
+    @staticmethod
+    def apply_quality_level(
+        live_stream_detector: LiveStreamDetector | SchedulerClient,
+        level: QualityLevel,
+        slicing: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Switches the detector of a stream to a quality level.
+
+        Args:
+            live_stream_detector (LiveStreamDetector | SchedulerClient):
+                The detector of the stream.
+            level (QualityLevel): The model and slice size to use.
+            slicing (dict): The configured slicing of the stream.
+        """
+        live_stream_detector.set_model_key(level['model_key'])
+        if level['slice_size'] is not None:
+            slicing = {**(slicing or {}), 'slice_size': level['slice_size']}
+        if isinstance(live_stream_detector, SchedulerClient):
+            live_stream_detector.slicing = slicing
+        else:
+            # Tiles cached by an incremental slicer came from the old model
+            live_stream_detector.slicer = (
+                TileSlicer.from_config(slicing) if slicing else None
+            )
+
+    @staticmethod
+    def describe_quality_level(level: QualityLevel | dict[str, Any]) -> str:
+        """
+        Describes a quality level for the log.
+
+        Args:
+            level (QualityLevel | dict[str, Any]): The model key and slice
+                size.
+
+        Returns:
+            str: The model key, with the slice size if one is set.
+        """
+        if level['slice_size'] is None:
+            return level['model_key']
+        return f"{level['model_key']} ({level['slice_size']} px slices)"
+
+    def create_capture_hub(
+        self,
+        video_url: str,
+        decoder: dict[str, Any] | None = None,
+    ) -> CaptureHub:
+        """
+        Create the hub that opens a video source once for all its streams.
+
+        Args:
+            video_url (str): Video stream URL.
+            decoder (dict): Decoder backend of the source and whether it
+                decodes keyframes only.
+
+        Returns:
+            CaptureHub: The hub of the source.
+        """
+        decoder = decoder or {}
+        return CaptureHub(
+            StreamCapture(
+                stream_url=video_url,
+                decoder=decoder.get('backend', 'opencv'),
+                keyframes_only=decoder.get('keyframes_only'),
+            ),
+        )
+
+    async def process_source(self, configs: list[AppConfig]) -> None:
+        """
+        Process every stream configured on one video source.
+
+        The source is opened once and its frames are fanned out to the
+        streams, each keeping its own capture interval. The decoder of the
+        first configuration is used for the source.
+
+        Args:
+            configs (list[AppConfig]): The configurations of the source.
+        """
+        capture_hub = self.create_capture_hub(
+            configs[0].get('video_url', ''), configs[0].get('decoder'),
+        )
+        await asyncio.gather(
+            *(self.process_streams(config, capture_hub) for config in configs),
+        )
+
+    async def process_streams(
+        self,
+        config: AppConfig,
+        capture_hub: CaptureHub | None = None,
+    ) -> None:
         """
         Process a video stream based on the given configuration.
 
         Args:
             config (AppConfig): The configuration for the stream processing.
+            capture_hub (CaptureHub | None): The hub of a source shared
+                with other streams.
         """
         try:
             # Check if 'notifications' field exists (new format)
@@ -451,6 +1009,19 @@ class MainApp:
             store_in_redis = config.get('store_in_redis', False)
             work_start_hour = config.get('work_start_hour', 7)
             work_end_hour = config.get('work_end_hour', 18)
+            danger_engine = config.get('danger_engine') or 'python'
+            memory_policy = config.get('memory_policy')
+            upload_encoding = config.get('upload_encoding')
+            slicing = config.get('slicing')
+            decoder = config.get('decoder')
+            clip = config.get('clip')
+            schedule = config.get('schedule')
+            model_backend = config.get('model_backend') or 'torch'
+            frame_cache = config.get('frame_cache')
+            endpoints = config.get('endpoints')
+            tracking = config.get('tracking')
+            cascade = config.get('cascade')
+            qos = config.get('qos')
 
             # Run hazard detection on a single video stream
             await self.process_single_stream(
@@ -465,38 +1036,44 @@ class MainApp:
                 work_start_hour=work_start_hour or 7,
                 work_end_hour=work_end_hour or 18,
                 store_in_redis=store_in_redis,
+                danger_engine=danger_engine,
+                memory_policy=memory_policy,
+                upload_encoding=upload_encoding,
+                slicing=slicing,
+                decoder=decoder,
+                capture_hub=capture_hub,
+                clip=clip,
+                schedule=schedule,
+                model_backend=model_backend,
+                frame_cache=frame_cache,
+                endpoints=endpoints,
+                tracking=tracking,
+                cascade=cascade,
+                qos=qos,
             )
         finally:
             # Clean up Redis storage if needed
             if config.get('store_in_redis', False):
                 redis_manager = RedisManager()
-                site = config.get('site') or 'default site'
-                stream_name = config.get(
-                    'stream_name',
-                ) or 'default stream name'
-
-                site = Utils.encode(site)
-                stream_name = Utils.encode(stream_name)
-
-                key = f"stream_frame:{site}|{stream_name}"
+                key = self.get_redis_key(config)
                 await redis_manager.delete(key)
                 self.logger.info(f"Deleted Redis key: {key}")
 
                 # Close the Redis connection
                 await redis_manager.close_connection()
 
-    def start_process(self, config: AppConfig) -> Process:
+    def start_process(self, configs: list[AppConfig]) -> Process:
         """
-        Start a new process for processing a video stream.
+        Start a new process for processing the streams of a video source.
 
         Args:
-            config (AppConfig): The configuration for the stream processing.
+            configs (list[AppConfig]): The configurations of the source.
 
         Returns:
             Process: The newly started process.
         """
         p = Process(
-            target=lambda: asyncio.run(self.process_streams(config)),
+            target=lambda: asyncio.run(self.process_source(configs)),
         )
         p.start()
         return p
@@ -518,6 +1095,8 @@ async def process_single_image(
     output_folder: str = 'output_images',
     stream_name: str | None = None,
     language: str = 'en',
+    model_backend: str = 'torch',
+    num_threads: int | None = None,
 ) -> None:
     """
     Process a single image for hazard detection and save the result.
@@ -528,6 +1107,8 @@ async def process_single_image(
         output_folder (str): The folder to save the output image.
         stream_name (str): The name of the output image file.
         language (str): The language for labels on the output image.
+        model_backend (str): The backend of detection, 'torch' or 'onnx'.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
 
     Returns:
         None
@@ -553,6 +1134,8 @@ async def process_single_image(
             output_folder=output_folder,
             # Shared token not needed for single image processing
             shared_token={},
+            model_backend=model_backend,
+            num_threads=num_threads,
         )
 
         # Initialise the drawing manager
@@ -608,6 +1191,13 @@ async def main():
         default='yolo11n',
         help='Model key to use for detection',
     )
+    parser.add_argument(
+        '--model_backend',
+        type=str,
+        default='torch',
+        choices=MODEL_BACKENDS,
+        help='Backend of detection for --image and --replay',
+    )
     parser.add_argument(
         '--output_folder',
         type=str,
@@ -620,20 +1210,106 @@ async def main():
         default='en',
         help='Language for labels on the output image',
     )
+    parser.add_argument(
+        '--batched_inference',
+        action='store_true',
+        help='Share one inference scheduler across local-detection streams',
+    )
+    parser.add_argument(
+        '--max_batch_size',
+        type=int,
+        default=8,
+        help='Maximum number of frames per inference batch',
+    )
+    parser.add_argument(
+        '--max_wait_ms',
+        type=float,
+        default=20.0,
+        help='Maximum time in milliseconds to wait for a full batch',
+    )
+    parser.add_argument(
+        '--inference_workers',
+        type=int,
+        default=1,
+        help='Number of model-owning inference worker processes',
+    )
+    parser.add_argument(
+        '--clip_buffer_mb',
+        type=float,
+        default=512.0,
+        help='Memory in MB shared by the clip buffers of all streams',
+    )
+    parser.add_argument(
+        '--compute_budget',
+        type=float,
+        help='Device-seconds per second shared by all streams, e.g. 1.0',
+    )
+    parser.add_argument(
+        '--onnx_threads',
+        type=int,
+        help='Intra-op threads of models on the ONNX Runtime backend',
+    )
+    parser.add_argument(
+        '--replay',
+        type=str,
+        help='Video file to replay through the pipeline as a benchmark',
+    )
+    parser.add_argument(
+        '--replay_speed',
+        type=float,
+        default=0.0,
+        help='Multiple of real time to replay at, 0 for maximum speed',
+    )
+    parser.add_argument(
+        '--replay_frames',
+        type=int,
+        help='Number of frames to replay, all frames if not given',
+    )
+    parser.add_argument(
+        '--replay_report',
+        type=str,
+        default='replay_report.json',
+        help='JSON file to write the replay benchmark report to',
+    )
     args = parser.parse_args()
 
     try:
-        if args.image:
+        if args.replay:
+            # Benchmark the pipeline on a video file
+            report = await run_replay(
+                args.replay,
+                model_key=args.model_key,
+                speed=args.replay_speed,
+                max_frames=args.replay_frames,
+                language=args.language,
+                model_backend=args.model_backend,
+                num_threads=args.onnx_threads,
+            )
+            print(format_report(report))
+            write_report(report, args.replay_report)
+            print(f"Replay report saved to {args.replay_report}")
+        elif args.image:
             # If an image path is provided, process the single image
             await process_single_image(
                 image_path=args.image,
                 model_key=args.model_key,
                 output_folder=args.output_folder,
                 language=args.language,
+                model_backend=args.model_backend,
+                num_threads=args.onnx_threads,
             )
         else:
             # Otherwise, run hazard detection on multiple video streams
-            app = MainApp(args.config)
+            app = MainApp(
+                args.config,
+                batched_inference=args.batched_inference,
+                max_batch_size=args.max_batch_size,
+                max_wait_ms=args.max_wait_ms,
+                inference_workers=args.inference_workers,
+                clip_buffer_mb=args.clip_buffer_mb,
+                compute_budget=args.compute_budget,
+                onnx_threads=args.onnx_threads,
+            )
             await app.run_multiple_streams()
     except KeyboardInterrupt:
         print('\n[INFO] Received KeyboardInterrupt. Shutting down...')
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import TypedDict
+
+from streamlink.session import Streamlink
+
+#: File the estimates of every stream on the node are shared through.
+DEFAULT_CACHE_PATH = os.path.join(
+    tempfile.gettempdir(), 'construction_hazard_bandwidth.json',
+)
+
+
+class BandwidthEntry(TypedDict):
+    mbps: float
+    updated_at: float
+
+
+class BandwidthEstimator:
+    """
+    Estimates the download throughput of each host from the segments that
+    streams actually download, instead of running a speed test.
+
+    Every measurement updates an exponential moving average per host.
+    Estimates expire after `ttl` seconds and are kept in a JSON file, so
+    streams in other processes of the node reading from the same host
+    share them. Streams whose segments cannot be measured claim a probe
+    through a second file, so a host is probed at most once per TTL.
+    """
+
+    def __init__(
+        self,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        ttl: float = 300.0,
+        smoothing: float = 0.3,
+        min_bytes: int = 64 * 1024,
+    ):
+        """
+        Initialises the estimator.
+
+        Args:
+            cache_path (str): The JSON file shared between processes.
+            ttl (float): Seconds after which an estimate is discarded.
+            smoothing (float): Weight of a new measurement in the moving
+                average, between 0 and 1.
+            min_bytes (int): Smallest response that counts as a segment.
+                Playlists and other small responses are dominated by
+                latency and would underestimate the bandwidth.
+
+        Raises:
+            ValueError: If an argument is out of range.
+        """
+        if ttl <= 0:
+            raise ValueError('ttl must be positive.')
+        if not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be in (0, 1].')
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.smoothing = smoothing
+        self.min_bytes = min_bytes
+        self.probe_path = f"{cache_path}.probes"
+        # Copy of the estimates used when the cache file is unavailable
+        self.estimates: dict[str, BandwidthEntry] = {}
+        # Copy of the probe claims, by host, for the same purpose
+        self.probes: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> float | None:
+        """
+        Returns the current download estimate of a host.
+
+        Args:
+            host (str): The host the stream is read from.
+
+        Returns:
+            float | None: The throughput in Mbps, or None if nothing has
+                been measured within the TTL.
+        """
+        with self._lock:
+            entry = self._load().get(host)
+        if entry is None or not self._is_fresh(entry):
+            return None
+        return entry['mbps']
+
+    def record(self, host: str, size: int, seconds: float) -> float | None:
+        """
+        Adds a measured download to the estimate of a host.
+
+        Args:
+            host (str): The host the data was downloaded from.
+            size (int): The number of bytes downloaded.
+            seconds (float): How long the download took.
+
+        Returns:
+            float | None: The updated estimate in Mbps, or None if the
+                measurement was ignored.
+        """
+        if size < self.min_bytes or seconds <= 0:
+            return None
+        mbps = size * 8 / seconds / 1_000_000
+        with self._lock:
+            estimates = {
+                key: entry for key, entry in self._load().items()
+                if self._is_fresh(entry)
+            }
+            previous = estimates.get(host)
+            if previous is not None:
+                mbps = (
+                    self.smoothing * mbps
+                    + (1 - self.smoothing) * previous['mbps']
+                )
+            estimates[host] = {'mbps': mbps, 'updated_at': time.time()}
+            self._save(estimates)
+        return mbps
+
+    def claim_probe(self, host: str) -> bool:
+        """
+        Claims the probe of a host that has no current estimate.
+
+        Only the first stream of the node asking within the TTL gets the
+        claim, so the other streams from the host wait for its result.
+
+        Args:
+            host (str): The host to probe.
+
+        Returns:
+            bool: Whether the caller should probe the host.
+        """
+        with self._lock:
+            entry = self._load().get(host)
+            if entry is not None and self._is_fresh(entry):
+                return False
+            now = time.time()
+            probes = {
+                key: claimed_at
+                for key, claimed_at in self._load_probes().items()
+                if now - claimed_at < self.ttl
+            }
+            if host in probes:
+                return False
+            probes[host] = now
+            self.probes = probes
+            self._write(self.probe_path, probes, 'probe claims')
+        return True
+
+    def install(self, session: Streamlink, host: str) -> None:
+        """
+        Measures every download made by a streamlink session.
+
+        The hook reads the body of each response, which streamlink does
+        right after the request for segments anyway, and attributes the
+        throughput to the host of the stream.
+
+        Args:
+            session (Streamlink): The session the stream is opened with.
+            host (str): The host the measurements are recorded under.
+        """
+        def measure(response: Any, *args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            size = len(response.content)
+            seconds = (
+                response.elapsed.total_seconds()
+                + time.perf_counter() - start
+            )
+            self.record(host, size, seconds)
+            return response
+
+        session.http.hooks['response'].append(measure)
+
+    def _is_fresh(self, entry: BandwidthEntry) -> bool:
+        """
+        Returns whether an estimate is within the TTL.
+        """
+        return time.time() - entry['updated_at'] < self.ttl
+
+    def _load(self) -> dict[str, BandwidthEntry]:
+        """
+        Reads the shared estimates, falling back to the local copy.
+        """
+        try:
+            with open(self.cache_path, encoding='utf-8') as file:
+                self.estimates = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading bandwidth estimates: {e}")
+        return dict(self.estimates)
+
+    def _load_probes(self) -> dict[str, float]:
+        """
+        Reads the shared probe claims, falling back to the local copy.
+        """
+        try:
+            with open(self.probe_path, encoding='utf-8') as file:
+                self.probes = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading bandwidth probe claims: {e}")
+        return dict(self.probes)
+
+    def _save(self, estimates: dict[str, BandwidthEntry]) -> None:
+        """
+        Replaces the shared estimates atomically.
+        """
+        self.estimates = estimates
+        self._write(self.cache_path, estimates, 'estimates')
+
+    @staticmethod
+    def _write(path: str, data: dict[str, Any], name: str) -> None:
+        """
+        Replaces a shared JSON file atomically.
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing bandwidth {name}: {e}")
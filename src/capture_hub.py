@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncGenerator
+
+import numpy as np
+
+from src.stream_capture import StreamCapture
+
+
+class CaptureSubscription:
+    """
+    A logical stream pipeline reading frames from a `CaptureHub`.
+
+    Each subscription keeps its own capture interval, so pipelines with
+    different processing times sharing a camera are paced independently.
+    """
+
+    def __init__(
+        self,
+        hub: CaptureHub,
+        name: str,
+        capture_interval: float = 15,
+    ):
+        """
+        Initialises the subscription.
+
+        Args:
+            hub (CaptureHub): The hub delivering the frames.
+            name (str): The name of the pipeline, used in logs.
+            capture_interval (float): Seconds between frames.
+        """
+        self.hub = hub
+        self.name = name
+        self.capture_interval = capture_interval
+        # Monotonic time of the last delivered frame
+        self.last_delivered = float('-inf')
+        self.frames_delivered = 0
+
+    @property
+    def due(self) -> float:
+        """
+        Returns the monotonic time from which the next frame is due.
+        """
+        return self.last_delivered + self.capture_interval
+
+    async def frames(self) -> AsyncGenerator[tuple[np.ndarray, float]]:
+        """
+        Yields frames of the source at the capture interval.
+
+        Yields:
+            tuple[np.ndarray, float]: The captured frame and the timestamp.
+                The frame is shared with the other pipelines of the source
+                and must not be modified in place.
+        """
+        while True:
+            item = await self.hub.request_frame(self)
+            if item is None:
+                return
+            yield item
+
+    def update_capture_interval(self, new_interval: float) -> None:
+        """
+        Updates the capture interval of this pipeline.
+
+        Args:
+            new_interval (float): Frame capture interval in seconds.
+        """
+        self.capture_interval = new_interval
+        self.hub.wake()
+
+    def get_frame_counters(self) -> dict[str, int]:
+        """
+        Returns the frame counters of the shared source.
+
+        Returns:
+            dict[str, int]: The frame counters of the source.
+        """
+        return self.hub.capture.get_frame_counters()
+
+    async def close(self) -> None:
+        """
+        Leaves the hub, which releases the source after the last pipeline.
+        """
+        await self.hub.unsubscribe(self)
+
+
+class CaptureHub:
+    """
+    Opens a video source once and fans its frames out to any number of
+    pipelines.
+
+    A frame is read from the source only when a waiting pipeline is due,
+    and is then delivered to every pipeline due at that moment, so the
+    connection and decoding are paid once per camera however many
+    configurations watch it.
+    """
+
+    def __init__(self, capture: StreamCapture):
+        """
+        Initialises the hub.
+
+        Args:
+            capture (StreamCapture): The capture of the physical source.
+        """
+        self.capture = capture
+        self.subscribers: list[CaptureSubscription] = []
+        # Futures of the pipelines waiting for their next frame
+        self.pending: dict[CaptureSubscription, asyncio.Future] = {}
+        # Frames read from the source, each shared by its pipelines
+        self.frames_read = 0
+        # Set once the source has stopped delivering frames
+        self.finished = False
+        self._wake_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def subscribe(
+        self,
+        name: str,
+        capture_interval: float = 15,
+    ) -> CaptureSubscription:
+        """
+        Adds a pipeline to the source.
+
+        Args:
+            name (str): The name of the pipeline.
+            capture_interval (float): Seconds between its frames.
+
+        Returns:
+            CaptureSubscription: The subscription to read frames from.
+        """
+        subscription = CaptureSubscription(self, name, capture_interval)
+        self.subscribers.append(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: CaptureSubscription) -> None:
+        """
+        Removes a pipeline, stopping the hub after the last one.
+
+        Args:
+            subscription (CaptureSubscription): The pipeline to remove.
+        """
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+        future = self.pending.pop(subscription, None)
+        if future and not future.done():
+            future.set_result(None)
+        if not self.subscribers:
+            await self.stop()
+        else:
+            self.wake()
+
+    async def request_frame(
+        self,
+        subscription: CaptureSubscription,
+    ) -> tuple[np.ndarray, float] | None:
+        """
+        Waits for the next frame of a pipeline.
+
+        Args:
+            subscription (CaptureSubscription): The waiting pipeline.
+
+        Returns:
+            tuple[np.ndarray, float] | None: The frame and its timestamp,
+                or None once the source has stopped.
+        """
+        if self.finished or subscription not in self.subscribers:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self.pending[subscription] = future
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self.wake()
+        return await future
+
+    def wake(self) -> None:
+        """
+        Makes the reader re-evaluate when the next frame is due.
+        """
+        self._wake_event.set()
+
+    async def stop(self) -> None:
+        """
+        Stops reading the source and releases it.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        elif self._task is None:
+            self.finished = True
+            await self.capture.release_resources()
+
+    async def _wait_until_due(self) -> None:
+        """
+        Sleeps until a waiting pipeline is due for its next frame.
+        """
+        while True:
+            self._wake_event.clear()
+            dues = [subscription.due for subscription in self.pending]
+            now = time.monotonic()
+            if dues and min(dues) <= now:
+                return
+            timeout = min(dues) - now if dues else None
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake_event.wait(), timeout)
+
+    async def _run(self) -> None:
+        """
+        Reads frames while pipelines are subscribed and delivers them.
+        """
+        frames = self.capture.execute_capture()
+        try:
+            while self.subscribers:
+                await self._wait_until_due()
+                # Keep the source paced by its most frequent pipeline
+                self.capture.update_capture_interval(
+                    min(s.capture_interval for s in self.subscribers),
+                )
+                try:
+                    frame, timestamp = await anext(frames)
+                except StopAsyncIteration:
+                    break
+                self.frames_read += 1
+
+                now = time.monotonic()
+                for subscription, future in list(self.pending.items()):
+                    if subscription.due > now or future.done():
+                        continue
+                    subscription.last_delivered = now
+                    subscription.frames_delivered += 1
+                    future.set_result((frame, timestamp))
+                    del self.pending[subscription]
+        finally:
+            self.finished = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_result(None)
+            self.pending.clear()
+            await frames.aclose()
+            await self.capture.release_resources()
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+from typing import TypedDict
+
+import numpy as np
+from sahi.postprocess.combine import GreedyNMMPostprocess
+from sahi.prediction import ObjectPrediction
+from sahi.prediction import PredictionResult
+from sahi.predict import get_prediction
+from sahi.predict import get_sliced_prediction
+from sahi.slicing import get_slice_bboxes
+
+from src.tile_slicer import TileSlicer
+
+#: How the cascade falls back when small objects are likely.
+CASCADE_FALLBACKS = ('sliced', 'regions')
+
+
+class CascadeStats(TypedDict):
+    frames: int
+    full_frame: int
+    regions: int
+    sliced: int
+    latency_saved: float
+
+
+class CascadeDetector:
+    """
+    Runs a full-frame pass first and slices only when it looks necessary.
+
+    On close-range cameras one full-frame inference finds everything, and
+    tiling the frame multiplies the cost for nothing. The cascade falls
+    back to slicing only if the full-frame pass found boxes that are small
+    relative to the frame or have a low confidence, which is where objects
+    at the limit of the model's resolution show up. The fallback is either
+    the full sliced inference, or in 'regions' mode the crops around those
+    boxes alone, merged with the full-frame predictions.
+
+    The latency saved is estimated against running the full sliced
+    inference on every frame, with the cost of sliced inference measured
+    whenever it runs and extrapolated from the full-frame pass before.
+
+    A cascade holds the statistics of one stream.
+    """
+
+    def __init__(
+        self,
+        fallback: str = 'sliced',
+        small_area: float = 0.002,
+        low_confidence: float = 0.5,
+        slice_when_empty: bool = False,
+        slice_size: int = 376,
+        overlap_ratio: float = 0.3,
+        max_region_fraction: float = 0.5,
+        smoothing: float = 0.2,
+    ):
+        """
+        Initialises the cascade.
+
+        Args:
+            fallback (str): 'sliced' to run the full sliced inference, or
+                'regions' to slice only around the small and low
+                confidence boxes.
+            small_area (float): The area of a box, as a fraction of the
+                frame, below which it counts as small.
+            low_confidence (float): The confidence below which a box
+                counts as uncertain.
+            slice_when_empty (bool): Whether a full-frame pass without any
+                detection falls back to sliced inference.
+            slice_size (int): The size of slices and regions when no
+                slicer is given.
+            overlap_ratio (float): The overlap of slices when no slicer is
+                given.
+            max_region_fraction (float): The share of the frame the
+                regions may cover before the full sliced inference runs
+                instead.
+            smoothing (float): The weight of the latest latency in the
+                moving averages.
+
+        Raises:
+            ValueError: If any of the settings is out of range.
+        """
+        if fallback not in CASCADE_FALLBACKS:
+            raise ValueError(
+                f"Unsupported cascade fallback '{fallback}'. "
+                f"Expected one of {CASCADE_FALLBACKS}.",
+            )
+        if not 0 <= small_area <= 1:
+            raise ValueError('small_area must be in [0, 1].')
+        if slice_size < 1:
+            raise ValueError('slice_size must be at least 1.')
+        if not 0 < max_region_fraction <= 1:
+            raise ValueError('max_region_fraction must be in (0, 1].')
+        if not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be in (0, 1].')
+
+        self.fallback = fallback
+        self.small_area = small_area
+        self.low_confidence = low_confidence
+        self.slice_when_empty = slice_when_empty
+        self.slice_size = slice_size
+        self.overlap_ratio = overlap_ratio
+        self.max_region_fraction = max_region_fraction
+        self.smoothing = smoothing
+
+        # Matches the merge get_sliced_prediction applies by default
+        self.postprocess = GreedyNMMPostprocess(
+            match_threshold=0.5,
+            match_metric='IOS',
+            class_agnostic=False,
+        )
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.full_frame = 0
+        self.regions = 0
+        self.sliced = 0
+        self.latency_saved = 0.0
+        self.full_latency: float | None = None
+        self.sliced_latency: float | None = None
+        self.tile_counts: dict[tuple[int, int, int, float], int] = {}
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None) -> CascadeDetector:
+        """
+        Builds a cascade from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any] | None): The `cascade` entry, e.g.
+                {"fallback": "regions", "small_area": 0.001}.
+
+        Returns:
+            CascadeDetector: The configured cascade.
+        """
+        return cls(**(config or {}))
+
+    def average(self, current: float | None, latency: float) -> float:
+        """
+        Adds a latency to an exponential moving average.
+
+        Args:
+            current (float | None): The average so far, if any.
+            latency (float): The latest latency in seconds.
+
+        Returns:
+            float: The updated average.
+        """
+        if current is None:
+            return latency
+        return current + self.smoothing * (latency - current)
+
+    def count_tiles(
+        self,
+        height: int,
+        width: int,
+        slice_size: int,
+        overlap_ratio: float,
+    ) -> int:
+        """
+        Returns the number of slices sliced inference runs on a frame.
+
+        Args:
+            height (int): The frame height.
+            width (int): The frame width.
+            slice_size (int): The size of the slices.
+            overlap_ratio (float): The overlap between slices.
+
+        Returns:
+            int: The number of slices.
+        """
+        key = (height, width, slice_size, overlap_ratio)
+        if key not in self.tile_counts:
+            self.tile_counts[key] = len(
+                get_slice_bboxes(
+                    image_height=height,
+                    image_width=width,
+                    slice_height=slice_size,
+                    slice_width=slice_size,
+                    auto_slice_resolution=False,
+                    overlap_height_ratio=overlap_ratio,
+                    overlap_width_ratio=overlap_ratio,
+                ),
+            )
+        return self.tile_counts[key]
+
+    def find_uncertain(
+        self,
+        predictions: list[ObjectPrediction],
+        height: int,
+        width: int,
+    ) -> list[ObjectPrediction]:
+        """
+        Picks the predictions that hint at objects too small for the pass.
+
+        Args:
+            predictions (list[ObjectPrediction]): The full-frame
+                predictions.
+            height (int): The frame height.
+            width (int): The frame width.
+
+        Returns:
+            list[ObjectPrediction]: The small or low confidence ones.
+        """
+        frame_area = max(height * width, 1)
+        return [
+            prediction
+            for prediction in predictions
+            if prediction.bbox.area / frame_area < self.small_area
+            or prediction.score.value < self.low_confidence
+        ]
+
+    def find_regions(
+        self,
+        predictions: list[ObjectPrediction],
+        height: int,
+        width: int,
+        size: int,
+    ) -> list[list[int]]:
+        """
+        Lays out the crops around predictions, merging overlapping ones.
+
+        Each crop is a square of `size` centred on its box, or the box
+        itself if it is larger, moved inside the frame.
+
+        Args:
+            predictions (list[ObjectPrediction]): The boxes to crop around.
+            height (int): The frame height.
+            width (int): The frame width.
+            size (int): The side of a crop.
+
+        Returns:
+            list[list[int]]: The crops as [x1, y1, x2, y2].
+        """
+        regions = []
+        for prediction in predictions:
+            x1, y1, x2, y2 = prediction.bbox.to_xyxy()
+            region = []
+            for low, high, limit in ((x1, x2, width), (y1, y2, height)):
+                side = min(max(size, int(high - low) + 1), limit)
+                start = int((low + high - side) / 2)
+                start = min(max(start, 0), limit - side)
+                region.append((start, start + side))
+            (rx1, rx2), (ry1, ry2) = region
+            regions.append([rx1, ry1, rx2, ry2])
+
+        # Merge crops until none of them overlap
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    a, b = regions[i], regions[j]
+                    if (
+                        a[0] < b[2] and b[0] < a[2]
+                        and a[1] < b[3] and b[1] < a[3]
+                    ):
+                        regions[i] = [
+                            min(a[0], b[0]), min(a[1], b[1]),
+                            max(a[2], b[2]), max(a[3], b[3]),
+                        ]
+                        del regions[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return regions
+
+    def predict(
+        self,
+        frame: np.ndarray,
+        model: Any,
+        slicer: TileSlicer | None = None,
+    ) -> PredictionResult:
+        """
+        Runs the cascade on a frame.
+
+        Args:
+            frame (np.ndarray): The frame to detect objects in.
+            model (Any): The SAHI detection model.
+            slicer (TileSlicer | None): The slicer of the stream, whose
+                slice settings and incremental state the fallback uses.
+
+        Returns:
+            PredictionResult: The predictions for the frame.
+        """
+        height, width = frame.shape[:2]
+        slice_size = slicer.slice_size if slicer else self.slice_size
+        overlap_ratio = slicer.overlap_ratio if slicer else self.overlap_ratio
+
+        start = time.perf_counter()
+        full_predictions = get_prediction(frame, model).object_prediction_list
+        full_time = time.perf_counter() - start
+
+        uncertain = self.find_uncertain(full_predictions, height, width)
+        incremental = slicer is not None and slicer.incremental
+        regions: list[list[int]] = []
+        stage = 'full_frame'
+        if uncertain or (self.slice_when_empty and not full_predictions):
+            stage = 'sliced'
+            if self.fallback == 'regions' and uncertain:
+                regions = self.find_regions(
+                    uncertain, height, width, slice_size,
+                )
+                covered = sum(
+                    (x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions
+                )
+                if covered <= self.max_region_fraction * height * width:
+                    stage = 'regions'
+
+        start = time.perf_counter()
+        predictions = full_predictions
+        if stage == 'regions':
+            predictions = list(full_predictions)
+            for x1, y1, x2, y2 in regions:
+                result = get_prediction(
+                    np.ascontiguousarray(frame[y1:y2, x1:x2]),
+                    model,
+                    shift_amount=[x1, y1],
+                    full_shape=[height, width],
+                )
+                predictions += [
+                    prediction.get_shifted_object_prediction()
+                    for prediction in result.object_prediction_list
+                ]
+        elif stage == 'sliced' and incremental:
+            # Keeps the tiles of the slicer in step with the stream, reusing
+            # the full-frame pass that has already run
+            predictions = slicer.predict(  # type: ignore[union-attr]
+                frame, model, full_predictions=full_predictions,
+            ).object_prediction_list
+        elif stage == 'sliced':
+            predictions = full_predictions + get_sliced_prediction(
+                frame,
+                model,
+                slice_height=slice_size,
+                slice_width=slice_size,
+                overlap_height_ratio=overlap_ratio,
+                overlap_width_ratio=overlap_ratio,
+                perform_standard_pred=False,
+                verbose=0,
+            ).object_prediction_list
+        fallback_time = time.perf_counter() - start
+        if stage != 'full_frame' and len(predictions) > 1:
+            predictions = self.postprocess(predictions)
+
+        with self.lock:
+            self.full_latency = self.average(self.full_latency, full_time)
+            if stage == 'sliced':
+                self.sliced_latency = self.average(
+                    self.sliced_latency, full_time + fallback_time,
+                )
+            baseline = self.sliced_latency
+            if baseline is None:
+                # Each slice costs about as much as the full frame
+                tiles = self.count_tiles(
+                    height, width, slice_size, overlap_ratio,
+                )
+                baseline = (tiles + 1) * self.full_latency
+            self.latency_saved += baseline - (full_time + fallback_time)
+            self.frames += 1
+            if stage == 'full_frame':
+                self.full_frame += 1
+            elif stage == 'regions':
+                self.regions += 1
+            else:
+                self.sliced += 1
+
+        return PredictionResult(
+            object_prediction_list=predictions,
+            image=frame,
+        )
+
+    def get_stats(self) -> CascadeStats:
+        """
+        Returns how often each stage ran and the latency saved.
+
+        Returns:
+            CascadeStats: The cascade statistics.
+        """
+        with self.lock:
+            return {
+                'frames': self.frames,
+                'full_frame': self.full_frame,
+                'regions': self.regions,
+                'sliced': self.sliced,
+                'latency_saved': self.latency_saved,
+            }
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import time
+from collections import deque
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Any
+from typing import TypedDict
+
+import cv2
+import numpy as np
+
+from src.capture_hub import CaptureHub
+from src.capture_hub import CaptureSubscription
+
+#: Formats a clip can be written in.
+CLIP_FORMATS = ('mjpeg', 'mp4')
+
+
+class ClipBufferStats(TypedDict):
+    frames: int
+    buffer_bytes: int
+    max_bytes: int
+    occupancy: float
+    buffered_seconds: float
+    frames_evicted: int
+    clips_written: int
+
+
+class FrameRingBuffer:
+    """
+    A ring buffer of JPEG-compressed frames bounded by age and by size.
+    """
+
+    def __init__(self, max_seconds: float, max_bytes: int):
+        """
+        Initialises the buffer.
+
+        Args:
+            max_seconds (float): The oldest frame kept, relative to the
+                newest one.
+            max_bytes (int): The total size of the kept frames.
+        """
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.frames: deque[tuple[float, bytes]] = deque()
+        self.nbytes = 0
+        self.frames_evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def append(self, timestamp: float, jpeg: bytes) -> None:
+        """
+        Adds a frame, evicting the oldest ones beyond the limits.
+
+        Args:
+            timestamp (float): The capture time of the frame.
+            jpeg (bytes): The compressed frame.
+        """
+        self.frames.append((timestamp, jpeg))
+        self.nbytes += len(jpeg)
+        while self.frames and (
+            self.frames[0][0] < timestamp - self.max_seconds
+            or self.nbytes > self.max_bytes
+        ):
+            self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        """
+        Changes the size limit, evicting frames if it shrinks.
+
+        Args:
+            max_bytes (int): The new total size of the kept frames.
+        """
+        self.max_bytes = max_bytes
+        while self.frames and self.nbytes > self.max_bytes:
+            self._evict()
+
+    def get_frames(
+        self,
+        start: float,
+        end: float,
+    ) -> list[tuple[float, bytes]]:
+        """
+        Returns the frames captured within a time window.
+
+        Args:
+            start (float): The start of the window.
+            end (float): The end of the window.
+
+        Returns:
+            list[tuple[float, bytes]]: The timestamps and frames.
+        """
+        return [
+            (timestamp, jpeg) for timestamp, jpeg in self.frames
+            if start <= timestamp <= end
+        ]
+
+    def get_buffered_seconds(self) -> float:
+        """
+        Returns the time span covered by the buffer.
+        """
+        if not self.frames:
+            return 0.0
+        return self.frames[-1][0] - self.frames[0][0]
+
+    def _evict(self) -> None:
+        """
+        Drops the oldest frame.
+        """
+        _, jpeg = self.frames.popleft()
+        self.nbytes -= len(jpeg)
+        self.frames_evicted += 1
+
+
+def write_clip(
+    path: str,
+    frames: list[tuple[float, bytes]],
+    fps: float,
+    clip_format: str,
+) -> None:
+    """
+    Writes buffered frames to a video file.
+
+    MJPEG clips are the JPEG frames concatenated without re-encoding, which
+    FFmpeg-based players open as an MJPEG stream. MP4 clips are decoded
+    and re-encoded with the 'mp4v' codec.
+
+    Args:
+        path (str): The output file.
+        frames (list[tuple[float, bytes]]): The timestamps and frames.
+        fps (float): The frame rate the frames were sampled at.
+        clip_format (str): 'mjpeg' or 'mp4'.
+    """
+    if clip_format == 'mjpeg':
+        with open(path, 'wb') as file:
+            for _, jpeg in frames:
+                file.write(jpeg)
+        return
+
+    writer: cv2.VideoWriter | None = None
+    try:
+        for _, jpeg in frames:
+            image = cv2.imdecode(
+                np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR,
+            )
+            if image is None:
+                continue
+            if writer is None:
+                height, width = image.shape[:2]
+                writer = cv2.VideoWriter(
+                    path,
+                    cv2.VideoWriter_fourcc(*'mp4v'),
+                    fps,
+                    (width, height),
+                )
+            writer.write(image)
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+class ClipRecorder:
+    """
+    Keeps recent frames of a stream and writes a clip around violations.
+
+    The recorder reads the stream source through its own `CaptureHub`
+    subscription at `fps`, compresses the frames to JPEG off the event loop
+    and keeps them in a `FrameRingBuffer`. When an event is triggered, the
+    clip is written in the background once the post-event frames have
+    arrived, so the detection loop is never stalled.
+
+    The buffer is capped at `max_buffer_mb`, and at an even share of
+    `node_limit_mb` among the recorders sharing `node_usage`, a mapping of
+    recorder names to buffered bytes shared by the processes of the node.
+    """
+
+    def __init__(
+        self,
+        capture_hub: CaptureHub,
+        name: str,
+        output_folder: str = 'clips',
+        pre_seconds: float = 5.0,
+        post_seconds: float = 5.0,
+        fps: float = 2.0,
+        clip_format: str = 'mjpeg',
+        jpeg_quality: int = 80,
+        max_buffer_mb: float = 32.0,
+        node_usage: MutableMapping[str, int] | None = None,
+        node_limit_mb: float | None = None,
+    ):
+        """
+        Initialises the recorder.
+
+        Args:
+            capture_hub (CaptureHub): The hub of the stream source.
+            name (str): The name of the stream, used in clip file names.
+            output_folder (str): The folder clips are written to.
+            pre_seconds (float): Seconds of video kept before an event.
+            post_seconds (float): Seconds of video recorded after it.
+            fps (float): Frames per second sampled into the buffer.
+            clip_format (str): 'mjpeg' or 'mp4'.
+            jpeg_quality (int): The JPEG quality of buffered frames.
+            max_buffer_mb (float): The buffer size limit of this stream.
+            node_usage (MutableMapping[str, int] | None): Buffered bytes
+                of every recorder on the node.
+            node_limit_mb (float | None): The buffer size limit of the
+                node, shared evenly among the recorders in `node_usage`.
+
+        Raises:
+            ValueError: If an argument is out of range.
+        """
+        if clip_format not in CLIP_FORMATS:
+            raise ValueError(
+                f"Unsupported clip format: {clip_format}. "
+                f"Expected one of {CLIP_FORMATS}.",
+            )
+        if fps <= 0:
+            raise ValueError('fps must be positive.')
+        if pre_seconds < 0 or post_seconds < 0:
+            raise ValueError('pre_seconds and post_seconds must be >= 0.')
+
+        self.capture_hub = capture_hub
+        self.name = name
+        self.output_folder = output_folder
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.clip_format = clip_format
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.node_usage = node_usage
+        self.node_limit_bytes = (
+            int(node_limit_mb * 1024 * 1024)
+            if node_limit_mb is not None else None
+        )
+        # Two frames of slack keep the first frame of a clip until written
+        self.buffer = FrameRingBuffer(
+            pre_seconds + post_seconds + 2 / fps, self.max_bytes,
+        )
+        self.subscription: CaptureSubscription | None = None
+        self.clips_written = 0
+        # End of the post-event window of the clip being recorded
+        self.recording_until = float('-inf')
+        self._reader: asyncio.Task | None = None
+        self._writers: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict[str, Any],
+        capture_hub: CaptureHub,
+        name: str,
+        node_usage: MutableMapping[str, int] | None = None,
+        node_limit_mb: float | None = None,
+    ) -> ClipRecorder:
+        """
+        Builds a recorder from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any]): The `clip` entry, e.g.
+                {"pre_seconds": 5, "post_seconds": 5, "format": "mp4"}.
+            capture_hub (CaptureHub): The hub of the stream source.
+            name (str): The name of the stream.
+            node_usage (MutableMapping[str, int] | None): Buffered bytes
+                of every recorder on the node.
+            node_limit_mb (float | None): The buffer size limit of the
+                node.
+
+        Returns:
+            ClipRecorder: The configured recorder.
+        """
+        config = dict(config)
+        if 'format' in config:
+            config['clip_format'] = config.pop('format')
+        return cls(
+            capture_hub,
+            name,
+            node_usage=node_usage,
+            node_limit_mb=node_limit_mb,
+            **config,
+        )
+
+    def start(self) -> None:
+        """
+        Starts buffering frames of the stream.
+        """
+        if self._reader is not None:
+            return
+        self.subscription = self.capture_hub.subscribe(
+            f"{self.name}_clips", capture_interval=1 / self.fps,
+        )
+        self._reader = asyncio.create_task(self._read_frames())
+
+    async def stop(self) -> None:
+        """
+        Finishes pending clips, then stops buffering.
+        """
+        if self._writers:
+            await asyncio.gather(*self._writers, return_exceptions=True)
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self.subscription is not None:
+            await self.subscription.close()
+            self.subscription = None
+        if self.node_usage is not None:
+            self.node_usage.pop(self.name, None)
+
+    def trigger(self, timestamp: float) -> bool:
+        """
+        Records a clip around an event, unless one is already recording.
+
+        Args:
+            timestamp (float): The capture time of the event frame.
+
+        Returns:
+            bool: True if a new clip was started.
+        """
+        if timestamp <= self.recording_until:
+            return False
+        self.recording_until = timestamp + self.post_seconds
+        task = asyncio.create_task(self._write_clip(timestamp))
+        self._writers.add(task)
+        task.add_done_callback(self._writers.discard)
+        return True
+
+    def get_stats(self) -> ClipBufferStats:
+        """
+        Returns the occupancy of the buffer.
+
+        Returns:
+            ClipBufferStats: Frames and bytes buffered, the size limit and
+                the share of it in use, the seconds covered, frames evicted
+                and clips written.
+        """
+        return {
+            'frames': len(self.buffer),
+            'buffer_bytes': self.buffer.nbytes,
+            'max_bytes': self.buffer.max_bytes,
+            'occupancy': (
+                self.buffer.nbytes / self.buffer.max_bytes
+                if self.buffer.max_bytes else 1.0
+            ),
+            'buffered_seconds': self.buffer.get_buffered_seconds(),
+            'frames_evicted': self.buffer.frames_evicted,
+            'clips_written': self.clips_written,
+        }
+
+    def encode(self, frame: np.ndarray) -> bytes | None:
+        """
+        Compresses a frame to JPEG.
+
+        Args:
+            frame (np.ndarray): The frame.
+
+        Returns:
+            bytes | None: The JPEG bytes, or None if encoding failed.
+        """
+        success, buffer = cv2.imencode(
+            '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality],
+        )
+        return buffer.tobytes() if success else None
+
+    def update_budget(self) -> None:
+        """
+        Shrinks the buffer to its share of the node limit.
+        """
+        if self.node_usage is None:
+            return
+        self.node_usage[self.name] = self.buffer.nbytes
+        max_bytes = self.max_bytes
+        if self.node_limit_bytes is not None:
+            share = self.node_limit_bytes // max(len(self.node_usage), 1)
+            max_bytes = min(max_bytes, share)
+        if max_bytes != self.buffer.max_bytes:
+            self.buffer.resize(max_bytes)
+            self.node_usage[self.name] = self.buffer.nbytes
+
+    async def _read_frames(self) -> None:
+        """
+        Buffers the frames of the subscription until it ends.
+        """
+        assert self.subscription is not None
+        async for frame, timestamp in self.subscription.frames():
+            jpeg = await asyncio.to_thread(self.encode, frame)
+            if jpeg is None:
+                continue
+            self.buffer.append(timestamp, jpeg)
+            self.update_budget()
+
+    async def _write_clip(self, timestamp: float) -> str | None:
+        """
+        Waits for the post-event frames, then writes the clip.
+
+        Args:
+            timestamp (float): The capture time of the event frame.
+
+        Returns:
+            str | None: The path of the clip, or None if nothing was
+                written.
+        """
+        # Wait for the frames after the event, or for the reader to end
+        while (
+            time.time() < timestamp + self.post_seconds
+            and self._reader is not None
+            and not self._reader.done()
+        ):
+            await asyncio.sleep(
+                min(1 / self.fps, timestamp + self.post_seconds - time.time()),
+            )
+
+        frames = self.buffer.get_frames(
+            timestamp - self.pre_seconds, timestamp + self.post_seconds,
+        )
+        if not frames:
+            return None
+
+        os.makedirs(self.output_folder, exist_ok=True)
+        event_time = datetime.fromtimestamp(timestamp)
+        path = os.path.join(
+            self.output_folder,
+            f"{self.name}_{event_time:%Y%m%d_%H%M%S}.{self.clip_format}",
+        )
+        try:
+            await asyncio.to_thread(
+                write_clip, path, frames, self.fps, self.clip_format,
+            )
+        except Exception as e:
+            print(f"Error writing clip {path}: {e}")
+            return None
+        self.clips_written += 1
+        return path
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import time
+from collections.abc import MutableMapping
+from typing import TypedDict
+
+
+class StreamDemand(TypedDict):
+    cost: float
+    latency: float
+    priority: float
+    min_fps: float
+    max_fps: float
+    updated_at: float
+
+
+class StreamAllocation(TypedDict):
+    fps: float
+    interval: float
+    share: float
+    cost: float
+    priority: float
+
+
+#: Longest capture interval assigned to a stream, in seconds.
+MAX_INTERVAL = 300.0
+
+
+def compute_allocations(
+    demands: dict[str, StreamDemand],
+    budget: float,
+) -> dict[str, StreamAllocation]:
+    """
+    Splits a compute budget into frame rates for the streams of a node.
+
+    Every stream first gets its minimum frame rate, scaled down evenly if
+    the minimums alone exceed the budget. The rest of the budget is then
+    shared out in proportion to the priorities, as device time rather than
+    frames, and a stream reaching its maximum frame rate passes its unused
+    share on to the others.
+
+    Args:
+        demands (dict[str, StreamDemand]): The cost per frame, latency,
+            priority and frame rate limits of each stream.
+        budget (float): Device-seconds available per second, e.g. 1.0 for
+            one fully used GPU.
+
+    Returns:
+        dict[str, StreamAllocation]: The frame rate, capture interval,
+            share of the budget, cost and priority of each stream.
+    """
+    costs = {key: max(demand['cost'], 1e-6) for key, demand in demands.items()}
+    # A stream cannot go faster than it processes a frame
+    max_rates = {
+        key: min(
+            demand['max_fps'],
+            1 / demand['latency'] if demand['latency'] > 0 else float('inf'),
+        )
+        for key, demand in demands.items()
+    }
+    min_rates = {
+        key: min(demand['min_fps'], max_rates[key])
+        for key, demand in demands.items()
+    }
+
+    min_load = sum(min_rates[key] * costs[key] for key in demands)
+    scale = min(1.0, budget / min_load) if min_load > 0 else 1.0
+    rates = {key: min_rates[key] * scale for key in demands}
+    remaining = budget - sum(rates[key] * costs[key] for key in demands)
+
+    # Water-fill the remaining budget by priority
+    active = {key for key in demands if rates[key] < max_rates[key]}
+    while remaining > 1e-9 and active:
+        total_priority = sum(demands[key]['priority'] for key in active)
+        saturated = set()
+        for key in active:
+            share = remaining * demands[key]['priority'] / total_priority
+            if rates[key] + share / costs[key] >= max_rates[key]:
+                saturated.add(key)
+        if not saturated:
+            for key in active:
+                share = remaining * demands[key]['priority'] / total_priority
+                rates[key] += share / costs[key]
+            break
+        for key in saturated:
+            remaining -= (max_rates[key] - rates[key]) * costs[key]
+            rates[key] = max_rates[key]
+        active -= saturated
+
+    return {
+        key: {
+            'fps': rates[key],
+            'interval': min(
+                1 / rates[key] if rates[key] > 0 else MAX_INTERVAL,
+                MAX_INTERVAL,
+            ),
+            'share': rates[key] * costs[key] / budget if budget else 0.0,
+            'cost': demands[key]['cost'],
+            'priority': demands[key]['priority'],
+        }
+        for key in demands
+    }
+
+
+class ComputeBudgetScheduler:
+    """
+    Assigns capture intervals to the streams of a node from a shared
+    compute budget.
+
+    Streams report the device time and latency of each frame along with
+    their priority and frame rate limits, and `allocate` turns the reports
+    into capture intervals that keep the device busy without queueing
+    frames. Reports and allocations are kept in mappings that a
+    `multiprocessing.Manager` can share between stream processes.
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        demands: MutableMapping[str, StreamDemand] | None = None,
+        allocations: MutableMapping[str, StreamAllocation] | None = None,
+        smoothing: float = 0.3,
+        stale_after: float = 300.0,
+    ):
+        """
+        Initialises the scheduler.
+
+        Args:
+            budget (float): Device-seconds available per second.
+            demands (MutableMapping[str, StreamDemand] | None): The shared
+                reports of the streams.
+            allocations (MutableMapping[str, StreamAllocation] | None): The
+                shared allocations of the streams.
+            smoothing (float): Weight of a new measurement in the moving
+                averages of cost and latency, between 0 and 1.
+            stale_after (float): Seconds after which a stream that stopped
+                reporting is left out of the allocation.
+
+        Raises:
+            ValueError: If an argument is out of range.
+        """
+        if budget <= 0:
+            raise ValueError('budget must be positive.')
+        if not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be in (0, 1].')
+        self.budget = budget
+        self.demands: MutableMapping[str, StreamDemand] = (
+            demands if demands is not None else {}
+        )
+        self.allocations: MutableMapping[str, StreamAllocation] = (
+            allocations if allocations is not None else {}
+        )
+        self.smoothing = smoothing
+        self.stale_after = stale_after
+
+    def report(
+        self,
+        stream_id: str,
+        cost: float,
+        latency: float,
+        priority: float = 1.0,
+        min_fps: float = 1 / 60,
+        max_fps: float = 1.0,
+    ) -> None:
+        """
+        Records the cost of a processed frame.
+
+        Args:
+            stream_id (str): The stream.
+            cost (float): Seconds of device time the frame took.
+            latency (float): Seconds the stream took to process the frame.
+            priority (float): Weight of the stream in the shared budget.
+            min_fps (float): Frame rate the stream is guaranteed while the
+                budget allows.
+            max_fps (float): Frame rate the stream never exceeds.
+
+        Raises:
+            ValueError: If the priority or frame rates are out of range.
+        """
+        if priority <= 0:
+            raise ValueError('priority must be positive.')
+        if min_fps < 0 or max_fps <= 0 or min_fps > max_fps:
+            raise ValueError('Expected 0 <= min_fps <= max_fps, max_fps > 0.')
+
+        previous = self.demands.get(stream_id)
+        if previous is not None:
+            cost = (
+                self.smoothing * cost
+                + (1 - self.smoothing) * previous['cost']
+            )
+            latency = (
+                self.smoothing * latency
+                + (1 - self.smoothing) * previous['latency']
+            )
+        self.demands[stream_id] = {
+            'cost': cost,
+            'latency': latency,
+            'priority': priority,
+            'min_fps': min_fps,
+            'max_fps': max_fps,
+            'updated_at': time.time(),
+        }
+
+    def unregister(self, stream_id: str) -> None:
+        """
+        Removes a stream from the allocation.
+
+        Args:
+            stream_id (str): The stream.
+        """
+        self.demands.pop(stream_id, None)
+        self.allocations.pop(stream_id, None)
+
+    def allocate(self) -> dict[str, StreamAllocation]:
+        """
+        Recomputes the allocation of every stream that is still reporting.
+
+        Returns:
+            dict[str, StreamAllocation]: The allocation of each stream.
+        """
+        now = time.time()
+        demands = {
+            key: demand for key, demand in dict(self.demands).items()
+            if now - demand['updated_at'] < self.stale_after
+        }
+        for key in set(self.demands.keys()) - set(demands):
+            self.unregister(key)
+
+        allocations = compute_allocations(demands, self.budget)
+        self.allocations.update(allocations)
+        for key in set(self.allocations.keys()) - set(allocations):
+            self.allocations.pop(key, None)
+        return allocations
+
+    def get_interval(self, stream_id: str, default: float) -> float:
+        """
+        Returns the capture interval assigned to a stream.
+
+        Args:
+            stream_id (str): The stream.
+            default (float): The interval used until the stream has been
+                allocated.
+
+        Returns:
+            float: The capture interval in seconds.
+        """
+        allocation = self.allocations.get(stream_id)
+        return allocation['interval'] if allocation else default
+
+    def get_allocations(self) -> dict[str, StreamAllocation]:
+        """
+        Returns the current allocation of every stream.
+
+        Returns:
+            dict[str, StreamAllocation]: The allocation of each stream.
+        """
+        return dict(self.allocations)
+
+    def get_utilisation(self) -> float:
+        """
+        Returns the share of the budget the allocation uses.
+
+        Returns:
+            float: The allocated fraction of the budget.
+        """
+        return sum(
+            allocation['share']
+            for allocation in self.get_allocations().values()
+        )
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import numpy as np
 from shapely.geometry import Polygon
 from sklearn.cluster import HDBSCAN
 
@@ -11,7 +12,14 @@ class DangerDetector:
     A class to detect potential safety hazards based on the detection data.
     """
 
-    def __init__(self, detection_items: dict[str, bool] = {}):
+    #: Supported engines for the classification and pairwise checks.
+    ENGINES = ('python', 'numpy')
+
+    def __init__(
+        self,
+        detection_items: dict[str, bool] = {},
+        engine: str = 'python',
+    ):
         """
         Initialises the danger detector.
 
@@ -24,10 +32,12 @@ class DangerDetector:
                   dangerously close to machinery or vehicles.
                 - 'detect_in_restricted_area': Detect if workers are entering
                   restricted areas.
+            engine (str): The engine used for driver filtering, PPE and
+                proximity checks. 'python' compares detections pair by pair,
+                'numpy' evaluates all pairs as broadcasted matrices.
 
         Raises:
-            ValueError: If the detection_items is not a dictionary or if any
-                of the keys are not strings or values are not booleans.
+            ValueError: If the engine is not supported.
 
         Examples:
             >>> detector = DangerDetector({
@@ -55,6 +65,13 @@ class DangerDetector:
         else:
             self.detection_items = {}
 
+        if engine not in self.ENGINES:
+            raise ValueError(
+                f"Unsupported engine: {engine}. "
+                f"Must be one of {list(self.ENGINES)}.",
+            )
+        self.engine = engine
+
     def detect_danger(
         self,
         datas: list[list[float]],
@@ -91,6 +108,10 @@ class DangerDetector:
         ):
             self.check_restricted_area(datas, warnings, polygons)
 
+        if self.engine == 'numpy':
+            self.detect_danger_vectorised(datas, warnings)
+            return list(warnings), polygons
+
         ############################################################
         # Classify detected objects into different categories
         ############################################################
@@ -148,6 +169,69 @@ class DangerDetector:
 
         return list(warnings), polygons
 
+    def detect_danger_vectorised(
+        self,
+        datas: list[list[float]],
+        warnings: set[str],
+    ) -> None:
+        """
+        Runs driver filtering, PPE and proximity checks on an (N, 6) array.
+
+        Produces the same warnings as the pairwise Python checks, but
+        evaluates every person/object pair as one broadcasted matrix.
+
+        Args:
+            datas (List[List[float]]): Normalised detections.
+            warnings (set[str]): A set to store warning messages.
+        """
+        if not datas:
+            return
+
+        detections = np.asarray(
+            [data[:6] for data in datas], dtype=np.float64,
+        ).reshape(-1, 6)
+        labels = detections[:, 5]
+
+        persons = detections[labels == 5]
+        violations = detections[(labels == 2) | (labels == 4)]
+        machinery_vehicles = detections[(labels == 8) | (labels == 9)]
+
+        # Filter out persons who are likely drivers
+        if len(machinery_vehicles) and len(persons):
+            is_driver = Utils.is_driver_matrix(persons, machinery_vehicles)
+            persons = persons[~is_driver.any(axis=1)]
+
+        if len(violations) and (
+            not self.detection_items or
+                self.detection_items.get(
+                    'detect_no_safety_vest_or_helmet', False,
+                )
+        ):
+            # A violation is reported unless it overlaps some person
+            overlaps = Utils.overlap_percentage_matrix(violations, persons)
+            unmatched = ~(overlaps > 0.5).any(axis=1)
+            unmatched_labels = violations[unmatched, 5]
+            if (unmatched_labels == 2).any():
+                warnings.add('Warning: Someone is not wearing a hardhat!')
+            if (unmatched_labels == 4).any():
+                warnings.add(
+                    'Warning: Someone is not wearing a safety vest!',
+                )
+
+        if len(persons) and len(machinery_vehicles) and (
+            not self.detection_items or
+            self.detection_items.get('detect_near_machinery_or_vehicle', False)
+        ):
+            close = Utils.is_dangerously_close_matrix(
+                persons, machinery_vehicles, machinery_vehicles[:, 5],
+            )
+            # Each person only reports the first object they are close to
+            close_rows = close.any(axis=1)
+            first_close = close[close_rows].argmax(axis=1)
+            for label in np.unique(machinery_vehicles[first_close, 5]):
+                name = 'machinery' if label == 8 else 'vehicle'
+                warnings.add(f"Warning: Someone is too close to {name}!")
+
     def check_restricted_area(
         self,
         datas: list[list[float]],
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+from typing import Any
+from typing import TypedDict
+
+import cv2
+import numpy as np
+
+from src.label_postprocessing import iou_matrix
+
+#: Weights of the position and velocity noise relative to the box height.
+POSITION_NOISE = 1 / 20
+VELOCITY_NOISE = 1 / 160
+
+
+class TrackerStats(TypedDict):
+    frames: int
+    detections: int
+    interval: int
+    tracks: int
+
+
+class KalmanBoxTrack:
+    """
+    A box moving at constant velocity, filtered with a Kalman filter.
+
+    The state is the centre, width and height of the box and their
+    velocities in pixels per frame. The noise scales with the box height,
+    so near and far objects are tracked alike.
+    """
+
+    #: Transition of one frame: positions move by their velocities.
+    TRANSITION = np.eye(8) + np.eye(8, k=4)
+    #: Measurement of the centre, width and height.
+    MEASUREMENT = np.eye(4, 8)
+
+    def __init__(self, track_id: int, data: list[float]):
+        """
+        Starts a track at a detection.
+
+        Args:
+            track_id (int): The identifier of the track.
+            data (list[float]): The detection [x1, y1, x2, y2, confidence,
+                class].
+        """
+        self.track_id = track_id
+        self.label = data[5]
+        self.confidence = float(data[4])
+        self.misses = 0
+        self.frames_since_update = 0
+
+        measurement = self.to_measurement(data)
+        self.state = np.concatenate([measurement, np.zeros(4)])
+        height = max(measurement[3], 1.0)
+        std = np.array(
+            [2 * POSITION_NOISE * height] * 4
+            + [10 * VELOCITY_NOISE * height] * 4,
+        )
+        self.covariance = np.diag(std ** 2)
+
+    @staticmethod
+    def to_measurement(data: list[float]) -> np.ndarray:
+        """
+        Converts a box to its centre, width and height.
+
+        Args:
+            data (list[float]): The box [x1, y1, x2, y2, ...].
+
+        Returns:
+            np.ndarray: The measurement [cx, cy, w, h].
+        """
+        x1, y1, x2, y2 = (float(value) for value in data[:4])
+        return np.array(
+            [(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1],
+        )
+
+    @property
+    def box(self) -> list[float]:
+        """
+        The current box [x1, y1, x2, y2].
+        """
+        cx, cy, w, h = (float(value) for value in self.state[:4])
+        w, h = max(w, 0.0), max(h, 0.0)
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+    @property
+    def speed(self) -> float:
+        """
+        The speed of the centre in box heights per frame.
+        """
+        return float(
+            np.hypot(self.state[4], self.state[5])
+            / max(self.state[3], 1.0),
+        )
+
+    def predict(self) -> None:
+        """
+        Moves the track one frame forward.
+        """
+        height = max(self.state[3], 1.0)
+        std = np.array(
+            [POSITION_NOISE * height] * 4 + [VELOCITY_NOISE * height] * 4,
+        )
+        self.state = self.TRANSITION @ self.state
+        self.covariance = (
+            self.TRANSITION @ self.covariance @ self.TRANSITION.T
+            + np.diag(std ** 2)
+        )
+        self.frames_since_update += 1
+
+    def update(self, data: list[float]) -> None:
+        """
+        Corrects the track with a matched detection.
+
+        Args:
+            data (list[float]): The detection [x1, y1, x2, y2, confidence,
+                class].
+        """
+        height = max(self.state[3], 1.0)
+        noise = np.diag([(POSITION_NOISE * height) ** 2] * 4)
+        projected = self.MEASUREMENT @ self.covariance @ self.MEASUREMENT.T
+        gain = np.linalg.solve(
+            projected + noise, self.MEASUREMENT @ self.covariance,
+        ).T
+        innovation = self.to_measurement(data) - self.MEASUREMENT @ self.state
+        self.state = self.state + gain @ innovation
+        self.covariance = (
+            np.eye(8) - gain @ self.MEASUREMENT
+        ) @ self.covariance
+        self.confidence = float(data[4])
+        self.misses = 0
+        self.frames_since_update = 0
+
+
+class DetectionTracker:
+    """
+    Runs full detection every K frames and tracks boxes in between.
+
+    Detections are associated with tracks by IoU, and a Kalman filter per
+    track moves its box forward on the frames without detection. K adapts
+    after each detection: it grows by one while the predicted boxes still
+    match the detections and objects move slowly, and halves when they do
+    not. Detection also runs early if the scene changes, e.g. someone
+    walks in, or if the confidence of the tracks decays too far.
+    """
+
+    def __init__(
+        self,
+        min_interval: int = 1,
+        max_interval: int = 8,
+        iou_threshold: float = 0.3,
+        target_iou: float = 0.6,
+        max_drift: float = 0.5,
+        max_misses: int = 1,
+        confidence_decay: float = 0.95,
+        min_confidence: float = 0.3,
+        scene_change: float = 0.04,
+    ):
+        """
+        Initialises the tracker.
+
+        Args:
+            min_interval (int): The smallest K, in frames.
+            max_interval (int): The largest K, in frames.
+            iou_threshold (float): The smallest IoU of a predicted box and
+                a detection of the same class to match them.
+            target_iou (float): The mean IoU of matched predictions below
+                which K halves.
+            max_drift (float): Box heights an object may move between
+                detections, which caps K for fast objects.
+            max_misses (int): Detections in a row a track may be missing
+                from before it is dropped.
+            confidence_decay (float): Factor applied per frame to the
+                confidence of tracked boxes.
+            min_confidence (float): Tracked confidence below which
+                detection runs early.
+            scene_change (float): Mean absolute difference, from 0 to 1,
+                from the frame of the last detection above which
+                detection runs early.
+
+        Raises:
+            ValueError: If the interval range is invalid.
+        """
+        if not 1 <= min_interval <= max_interval:
+            raise ValueError(
+                'Intervals must satisfy 1 <= min_interval <= max_interval.',
+            )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.iou_threshold = iou_threshold
+        self.target_iou = target_iou
+        self.max_drift = max_drift
+        self.max_misses = max_misses
+        self.confidence_decay = confidence_decay
+        self.min_confidence = min_confidence
+        self.scene_change = scene_change
+
+        self.tracks: list[KalmanBoxTrack] = []
+        self.next_id = 1
+        self.interval = min_interval
+        self.frames_since_detection = 0
+        self.reference: np.ndarray | None = None
+        self.frames = 0
+        self.detections = 0
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None) -> DetectionTracker:
+        """
+        Builds a tracker from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any] | None): The `tracking` entry, e.g.
+                {"max_interval": 5, "scene_change": 0.03}.
+
+        Returns:
+            DetectionTracker: The configured tracker.
+        """
+        return cls(**(config or {}))
+
+    @staticmethod
+    def thumbnail(frame: np.ndarray) -> np.ndarray:
+        """
+        Shrinks a frame to a small greyscale image to measure change.
+
+        Args:
+            frame (np.ndarray): The BGR frame.
+
+        Returns:
+            np.ndarray: A 64 x 36 float image from 0 to 1.
+        """
+        grey = (
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if frame.ndim == 3
+            else frame
+        )
+        small = cv2.resize(grey, (64, 36), interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32) / 255
+
+    def propagate(self, frame: np.ndarray) -> list[list[float]] | None:
+        """
+        Moves the tracks onto a frame, unless it needs detection.
+
+        Args:
+            frame (np.ndarray): The frame.
+
+        Returns:
+            list[list[float]] | None: The tracked boxes as [x1, y1, x2, y2,
+                confidence, class, track_id], or None if the frame should
+                go through full detection and `update`.
+        """
+        self.frames += 1
+        if (
+            self.reference is None
+            or self.frames_since_detection + 1 >= self.interval
+        ):
+            return None
+        change = float(
+            np.mean(np.abs(self.thumbnail(frame) - self.reference)),
+        )
+        decay = self.confidence_decay ** (self.frames_since_detection + 1)
+        if change > self.scene_change or any(
+            track.confidence * decay < self.min_confidence
+            for track in self.tracks
+        ):
+            return None
+
+        self.frames_since_detection += 1
+        datas = []
+        for track in self.tracks:
+            track.predict()
+            if track.misses:
+                continue
+            datas.append(
+                track.box
+                + [track.confidence * decay, track.label, track.track_id],
+            )
+        return datas
+
+    def update(
+        self,
+        frame: np.ndarray,
+        datas: list[list[float]],
+    ) -> list[list[float]]:
+        """
+        Associates a full detection with the tracks and adapts K.
+
+        Args:
+            frame (np.ndarray): The frame that was detected.
+            datas (list[list[float]]): Its detections of [x1, y1, x2, y2,
+                confidence, class].
+
+        Returns:
+            list[list[float]]: The detections with the identifier of their
+                track appended.
+        """
+        self.detections += 1
+        steps = self.frames_since_detection + 1
+        for track in self.tracks:
+            # Catch up to this frame from the last one tracked
+            for _ in range(steps - track.frames_since_update):
+                track.predict()
+
+        matches = self.associate(datas)
+        matched_ious = []
+        tracked = []
+        for index, data in enumerate(datas):
+            if index in matches:
+                track, iou = matches[index]
+                track.update(data)
+                matched_ious.append(iou)
+            else:
+                track = KalmanBoxTrack(self.next_id, data)
+                self.next_id += 1
+                self.tracks.append(track)
+            tracked.append(list(data[:6]) + [track.track_id])
+
+        matched_tracks = {id(track) for track, _ in matches.values()}
+        for track in self.tracks:
+            if id(track) not in matched_tracks and track.frames_since_update:
+                track.misses += 1
+        self.tracks = [
+            track for track in self.tracks if track.misses <= self.max_misses
+        ]
+        for track in self.tracks:
+            track.frames_since_update = 0
+
+        self.adapt_interval(matched_ious, len(datas) - len(matches))
+        self.reference = self.thumbnail(frame)
+        self.frames_since_detection = 0
+        return tracked
+
+    def associate(
+        self,
+        datas: list[list[float]],
+    ) -> dict[int, tuple[KalmanBoxTrack, float]]:
+        """
+        Matches detections to tracks of the same class, best IoU first.
+
+        Args:
+            datas (list[list[float]]): The detections.
+
+        Returns:
+            dict[int, tuple[KalmanBoxTrack, float]]: The track and IoU of
+                each matched detection index.
+        """
+        if not datas or not self.tracks:
+            return {}
+        ious = iou_matrix(
+            np.asarray([data[:4] for data in datas], dtype=np.float64),
+            np.asarray([track.box for track in self.tracks]),
+        )
+        labels = np.asarray([data[5] for data in datas])
+        track_labels = np.asarray([track.label for track in self.tracks])
+        ious[labels[:, None] != track_labels[None, :]] = 0
+
+        matches: dict[int, tuple[KalmanBoxTrack, float]] = {}
+        used: set[int] = set()
+        for flat in np.argsort(-ious, axis=None):
+            row, column = np.unravel_index(flat, ious.shape)
+            iou = float(ious[row, column])
+            if iou < self.iou_threshold:
+                break
+            if row in matches or column in used:
+                continue
+            matches[int(row)] = (self.tracks[column], iou)
+            used.add(int(column))
+        return matches
+
+    def adapt_interval(
+        self,
+        matched_ious: list[float],
+        new_tracks: int,
+    ) -> None:
+        """
+        Sets K from how well the tracks predicted the detection.
+
+        Args:
+            matched_ious (list[float]): IoUs of predicted boxes with their
+                detections.
+            new_tracks (int): Detections that matched no track.
+        """
+        if (matched_ious and np.mean(matched_ious) < self.target_iou) or (
+            new_tracks and self.frames_since_detection
+        ):
+            self.interval = max(self.min_interval, self.interval // 2)
+            return
+
+        # Fast objects may only drift max_drift box heights between
+        # detections
+        limit = self.max_interval
+        speed = max((track.speed for track in self.tracks), default=0.0)
+        if speed > 0:
+            limit = int(np.clip(self.max_drift / speed, 1, limit))
+        self.interval = max(
+            self.min_interval, min(self.interval + 1, limit),
+        )
+
+    def get_stats(self) -> TrackerStats:
+        """
+        Returns the frames seen, frames detected, current K and tracks.
+
+        Returns:
+            TrackerStats: The tracker statistics.
+        """
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'interval': self.interval,
+            'tracks': len(self.tracks),
+        }
@@ -184,7 +184,7 @@ class DrawingManager:
 
         # Draw the detections on the frame
         for data in datas:
-            x1, y1, x2, y2, _, label_id = data
+            x1, y1, x2, y2, _, label_id = data[:6]
             label_id = int(label_id)
             if label_id in category_id_to_name:
                 label = category_id_to_name[label_id]
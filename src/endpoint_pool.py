@@ -0,0 +1,458 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Sequence
+from typing import Any
+from typing import TypedDict
+from typing import TypeVar
+
+import aiohttp
+
+T = TypeVar('T')
+
+#: Ways of picking the endpoint of a request.
+SELECTION_STRATEGIES = ('least_outstanding', 'latency')
+
+
+class NoEndpointAvailableError(aiohttp.ClientConnectionError):
+    """
+    Raised when the circuit breakers of all endpoints are open.
+    """
+
+
+class EndpointStats(TypedDict):
+    url: str
+    state: str
+    outstanding: int
+    latency: float | None
+    requests: int
+    failures: int
+
+
+class EndpointPoolStats(TypedDict):
+    endpoints: list[EndpointStats]
+    retries: int
+    hedges: int
+
+
+class Endpoint:
+    """
+    A detection server with its load, latency and circuit breaker.
+    """
+
+    def __init__(self, url: str):
+        """
+        Initialises the endpoint.
+
+        Args:
+            url (str): The base URL of the server.
+        """
+        url = url if url.startswith('http') else f"http://{url}"
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.latency: float | None = None
+        self.requests = 0
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        """
+        The state of the circuit breaker: closed, open or half-open.
+        """
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.probing else 'open'
+
+
+class EndpointPool:
+    """
+    Spreads detection requests over several servers.
+
+    Each request goes to the endpoint with the fewest requests in flight,
+    or with the lowest expected wait from its measured latency. After
+    `failure_threshold` failures in a row the circuit breaker of an
+    endpoint opens and it gets no requests for `reset_timeout` seconds,
+    after which a single probe request decides whether it closes again.
+    Requests still running after the `hedge_percentile` of recent
+    latencies are hedged to a second endpoint and the first response wins.
+    Failed requests are retried on other endpoints at most `max_retries`
+    times.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        strategy: str = 'least_outstanding',
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        hedge_percentile: float | None = None,
+        hedge_min_samples: int = 20,
+        max_retries: int = 2,
+        latency_window: int = 200,
+        latency_smoothing: float = 0.3,
+        request_timeout: float = 30.0,
+    ):
+        """
+        Initialises the pool.
+
+        Args:
+            urls (Sequence[str]): The base URLs of the detection servers.
+            strategy (str): 'least_outstanding' or 'latency'.
+            failure_threshold (int): Failures in a row that open the
+                circuit breaker of an endpoint.
+            reset_timeout (float): Seconds an open circuit breaker waits
+                before letting a probe request through.
+            hedge_percentile (float | None): The percentile of recent
+                latencies, from 0 to 1, after which a request is also sent
+                to a second endpoint. None disables hedging.
+            hedge_min_samples (int): Latencies to measure before hedging.
+            max_retries (int): Retries of a failed request.
+            latency_window (int): Recent latencies kept for the hedging
+                percentile.
+            latency_smoothing (float): Weight of the newest latency in the
+                moving average of each endpoint.
+            request_timeout (float): Seconds after which a request counts
+                as a failure of its endpoint.
+
+        Raises:
+            ValueError: If there are no URLs or an argument is invalid.
+        """
+        if not urls:
+            raise ValueError('At least one endpoint URL is required.')
+        if strategy not in SELECTION_STRATEGIES:
+            raise ValueError(
+                f"Unsupported selection strategy '{strategy}'. "
+                f"Expected one of {SELECTION_STRATEGIES}.",
+            )
+        if hedge_percentile is not None and not 0 < hedge_percentile < 1:
+            raise ValueError('hedge_percentile must be between 0 and 1.')
+        if request_timeout <= 0:
+            raise ValueError('request_timeout must be positive.')
+        if failure_threshold < 1 or max_retries < 0:
+            raise ValueError(
+                'failure_threshold must be positive and max_retries must '
+                'not be negative.',
+            )
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_retries = max_retries
+        self.latency_smoothing = latency_smoothing
+        self.request_timeout = request_timeout
+        self.latencies: deque[float] = deque(maxlen=latency_window)
+        self.next_index = 0
+        self.retries = 0
+        self.hedges = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict[str, Any] | None,
+        default_url: str,
+    ) -> EndpointPool:
+        """
+        Builds a pool from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any] | None): The `endpoints` entry, e.g.
+                {"urls": ["http://a:8000", "http://b:8000"],
+                "hedge_percentile": 0.95}.
+            default_url (str): The URL used if the entry has none.
+
+        Returns:
+            EndpointPool: The configured pool.
+        """
+        config = dict(config or {})
+        urls = config.pop('urls', None) or [default_url]
+        return cls(urls, **config)
+
+    @staticmethod
+    def is_endpoint_failure(exc: BaseException) -> bool:
+        """
+        Checks whether an error is the fault of the endpoint.
+
+        Connection errors, timeouts, server errors and throttling count
+        against the endpoint and are retried elsewhere. Other client
+        errors, e.g. a rejected request, would fail on any endpoint.
+
+        Args:
+            exc (BaseException): The error of a request.
+
+        Returns:
+            bool: True if the request may succeed on another endpoint.
+        """
+        if isinstance(exc, NoEndpointAvailableError):
+            return False
+        if isinstance(exc, aiohttp.ClientResponseError):
+            return exc.status >= 500 or exc.status == 429
+        return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    def is_available(self, endpoint: Endpoint, now: float) -> bool:
+        """
+        Checks whether the circuit breaker lets a request through.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+            now (float): The current monotonic time.
+
+        Returns:
+            bool: True if closed, or open long enough for a probe.
+        """
+        if endpoint.opened_at is None:
+            return True
+        return (
+            not endpoint.probing
+            and now - endpoint.opened_at >= self.reset_timeout
+        )
+
+    def choose(self, exclude: Sequence[Endpoint] = ()) -> Endpoint | None:
+        """
+        Picks the endpoint of the next request.
+
+        Ties go round-robin, so idle endpoints share the requests.
+
+        Args:
+            exclude (Sequence[Endpoint]): Endpoints to leave out, e.g. those
+                already tried.
+
+        Returns:
+            Endpoint | None: The endpoint, or None if the circuit breakers
+                of all other endpoints are open.
+        """
+        now = time.monotonic()
+        count = len(self.endpoints)
+        ordered = [
+            self.endpoints[(self.next_index + offset) % count]
+            for offset in range(count)
+        ]
+        available = [e for e in ordered if self.is_available(e, now)]
+        candidates = [e for e in available if e not in exclude]
+        if not candidates:
+            return None
+
+        if self.strategy == 'latency':
+            # Expected wait behind the requests already in flight
+            endpoint = min(
+                candidates,
+                key=lambda e: (e.latency or 0.0) * (e.outstanding + 1),
+            )
+        else:
+            endpoint = min(
+                candidates,
+                key=lambda e: (e.outstanding, e.latency or 0.0),
+            )
+        self.next_index = (self.endpoints.index(endpoint) + 1) % count
+        if endpoint.opened_at is not None:
+            endpoint.probing = True
+        return endpoint
+
+    def record_success(self, endpoint: Endpoint, latency: float) -> None:
+        """
+        Closes the circuit breaker and records the latency of a request.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+            latency (float): The latency of the request in seconds.
+        """
+        endpoint.failures = 0
+        endpoint.opened_at = None
+        endpoint.probing = False
+        endpoint.latency = (
+            latency
+            if endpoint.latency is None
+            else self.latency_smoothing * latency
+            + (1 - self.latency_smoothing) * endpoint.latency
+        )
+        self.latencies.append(latency)
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        """
+        Counts a failure, opening the circuit breaker if needed.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+        """
+        endpoint.failures += 1
+        if endpoint.probing or endpoint.failures >= self.failure_threshold:
+            endpoint.opened_at = time.monotonic()
+        endpoint.probing = False
+
+    def hedge_delay(self) -> float | None:
+        """
+        Returns how long to wait before hedging a request.
+
+        Returns:
+            float | None: The latency percentile in seconds, or None if
+                hedging is off or not enough latencies were measured.
+        """
+        if (
+            self.hedge_percentile is None
+            or len(self.endpoints) < 2
+            or len(self.latencies) < self.hedge_min_samples
+        ):
+            return None
+        latencies = sorted(self.latencies)
+        index = min(
+            len(latencies) - 1, int(self.hedge_percentile * len(latencies)),
+        )
+        return latencies[index]
+
+    async def call(
+        self,
+        endpoint: Endpoint,
+        send: Callable[[Endpoint], Awaitable[T]],
+    ) -> T:
+        """
+        Sends one request to an endpoint and records the outcome.
+
+        A request still running after `request_timeout` is cancelled, so
+        a stalled endpoint counts as failed instead of holding the stream.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+            send (Callable[[Endpoint], Awaitable[T]]): Sends the request.
+
+        Returns:
+            T: The result of the request.
+        """
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                send(endpoint), self.request_timeout,
+            )
+        except asyncio.CancelledError:
+            # A hedge lost the race, which says nothing of the endpoint
+            endpoint.probing = False
+            raise
+        except Exception as exc:
+            if self.is_endpoint_failure(exc):
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint, time.perf_counter() - start)
+            return result
+        finally:
+            endpoint.outstanding -= 1
+
+    async def request(self, send: Callable[[Endpoint], Awaitable[T]]) -> T:
+        """
+        Sends a request through the pool with hedging and retries.
+
+        Args:
+            send (Callable[[Endpoint], Awaitable[T]]): Sends the request to
+                the given endpoint. It is called again for retries and
+                hedges, so it must build a new request each time.
+
+        Returns:
+            T: The first successful result.
+
+        Raises:
+            NoEndpointAvailableError: If all circuit breakers are open.
+            Exception: The error of the last attempt, or any error that is
+                not the fault of the endpoint.
+        """
+        tried: list[Endpoint] = []
+        attempt = 0
+        while True:
+            try:
+                return await self.request_once(send, tried)
+            except Exception as exc:
+                if (
+                    not self.is_endpoint_failure(exc)
+                    or attempt >= self.max_retries
+                ):
+                    raise
+            attempt += 1
+            self.retries += 1
+
+    async def request_once(
+        self,
+        send: Callable[[Endpoint], Awaitable[T]],
+        tried: list[Endpoint],
+    ) -> T:
+        """
+        Sends one attempt of a request, hedged if it is slow.
+
+        Args:
+            send (Callable[[Endpoint], Awaitable[T]]): Sends the request.
+            tried (list[Endpoint]): Endpoints tried by earlier attempts,
+                extended with those of this one.
+
+        Returns:
+            T: The first successful result.
+        """
+        # Prefer endpoints not tried yet, but retry one if it is the last
+        endpoint = self.choose(exclude=tried) or self.choose()
+        if endpoint is None:
+            raise NoEndpointAvailableError(
+                'The circuit breakers of all detection endpoints are open.',
+            )
+        tried.append(endpoint)
+        pending = {asyncio.ensure_future(self.call(endpoint, send))}
+        delay = self.hedge_delay()
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Hedge the slow request to another endpoint
+                    delay = None
+                    backup = self.choose(exclude=tried)
+                    if backup is not None:
+                        tried.append(backup)
+                        self.hedges += 1
+                        pending.add(
+                            asyncio.ensure_future(self.call(backup, send)),
+                        )
+                    continue
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        return task.result()
+                    if not self.is_endpoint_failure(exc):
+                        raise exc
+                    error = exc
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is None:
+            raise RuntimeError('The request ended without any response.')
+        raise error
+
+    def get_stats(self) -> EndpointPoolStats:
+        """
+        Returns the state, load and latency of each endpoint.
+
+        Returns:
+            EndpointPoolStats: The endpoints, retries and hedges.
+        """
+        return {
+            'endpoints': [
+                {
+                    'url': endpoint.url,
+                    'state': endpoint.state,
+                    'outstanding': endpoint.outstanding,
+                    'latency': endpoint.latency,
+                    'requests': endpoint.requests,
+                    'failures': endpoint.failures,
+                }
+                for endpoint in self.endpoints
+            ],
+            'retries': self.retries,
+            'hedges': self.hedges,
+        }
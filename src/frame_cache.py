@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any
+from typing import TypedDict
+
+import cv2
+import numpy as np
+
+
+class FrameCacheStats(TypedDict):
+    hits: int
+    misses: int
+    hit_rate: float
+    identical_frames: int
+    frozen: bool
+
+
+def fingerprint_frame(frame: np.ndarray, hash_size: int = 16) -> int:
+    """
+    Computes a difference hash of a frame.
+
+    The frame is shrunk to (hash_size + 1) x hash_size grey pixels and
+    each bit records whether a pixel is brighter than its right-hand
+    neighbour, so the hash follows the layout of the scene rather than
+    its exact pixel values, noise or compression artefacts.
+
+    Args:
+        frame (np.ndarray): The BGR or greyscale frame.
+        hash_size (int): The number of rows, and of bits per row.
+
+    Returns:
+        int: The hash of hash_size * hash_size bits.
+    """
+    grey = (
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    )
+    small = cv2.resize(
+        grey, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA,
+    )
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class FrameCache:
+    """
+    Reuses the results of a stream for frames that are effectively the
+    same as the last processed one.
+
+    Frames are compared by the Hamming distance of their difference hash
+    with the frame the cached results came from, so a static scene or a
+    frozen camera is not run through detection again. Cached results
+    expire after `max_age` seconds, so slow changes that keep the hash are
+    still picked up, unless the camera is frozen: once `frozen_after`
+    consecutive frames are byte for byte the same, the encoder is taken to
+    have hung and nothing can change until it recovers.
+    """
+
+    def __init__(
+        self,
+        hash_size: int = 16,
+        max_distance: int = 4,
+        max_age: float = 60.0,
+        frozen_after: int = 10,
+    ):
+        """
+        Initialises the cache.
+
+        Args:
+            hash_size (int): The side of the difference hash, giving
+                hash_size ** 2 bits.
+            max_distance (int): The most hash bits a frame may differ by
+                and still reuse the cached results.
+            max_age (float): Seconds of stream time after which cached
+                results are recomputed.
+            frozen_after (int): Consecutive identical frames after which
+                the camera is reported frozen.
+
+        Raises:
+            ValueError: If an argument is out of range.
+        """
+        if hash_size < 2:
+            raise ValueError('hash_size must be at least 2.')
+        if max_distance < 0 or max_age < 0:
+            raise ValueError('max_distance and max_age must not be negative.')
+        if frozen_after < 1:
+            raise ValueError('frozen_after must be at least 1.')
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.frozen_after = frozen_after
+
+        self.value: Any = None
+        self.value_hash: int | None = None
+        self.value_time = 0.0
+        self.last_hash: int | None = None
+        self.last_checksum: int | None = None
+        self.identical_frames = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None) -> FrameCache:
+        """
+        Builds a cache from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any] | None): The `frame_cache` entry, e.g.
+                {"max_distance": 2, "frozen_after": 30}.
+
+        Returns:
+            FrameCache: The configured cache.
+        """
+        return cls(**(config or {}))
+
+    @property
+    def frozen(self) -> bool:
+        """
+        Whether the last `frozen_after` frames were all identical.
+        """
+        return self.identical_frames >= self.frozen_after
+
+    def lookup(self, frame: np.ndarray, timestamp: float) -> Any:
+        """
+        Returns the cached results if the frame can reuse them.
+
+        Every frame passed here counts towards the frozen camera signal
+        and the hit and miss counters. After a miss, the results of the
+        frame are expected through `store`.
+
+        Args:
+            frame (np.ndarray): The frame.
+            timestamp (float): The time of the frame in seconds.
+
+        Returns:
+            Any: The cached results, or None if the frame must be
+                processed.
+        """
+        checksum = zlib.crc32(np.ascontiguousarray(frame))
+        if checksum == self.last_checksum:
+            self.identical_frames += 1
+        else:
+            self.identical_frames = 0
+        self.last_checksum = checksum
+        self.last_hash = fingerprint_frame(frame, self.hash_size)
+
+        if (
+            self.value is not None
+            and self.value_hash is not None
+            and (self.last_hash ^ self.value_hash).bit_count()
+            <= self.max_distance
+            and (self.frozen or timestamp - self.value_time < self.max_age)
+        ):
+            self.hits += 1
+            return self.value
+        self.misses += 1
+        return None
+
+    def store(self, value: Any, timestamp: float) -> None:
+        """
+        Caches the results of the frame last passed to `lookup`.
+
+        Args:
+            value (Any): The results to reuse.
+            timestamp (float): The time of the frame in seconds.
+        """
+        self.value = value
+        self.value_hash = self.last_hash
+        self.value_time = timestamp
+
+    def get_stats(self) -> FrameCacheStats:
+        """
+        Returns the hit and miss counters and the frozen camera signal.
+
+        Returns:
+            FrameCacheStats: Hits, misses, hit rate, consecutive identical
+                frames and whether the camera is frozen.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'identical_frames': self.identical_frames,
+            'frozen': self.frozen,
+        }
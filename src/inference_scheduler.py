@@ -0,0 +1,560 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from multiprocessing.managers import SyncManager
+from typing import Any
+from typing import TypedDict
+
+import numpy as np
+
+from src.cascade_detector import CascadeDetector
+from src.live_stream_detection import LiveStreamDetector
+from src.tile_slicer import TileSlicer
+
+#: The number of streams whose slicing and cascade state a worker keeps.
+MAX_STREAM_SLICERS = 64
+
+
+class InferenceRequest(TypedDict):
+    request_id: int
+    stream_id: str
+    model_key: str
+    frame: np.ndarray
+    submitted_at: float
+    response_queue: Any
+    slicing: dict[str, Any] | None
+    model_backend: str
+    cascade: dict[str, Any] | None
+
+
+class InferenceResponse(TypedDict):
+    request_id: int
+    datas: list[list[float]] | None
+    error: str | None
+    queue_time: float
+    inference_time: float
+    batch_size: int
+
+
+def default_detector_factory(
+    model_key: str,
+    model_backend: str = 'torch',
+    num_threads: int | None = None,
+) -> LiveStreamDetector:
+    """
+    Builds the local detector that owns the weights for a model key.
+
+    Args:
+        model_key (str): The model key, e.g. 'yolo11n'.
+        model_backend (str): The backend the model runs on.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
+
+    Returns:
+        LiveStreamDetector: A detector running inference locally.
+    """
+    return LiveStreamDetector(
+        model_key=model_key,
+        detect_with_server=False,
+        model_backend=model_backend,
+        num_threads=num_threads,
+    )
+
+
+def collect_batch(
+    request_queue: Any,
+    max_batch_size: int,
+    max_wait_ms: float,
+) -> list[InferenceRequest] | None:
+    """
+    Pulls a micro-batch of requests from the shared queue.
+
+    Blocks until the first request arrives, then keeps collecting until
+    either `max_batch_size` requests are gathered or `max_wait_ms` has
+    passed since the first one.
+
+    Args:
+        request_queue (Any): The shared request queue.
+        max_batch_size (int): The maximum number of requests per batch.
+        max_wait_ms (float): The maximum time to wait for a full batch.
+
+    Returns:
+        list[InferenceRequest] | None: The batch, or None if the scheduler
+            asked the worker to stop.
+    """
+    first = request_queue.get()
+    if first is None:
+        return None
+
+    batch: list[InferenceRequest] = [first]
+    deadline = time.monotonic() + max_wait_ms / 1000
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            request = request_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if request is None:
+            # Put the sentinel back so the worker stops after this batch
+            request_queue.put(None)
+            break
+        batch.append(request)
+    return batch
+
+
+def get_stream_state(
+    states: OrderedDict[str, tuple[Any, Any]],
+    stream_id: str,
+    config: Any,
+    build: Callable[[], Any],
+) -> Any:
+    """
+    Returns the slicer or cascade of a stream, rebuilt for a new config.
+
+    Streams switching model or settings start over, and the least
+    recently used streams are dropped beyond `MAX_STREAM_SLICERS`, so
+    stopped streams do not pile up in a long-lived worker.
+
+    Args:
+        states (OrderedDict[str, tuple[Any, Any]]): The config and state
+            by stream, oldest first.
+        stream_id (str): The stream the state belongs to.
+        config (Any): The model key and settings the state is built for.
+        build (Callable[[], Any]): Builds the state for the config.
+
+    Returns:
+        Any: The state of the stream.
+    """
+    state = states.get(stream_id)
+    if state is None or state[0] != config:
+        state = states[stream_id] = (config, build())
+        while len(states) > MAX_STREAM_SLICERS:
+            states.popitem(last=False)
+    states.move_to_end(stream_id)
+    return state[1]
+
+
+def run_inference_worker(
+    worker_id: int,
+    request_queue: Any,
+    stats: Any,
+    max_batch_size: int,
+    max_wait_ms: float,
+    detector_factory: Callable[[str, str], Any],
+) -> None:
+    """
+    Owns the models and serves micro-batches until told to stop.
+
+    Each model key and backend is loaded once per worker on first use, so
+    memory grows with the number of models rather than the number of
+    cameras.
+
+    Args:
+        worker_id (int): The index of this worker.
+        request_queue (Any): The shared request queue.
+        stats (Any): A shared dictionary for throughput statistics.
+        max_batch_size (int): The maximum number of requests per batch.
+        max_wait_ms (float): The maximum time to wait for a full batch.
+        detector_factory (Callable[[str, str], Any]): Builds a detector
+            with a `generate_detections_local` coroutine for a model key
+            and backend.
+    """
+    logger = logging.getLogger(__name__)
+    loop = asyncio.new_event_loop()
+    detectors: dict[tuple[str, str], Any] = {}
+    # Slicing and cascade state is per stream, while detectors are shared
+    # per model
+    slicers: OrderedDict[str, tuple[Any, TileSlicer]] = OrderedDict()
+    cascades: OrderedDict[str, tuple[Any, CascadeDetector]] = OrderedDict()
+    frames = batches = 0
+    inference_total = 0.0
+
+    try:
+        while True:
+            batch = collect_batch(request_queue, max_batch_size, max_wait_ms)
+            if batch is None:
+                break
+            batch_start = time.time()
+
+            # Group the batch by model so each model runs once per batch
+            groups: dict[tuple[str, str], list[InferenceRequest]] = {}
+            for request in batch:
+                key = (
+                    request['model_key'],
+                    request.get('model_backend', 'torch'),
+                )
+                groups.setdefault(key, []).append(request)
+
+            for key, requests in groups.items():
+                model_key = key[0]
+                try:
+                    if key not in detectors:
+                        detectors[key] = detector_factory(*key)
+                    detector = detectors[key]
+                except Exception as e:
+                    logger.error(f"Failed to load model {model_key}: {e}")
+                    for request in requests:
+                        send_response(
+                            request, None, str(e), batch_start,
+                            0.0, len(batch),
+                        )
+                    continue
+
+                for request in requests:
+                    start = time.time()
+                    datas: list[list[float]] | None = None
+                    error: str | None = None
+                    try:
+                        stream_id = request['stream_id']
+                        kwargs: dict[str, Any] = {}
+                        slicing = request.get('slicing')
+                        if slicing is not None:
+                            kwargs['slicer'] = get_stream_state(
+                                slicers, stream_id, (model_key, slicing),
+                                lambda: TileSlicer.from_config(slicing),
+                            )
+                        cascade = request.get('cascade')
+                        if cascade is not None:
+                            kwargs['cascade'] = get_stream_state(
+                                cascades, stream_id, (model_key, cascade),
+                                lambda: CascadeDetector.from_config(cascade),
+                            )
+                        detection = detector.generate_detections_local(
+                            request['frame'], **kwargs,
+                        )
+                        datas = loop.run_until_complete(detection)
+                    except Exception as e:
+                        logger.error(
+                            f"Inference failed for {request['stream_id']}: "
+                            f"{e}",
+                        )
+                        error = str(e)
+                    inference_time = time.time() - start
+                    inference_total += inference_time
+                    send_response(
+                        request, datas, error, batch_start,
+                        inference_time, len(batch),
+                    )
+
+            frames += len(batch)
+            batches += 1
+            stats[worker_id] = {
+                'frames': frames,
+                'batches': batches,
+                'inference_time': inference_total,
+            }
+    finally:
+        loop.close()
+
+
+def send_response(
+    request: InferenceRequest,
+    datas: list[list[float]] | None,
+    error: str | None,
+    batch_start: float,
+    inference_time: float,
+    batch_size: int,
+) -> None:
+    """
+    Sends the result of a request back to its stream's pipeline.
+
+    Args:
+        request (InferenceRequest): The request being answered.
+        datas (list[list[float]] | None): The detections, if any.
+        error (str | None): The error message if inference failed.
+        batch_start (float): When the batch started processing.
+        inference_time (float): Seconds spent on inference.
+        batch_size (int): The size of the batch the request was part of.
+    """
+    response: InferenceResponse = {
+        'request_id': request['request_id'],
+        'datas': datas,
+        'error': error,
+        'queue_time': max(0.0, batch_start - request['submitted_at']),
+        'inference_time': inference_time,
+        'batch_size': batch_size,
+    }
+    try:
+        request['response_queue'].put(response)
+    except Exception as e:
+        # The stream may have been stopped while its frame was in flight
+        logging.getLogger(__name__).warning(
+            f"Dropped response for {request['stream_id']}: {e}",
+        )
+
+
+class SchedulerClient:
+    """
+    Stream-side handle that submits frames to the inference scheduler.
+
+    Exposes the same `generate_detections` coroutine as
+    `LiveStreamDetector`, so it can be used as a drop-in replacement in a
+    stream's pipeline.
+    """
+
+    def __init__(
+        self,
+        stream_id: str,
+        model_key: str,
+        request_queue: Any,
+        response_queue: Any,
+        timeout: float = 60.0,
+        slicing: dict[str, Any] | None = None,
+        model_backend: str = 'torch',
+        cascade: dict[str, Any] | None = None,
+    ):
+        """
+        Initialises the client for a single stream.
+
+        Args:
+            stream_id (str): The identifier of the stream.
+            model_key (str): The model key used for detection.
+            request_queue (Any): The scheduler's shared request queue.
+            response_queue (Any): This stream's response queue.
+            timeout (float): Seconds to wait for a result.
+            slicing (dict[str, Any] | None): The slicing configuration of
+                the stream, see `TileSlicer.from_config`.
+            model_backend (str): The backend the model runs on.
+            cascade (dict[str, Any] | None): The cascade configuration of
+                the stream, see `CascadeDetector.from_config`.
+        """
+        self.stream_id = stream_id
+        self.model_key = model_key
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.timeout = timeout
+        self.slicing = slicing
+        self.model_backend = model_backend
+        self.cascade = cascade
+        self.request_ids = itertools.count()
+        self.last_response: InferenceResponse | None = None
+
+    def set_model_key(self, model_key: str) -> None:
+        """
+        Switches the frames of the stream to another model.
+
+        Args:
+            model_key (str): The model key to detect with.
+        """
+        self.model_key = model_key
+
+    async def generate_detections(
+        self,
+        frame: np.ndarray,
+    ) -> tuple[list[list[float]], np.ndarray]:
+        """
+        Submits a frame to the scheduler and waits for its detections.
+
+        Args:
+            frame (np.ndarray): The frame to detect objects in.
+
+        Returns:
+            tuple[list[list[float]], np.ndarray]:
+                Detections and original frame.
+
+        Raises:
+            TimeoutError: If no result arrives within the timeout.
+            RuntimeError: If inference failed in the scheduler.
+        """
+        request_id = next(self.request_ids)
+        request: InferenceRequest = {
+            'request_id': request_id,
+            'stream_id': self.stream_id,
+            'model_key': self.model_key,
+            'frame': frame,
+            'submitted_at': time.time(),
+            'response_queue': self.response_queue,
+            'slicing': self.slicing,
+            'model_backend': self.model_backend,
+            'cascade': self.cascade,
+        }
+        self.request_queue.put(request)
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"No detection result for {self.stream_id} "
+                    f"within {self.timeout}s",
+                )
+            try:
+                response: InferenceResponse = await asyncio.to_thread(
+                    self.response_queue.get, True, remaining,
+                )
+            except queue.Empty:
+                continue
+
+            # Skip results of earlier requests that timed out
+            if response['request_id'] != request_id:
+                continue
+
+            self.last_response = response
+            if response['error'] is not None:
+                raise RuntimeError(response['error'])
+            return response['datas'] or [], frame
+
+
+class InferenceScheduler:
+    """
+    Central inference scheduler shared by all streams on a node.
+
+    Stream pipelines push frames into one shared queue and a pool of
+    model-owning workers pulls micro-batches from it, so each model is
+    loaded once per worker instead of once per camera.
+    """
+
+    def __init__(
+        self,
+        manager: SyncManager,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        num_workers: int = 1,
+        detector_factory: Callable[[str, str], Any] = (
+            default_detector_factory
+        ),
+    ):
+        """
+        Initialises the scheduler.
+
+        Args:
+            manager (SyncManager): The manager used for shared state.
+            max_batch_size (int): The maximum number of frames per batch.
+            max_wait_ms (float): The maximum time a worker waits to fill
+                a batch, in milliseconds.
+            num_workers (int): The number of model-owning worker processes.
+            detector_factory (Callable[[str, str], Any]): Builds a detector
+                for a model key and backend inside a worker process.
+        """
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1.')
+        if num_workers < 1:
+            raise ValueError('num_workers must be at least 1.')
+
+        self.manager = manager
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.num_workers = num_workers
+        self.detector_factory = detector_factory
+        self.request_queue: Any = multiprocessing.Queue()
+        self.stats: Any = manager.dict()
+        self.workers: list[multiprocessing.Process] = []
+        self.last_report: tuple[float, int] = (time.time(), 0)
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        """
+        Starts the model-owning worker processes.
+        """
+        for worker_id in range(self.num_workers):
+            worker = multiprocessing.Process(
+                target=run_inference_worker,
+                args=(
+                    worker_id,
+                    self.request_queue,
+                    self.stats,
+                    self.max_batch_size,
+                    self.max_wait_ms,
+                    self.detector_factory,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+        self.last_report = (time.time(), self.total_frames())
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stops the worker processes.
+
+        Args:
+            timeout (float): Seconds to wait for each worker to exit.
+        """
+        for _ in self.workers:
+            self.request_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers.clear()
+
+    def create_client(
+        self,
+        stream_id: str,
+        model_key: str,
+        slicing: dict[str, Any] | None = None,
+        model_backend: str = 'torch',
+        cascade: dict[str, Any] | None = None,
+    ) -> SchedulerClient:
+        """
+        Creates the handle a stream pipeline uses to submit frames.
+
+        Args:
+            stream_id (str): The identifier of the stream.
+            model_key (str): The model key used for detection.
+            slicing (dict[str, Any] | None): The slicing configuration of
+                the stream.
+            model_backend (str): The backend the model runs on.
+            cascade (dict[str, Any] | None): The cascade configuration of
+                the stream.
+
+        Returns:
+            SchedulerClient: The client for the stream.
+        """
+        return SchedulerClient(
+            stream_id=stream_id,
+            model_key=model_key,
+            request_queue=self.request_queue,
+            response_queue=self.manager.Queue(),
+            slicing=slicing,
+            model_backend=model_backend,
+            cascade=cascade,
+        )
+
+    def total_frames(self) -> int:
+        """
+        Returns the number of frames processed by all workers.
+
+        Returns:
+            int: The total number of frames.
+        """
+        return sum(stat['frames'] for stat in self.stats.values())
+
+    def report_throughput(self) -> dict[str, float]:
+        """
+        Reports the throughput since the previous report.
+
+        Returns:
+            dict[str, float]: Frames per second, total frames, batches and
+                mean batch size.
+        """
+        now = time.time()
+        stats = list(self.stats.values())
+        frames = sum(stat['frames'] for stat in stats)
+        batches = sum(stat['batches'] for stat in stats)
+        last_time, last_frames = self.last_report
+        elapsed = now - last_time
+        fps = (frames - last_frames) / elapsed if elapsed > 0 else 0.0
+        self.last_report = (now, frames)
+
+        report = {
+            'frames_per_second': fps,
+            'total_frames': float(frames),
+            'total_batches': float(batches),
+            'mean_batch_size': frames / batches if batches else 0.0,
+        }
+        self.logger.info(
+            f"Inference scheduler: {fps:.2f} frames/s, "
+            f"{frames} frames in {batches} batches "
+            f"(mean batch size {report['mean_batch_size']:.2f})",
+        )
+        return report
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+
+#: (positive, negative) class pairs that cannot both hold for one object:
+#: Hardhat and NO-Hardhat, Safety Vest and NO-Safety Vest.
+CONFLICTING_LABELS: tuple[tuple[int, int], ...] = ((0, 2), (7, 4))
+
+#: IoU above which a negative label is dropped by local detection.
+LOCAL_IOU_THRESHOLD = 0.8
+
+#: IoU above which a negative label is dropped by the detection server.
+SERVER_IOU_THRESHOLD = 0.5
+
+
+def iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Calculates the pairwise IoU of two sets of pixel boxes.
+
+    Boxes are inclusive of their last pixel, so a box [x1, y1, x2, y2]
+    covers (x2 - x1 + 1) * (y2 - y1 + 1) pixels.
+
+    Args:
+        boxes1 (np.ndarray): An (N, 4) array of [x1, y1, x2, y2].
+        boxes2 (np.ndarray): An (M, 4) array of [x1, y1, x2, y2].
+
+    Returns:
+        np.ndarray: An (N, M) array of IoUs.
+    """
+    a = boxes1[:, None, :4]
+    b = boxes2[None, :, :4]
+    overlap_w = np.clip(
+        np.minimum(a[..., 2], b[..., 2])
+        - np.maximum(a[..., 0], b[..., 0]) + 1, 0, None,
+    )
+    overlap_h = np.clip(
+        np.minimum(a[..., 3], b[..., 3])
+        - np.maximum(a[..., 1], b[..., 1]) + 1, 0, None,
+    )
+    overlap_area = overlap_w * overlap_h
+    area1 = (a[..., 2] - a[..., 0] + 1) * (a[..., 3] - a[..., 1] + 1)
+    area2 = (b[..., 2] - b[..., 0] + 1) * (b[..., 3] - b[..., 1] + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = overlap_area / (area1 + area2 - overlap_area)
+    return np.nan_to_num(iou, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def containment_matrix(inner: np.ndarray, outer: np.ndarray) -> np.ndarray:
+    """
+    Checks which boxes lie completely within which others.
+
+    Args:
+        inner (np.ndarray): An (N, 4) array of [x1, y1, x2, y2].
+        outer (np.ndarray): An (M, 4) array of [x1, y1, x2, y2].
+
+    Returns:
+        np.ndarray: An (N, M) boolean array, True where inner box i lies
+            within outer box j, edges included.
+    """
+    a = inner[:, None, :4]
+    b = outer[None, :, :4]
+    return (
+        (a[..., 0] >= b[..., 0])
+        & (a[..., 2] <= b[..., 2])
+        & (a[..., 1] >= b[..., 1])
+        & (a[..., 3] <= b[..., 3])
+    )
+
+
+def remove_conflicting_labels(
+    datas: Sequence[Sequence[float]],
+    iou_threshold: float | None = SERVER_IOU_THRESHOLD,
+    remove_contained: bool = True,
+    label_pairs: Sequence[tuple[int, int]] = CONFLICTING_LABELS,
+) -> list:
+    """
+    Drops labels that contradict another label of the same object.
+
+    For each (positive, negative) pair of classes, e.g. Hardhat and
+    NO-Hardhat, a negative box is dropped when its IoU with a positive box
+    exceeds `iou_threshold` or when it lies within a positive box. Of the
+    negative boxes left, one containing a positive box drops that positive
+    box instead. All of it is decided in one pass over the IoU and
+    containment matrices of the detections, with the same result as
+    removing overlaps, then contained labels, then overlaps again.
+
+    Args:
+        datas (Sequence[Sequence[float]]): Detections of
+            [x1, y1, x2, y2, confidence, class, ...].
+        iou_threshold (float | None): The IoU above which the negative
+            label is dropped. None keeps overlapping labels.
+        remove_contained (bool): Whether to drop contained labels.
+        label_pairs (Sequence[tuple[int, int]]): The (positive, negative)
+            class pairs to check.
+
+    Returns:
+        list: The detections kept, in their original order.
+    """
+    if not len(datas):
+        return list(datas)
+    array = np.asarray([data[:6] for data in datas], dtype=np.float64)
+    classes = array[:, 5]
+    keep = np.ones(len(array), dtype=bool)
+
+    for positive, negative in label_pairs:
+        positives = np.flatnonzero(classes == positive)
+        negatives = np.flatnonzero(classes == negative)
+        if not len(positives) or not len(negatives):
+            continue
+        positive_boxes = array[positives, :4]
+        negative_boxes = array[negatives, :4]
+
+        overlapping = np.zeros(len(negatives), dtype=bool)
+        if iou_threshold is not None:
+            overlapping = (
+                iou_matrix(positive_boxes, negative_boxes) > iou_threshold
+            ).any(axis=0)
+        keep[negatives[overlapping]] = False
+        if not remove_contained:
+            continue
+
+        # Only negatives left after the overlap check take part
+        remaining = ~overlapping
+        negative_inside = containment_matrix(negative_boxes, positive_boxes).T
+        positive_inside = (
+            containment_matrix(positive_boxes, negative_boxes)
+            & ~negative_inside
+        )
+        keep[negatives[remaining & negative_inside.any(axis=0)]] = False
+        keep[positives[(positive_inside & remaining).any(axis=1)]] = False
+
+    return [data for data, kept in zip(datas, keep) if kept]
@@ -2,19 +2,29 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import gc
 import logging
-import os
-from pathlib import Path
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
 from typing import MutableMapping
 from typing import TypedDict
 
 import aiohttp
 import cv2
 import numpy as np
-from sahi import AutoDetectionModel
+from sahi.models.base import DetectionModel
 from sahi.predict import get_sliced_prediction
 
+from src.cascade_detector import CascadeDetector
+from src.endpoint_pool import Endpoint
+from src.endpoint_pool import EndpointPool
+from src.label_postprocessing import LOCAL_IOU_THRESHOLD
+from src.label_postprocessing import remove_conflicting_labels
+from src.model_backends import load_detection_model
+from src.model_backends import MODEL_BACKENDS
+from src.tile_slicer import TileSlicer
+from src.token_manager import TokenManager
+
 
 class InputData(TypedDict):
     frame: np.ndarray
@@ -37,6 +47,13 @@ class LiveStreamDetector:
     using YOLO with SAHI.
     """
 
+    # File extension, MIME type and quality flag of each upload codec
+    UPLOAD_CODECS: dict[str, tuple[str, str, int | None]] = {
+        'png': ('.png', 'image/png', None),
+        'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+        'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+    }
+
     def __init__(
         self,
         api_url: str = 'http://localhost:5000',
@@ -45,20 +62,83 @@ class LiveStreamDetector:
         detect_with_server: bool = False,
         shared_token: MutableMapping[str, str] | None = None,
         shared_lock=None,
+        connection_limit: int = 10,
+        connection_limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 60.0,
+        upload_codec: str = 'png',
+        upload_quality: int = 90,
+        upload_max_side: int | None = None,
+        slicer: TileSlicer | None = None,
+        stream_id: str | None = None,
+        model_backend: str = 'torch',
+        num_threads: int | None = None,
+        label_iou_threshold: float = LOCAL_IOU_THRESHOLD,
+        token_refresh_margin: float = 300.0,
+        endpoint_pool: EndpointPool | None = None,
+        cascade: CascadeDetector | None = None,
     ):
         """
         Initialises the LiveStreamDetector.
 
         Args:
-            api_url (str): The URL of the API for detection.
+            api_url (str): The URL of the API for login, and for detection
+                unless an endpoint pool is given.
             model_key (str): The model key for detection.
             output_folder (Optional[str]): Folder for detected frames.
             detect_with_server (bool): Whether to use server-based detection.
             shared_token (Optional[dict]): A shared dictionary for
                 token storage.
-            shared_lock: A shared multiprocessing Lock to
-                avoid multiple logins simultaneously.
+            shared_lock: A shared multiprocessing Lock so that only one
+                process renews the token at a time.
+            connection_limit (int): Maximum number of open connections
+                to the API.
+            connection_limit_per_host (int): Maximum number of open
+                connections to the same host.
+            dns_cache_ttl (int): Seconds to cache resolved API hosts.
+            keepalive_timeout (float): Seconds to keep idle connections
+                open for reuse.
+            upload_codec (str): Codec of frames sent to the API, one of
+                'png', 'jpeg' or 'webp'.
+            upload_quality (int): Quality from 1 to 100 for JPEG and WebP.
+            upload_max_side (Optional[int]): If set, frames are downscaled
+                so their longer side is at most this many pixels before
+                upload, and detections are scaled back to the frame.
+            slicer (Optional[TileSlicer]): Slice settings of the stream.
+                Local detection runs through it, and server detection
+                sends its settings along with each frame.
+            stream_id (Optional[str]): The identifier of the stream, sent
+                so the server can keep incremental slicing state for it.
+            model_backend (str): The backend of local detection, 'torch'
+                or 'onnx' for ONNX Runtime on the CPU.
+            num_threads (Optional[int]): Intra-op threads of ONNX Runtime.
+            label_iou_threshold (float): The IoU with a Hardhat or Safety
+                Vest box above which a local NO-Hardhat or NO-Safety Vest
+                box is dropped.
+            token_refresh_margin (float): Seconds before the API token
+                expires at which it is renewed.
+            endpoint_pool (Optional[EndpointPool]): The detection servers
+                to spread server detection over, which accept the tokens
+                issued by `api_url`. None sends everything to `api_url`.
+            cascade (Optional[CascadeDetector]): Runs a full-frame pass
+                first and slices only if small objects are likely. Server
+                detection asks the server for its fallback. None always
+                slices.
+
+        Raises:
+            ValueError: If the upload codec or model backend is not
+                supported.
         """
+        if upload_codec not in self.UPLOAD_CODECS:
+            raise ValueError(
+                f"Unsupported upload codec '{upload_codec}'. "
+                f"Expected one of {tuple(self.UPLOAD_CODECS)}.",
+            )
+        if model_backend not in MODEL_BACKENDS:
+            raise ValueError(
+                f"Unsupported model backend '{model_backend}'. "
+                f"Expected one of {MODEL_BACKENDS}.",
+            )
         self.api_url: str = (
             api_url if api_url.startswith('http') else f"http://{api_url}"
         )
@@ -69,75 +149,145 @@ class LiveStreamDetector:
             access_token='',
         )
         self.shared_lock = shared_lock
-        self.model: AutoDetectionModel | None = None
+        self.model: DetectionModel | None = None
+        self.loaded_models: dict[str, DetectionModel] = {}
         self.logger = logging.getLogger(__name__)
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.session: aiohttp.ClientSession | None = None
+        self.upload_codec = upload_codec
+        self.upload_quality = upload_quality
+        self.upload_max_side = upload_max_side
+        self.slicer = slicer
+        self.stream_id = stream_id
+        self.model_backend = model_backend
+        self.num_threads = num_threads
+        self.label_iou_threshold = label_iou_threshold
+        self.endpoint_pool = endpoint_pool or EndpointPool([self.api_url])
+        self.cascade = cascade
+        self.token_manager = TokenManager(
+            api_url=self.api_url,
+            get_session=self.get_session,
+            shared_token=self.shared_token,
+            shared_lock=shared_lock,
+            refresh_margin=token_refresh_margin,
+        )
 
     #######################################################################
-    # Authentication functions
+    # Session functions
     #######################################################################
 
-    def acquire_shared_lock(self):
+    def get_session(self) -> aiohttp.ClientSession:
         """
-        Acquires the shared lock for authentication.
+        Returns the long-lived HTTP session, creating it on first use.
+
+        The session keeps connections to the API alive between requests,
+        so each detection does not pay for a new TCP (and TLS) handshake.
+
+        Returns:
+            aiohttp.ClientSession: The session used for API requests.
         """
-        if self.shared_lock:
-            self.shared_lock.acquire()
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
 
-    def release_shared_lock(self):
+    async def close(self) -> None:
         """
-        Releases the shared lock for authentication.
+        Closes the HTTP session and its pooled connections.
         """
-        if self.shared_lock:
-            self.shared_lock.release()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    #######################################################################
+    # Authentication functions
+    #######################################################################
 
     async def authenticate(self, force: bool = False) -> None:
         """
         Ensures that the user is authenticated, re-authenticates if needed.
 
+        The token is cached in this process and renewed ahead of expiry,
+        see `TokenManager`.
+
         Args:
-            force (bool): Whether to force re-authentication.
+            force (bool): Whether to renew the current token, e.g. after
+                the API refused it.
 
         Raises:
             aiohttp.ClientResponseError: If the authentication fails.
             ValueError: If credentials are missing.
         """
-        username = os.getenv('API_USERNAME')
-        password = os.getenv('API_PASSWORD')
+        await self.token_manager.get_token(
+            rejected=self.token_manager.access_token if force else None,
+        )
 
-        if not username or not password:
-            raise ValueError(
-                'Missing API_USERNAME '
-                'or API_PASSWORD in environment variables',
-            )
+    #######################################################################
+    # Detection functions
+    #######################################################################
 
-        # Check if re-authentication is needed
-        if not force and self.shared_token.get('access_token'):
-            return
+    async def post_to_endpoints(
+        self,
+        path: str,
+        build_form: Callable[[], aiohttp.FormData],
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Any]],
+        params: dict[str, str] | None = None,
+    ) -> Any:
+        """
+        Posts a form to the detection endpoints and reads the response.
 
-        self.acquire_shared_lock()
-        try:
-            async with aiohttp.ClientSession() as session:
+        The endpoint pool picks the server, hedges slow requests and
+        retries failed ones. If a server refuses the token, it is renewed
+        and the request sent once more.
+
+        Args:
+            path (str): The path of the API endpoint.
+            build_form (Callable[[], aiohttp.FormData]): Builds the form,
+                once per attempt since a form can only be sent once.
+            read (Callable[[aiohttp.ClientResponse], Awaitable[Any]]):
+                Reads the result from a successful response.
+            params (Optional[dict[str, str]]): The query parameters.
+
+        Returns:
+            Any: The result read from the response.
+        """
+        async def send(endpoint: Endpoint) -> Any:
+            # Ensure authenticated, renewing the token ahead of expiry
+            access_token = await self.token_manager.get_token()
+            renewed = False
+            while True:
+                session = self.get_session()
                 async with session.post(
-                    f"{self.api_url}/api/token",
-                    json={
-                        'username': username,
-                        'password': password,
-                    },
+                    f"{endpoint.url}{path}",
+                    data=build_form(),
+                    params=params,
+                    headers={'Authorization': f"Bearer {access_token}"},
+                    timeout=aiohttp.ClientTimeout(
+                        total=self.endpoint_pool.request_timeout,
+                    ),
                 ) as response:
+                    # Token expired or invalid
+                    if response.status in (401, 403) and not renewed:
+                        self.logger.warning(
+                            'Token expired or invalid. Re-authenticating...',
+                        )
+                        access_token = await self.token_manager.get_token(
+                            rejected=access_token,
+                        )
+                        renewed = True
+                        continue
                     response.raise_for_status()
-                    token_data = await response.json()
-                    self.shared_token['access_token'] = (
-                        token_data['access_token']
-                    )
-                    self.logger.info(
-                        'Successfully authenticated and retrieved token.',
-                    )
-        finally:
-            self.release_shared_lock()
+                    return await read(response)
 
-    #######################################################################
-    # Detection functions
-    #######################################################################
+        return await self.endpoint_pool.request(send)
 
     async def generate_detections_cloud(
         self,
@@ -152,80 +302,297 @@ class LiveStreamDetector:
         Returns:
             list[list[float]]: The detection data.
         """
-        # Encode frame as PNG bytes
-        success, frame_encoded = cv2.imencode('.png', frame)
-        if not success:
-            raise ValueError('Failed to encode frame as PNG bytes.')
-        frame_bytes = frame_encoded.tobytes()
+        # Downscale and encode the frame with the upload codec
+        frame_bytes, scale = self.encode_frame(frame)
+        extension, content_type, _ = self.UPLOAD_CODECS[self.upload_codec]
 
-        # Ensure authenticated
-        await self.authenticate()
-
-        # Send detection request
-        try:
-            headers = {
-                'Authorization': f"Bearer {self.shared_token['access_token']}",
-            }
+        def build_form() -> aiohttp.FormData:
             data = aiohttp.FormData()
             data.add_field(
                 'image',
                 frame_bytes,
-                filename='frame.png',
-                content_type='image/png',
+                filename=f"frame{extension}",
+                content_type=content_type,
             )
+            self.add_slicing_fields(data)
+            return data
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/api/detect",
-                    data=data,
-                    params={'model': self.model_key},
-                    headers=headers,
-                ) as response:
-                    # Token expired or invalid
-                    if response.status in (401, 403):
-                        self.logger.warning(
-                            'Token expired or invalid. Re-authenticating...',
-                        )
-                        # Re-authenticate and retry detection request
-                        await self.authenticate(force=True)
-
-                        # Retry detection request
-                        return await self.generate_detections_cloud(frame)
-                    response.raise_for_status()
-                    return await response.json()
-        except aiohttp.ClientResponseError as exc:
+        # Send detection request
+        try:
+            datas = await self.post_to_endpoints(
+                '/api/detect',
+                build_form,
+                lambda response: response.json(),
+                params={'model': self.model_key},
+            )
+        except aiohttp.ClientError as exc:
             self.logger.error(f"Failed to send detection request: {exc}")
             raise
 
+        # Map the detections back onto the original frame
+        if scale != 1.0:
+            datas = self.rescale_detections(datas, scale)
+        return datas
+
+    def add_slicing_fields(self, data: aiohttp.FormData) -> None:
+        """
+        Adds the slice and cascade settings of the stream to a detection
+        request.
+
+        Args:
+            data (aiohttp.FormData): The form of the detection request.
+        """
+        if self.cascade is not None:
+            data.add_field('cascade', self.cascade.fallback)
+        if self.slicer is None:
+            return
+        data.add_field('slice_size', str(self.slicer.slice_size))
+        data.add_field('slice_overlap', str(self.slicer.overlap_ratio))
+        if self.slicer.incremental and self.stream_id:
+            data.add_field('stream_id', self.stream_id)
+            data.add_field(
+                'diff_threshold', str(self.slicer.diff_threshold),
+            )
+
+    async def generate_detections_cloud_batch(
+        self,
+        frames: list[np.ndarray],
+        response_format: str = 'packed',
+    ) -> list[list[list[float]]]:
+        """
+        Sends several frames to the API in one request.
+
+        Authentication, rate limiting and the HTTP round trip are paid once
+        for the whole batch instead of once per frame.
+
+        Args:
+            frames (list[np.ndarray]): The frames to send for detection.
+            response_format (str): 'packed' for a binary float32 response
+                or 'json' for nested lists.
+
+        Returns:
+            list[list[list[float]]]: The detection data of each frame.
+        """
+        if not frames:
+            return []
+
+        # Downscale and encode every frame with the upload codec
+        encoded = [self.encode_frame(frame) for frame in frames]
+        extension, content_type, _ = self.UPLOAD_CODECS[self.upload_codec]
+
+        def build_form() -> aiohttp.FormData:
+            data = aiohttp.FormData()
+            data.add_field('model', self.model_key)
+            data.add_field('response_format', response_format)
+            for index, (frame_bytes, _) in enumerate(encoded):
+                data.add_field(
+                    'images',
+                    frame_bytes,
+                    filename=f"frame_{index}{extension}",
+                    content_type=content_type,
+                )
+            return data
+
+        async def read(response: aiohttp.ClientResponse) -> Any:
+            if response_format == 'packed':
+                return self.unpack_detections(await response.read())
+            return await response.json()
+
+        try:
+            results = await self.post_to_endpoints(
+                '/api/detect_batch', build_form, read,
+            )
+        except aiohttp.ClientError as exc:
+            self.logger.error(
+                f"Failed to send batch detection request: {exc}",
+            )
+            raise
+
+        # Map the detections back onto the original frames
+        return [
+            self.rescale_detections(datas, scale) if scale != 1.0 else datas
+            for datas, (_, scale) in zip(results, encoded)
+        ]
+
+    @staticmethod
+    def unpack_detections(data: bytes) -> list[list[list[float]]]:
+        """
+        Unpacks the binary response of `/api/detect_batch`.
+
+        The layout is little-endian: a uint32 image count, one uint32
+        detection count per image, then every detection as six float32
+        values [x1, y1, x2, y2, confidence, label].
+
+        Args:
+            data (bytes): The packed detections.
+
+        Returns:
+            list[list[list[float]]]: The detections of each frame, with
+                integer coordinates and labels as in the JSON response.
+        """
+        num_images = int(np.frombuffer(data, dtype='<u4', count=1)[0])
+        counts = np.frombuffer(
+            data, dtype='<u4', count=num_images, offset=4,
+        )
+        rows = np.frombuffer(
+            data, dtype='<f4', offset=4 * (num_images + 1),
+        ).reshape(-1, 6)
+
+        results: list[list[list[float]]] = []
+        start = 0
+        for count in counts.tolist():
+            results.append([
+                [
+                    int(row[0]), int(row[1]), int(row[2]), int(row[3]),
+                    float(row[4]), int(row[5]),
+                ]
+                for row in rows[start:start + count].tolist()
+            ])
+            start += count
+        return results
+
+    def encode_frame(self, frame: np.ndarray) -> tuple[bytes, float]:
+        """
+        Downscales and encodes a frame for upload.
+
+        Args:
+            frame (np.ndarray): The frame to encode.
+
+        Returns:
+            tuple[bytes, float]: The encoded frame and the scale applied
+                to it (1.0 if it was not resized).
+
+        Raises:
+            ValueError: If the frame cannot be encoded.
+        """
+        scale = 1.0
+        height, width = frame.shape[:2]
+        if self.upload_max_side and max(height, width) > self.upload_max_side:
+            scale = self.upload_max_side / max(height, width)
+            frame = cv2.resize(
+                frame,
+                (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+
+        extension, _, quality_flag = self.UPLOAD_CODECS[self.upload_codec]
+        params = (
+            [quality_flag, self.upload_quality]
+            if quality_flag is not None else []
+        )
+        success, frame_encoded = cv2.imencode(extension, frame, params)
+        if not success:
+            raise ValueError(
+                f"Failed to encode frame as {self.upload_codec.upper()} "
+                'bytes.',
+            )
+        return frame_encoded.tobytes(), scale
+
+    @staticmethod
+    def rescale_detections(
+        datas: list[list[float]],
+        scale: float,
+    ) -> list[list[float]]:
+        """
+        Scales detection boxes from a resized frame back to the original.
+
+        Args:
+            datas (list[list[float]]): The detections on the resized frame.
+            scale (float): The scale that was applied to the frame.
+
+        Returns:
+            list[list[float]]: The detections on the original frame.
+        """
+        return [
+            [round(x / scale) for x in data[:4]] + list(data[4:])
+            for data in datas
+        ]
+
+    def set_model_key(self, model_key: str) -> None:
+        """
+        Switches detection to another model, e.g. a smaller one under load.
+
+        Local models loaded before are kept, so switching back does not
+        load their weights again.
+
+        Args:
+            model_key (str): The model key to detect with.
+        """
+        if model_key == self.model_key:
+            return
+        if self.model is not None:
+            self.loaded_models[self.model_key] = self.model
+        self.model_key = model_key
+        self.model = self.loaded_models.get(model_key)
+
     async def generate_detections_local(
         self,
         frame: np.ndarray,
+        slicer: TileSlicer | None = None,
+        cascade: CascadeDetector | None = None,
     ) -> list[list[float]]:
         """
-        Generates detections locally using YOLO.
+        Generates detections locally using YOLO on the model backend.
+
+        The blocking inference runs in a thread, so the other pipelines
+        sharing the event loop, such as those of the same video source,
+        keep running meanwhile.
 
         Args:
             frame (np.ndarray): The frame to send for detection.
+            slicer (Optional[TileSlicer]): The slicer of the frame's
+                stream, for detectors shared between streams. Defaults to
+                the detector's own slicer.
+            cascade (Optional[CascadeDetector]): The cascade of the frame's
+                stream, for detectors shared between streams. Defaults to
+                the detector's own cascade.
+
+        Returns:
+            list[list[float]]: The detection data.
+        """
+        return await asyncio.to_thread(
+            self.predict_local, frame, slicer, cascade,
+        )
+
+    def predict_local(
+        self,
+        frame: np.ndarray,
+        slicer: TileSlicer | None = None,
+        cascade: CascadeDetector | None = None,
+    ) -> list[list[float]]:
+        """
+        Runs the blocking local inference on a frame.
+
+        Args:
+            frame (np.ndarray): The frame to send for detection.
+            slicer (Optional[TileSlicer]): The slicer of the frame's
+                stream. Defaults to the detector's own slicer.
+            cascade (Optional[CascadeDetector]): The cascade of the frame's
+                stream. Defaults to the detector's own cascade.
 
         Returns:
             list[list[float]]: The detection data.
         """
         if self.model is None:
-            model_path = Path('models/pt/') / f"best_{self.model_key}.pt"
-            self.model = AutoDetectionModel.from_pretrained(
-                'yolo11',
-                model_path=model_path,
-                device='cuda:0',
+            self.model = load_detection_model(
+                self.model_key, self.model_backend, self.num_threads,
             )
 
-        result = get_sliced_prediction(
-            frame,
-            self.model,
-            slice_height=376,
-            slice_width=376,
-            overlap_height_ratio=0.3,
-            overlap_width_ratio=0.3,
-        )
+        slicer = slicer or self.slicer
+        cascade = cascade or self.cascade
+        if cascade is not None:
+            result = cascade.predict(frame, self.model, slicer)
+        elif slicer is not None:
+            result = slicer.predict(frame, self.model)
+        else:
+            result = get_sliced_prediction(
+                frame,
+                self.model,
+                slice_height=376,
+                slice_width=376,
+                overlap_height_ratio=0.3,
+                overlap_width_ratio=0.3,
+            )
 
         # Compile detection data in YOLO format
         datas = []
@@ -235,11 +602,8 @@ class LiveStreamDetector:
             confidence = float(obj.score.value)
             datas.append([x1, y1, x2, y2, confidence, label])
 
-        # Remove overlapping labels for Hardhat and Safety Vest categories
-        datas = self.remove_overlapping_labels(datas)
-
-        # Remove fully contained Hardhat and Safety Vest labels
-        datas = self.remove_completely_contained_labels(datas)
+        # Remove contradicting Hardhat and Safety Vest labels
+        datas = remove_conflicting_labels(datas, self.label_iou_threshold)
 
         return datas
 
@@ -290,6 +654,7 @@ class LiveStreamDetector:
         finally:
             cap.release()
             cv2.destroyAllWindows()
+            await self.close()
 
     #######################################################################
     # Post-processing functions
@@ -305,86 +670,8 @@ class LiveStreamDetector:
         Returns:
             list: A list of detection data with overlapping labels removed.
         """
-        # Indices of Hardhat detections
-        hardhat_indices = [
-            i for i, d in enumerate(
-                datas,
-            ) if d[5] == 0
-        ]
-        # Indices of NO-Hardhat detections
-        no_hardhat_indices = [i for i, d in enumerate(datas) if d[5] == 2]
-        # Indices of Safety Vest detections
-        safety_vest_indices = [i for i, d in enumerate(datas) if d[5] == 7]
-        # Indices of NO-Safety Vest detections
-        no_safety_vest_indices = [i for i, d in enumerate(datas) if d[5] == 4]
-
-        to_remove = set()
-        for hardhat_index in hardhat_indices:
-            for no_hardhat_index in no_hardhat_indices:
-                overlap = self.overlap_percentage(
-                    datas[hardhat_index][:4], datas[no_hardhat_index][:4],
-                )
-                if overlap > 0.8:
-                    to_remove.add(no_hardhat_index)
-
-        for safety_vest_index in safety_vest_indices:
-            for no_safety_vest_index in no_safety_vest_indices:
-                overlap = self.overlap_percentage(
-                    datas[safety_vest_index][:4],
-                    datas[no_safety_vest_index][:4],
-                )
-                if overlap > 0.8:
-                    to_remove.add(no_safety_vest_index)
-
-        for index in sorted(to_remove, reverse=True):
-            datas.pop(index)
-
-        gc.collect()
-        return datas
-
-    def overlap_percentage(self, bbox1, bbox2):
-        """
-        Calculates the percentage of overlap between two bounding boxes.
-
-        Args:
-            bbox1 (list): The first bounding box [x1, y1, x2, y2].
-            bbox2 (list): The second bounding box [x1, y1, x2, y2].
-
-        Returns:
-            float: The percentage of overlap between the two bounding boxes.
-        """
-        x1 = max(bbox1[0], bbox2[0])
-        y1 = max(bbox1[1], bbox2[1])
-        x2 = min(bbox1[2], bbox2[2])
-        y2 = min(bbox1[3], bbox2[3])
-
-        intersection_area = max(0, x2 - x1 + 1) * max(0, y2 - y1 + 1)
-        bbox1_area = (bbox1[2] - bbox1[0] + 1) * (bbox1[3] - bbox1[1] + 1)
-        bbox2_area = (bbox2[2] - bbox2[0] + 1) * (bbox2[3] - bbox2[1] + 1)
-
-        overlap_percentage = intersection_area / float(
-            bbox1_area + bbox2_area - intersection_area,
-        )
-        gc.collect()
-
-        return overlap_percentage
-
-    def is_contained(self, inner_bbox, outer_bbox):
-        """
-        Determines if one bounding box is completely contained within another.
-
-        Args:
-            inner_bbox (list): The inner bounding box [x1, y1, x2, y2].
-            outer_bbox (list): The outer bounding box [x1, y1, x2, y2].
-
-        Returns:
-            bool: Checks if inner box is fully within outer bounding box.
-        """
-        return (
-            inner_bbox[0] >= outer_bbox[0]
-            and inner_bbox[2] <= outer_bbox[2]
-            and inner_bbox[1] >= outer_bbox[1]
-            and inner_bbox[3] <= outer_bbox[3]
+        return remove_conflicting_labels(
+            datas, self.label_iou_threshold, remove_contained=False,
         )
 
     def remove_completely_contained_labels(self, datas):
@@ -397,57 +684,7 @@ class LiveStreamDetector:
         Returns:
             list: Detection data with fully contained labels removed.
         """
-        # Indices of Hardhat detections
-        hardhat_indices = [
-            i
-            for i, d in enumerate(
-                datas,
-            )
-            if d[5] == 0
-        ]
-
-        # Indices of NO-Hardhat detections
-        no_hardhat_indices = [i for i, d in enumerate(datas) if d[5] == 2]
-
-        # Indices of Safety Vest detections
-        safety_vest_indices = [i for i, d in enumerate(datas) if d[5] == 7]
-
-        # Indices of NO-Safety Vest detections
-        no_safety_vest_indices = [i for i, d in enumerate(datas) if d[5] == 4]
-
-        to_remove = set()
-        # Check hardhats
-        for hardhat_index in hardhat_indices:
-            for no_hardhat_index in no_hardhat_indices:
-                if self.is_contained(
-                    datas[no_hardhat_index][:4],
-                    datas[hardhat_index][:4],
-                ):
-                    to_remove.add(no_hardhat_index)
-                elif self.is_contained(
-                    datas[hardhat_index][:4],
-                    datas[no_hardhat_index][:4],
-                ):
-                    to_remove.add(hardhat_index)
-
-        # Check safety vests
-        for safety_vest_index in safety_vest_indices:
-            for no_safety_vest_index in no_safety_vest_indices:
-                if self.is_contained(
-                    datas[no_safety_vest_index][:4],
-                    datas[safety_vest_index][:4],
-                ):
-                    to_remove.add(no_safety_vest_index)
-                elif self.is_contained(
-                    datas[safety_vest_index][:4],
-                    datas[no_safety_vest_index][:4],
-                ):
-                    to_remove.add(safety_vest_index)
-
-        for index in sorted(to_remove, reverse=True):
-            datas.pop(index)
-
-        return datas
+        return remove_conflicting_labels(datas, iou_threshold=None)
 
 
 async def main():
@@ -482,6 +719,18 @@ async def main():
         action='store_true',
         help='Run detection using server api',
     )
+    parser.add_argument(
+        '--model_backend',
+        type=str,
+        default='torch',
+        choices=MODEL_BACKENDS,
+        help='Backend of local detection',
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        help='Intra-op threads of the ONNX Runtime backend',
+    )
     args = parser.parse_args()
 
     # Shared token for authentication
@@ -496,6 +745,8 @@ async def main():
         detect_with_server=args.detect_with_server,
         # If you want to share token across threads, use Manager()
         shared_token=shared_token,
+        model_backend=args.model_backend,
+        num_threads=args.num_threads,
     )
     await detector.run_detection(args.url)
 
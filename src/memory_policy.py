@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import gc
+import time
+from typing import Any
+from typing import TypedDict
+
+import psutil
+
+
+class MemoryStats(TypedDict):
+    frames: int
+    collections: int
+    collection_time: float
+    last_collection_time: float
+    rss_mb: float
+
+
+class MemoryPolicy:
+    """
+    Decides when a stream runs a full garbage collection.
+
+    Modes:
+        - 'off': never collect explicitly and leave it to the interpreter.
+        - 'interval': collect once every `interval` frames.
+        - 'rss': collect when the resident set size of the process exceeds
+          `rss_threshold_mb`, at most once every `interval` frames.
+    """
+
+    MODES = ('off', 'interval', 'rss')
+
+    def __init__(
+        self,
+        mode: str = 'interval',
+        interval: int = 100,
+        rss_threshold_mb: float = 1024.0,
+    ):
+        """
+        Initialises the memory policy.
+
+        Args:
+            mode (str): One of 'off', 'interval' or 'rss'.
+            interval (int): Frames between collections in 'interval' mode,
+                and the minimum frames between collections in 'rss' mode.
+            rss_threshold_mb (float): The RSS in MB above which 'rss' mode
+                collects.
+
+        Raises:
+            ValueError: If the mode or interval is invalid.
+        """
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown memory policy mode '{mode}'. "
+                f"Expected one of {self.MODES}.",
+            )
+        if interval < 1:
+            raise ValueError('interval must be at least 1.')
+
+        self.mode = mode
+        self.interval = interval
+        self.rss_threshold_mb = rss_threshold_mb
+        self.process = psutil.Process()
+        self.frames = 0
+        self.collections = 0
+        self.collection_time = 0.0
+        self.last_collection_time = 0.0
+        self.last_collection_frame = 0
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any] | None) -> MemoryPolicy:
+        """
+        Builds a memory policy from a stream configuration entry.
+
+        Args:
+            config (dict[str, Any] | None): The `memory_policy` entry, e.g.
+                {"mode": "rss", "rss_threshold_mb": 2048}.
+
+        Returns:
+            MemoryPolicy: The configured policy, or the default policy if
+                no configuration is given.
+        """
+        return cls(**(config or {}))
+
+    def get_rss_mb(self) -> float:
+        """
+        Returns the resident set size of the current process.
+
+        Returns:
+            float: The RSS in megabytes.
+        """
+        return self.process.memory_info().rss / (1024 * 1024)
+
+    def should_collect(self) -> bool:
+        """
+        Checks whether the policy asks for a collection on this frame.
+
+        Returns:
+            bool: True if a collection should run.
+        """
+        if self.mode == 'off':
+            return False
+        frames_since = self.frames - self.last_collection_frame
+        if frames_since < self.interval:
+            return False
+        if self.mode == 'interval':
+            return True
+        return self.get_rss_mb() > self.rss_threshold_mb
+
+    def step(self) -> bool:
+        """
+        Records a processed frame and collects if the policy says so.
+
+        Returns:
+            bool: True if a collection ran.
+        """
+        self.frames += 1
+        if not self.should_collect():
+            return False
+
+        start = time.perf_counter()
+        gc.collect()
+        self.last_collection_time = time.perf_counter() - start
+        self.collection_time += self.last_collection_time
+        self.collections += 1
+        self.last_collection_frame = self.frames
+        return True
+
+    def get_stats(self) -> MemoryStats:
+        """
+        Returns the collection statistics and current RSS.
+
+        Returns:
+            MemoryStats: Frames seen, number of collections, total and last
+                collection time in seconds, and RSS in megabytes.
+        """
+        return {
+            'frames': self.frames,
+            'collections': self.collections,
+            'collection_time': self.collection_time,
+            'last_collection_time': self.last_collection_time,
+            'rss_mb': self.get_rss_mb(),
+        }
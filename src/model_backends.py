@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import ast
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+import torch
+from sahi import AutoDetectionModel
+from sahi.models.base import DetectionModel
+from sahi.prediction import ObjectPrediction
+from sahi.utils.compatibility import fix_full_shape_list
+from sahi.utils.compatibility import fix_shift_amount_list
+
+#: Inference backends a detection model can run on.
+MODEL_BACKENDS = ('torch', 'onnx')
+
+#: Folder and file extension of the weights of each backend.
+MODEL_FILES: dict[str, tuple[str, str]] = {
+    'torch': ('models/pt', '.pt'),
+    'onnx': ('models/onnx', '.onnx'),
+}
+
+#: Suffix of the keys of INT8-quantised models, e.g. 'yolo11n-int8'.
+QUANTISED_SUFFIX = '-int8'
+
+
+def letterbox(
+    image: np.ndarray,
+    input_shape: tuple[int, int],
+) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """
+    Scales and pads an image into the input of a YOLO model.
+
+    Args:
+        image (np.ndarray): The RGB image.
+        input_shape (tuple[int, int]): The model input height and width.
+
+    Returns:
+        tuple[np.ndarray, float, tuple[int, int]]: The input blob, the
+            scale applied to the image and the left and top padding.
+    """
+    height, width = image.shape[:2]
+    input_height, input_width = input_shape
+    ratio = min(input_height / height, input_width / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(
+            image, (new_width, new_height),
+            interpolation=cv2.INTER_LINEAR,
+        )
+
+    # Centre the image, splitting odd padding as Ultralytics does
+    pad_x = (input_width - new_width) / 2
+    pad_y = (input_height - new_height) / 2
+    left, top = round(pad_x - 0.1), round(pad_y - 0.1)
+    image = cv2.copyMakeBorder(
+        image,
+        top,
+        round(pad_y + 0.1),
+        left,
+        round(pad_x + 0.1),
+        cv2.BORDER_CONSTANT,
+        value=(114, 114, 114),
+    )
+    blob = image.transpose(2, 0, 1)[np.newaxis].astype(np.float32)
+    blob /= 255.0
+    return blob, ratio, (left, top)
+
+
+class OnnxDetectionModel(DetectionModel):
+    """
+    Runs a YOLO model exported to ONNX with ONNX Runtime on the CPU.
+
+    The model is expected as exported by Ultralytics, with one output of
+    shape (1, 4 + classes, anchors) holding centre boxes and class scores,
+    and the class names and input size in the model metadata. Frames are
+    letterboxed to the input size and filtered with per-class NMS, as the
+    PyTorch backend does, so the model plugs into SAHI sliced inference
+    like any other SAHI detection model.
+    """
+
+    #: The most boxes kept per image, as in Ultralytics.
+    max_detections = 300
+
+    def __init__(
+        self,
+        *args: Any,
+        num_threads: int | None = None,
+        iou_threshold: float = 0.7,
+        **kwargs: Any,
+    ):
+        """
+        Initialises the model.
+
+        Args:
+            *args (Any): Arguments of `DetectionModel`.
+            num_threads (int | None): Intra-op threads of ONNX Runtime.
+                None lets ONNX Runtime use one per physical core.
+            iou_threshold (float): The IoU above which NMS suppresses an
+                overlapping box of the same class.
+            **kwargs (Any): Keyword arguments of `DetectionModel`.
+        """
+        self.num_threads = num_threads
+        self.iou_threshold = iou_threshold
+        self.input_name = 'images'
+        self.input_shape: tuple[int, int] = (640, 640)
+        super().__init__(*args, **kwargs)
+
+    def load_model(self) -> None:
+        """
+        Opens an ONNX Runtime session on the model file.
+
+        Raises:
+            ImportError: If ONNX Runtime is not installed.
+        """
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        # Frames go through the model one at a time
+        options.inter_op_num_threads = 1
+        session = onnxruntime.InferenceSession(
+            str(self.model_path),
+            sess_options=options,
+            providers=['CPUExecutionProvider'],
+        )
+        self.set_model(session)
+
+    def set_model(self, model: Any, **kwargs: Any) -> None:
+        """
+        Uses an ONNX Runtime session and reads its metadata.
+
+        Args:
+            model (Any): The `onnxruntime.InferenceSession`.
+            **kwargs (Any): Unused.
+        """
+        self.model = model
+        model_input = model.get_inputs()[0]
+        self.input_name = model_input.name
+        metadata = model.get_modelmeta().custom_metadata_map
+        if 'imgsz' in metadata:
+            height, width = ast.literal_eval(metadata['imgsz'])
+            self.input_shape = (int(height), int(width))
+        elif all(isinstance(size, int) for size in model_input.shape[2:]):
+            self.input_shape = tuple(model_input.shape[2:4])
+        if not self.category_mapping and 'names' in metadata:
+            names = ast.literal_eval(metadata['names'])
+            self.category_mapping = {
+                str(key): value for key, value in names.items()
+            }
+
+    def preprocess(
+        self,
+        image: np.ndarray,
+    ) -> tuple[np.ndarray, float, tuple[int, int]]:
+        """
+        Letterboxes an image into the model input.
+
+        Args:
+            image (np.ndarray): The RGB image.
+
+        Returns:
+            tuple[np.ndarray, float, tuple[int, int]]: The input blob, the
+                scale applied to the image and the left and top padding.
+        """
+        return letterbox(image, self.input_shape)
+
+    def postprocess(
+        self,
+        output: np.ndarray,
+        ratio: float,
+        padding: tuple[int, int],
+        image_shape: tuple[int, ...],
+    ) -> np.ndarray:
+        """
+        Turns the raw model output into boxes on the original image.
+
+        Args:
+            output (np.ndarray): The output of shape (4 + classes, anchors).
+            ratio (float): The scale applied to the image.
+            padding (tuple[int, int]): The left and top padding.
+            image_shape (tuple[int, ...]): The shape of the original image.
+
+        Returns:
+            np.ndarray: An (N, 6) array of [x1, y1, x2, y2, score, class].
+        """
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_scores)), class_ids]
+        keep = scores >= self.confidence_threshold
+        boxes, scores, class_ids = (
+            predictions[keep, :4], scores[keep], class_ids[keep]
+        )
+        if not len(boxes):
+            return np.zeros((0, 6), dtype=np.float32)
+
+        # NMS takes boxes by their top-left corner and size
+        xywh = boxes.copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(),
+            scores.tolist(),
+            class_ids.tolist(),
+            self.confidence_threshold,
+            self.iou_threshold,
+        )
+        indices = np.asarray(indices, dtype=int).reshape(-1)
+        indices = indices[:self.max_detections]
+
+        xyxy = xywh[indices]
+        xyxy[:, 2:] += xyxy[:, :2]
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - padding[0]) / ratio
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - padding[1]) / ratio
+        height, width = image_shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return np.column_stack(
+            [xyxy, scores[indices], class_ids[indices]],
+        ).astype(np.float32)
+
+    def perform_inference(self, image: np.ndarray) -> None:
+        """
+        Runs the model on an image.
+
+        Args:
+            image (np.ndarray): The RGB image, as SAHI passes it.
+        """
+        if self.model is None:
+            raise ValueError('Model is not loaded, call load_model() first.')
+        blob, ratio, padding = self.preprocess(image)
+        output = self.model.run(None, {self.input_name: blob})[0]
+        self._original_predictions = [
+            self.postprocess(output[0], ratio, padding, image.shape),
+        ]
+
+    @property
+    def num_categories(self) -> int:
+        return len(self.category_mapping or {})
+
+    @property
+    def has_mask(self) -> bool:
+        return False
+
+    @property
+    def category_names(self) -> list[str]:
+        return list((self.category_mapping or {}).values())
+
+    def _create_object_prediction_list_from_original_predictions(
+        self,
+        shift_amount_list: list[list[int | float]] | None = [[0, 0]],
+        full_shape_list: list[list[int | float]] | None = None,
+    ) -> None:
+        """
+        Converts the boxes of the last inference into SAHI predictions.
+
+        Args:
+            shift_amount_list (list[list[int | float]] | None): The offset
+                of each image in the full frame, as [x, y].
+            full_shape_list (list[list[int | float]] | None): The size of
+                the full frame of each image, as [height, width].
+        """
+        shift_amount_list = fix_shift_amount_list(shift_amount_list)
+        full_shape_list = fix_full_shape_list(full_shape_list)
+
+        object_prediction_list_per_image = []
+        for index, predictions in enumerate(self._original_predictions):
+            shift_amount = shift_amount_list[index]
+            full_shape = (
+                None if full_shape_list is None else full_shape_list[index]
+            )
+            object_prediction_list = []
+            for x1, y1, x2, y2, score, class_id in predictions.tolist():
+                # Skip boxes that collapsed when clipped to the image
+                if x2 - x1 <= 0 or y2 - y1 <= 0:
+                    continue
+                category_id = int(class_id)
+                object_prediction_list.append(
+                    ObjectPrediction(
+                        bbox=[x1, y1, x2, y2],
+                        category_id=category_id,
+                        category_name=(self.category_mapping or {}).get(
+                            str(category_id), str(category_id),
+                        ),
+                        score=score,
+                        shift_amount=shift_amount,
+                        full_shape=full_shape,
+                    ),
+                )
+            object_prediction_list_per_image.append(object_prediction_list)
+        self._object_prediction_list_per_image = (
+            object_prediction_list_per_image
+        )
+
+
+def get_model_path(model_key: str, model_backend: str = 'torch') -> Path:
+    """
+    Returns where the weights of a model are kept for a backend.
+
+    Args:
+        model_key (str): The model key, e.g. 'yolo11n'.
+        model_backend (str): One of `MODEL_BACKENDS`.
+
+    Returns:
+        Path: The model file, e.g. models/onnx/best_yolo11n.onnx.
+
+    Raises:
+        ValueError: If the backend is not supported.
+    """
+    if model_backend not in MODEL_FILES:
+        raise ValueError(
+            f"Unsupported model backend '{model_backend}'. "
+            f"Expected one of {MODEL_BACKENDS}.",
+        )
+    folder, extension = MODEL_FILES[model_backend]
+    return Path(folder) / f"best_{model_key}{extension}"
+
+
+def get_model_backend(model_key: str, model_backend: str = 'torch') -> str:
+    """
+    Returns the backend a model key runs on.
+
+    Quantised models only exist as ONNX models, so their keys always run
+    on ONNX Runtime whatever backend the stream asks for.
+
+    Args:
+        model_key (str): The model key, e.g. 'yolo11n' or 'yolo11n-int8'.
+        model_backend (str): The backend asked for.
+
+    Returns:
+        str: The backend to run the model on.
+    """
+    if model_key.endswith(QUANTISED_SUFFIX):
+        return 'onnx'
+    return model_backend
+
+
+def get_torch_device() -> str:
+    """
+    Returns the device the PyTorch backend runs on.
+
+    Returns:
+        str: 'cuda:0' when a GPU is available, otherwise 'cpu'.
+    """
+    return 'cuda:0' if torch.cuda.is_available() else 'cpu'
+
+
+def load_detection_model(
+    model_key: str,
+    model_backend: str = 'torch',
+    num_threads: int | None = None,
+    model_path: str | Path | None = None,
+) -> DetectionModel:
+    """
+    Loads a detection model for SAHI inference on a backend.
+
+    Args:
+        model_key (str): The model key, e.g. 'yolo11n', or 'yolo11n-int8'
+            for its quantised variant, which always runs on ONNX Runtime.
+        model_backend (str): 'torch' for PyTorch, on the GPU if there is
+            one, or 'onnx' for ONNX Runtime on the CPU.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
+        model_path (str | Path | None): The model file, by default from
+            `get_model_path`.
+
+    Returns:
+        DetectionModel: The loaded model.
+
+    Raises:
+        ValueError: If the backend is not supported.
+    """
+    if model_backend not in MODEL_BACKENDS:
+        raise ValueError(
+            f"Unsupported model backend '{model_backend}'. "
+            f"Expected one of {MODEL_BACKENDS}.",
+        )
+    model_backend = get_model_backend(model_key, model_backend)
+    model_path = model_path or get_model_path(model_key, model_backend)
+    if model_backend == 'onnx':
+        return OnnxDetectionModel(
+            model_path=str(model_path),
+            device='cpu',
+            num_threads=num_threads,
+        )
+    return AutoDetectionModel.from_pretrained(
+        'yolo11',
+        model_path=str(model_path),
+        device=get_torch_device(),
+    )
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any
+from typing import TypedDict
+
+from src.model_backends import QUANTISED_SUFFIX
+
+#: Model keys from the smallest and fastest to the largest.
+MODEL_LADDER = ('yolo11n', 'yolo11s', 'yolo11m', 'yolo11l', 'yolo11x')
+
+#: Largest multiple of `upgrade_after` a flapping level has to wait.
+MAX_HOLD_FACTOR = 16
+
+
+class QualityLevel(TypedDict):
+    model_key: str
+    slice_size: int | None
+
+
+class QualitySwitch(TypedDict):
+    time: float
+    previous: QualityLevel
+    current: QualityLevel
+    latency: float
+    reason: str
+
+
+class QualityStats(TypedDict):
+    model_key: str
+    slice_size: int | None
+    degraded: bool
+    latency: float | None
+    switches: int
+
+
+class QualityController:
+    """
+    Trades detection quality for latency when a stream misses its SLO.
+
+    The quality levels of a stream run from its ceiling model down to its
+    floor model, and then on to coarser slices of the floor model, which
+    cut the number of tiles inferred per frame. The stream starts at its
+    configured model.
+
+    A moving average of the stream latency is compared with the latency
+    SLO. The controller moves one level down after the average stayed
+    above `degrade_ratio` of the SLO for `degrade_after` frames, and one
+    level up after it stayed below `upgrade_ratio` of the SLO for
+    `upgrade_after` frames. The gap between the two ratios, a cooldown
+    after each switch and a longer wait before returning to a level that
+    could not be held keep streams from flapping between levels.
+    """
+
+    def __init__(
+        self,
+        model_key: str,
+        latency_slo: float,
+        floor: str | None = None,
+        ceiling: str | None = None,
+        slice_size: int | None = None,
+        slice_sizes: list[int] | None = None,
+        degrade_ratio: float = 0.9,
+        upgrade_ratio: float = 0.5,
+        degrade_after: int = 3,
+        upgrade_after: int = 10,
+        cooldown: float = 30.0,
+        flap_window: float = 300.0,
+        smoothing: float = 0.3,
+        history_size: int = 100,
+    ):
+        """
+        Initialises the controller.
+
+        Args:
+            model_key (str): The configured model of the stream.
+            latency_slo (float): The target seconds to process a frame.
+            floor (str | None): The smallest model the stream may move
+                down to. Defaults to 'yolo11n'.
+            ceiling (str | None): The largest model the stream may move
+                up to. Defaults to the configured model.
+            slice_size (int | None): The configured slice size, None for
+                the default slicing.
+            slice_sizes (list[int] | None): Coarser slice sizes, in
+                increasing order, to use after the floor model.
+            degrade_ratio (float): The fraction of the SLO above which the
+                latency is at risk.
+            upgrade_ratio (float): The fraction of the SLO below which
+                there is headroom.
+            degrade_after (int): Frames at risk in a row before moving
+                down.
+            upgrade_after (int): Frames with headroom in a row before
+                moving up.
+            cooldown (float): Seconds after a switch without another one.
+            flap_window (float): Seconds after moving up within which
+                moving down again doubles the frames needed to move up to
+                that level next time.
+            smoothing (float): The weight of the latest latency in the
+                moving average.
+            history_size (int): The number of switches kept.
+
+        Raises:
+            ValueError: If a model is unknown, the floor is above the
+                ceiling, or a setting is out of range.
+        """
+        if latency_slo <= 0:
+            raise ValueError('latency_slo must be positive.')
+        if not 0 < upgrade_ratio < degrade_ratio:
+            raise ValueError(
+                'Ratios must satisfy 0 < upgrade_ratio < degrade_ratio.',
+            )
+        if degrade_after < 1 or upgrade_after < 1:
+            raise ValueError(
+                'degrade_after and upgrade_after must be at least 1.',
+            )
+        if not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be in (0, 1].')
+
+        # Quantised streams stay on quantised models
+        suffix = ''
+        if model_key.endswith(QUANTISED_SUFFIX):
+            suffix = QUANTISED_SUFFIX
+        floor_index, model_index, ceiling_index = (
+            self.find_model(key.removesuffix(QUANTISED_SUFFIX))
+            for key in (
+                floor or MODEL_LADDER[0], model_key, ceiling or model_key,
+            )
+        )
+        if not floor_index <= model_index <= ceiling_index:
+            raise ValueError(
+                'Models must satisfy floor <= model_key <= ceiling.',
+            )
+        coarser = [
+            size for size in slice_sizes or []
+            if slice_size is None or size > slice_size
+        ]
+        if coarser != sorted(set(coarser)):
+            raise ValueError('slice_sizes must be increasing.')
+
+        self.levels: list[QualityLevel] = [
+            {
+                'model_key': MODEL_LADDER[index] + suffix,
+                'slice_size': slice_size,
+            }
+            for index in range(ceiling_index, floor_index - 1, -1)
+        ] + [
+            {
+                'model_key': MODEL_LADDER[floor_index] + suffix,
+                'slice_size': size,
+            }
+            for size in coarser
+        ]
+        self.nominal = ceiling_index - model_index
+        self.index = self.nominal
+        self.latency_slo = latency_slo
+        self.degrade_ratio = degrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.degrade_after = degrade_after
+        self.upgrade_after = upgrade_after
+        self.cooldown = cooldown
+        self.flap_window = flap_window
+        self.smoothing = smoothing
+
+        self.latency: float | None = None
+        self.at_risk = 0
+        self.headroom = 0
+        self.switched_at = float('-inf')
+        self.upgraded_at = float('-inf')
+        self.upgrade_holds = [upgrade_after] * len(self.levels)
+        self.history: deque[QualitySwitch] = deque(maxlen=history_size)
+        self.switches = 0
+
+    @staticmethod
+    def find_model(model_key: str) -> int:
+        """
+        Returns the position of a model on the ladder.
+
+        Args:
+            model_key (str): The model key without quantisation suffix.
+
+        Returns:
+            int: The index in `MODEL_LADDER`.
+
+        Raises:
+            ValueError: If the model is not on the ladder.
+        """
+        if model_key not in MODEL_LADDER:
+            raise ValueError(
+                f"Unsupported model '{model_key}'. "
+                f"Expected one of {MODEL_LADDER}.",
+            )
+        return MODEL_LADDER.index(model_key)
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict[str, Any],
+        model_key: str,
+        slicing: dict[str, Any] | None = None,
+    ) -> QualityController:
+        """
+        Builds a controller from the `qos` entry of a stream configuration.
+
+        Args:
+            config (dict[str, Any]): The `qos` entry, e.g.
+                {"latency_slo": 2.0, "floor": "yolo11s",
+                "slice_sizes": [512, 640]}.
+            model_key (str): The configured model of the stream.
+            slicing (dict[str, Any] | None): The `slicing` entry of the
+                stream, for its configured slice size.
+
+        Returns:
+            QualityController: The configured controller.
+        """
+        return cls(
+            model_key=model_key,
+            slice_size=(slicing or {}).get('slice_size'),
+            **config,
+        )
+
+    @property
+    def level(self) -> QualityLevel:
+        """
+        The current quality level.
+        """
+        return self.levels[self.index]
+
+    def update(
+        self,
+        latency: float,
+        now: float | None = None,
+    ) -> QualitySwitch | None:
+        """
+        Records the latency of a frame and switches level if needed.
+
+        Args:
+            latency (float): The seconds the stream took for the frame.
+            now (float | None): The monotonic time, by default the current
+                one.
+
+        Returns:
+            QualitySwitch | None: The switch made, if any.
+        """
+        now = time.monotonic() if now is None else now
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        if self.latency > self.degrade_ratio * self.latency_slo:
+            self.at_risk += 1
+            self.headroom = 0
+        elif self.latency < self.upgrade_ratio * self.latency_slo:
+            self.headroom += 1
+            self.at_risk = 0
+        else:
+            self.at_risk = self.headroom = 0
+
+        if now - self.switched_at < self.cooldown:
+            return None
+        if (
+            self.at_risk >= self.degrade_after
+            and self.index < len(self.levels) - 1
+        ):
+            if now - self.upgraded_at < self.flap_window:
+                # The level just moved up to could not be held
+                self.upgrade_holds[self.index] = min(
+                    self.upgrade_holds[self.index] * 2,
+                    self.upgrade_after * MAX_HOLD_FACTOR,
+                )
+            else:
+                self.upgrade_holds[self.index] = self.upgrade_after
+            return self.switch(self.index + 1, now, 'latency at risk')
+        if (
+            self.index > 0
+            and self.headroom >= self.upgrade_holds[self.index - 1]
+        ):
+            return self.switch(self.index - 1, now, 'headroom')
+        return None
+
+    def switch(self, index: int, now: float, reason: str) -> QualitySwitch:
+        """
+        Moves to another level and records the switch.
+
+        Args:
+            index (int): The index of the new level.
+            now (float): The monotonic time.
+            reason (str): Why the level changed.
+
+        Returns:
+            QualitySwitch: The switch made.
+        """
+        record: QualitySwitch = {
+            'time': time.time(),
+            'previous': self.level,
+            'current': self.levels[index],
+            'latency': self.latency or 0.0,
+            'reason': reason,
+        }
+        if index < self.index:
+            self.upgraded_at = now
+        self.index = index
+        self.switched_at = now
+        # The new level is measured afresh
+        self.latency = None
+        self.at_risk = self.headroom = 0
+        self.switches += 1
+        self.history.append(record)
+        return record
+
+    def get_stats(self) -> QualityStats:
+        """
+        Returns the current level, latency and number of switches.
+
+        Returns:
+            QualityStats: The controller statistics.
+        """
+        return {
+            'model_key': self.level['model_key'],
+            'slice_size': self.level['slice_size'],
+            'degraded': self.index > self.nominal,
+            'latency': self.latency,
+            'switches': self.switches,
+        }
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import platform
+import subprocess
+import time
+from collections import defaultdict
+from collections import deque
+from collections.abc import AsyncGenerator
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TypedDict
+
+import cv2
+import numpy as np
+
+from src.danger_detector import DangerDetector
+from src.drawing_manager import DrawingManager
+from src.live_stream_detection import LiveStreamDetector
+from src.utils import RedisManager
+from src.utils import Utils
+
+#: Pipeline stages timed for every frame, in the order they run.
+STAGES: tuple[str, ...] = (
+    'decode', 'detect', 'danger', 'draw', 'encode', 'redis',
+)
+
+#: Latency percentiles reported for every stage.
+PERCENTILES: tuple[int, ...] = (50, 90, 99)
+
+
+class StageStats(TypedDict):
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class ReplayReport(TypedDict):
+    video: str
+    model_key: str
+    model_backend: str
+    speed: float
+    frames: int
+    media_seconds: float
+    wall_seconds: float
+    fps: float
+    realtime_factor: float
+    stages: dict[str, StageStats]
+    total: StageStats
+    environment: dict[str, str | None]
+
+
+def summarise_latencies(samples: list[float]) -> StageStats:
+    """
+    Summarises the latencies of a stage.
+
+    Args:
+        samples (list[float]): Latencies in seconds.
+
+    Returns:
+        StageStats: Count, mean, percentiles and maximum in milliseconds.
+    """
+    if not samples:
+        return {
+            'count': 0,
+            'mean_ms': 0.0,
+            'p50_ms': 0.0,
+            'p90_ms': 0.0,
+            'p99_ms': 0.0,
+            'max_ms': 0.0,
+        }
+    values = np.asarray(samples) * 1000
+    p50, p90, p99 = np.percentile(values, PERCENTILES)
+    return {
+        'count': len(samples),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(values.max()),
+    }
+
+
+class StageTimer:
+    """
+    Collects the latency of every pipeline stage for each frame.
+    """
+
+    def __init__(self):
+        """
+        Initialises the timer with no samples.
+        """
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.enabled = True
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """
+        Times the enclosed block as one sample of a stage.
+
+        Args:
+            stage (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Adds a sample to a stage, unless timing is paused.
+
+        Args:
+            stage (str): The name of the stage.
+            seconds (float): The latency of the sample.
+        """
+        if self.enabled:
+            self.samples[stage].append(seconds)
+
+    def summarise(self) -> dict[str, StageStats]:
+        """
+        Summarises every stage that was timed.
+
+        Returns:
+            dict[str, StageStats]: The latency summary of each stage, in
+                pipeline order.
+        """
+        stages = [stage for stage in STAGES if stage in self.samples]
+        stages += [stage for stage in self.samples if stage not in STAGES]
+        return {
+            stage: summarise_latencies(self.samples[stage])
+            for stage in stages
+        }
+
+
+class InMemoryRedis:
+    """
+    Stands in for a Redis server so storage runs without one.
+
+    Implements the commands `RedisManager` uses, keeping values and
+    capped streams in memory.
+    """
+
+    def __init__(self):
+        """
+        Initialises an empty store.
+        """
+        self.values: dict[str, bytes] = {}
+        self.streams: dict[str, deque[tuple[bytes, dict]]] = {}
+        self.entries_added = 0
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.values[key] = value
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    async def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+        self.streams.pop(key, None)
+
+    async def xadd(
+        self,
+        name: str,
+        fields: dict,
+        maxlen: int | None = None,
+    ) -> bytes:
+        stream = self.streams.get(name)
+        if stream is None or stream.maxlen != maxlen:
+            stream = deque(stream or (), maxlen=maxlen)
+            self.streams[name] = stream
+        self.entries_added += 1
+        entry_id = f"{int(time.time() * 1000)}-{self.entries_added}".encode()
+        stream.append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xread(self, streams: dict[str, str]) -> list:
+        return [
+            [name.encode(), list(self.streams[name])]
+            for name in streams if self.streams.get(name)
+        ]
+
+    async def close(self) -> None:
+        pass
+
+
+def get_video_fps(video_path: str) -> float:
+    """
+    Returns the frame rate of a video file, 30 if it is unknown.
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps or 30.0
+
+
+async def read_video_frames(
+    video_path: str,
+    speed: float = 0.0,
+    max_frames: int | None = None,
+    timer: StageTimer | None = None,
+) -> AsyncGenerator[tuple[np.ndarray, float]]:
+    """
+    Reads every frame of a video file, optionally paced to its frame rate.
+
+    Args:
+        video_path (str): The video file.
+        speed (float): Multiple of real time to replay at, e.g. 2.0 for
+            twice real time. 0 reads frames as fast as they are processed.
+        max_frames (int | None): The number of frames to read, None for
+            the whole file.
+        timer (StageTimer | None): Times the decoding of each frame.
+
+    Yields:
+        tuple[np.ndarray, float]: Each frame and its time in the video in
+            seconds.
+
+    Raises:
+        ValueError: If the video cannot be opened or speed is negative.
+    """
+    if speed < 0:
+        raise ValueError('speed must be 0 or positive.')
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Failed to open video {video_path}.")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    timer = timer or StageTimer()
+    frames = 0
+    wall_start = time.perf_counter()
+    try:
+        while max_frames is None or frames < max_frames:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timer.record('decode', time.perf_counter() - start)
+            media_time = frames / fps
+            frames += 1
+
+            # Hold the frame until it is due at the replay speed
+            if speed > 0:
+                delay = wall_start + media_time / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield frame, media_time
+    finally:
+        cap.release()
+
+
+def get_environment() -> dict[str, str | None]:
+    """
+    Describes where the replay ran, so reports can be told apart.
+
+    Returns:
+        dict[str, str | None]: The code revision, Python version,
+            platform and time of the run.
+    """
+    try:
+        revision: str | None = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'opencv': cv2.__version__,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+async def run_replay(
+    video_path: str,
+    model_key: str = 'yolo11n',
+    speed: float = 0.0,
+    max_frames: int | None = None,
+    warmup_frames: int = 1,
+    detect_with_server: bool = False,
+    detection_items: dict[str, bool] | None = None,
+    danger_engine: str = 'python',
+    language: str = 'en',
+    model_backend: str = 'torch',
+    num_threads: int | None = None,
+) -> ReplayReport:
+    """
+    Replays a video file through the stream pipeline and times each stage.
+
+    Frames go through the same stages as a live stream: detection, danger
+    detection, drawing, encoding and Redis storage, with Redis replaced by
+    an in-memory stand-in.
+
+    Args:
+        video_path (str): The video file.
+        model_key (str): Detection model key.
+        speed (float): Multiple of real time to replay at, 0 for as fast
+            as possible.
+        max_frames (int | None): The number of frames to time, None for
+            the whole file.
+        warmup_frames (int): Times the first frame is processed before
+            the replay starts, so model loading is not timed.
+        detect_with_server (bool): Whether detection goes to the API.
+        detection_items (dict[str, bool] | None): Items to detect.
+        danger_engine (str): Engine used by the DangerDetector.
+        language (str): Language of labels and stored warnings.
+        model_backend (str): Backend of local detection.
+        num_threads (int | None): Intra-op threads of ONNX Runtime.
+
+    Returns:
+        ReplayReport: Throughput and per-stage latencies of the replay.
+    """
+    timer = StageTimer()
+    live_stream_detector = LiveStreamDetector(
+        model_key=model_key,
+        detect_with_server=detect_with_server,
+        stream_id='replay',
+        model_backend=model_backend,
+        num_threads=num_threads,
+    )
+    danger_detector = DangerDetector(
+        detection_items or {}, engine=danger_engine,
+    )
+    drawing_manager = DrawingManager()
+    redis_manager = RedisManager()
+    redis_manager.redis = InMemoryRedis()
+
+    async def process_frame(frame: np.ndarray) -> None:
+        with timer.measure('detect'):
+            datas, _ = await live_stream_detector.generate_detections(frame)
+        with timer.measure('danger'):
+            warnings, polygons = danger_detector.detect_danger(datas)
+        with timer.measure('draw'):
+            frame_with_detections = drawing_manager.draw_detections_on_frame(
+                frame, polygons, datas, language=language,
+            )
+        with timer.measure('encode'):
+            frame_bytes = Utils.encode_frame(frame_with_detections)
+        with timer.measure('redis'):
+            await redis_manager.store_to_redis(
+                site='replay',
+                stream_name='replay',
+                frame_bytes=frame_bytes,
+                warnings=warnings,
+                language=language,
+            )
+
+    # Total latency covers the stages after decoding, which runs ahead of
+    # processing in a live stream
+    totals: list[float] = []
+    try:
+        # Warm up on the first frame, so model loading is not timed
+        timer.enabled = False
+        async for frame, _ in read_video_frames(video_path, max_frames=1):
+            for _ in range(warmup_frames):
+                await process_frame(frame)
+        timer.enabled = True
+
+        wall_start = time.perf_counter()
+        async for frame, _ in read_video_frames(
+            video_path, speed, max_frames, timer,
+        ):
+            frame_start = time.perf_counter()
+            await process_frame(frame)
+            totals.append(time.perf_counter() - frame_start)
+        wall_seconds = time.perf_counter() - wall_start
+    finally:
+        await live_stream_detector.close()
+        await redis_manager.close_connection()
+
+    frames = len(totals)
+    media_seconds = frames / get_video_fps(video_path)
+    return {
+        'video': video_path,
+        'model_key': model_key,
+        'model_backend': model_backend,
+        'speed': speed,
+        'frames': frames,
+        'media_seconds': media_seconds,
+        'wall_seconds': wall_seconds,
+        'fps': frames / wall_seconds if frames else 0.0,
+        'realtime_factor': (
+            media_seconds / wall_seconds if frames else 0.0
+        ),
+        'stages': timer.summarise(),
+        'total': summarise_latencies(totals),
+        'environment': get_environment(),
+    }
+
+
+def format_report(report: ReplayReport) -> str:
+    """
+    Formats a replay report as a table of stage latencies.
+
+    Args:
+        report (ReplayReport): The report of a replay.
+
+    Returns:
+        str: The table, followed by the throughput of the replay.
+    """
+    lines = [
+        f"{'stage':>8} {'count':>6} {'mean ms':>9} {'p50 ms':>9} "
+        f"{'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    rows: list[tuple[str, StageStats]] = list(report['stages'].items())
+    rows.append(('total', report['total']))
+    for stage, stats in rows:
+        lines.append(
+            f"{stage:>8} {stats['count']:>6} {stats['mean_ms']:>9.2f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}",
+        )
+    lines.append(
+        f"{report['frames']} frames in {report['wall_seconds']:.2f}s: "
+        f"{report['fps']:.2f} frames/s, "
+        f"{report['realtime_factor']:.2f}x real time",
+    )
+    return '\n'.join(lines)
+
+
+def write_report(report: ReplayReport, path: str) -> None:
+    """
+    Writes a replay report as JSON.
+
+    Args:
+        report (ReplayReport): The report of a replay.
+        path (str): The JSON file to write.
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
@@ -4,13 +4,22 @@ import argparse
 import asyncio
 import datetime
 import gc
+import threading
+import time
 from collections.abc import AsyncGenerator
 from typing import TypedDict
+from urllib.parse import urlparse
 
 import cv2
 import numpy as np
-import speedtest
 import streamlink
+from streamlink.stream.dash import DASHStream
+from streamlink.stream.hls import HLSStream
+from streamlink.stream.stream import Stream
+
+from src.bandwidth_estimator import BandwidthEstimator
+from src.video_decoders import DECODER_BACKENDS
+from src.video_decoders import PyAVCapture
 
 
 class InputData(TypedDict):
@@ -23,12 +32,194 @@ class ResultData(TypedDict):
     timestamp: float
 
 
+class FrameGrabber:
+    """
+    A background reader thread that keeps only the newest frame of a stream.
+
+    The thread keeps calling `grab()` so the capture never falls behind the
+    live stream, but only `retrieve()`s a frame when one has been requested.
+    Frames that nobody asked for are dropped without being converted.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture | PyAVCapture):
+        """
+        Initialises the grabber for an opened capture.
+
+        Args:
+            cap (cv2.VideoCapture | PyAVCapture): The opened capture.
+        """
+        self.cap = cap
+        # Counters for frames grabbed, retrieved and skipped
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        # Set when the capture stops delivering frames
+        self.failed = False
+        self._condition = threading.Condition()
+        self._latest_frame: np.ndarray | None = None
+        self._sequence = 0
+        self._retrieve_requested = False
+        self._stop_event = threading.Event()
+        # Set by the thread on exit, and by a stop that gave up waiting so
+        # the thread releases the capture it may still be using
+        self._exited = False
+        self._release_on_exit = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        """
+        Starts the background reader thread.
+        """
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """
+        Stops the background reader thread.
+
+        If the thread is still inside a grab when the timeout expires, it
+        releases the capture itself once it leaves, so the caller must not.
+
+        Args:
+            timeout (float): Seconds to wait for the thread to finish.
+
+        Returns:
+            bool: Whether the thread has exited and the capture may be
+                released by the caller.
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        with self._condition:
+            if self._exited or not self._thread.is_alive():
+                return True
+            self._release_on_exit = True
+            return False
+
+    def _run(self) -> None:
+        """
+        Grabs frames until stopped, then hands the capture back.
+        """
+        try:
+            self._grab_frames()
+        finally:
+            with self._condition:
+                self._exited = True
+                release = self._release_on_exit
+            if release:
+                self.cap.release()
+
+    def _grab_frames(self) -> None:
+        """
+        Grabs frames until stopped, retrieving only requested ones.
+        """
+        while not self._stop_event.is_set():
+            try:
+                grabbed = self.cap.grab()
+            except Exception as e:
+                print(f"Error grabbing frame: {e}")
+                grabbed = False
+            if not grabbed:
+                self._mark_failed()
+                return
+            self.frames_grabbed += 1
+
+            with self._condition:
+                retrieve = self._retrieve_requested
+            if not retrieve:
+                self.frames_dropped += 1
+                continue
+
+            try:
+                ret, frame = self.cap.retrieve()
+            except Exception as e:
+                print(f"Error retrieving frame: {e}")
+                ret, frame = False, None
+            with self._condition:
+                # A failed retrieve answers the request with no frame, but
+                # the stream is kept open as the next grab may succeed
+                if ret and frame is not None:
+                    self.frames_decoded += 1
+                else:
+                    frame = None
+                self._latest_frame = frame
+                self._sequence += 1
+                self._retrieve_requested = False
+                self._condition.notify_all()
+
+    def _mark_failed(self) -> None:
+        """
+        Flags the capture as failed and wakes up any waiting reader.
+        """
+        with self._condition:
+            self.failed = True
+            self._condition.notify_all()
+
+    def _wait_for_frame(self, timeout: float) -> np.ndarray | None:
+        """
+        Blocks until a frame grabbed after the request is available.
+
+        Args:
+            timeout (float): Seconds to wait for the frame.
+
+        Returns:
+            np.ndarray | None: The newest frame, or None on failure.
+        """
+        with self._condition:
+            target = self._sequence + 1
+            self._retrieve_requested = True
+            self._condition.wait_for(
+                lambda: (
+                    self._sequence >= target
+                    or self.failed
+                    or self._stop_event.is_set()
+                ),
+                timeout,
+            )
+            if self._sequence >= target:
+                return self._latest_frame
+            return None
+
+    async def read(self, timeout: float = 10.0) -> np.ndarray | None:
+        """
+        Awaits the newest frame without blocking the event loop.
+
+        The returned frame is always grabbed after this call was made, so it
+        is never older than one frame period of the stream.
+
+        Args:
+            timeout (float): Seconds to wait for the frame.
+
+        Returns:
+            np.ndarray | None: The newest frame, or None if the stream failed
+                or no frame arrived in time.
+        """
+        if self.failed:
+            return None
+        return await asyncio.to_thread(self._wait_for_frame, timeout)
+
+
 class StreamCapture:
     """
     A class to capture frames from a video stream.
     """
 
-    def __init__(self, stream_url: str, capture_interval: int = 15):
+    #: Capture interval in seconds from which PyAV decodes keyframes only.
+    KEYFRAME_ONLY_INTERVAL = 5
+    #: Seconds between checks of whether the stream quality should change.
+    QUALITY_CHECK_INTERVAL = 60
+    #: Bytes read from a stream to time its first segments.
+    PROBE_BYTES = 512 * 1024
+
+    def __init__(
+        self,
+        stream_url: str,
+        capture_interval: int = 15,
+        decoder: str = 'opencv',
+        keyframes_only: bool | None = None,
+        bandwidth_estimator: BandwidthEstimator | None = None,
+    ):
         """
         Initialises the StreamCapture with the given stream URL.
 
@@ -36,40 +227,164 @@ class StreamCapture:
             stream_url (str): The URL of the video stream.
             capture_interval (int, optional): The interval at which frames
                 should be captured. Defaults to 15.
+            decoder (str, optional): The decoder backend, 'opencv' or
+                'pyav'. Defaults to 'opencv'.
+            keyframes_only (bool | None, optional): Whether the PyAV
+                backend decodes keyframes only. None enables it when the
+                capture interval is at least `KEYFRAME_ONLY_INTERVAL`.
+            bandwidth_estimator (BandwidthEstimator | None, optional): The
+                estimator the stream quality is selected with. Defaults to
+                one sharing the estimates of the node.
+
+        Raises:
+            ValueError: If the decoder backend is not supported.
         """
-        # Video stream URL
+        if decoder not in DECODER_BACKENDS:
+            raise ValueError(
+                f"Unsupported decoder: {decoder}. "
+                f"Expected one of {DECODER_BACKENDS}.",
+            )
+        # Video stream URL and the host its bandwidth is measured under
         self.stream_url = stream_url
+        self.host = urlparse(stream_url).hostname or stream_url
+        # Decoder backend and keyframe-only setting
+        self.decoder = decoder
+        self.keyframes_only = keyframes_only
         # Video capture object
-        self.cap: cv2.VideoCapture | None = None
+        self.cap: cv2.VideoCapture | PyAVCapture | None = None
         # Frame capture interval in seconds
         self.capture_interval = capture_interval
         # Flag to indicate successful capture
         self.successfully_captured = False
+        # Background reader keeping the newest frame of the stream
+        self.grabber: FrameGrabber | None = None
+        # Frame counters of grabbers that have already been released
+        self.frame_counters: dict[str, int] = {
+            'frames_grabbed': 0,
+            'frames_decoded': 0,
+            'frames_dropped': 0,
+        }
+        # Throughput measured from the segments of the streams
+        self.bandwidth_estimator = (
+            bandwidth_estimator or BandwidthEstimator()
+        )
+        # Qualities of the generic stream and the one being read
+        self.available_streams: dict[str, Stream] = {}
+        self.selected_quality: str | None = None
+        self.last_quality_check = time.monotonic()
 
-    async def initialise_stream(self, stream_url: str) -> None:
+    def use_keyframes_only(self) -> bool:
+        """
+        Returns whether the PyAV backend should decode keyframes only.
+
+        Returns:
+            bool: True to skip decoding frames between keyframes.
+        """
+        if self.keyframes_only is not None:
+            return self.keyframes_only
+        return self.capture_interval >= self.KEYFRAME_ONLY_INTERVAL
+
+    async def initialise_stream(self, stream_url: str | Stream) -> None:
         """
         Initialises the video stream.
 
         Args:
-            stream_url (str): The URL of the stream to initialise.
+            stream_url (str | Stream): The URL of the stream to initialise,
+                or a streamlink stream for the PyAV backend to read.
         """
-        self.cap = cv2.VideoCapture(stream_url)
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # Stop the reader of a previous capture before replacing it
+        await self.stop_grabber()
+
+        if self.decoder == 'pyav':
+            self.cap = PyAVCapture(
+                stream_url,
+                keyframes_only=self.use_keyframes_only(),
+            )
+        else:
+            self.cap = cv2.VideoCapture(stream_url)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         # self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'H264'))
 
         if not self.cap.isOpened():
             await asyncio.sleep(5)
             self.cap.open(stream_url)
 
+        # Start reading the stream in the background
+        self.grabber = FrameGrabber(self.cap)
+        self.grabber.start()
+
     async def release_resources(self) -> None:
         """
         Releases resources like the capture object.
         """
+        stopped = await self.stop_grabber()
         if self.cap:
-            self.cap.release()
+            # A reader stuck in a grab releases the capture when it leaves
+            if stopped:
+                self.cap.release()
             self.cap = None
         gc.collect()
 
+    async def stop_grabber(self) -> bool:
+        """
+        Stops the background reader and keeps its frame counters.
+
+        The reader thread is joined off the event loop, so other streams
+        keep running while a grab in progress finishes.
+
+        Returns:
+            bool: Whether the capture may be released, False if the reader
+                is still using it and releases it itself.
+        """
+        if self.grabber is None:
+            return True
+        grabber, self.grabber = self.grabber, None
+        stopped = await asyncio.to_thread(grabber.stop)
+        for key in self.frame_counters:
+            self.frame_counters[key] += getattr(grabber, key)
+        return stopped
+
+    def get_frame_counters(self) -> dict[str, int]:
+        """
+        Returns the number of frames grabbed, decoded and dropped so far.
+
+        Returns:
+            dict[str, int]: The frame counters of the stream.
+        """
+        counters = dict(self.frame_counters)
+        if self.grabber:
+            for key in counters:
+                counters[key] += getattr(self.grabber, key)
+        return counters
+
+    async def read_latest_frame(self) -> np.ndarray | None:
+        """
+        Awaits the newest frame of the stream.
+
+        Returns:
+            np.ndarray | None: The newest frame, or None if reading failed.
+        """
+        if self.grabber is None:
+            return None
+        return await self.grabber.read()
+
+    async def wait_for_next_capture(
+        self,
+        last_process_time: datetime.datetime,
+    ) -> None:
+        """
+        Sleeps until the capture interval has elapsed.
+
+        Args:
+            last_process_time (datetime.datetime): When the previous frame
+                was captured.
+        """
+        elapsed_time = (
+            datetime.datetime.now() - last_process_time
+        ).total_seconds()
+        if elapsed_time < self.capture_interval:
+            await asyncio.sleep(self.capture_interval - elapsed_time)
+
     async def execute_capture(
         self,
     ) -> AsyncGenerator[tuple[np.ndarray, float]]:
@@ -86,14 +401,14 @@ class StreamCapture:
         fail_count = 0  # Counter for consecutive failures
 
         while True:
-            if self.cap is None:
+            if self.cap is None or self.grabber is None:
                 await self.initialise_stream(self.stream_url)
 
-            ret, frame = (
-                self.cap.read() if self.cap is not None else (False, None)
-            )
+            # Sleep until the next frame is due, then take the newest one
+            await self.wait_for_next_capture(last_process_time)
+            frame = await self.read_latest_frame()
 
-            if not ret or frame is None:
+            if frame is None:
                 fail_count += 1
                 print(
                     'Failed to read frame, trying to reinitialise stream. '
@@ -117,36 +432,120 @@ class StreamCapture:
                 # Mark as successfully captured
                 self.successfully_captured = True
 
-            # Process the frame if the capture interval has elapsed
+            # Yield the frame with the time it was captured
             current_time = datetime.datetime.now()
-            elapsed_time = (current_time - last_process_time).total_seconds()
+            last_process_time = current_time
+            timestamp = current_time.timestamp()
+            yield frame, timestamp
 
-            # If the capture interval has elapsed, yield the frame
-            if elapsed_time >= self.capture_interval:
-                last_process_time = current_time
-                timestamp = current_time.timestamp()
-                yield frame, timestamp
+        await self.release_resources()
 
-                # Clear memory
-                del frame, timestamp
-                gc.collect()
+    def get_download_speed(self) -> float | None:
+        """
+        Returns the download speed measured from the stream host.
 
-            await asyncio.sleep(0.01)  # Adjust the sleep time as needed
+        Returns:
+            float | None: The throughput in Mbps, or None if it has not
+                been measured recently.
+        """
+        return self.bandwidth_estimator.get(self.host)
 
-        await self.release_resources()
+    def choose_quality(
+        self,
+        available_qualities: list[str],
+        download_speed: float | None,
+    ) -> str | None:
+        """
+        Chooses the best quality the download speed can sustain.
 
-    def check_internet_speed(self) -> tuple[float, float]:
+        Args:
+            available_qualities (list[str]): The qualities of the stream.
+            download_speed (float | None): The throughput in Mbps. None
+                starts at 720p until the throughput has been measured.
+
+        Returns:
+            str | None: The chosen quality, or None if none is compatible.
         """
-        Checks internet speed using the Speedtest library.
+        if download_speed is not None and download_speed > 10:
+            preferred_qualities = [
+                'best',
+                '1080p',
+                '720p',
+                '480p',
+                '360p',
+                '240p',
+                'worst',
+            ]
+        elif download_speed is None or 5 < download_speed <= 10:
+            preferred_qualities = ['720p', '480p', '360p', '240p', 'worst']
+        else:
+            preferred_qualities = ['480p', '360p', '240p', 'worst']
+
+        for quality in preferred_qualities:
+            if quality in available_qualities:
+                return quality
+        return None
+
+    def probe_download_speed(self, stream: Stream) -> float | None:
+        """
+        Times the first segments of a stream through its session.
+
+        OpenCV downloads the segments inside FFmpeg, where the session
+        cannot measure them, so without a probe the throughput of OpenCV
+        streams would never be known. Only segmented streams are probed,
+        as a progressive download never completes a response.
+
+        Args:
+            stream (Stream): A stream of the session measuring the host.
 
         Returns:
-            Tuple[float, float]: Download and upload speeds (Mbps).
+            float | None: The throughput in Mbps, or None if it could not
+                be measured.
         """
-        st = speedtest.Speedtest()
-        st.get_best_server()
-        download_speed = st.download() / 1_000_000  # Turn into Mbps
-        upload_speed = st.upload() / 1_000_000
-        return download_speed, upload_speed
+        if not isinstance(stream, (HLSStream, DASHStream)):
+            return self.get_download_speed()
+        try:
+            stream_io = stream.open()
+            try:
+                size = 0
+                while size < self.PROBE_BYTES:
+                    data = stream_io.read(self.PROBE_BYTES - size)
+                    if not data:
+                        break
+                    size += len(data)
+            finally:
+                stream_io.close()
+        except Exception as e:
+            print(f"Error probing download speed: {e}")
+        return self.get_download_speed()
+
+    def start_probe(self, stream: Stream) -> bool:
+        """
+        Probes an unmeasured host in the background for OpenCV streams.
+
+        The probe runs in a thread of its own, off the quality selection,
+        and only the first stream of the node asking for a host within
+        the estimate TTL probes it. The other streams from that host use
+        its result.
+
+        Args:
+            stream (Stream): A stream of the session measuring the host.
+
+        Returns:
+            bool: Whether a probe was started.
+        """
+        if (
+            self.decoder != 'opencv'
+            or not isinstance(stream, (HLSStream, DASHStream))
+            or not self.bandwidth_estimator.claim_probe(self.host)
+        ):
+            return False
+        threading.Thread(
+            target=self.probe_download_speed,
+            args=(stream,),
+            daemon=True,
+        ).start()
+        return True
 
     def select_quality_based_on_speed(self) -> str | None:
         """
@@ -154,42 +553,106 @@ class StreamCapture:
 
         Returns:
             str: The URL of the selected stream quality.
+        """
+        selected_stream = self.select_stream_based_on_speed()
+        return selected_stream.url if selected_stream else None
+
+    def select_stream_source(self) -> str | Stream | None:
+        """
+        Selects what the decoder opens for a generic stream.
+
+        PyAV reads the streamlink stream directly, while OpenCV reopens the
+        URL of the selected quality.
+
+        Returns:
+            str | Stream | None: The stream or its URL, or None if no
+                compatible quality is available.
+        """
+        if self.decoder == 'pyav':
+            return self.select_stream_based_on_speed()
+        return self.select_quality_based_on_speed()
+
+    def select_stream_based_on_speed(self) -> Stream | None:
+        """
+        Selects the streamlink stream whose quality suits internet speed.
+
+        The speed is the throughput measured from the segments downloaded
+        from the same host, so no speed test is run. The segments of the
+        returned stream are measured in turn when PyAV reads it, while for
+        OpenCV a background probe of the host starts if nothing was
+        measured yet, and the quality follows once it has finished.
+
+        Returns:
+            Stream | None: The selected stream, or None on failure.
 
         Raises:
             Exception: If compatible stream quality is not available.
         """
-        download_speed, _ = self.check_internet_speed()
+        download_speed = self.get_download_speed()
         try:
-            streams = streamlink.streams(self.stream_url)
+            session = streamlink.Streamlink()
+            self.bandwidth_estimator.install(session, self.host)
+            streams = session.streams(self.stream_url)
             available_qualities = list(streams.keys())
             print(f"Available qualities: {available_qualities}")
 
-            if download_speed > 10:
-                preferred_qualities = [
-                    'best',
-                    '1080p',
-                    '720p',
-                    '480p',
-                    '360p',
-                    '240p',
-                    'worst',
-                ]
-            elif 5 < download_speed <= 10:
-                preferred_qualities = ['720p', '480p', '360p', '240p', 'worst']
-            else:
-                preferred_qualities = ['480p', '360p', '240p', 'worst']
-
-            for quality in preferred_qualities:
-                if quality in available_qualities:
-                    selected_stream = streams[quality]
-                    print(f"Selected quality based on speed: {quality}")
-                    return selected_stream.url
-
-            raise Exception('No compatible stream quality is available.')
+            quality = self.choose_quality(available_qualities, download_speed)
+            if quality is None:
+                raise Exception('No compatible stream quality is available.')
+            if download_speed is None:
+                self.start_probe(streams[quality])
+
+            print(f"Selected quality based on speed: {quality}")
+            self.available_streams = streams
+            self.selected_quality = quality
+            self.last_quality_check = time.monotonic()
+            return streams[quality]
         except Exception as e:
             print(f"Error selecting quality based on speed: {e}")
             return None
 
+    def reselect_stream_source(self) -> str | Stream | None:
+        """
+        Switches quality when the measured throughput calls for it.
+
+        Only the cached estimate is read, so the check never blocks on the
+        network, and it runs at most every `QUALITY_CHECK_INTERVAL`. Once
+        the estimate of an OpenCV stream has expired, a background probe
+        of its host is started for a later check.
+
+        Returns:
+            str | Stream | None: The new stream or its URL, or None to keep
+                reading the current one.
+        """
+        now = time.monotonic()
+        if (
+            not self.available_streams
+            or now - self.last_quality_check < self.QUALITY_CHECK_INTERVAL
+        ):
+            return None
+        self.last_quality_check = now
+
+        # Without a recent measurement the current quality is kept
+        download_speed = self.get_download_speed()
+        if download_speed is None:
+            current = self.available_streams.get(self.selected_quality or '')
+            if current is not None:
+                self.start_probe(current)
+            return None
+        quality = self.choose_quality(
+            list(self.available_streams), download_speed,
+        )
+        if quality is None or quality == self.selected_quality:
+            return None
+
+        print(
+            f"Measured {download_speed:.1f} Mbps, switching quality from "
+            f"{self.selected_quality} to {quality}",
+        )
+        self.selected_quality = quality
+        stream = self.available_streams[quality]
+        return stream if self.decoder == 'pyav' else stream.url
+
     async def capture_generic_frames(
         self,
     ) -> AsyncGenerator[tuple[np.ndarray, float]]:
@@ -200,7 +663,7 @@ class StreamCapture:
             Tuple[np.ndarray, float]: The captured frame and the timestamp.
         """
         # Select the stream quality based on internet speed
-        stream_url = self.select_quality_based_on_speed()
+        stream_url = self.select_stream_source()
         if not stream_url:
             print('Failed to get suitable stream quality.')
             return
@@ -212,13 +675,12 @@ class StreamCapture:
         fail_count = 0  # Counter for consecutive failures
 
         while True:
-            # Read the frame from the stream
-            ret, frame = (
-                self.cap.read() if self.cap is not None else (False, None)
-            )
+            # Sleep until the next frame is due, then take the newest one
+            await self.wait_for_next_capture(last_process_time)
+            frame = await self.read_latest_frame()
 
             # Handle failed frame reads
-            if not ret or frame is None:
+            if frame is None:
                 fail_count += 1
                 print(
                     'Failed to read frame from generic stream. '
@@ -230,7 +692,7 @@ class StreamCapture:
                     print('Reinitialising the generic stream.')
                     await self.release_resources()
                     await asyncio.sleep(5)
-                    stream_url = self.select_quality_based_on_speed()
+                    stream_url = self.select_stream_source()
 
                     # Exit if no suitable stream quality is available
                     if not stream_url:
@@ -249,18 +711,15 @@ class StreamCapture:
                 self.successfully_captured = True
 
             current_time = datetime.datetime.now()
-            elapsed_time = (current_time - last_process_time).total_seconds()
-
-            if elapsed_time >= self.capture_interval:
-                last_process_time = current_time
-                timestamp = current_time.timestamp()
-                yield frame, timestamp
-
-                # Clear memory
-                del frame, timestamp
-                gc.collect()
+            last_process_time = current_time
+            timestamp = current_time.timestamp()
+            yield frame, timestamp
 
-            await asyncio.sleep(0.01)  # Adjust the sleep time as needed
+            # Follow changes of the measured throughput mid-stream
+            new_source = self.reselect_stream_source()
+            if new_source:
+                await self.release_resources()
+                await self.initialise_stream(new_source)
 
     def update_capture_interval(self, new_interval: int) -> None:
         """
@@ -282,9 +741,16 @@ async def main():
         help='Live stream URL',
         required=True,
     )
+    parser.add_argument(
+        '--decoder',
+        type=str,
+        choices=DECODER_BACKENDS,
+        default='opencv',
+        help='Decoder backend',
+    )
     args = parser.parse_args()
 
-    stream_capture = StreamCapture(args.url)
+    stream_capture = StreamCapture(args.url, decoder=args.decoder)
     async for frame, timestamp in stream_capture.execute_capture():
         # Process the frame here
         print(f"Frame at {timestamp} displayed")
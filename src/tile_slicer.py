@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+from typing import TypedDict
+
+import cv2
+import numpy as np
+from sahi.postprocess.combine import GreedyNMMPostprocess
+from sahi.prediction import ObjectPrediction
+from sahi.prediction import PredictionResult
+from sahi.predict import get_prediction
+from sahi.predict import get_sliced_prediction
+from sahi.slicing import get_slice_bboxes
+
+
+class SlicingStats(TypedDict):
+    frames: int
+    tiles_inferred: int
+    tiles_reused: int
+
+
+class TileSlicer:
+    """
+    Runs SAHI sliced inference with per-stream slice settings.
+
+    In incremental mode every tile is compared with the frame it was last
+    inferred on, using the mean absolute difference of a downsampled
+    greyscale copy. Only tiles that changed past the threshold go through
+    the model again; the others reuse their cached detections, so a mostly
+    static CCTV scene costs a fraction of full sliced inference.
+
+    A slicer holds the state of one stream and must not be shared between
+    streams.
+    """
+
+    def __init__(
+        self,
+        slice_size: int = 376,
+        overlap_ratio: float = 0.3,
+        incremental: bool = False,
+        diff_threshold: float = 4.0,
+        diff_scale: float = 0.125,
+        max_age: int = 30,
+    ):
+        """
+        Initialises the slicer.
+
+        Args:
+            slice_size (int): The width and height of each slice in pixels.
+            overlap_ratio (float): The overlap between adjacent slices.
+            incremental (bool): Whether to re-run only changed tiles.
+            diff_threshold (float): The mean absolute greyscale difference,
+                from 0 to 255, above which a tile counts as changed.
+            diff_scale (float): The factor frames are downsampled by
+                before they are compared.
+            max_age (int): The number of frames after which a tile is
+                re-run even if it has not changed.
+
+        Raises:
+            ValueError: If any of the settings is out of range.
+        """
+        if slice_size < 1:
+            raise ValueError('slice_size must be at least 1.')
+        if not 0 <= overlap_ratio < 1:
+            raise ValueError('overlap_ratio must be in [0, 1).')
+        if diff_threshold < 0:
+            raise ValueError('diff_threshold must not be negative.')
+        if not 0 < diff_scale <= 1:
+            raise ValueError('diff_scale must be in (0, 1].')
+        if max_age < 1:
+            raise ValueError('max_age must be at least 1.')
+
+        self.slice_size = slice_size
+        self.overlap_ratio = overlap_ratio
+        self.incremental = incremental
+        self.diff_threshold = diff_threshold
+        self.diff_scale = diff_scale
+        self.max_age = max_age
+
+        # Matches the merge get_sliced_prediction applies by default
+        self.postprocess = GreedyNMMPostprocess(
+            match_threshold=0.5,
+            match_metric='IOS',
+            class_agnostic=False,
+        )
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.tiles_inferred = 0
+        self.tiles_reused = 0
+        self.shape: tuple[int, int] | None = None
+        self.tiles: list[list[int]] = []
+        self.references: list[np.ndarray | None] = []
+        self.ages: list[int] = []
+        self.tile_predictions: list[list[ObjectPrediction]] = []
+        self.full_predictions: list[ObjectPrediction] = []
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict[str, Any] | None,
+        slice_size: int = 376,
+    ) -> TileSlicer:
+        """
+        Builds a slicer from the `slicing` entry of a stream configuration.
+
+        Args:
+            config (dict[str, Any] | None): The slicing configuration with
+                optional 'slice_size', 'overlap', 'incremental',
+                'diff_threshold' and 'max_age' keys.
+            slice_size (int): The slice size used when none is configured.
+
+        Returns:
+            TileSlicer: The configured slicer.
+        """
+        config = config or {}
+        return cls(
+            slice_size=config.get('slice_size', slice_size),
+            overlap_ratio=config.get('overlap', 0.3),
+            incremental=config.get('incremental', False),
+            diff_threshold=config.get('diff_threshold', 4.0),
+            max_age=config.get('max_age', 30),
+        )
+
+    def reset(self, height: int, width: int) -> None:
+        """
+        Lays out the tiles for a frame size and drops all cached results.
+
+        Args:
+            height (int): The frame height.
+            width (int): The frame width.
+        """
+        self.shape = (height, width)
+        self.tiles = get_slice_bboxes(
+            image_height=height,
+            image_width=width,
+            slice_height=self.slice_size,
+            slice_width=self.slice_size,
+            auto_slice_resolution=False,
+            overlap_height_ratio=self.overlap_ratio,
+            overlap_width_ratio=self.overlap_ratio,
+        )
+        self.references = [None] * len(self.tiles)
+        self.ages = [0] * len(self.tiles)
+        self.tile_predictions = [[] for _ in self.tiles]
+        self.full_predictions = []
+
+    def downsample(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Converts a frame into the small greyscale image used for diffing.
+
+        Args:
+            frame (np.ndarray): The BGR or greyscale frame.
+
+        Returns:
+            np.ndarray: The downsampled greyscale frame.
+        """
+        grey = frame
+        if frame.ndim == 3:
+            grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(
+            grey,
+            None,
+            fx=self.diff_scale,
+            fy=self.diff_scale,
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def crop_small(self, small: np.ndarray, index: int) -> np.ndarray:
+        """
+        Crops a tile out of a downsampled frame.
+
+        Args:
+            small (np.ndarray): The downsampled greyscale frame.
+            index (int): The index of the tile.
+
+        Returns:
+            np.ndarray: The tile, at least one pixel in each direction.
+        """
+        x1, y1, x2, y2 = (int(v * self.diff_scale) for v in self.tiles[index])
+        return small[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)]
+
+    def find_changed_tiles(self, small: np.ndarray) -> list[int]:
+        """
+        Finds the tiles that must go through the model again.
+
+        Args:
+            small (np.ndarray): The downsampled greyscale frame.
+
+        Returns:
+            list[int]: The indices of the changed or stale tiles.
+        """
+        changed = []
+        for index, reference in enumerate(self.references):
+            if reference is None or self.ages[index] >= self.max_age:
+                changed.append(index)
+                continue
+            diff = cv2.absdiff(self.crop_small(small, index), reference)
+            if float(diff.mean()) > self.diff_threshold:
+                changed.append(index)
+        return changed
+
+    def predict(
+        self,
+        frame: np.ndarray,
+        model: Any,
+        full_predictions: list[ObjectPrediction] | None = None,
+    ) -> PredictionResult:
+        """
+        Runs sliced inference on a frame.
+
+        Without incremental mode this is a plain `get_sliced_prediction`
+        call with the configured slices. In incremental mode only changed
+        tiles are inferred, and the full-frame pass SAHI adds to the slices
+        is repeated whenever any tile changed, unless the caller hands over
+        its own.
+
+        Args:
+            frame (np.ndarray): The frame to detect objects in.
+            model (Any): The SAHI detection model.
+            full_predictions (list[ObjectPrediction] | None): The
+                predictions of a full-frame pass the caller already ran on
+                this frame, used instead of running another one.
+
+        Returns:
+            PredictionResult: The merged predictions for the frame.
+        """
+        if not self.incremental:
+            result = get_sliced_prediction(
+                frame,
+                model,
+                slice_height=self.slice_size,
+                slice_width=self.slice_size,
+                overlap_height_ratio=self.overlap_ratio,
+                overlap_width_ratio=self.overlap_ratio,
+                perform_standard_pred=full_predictions is None,
+            )
+            if full_predictions is None:
+                return result
+            predictions = result.object_prediction_list + full_predictions
+            if len(predictions) > 1:
+                predictions = self.postprocess(predictions)
+            return PredictionResult(
+                object_prediction_list=predictions,
+                image=frame,
+            )
+
+        with self.lock:
+            height, width = frame.shape[:2]
+            if self.shape != (height, width):
+                self.reset(height, width)
+
+            small = self.downsample(frame)
+            changed = self.find_changed_tiles(small)
+            for index in changed:
+                x1, y1, x2, y2 = self.tiles[index]
+                result = get_prediction(
+                    np.ascontiguousarray(frame[y1:y2, x1:x2]),
+                    model,
+                    shift_amount=[x1, y1],
+                    full_shape=[height, width],
+                )
+                self.tile_predictions[index] = [
+                    prediction.get_shifted_object_prediction()
+                    for prediction in result.object_prediction_list
+                ]
+                self.references[index] = self.crop_small(small, index).copy()
+                self.ages[index] = 0
+
+            if full_predictions is not None:
+                self.full_predictions = list(full_predictions)
+            elif changed and len(self.tiles) > 1:
+                result = get_prediction(
+                    frame,
+                    model,
+                    shift_amount=[0, 0],
+                    full_shape=[height, width],
+                )
+                self.full_predictions = [
+                    prediction.get_shifted_object_prediction()
+                    for prediction in result.object_prediction_list
+                ]
+
+            self.ages = [age + 1 for age in self.ages]
+            self.frames += 1
+            self.tiles_inferred += len(changed)
+            self.tiles_reused += len(self.tiles) - len(changed)
+
+            predictions = [
+                prediction
+                for tile in self.tile_predictions
+                for prediction in tile
+            ] + self.full_predictions
+            if len(predictions) > 1:
+                predictions = self.postprocess(predictions)
+
+        return PredictionResult(
+            object_prediction_list=predictions,
+            image=frame,
+        )
+
+    def get_stats(self) -> SlicingStats:
+        """
+        Returns how many tiles were inferred and reused so far.
+
+        Returns:
+            SlicingStats: The slicing statistics.
+        """
+        return {
+            'frames': self.frames,
+            'tiles_inferred': self.tiles_inferred,
+            'tiles_reused': self.tiles_reused,
+        }
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+import math
+import os
+import time
+from collections.abc import Callable
+from collections.abc import MutableMapping
+from typing import Any
+
+import aiohttp
+
+
+def decode_token_expiry(token: str) -> float:
+    """
+    Reads the expiry time of a JWT without verifying it.
+
+    The client only needs to know when to renew its token; the signature
+    is for the server to check.
+
+    Args:
+        token (str): The JWT.
+
+    Returns:
+        float: The `exp` claim as a UNIX time, or infinity if the token
+            has none or is not a JWT.
+    """
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)),
+        )
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return math.inf
+
+
+class TokenManager:
+    """
+    Keeps the API token of a process, shared with the other processes.
+
+    The token is cached locally, so requests read it without a round trip
+    to the manager process holding the shared token. It is renewed
+    `refresh_margin` seconds before it expires, with the refresh token if
+    there is one and by logging in otherwise. Renewal is single-flight:
+    within a process one coroutine renews while the others wait for it,
+    and across processes the shared lock lets one process renew while the
+    others pick up its token from the shared dictionary.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        get_session: Callable[[], aiohttp.ClientSession],
+        shared_token: MutableMapping[str, Any] | None = None,
+        shared_lock=None,
+        refresh_margin: float = 300.0,
+        lock_poll_interval: float = 0.05,
+        login_path: str = '/api/token',
+        refresh_path: str = '/api/refresh',
+    ):
+        """
+        Initialises the token manager.
+
+        Args:
+            api_url (str): The URL of the API.
+            get_session (Callable[[], aiohttp.ClientSession]): Returns the
+                session used for authentication requests.
+            shared_token (MutableMapping[str, Any] | None): The token
+                shared by all processes, e.g. a `Manager().dict()`.
+            shared_lock: A shared multiprocessing Lock so that only one
+                process renews the token at a time.
+            refresh_margin (float): Seconds before expiry at which the
+                token is renewed.
+            lock_poll_interval (float): Seconds between attempts to take
+                the shared lock, so waiting does not block the event loop.
+            login_path (str): The path of the login endpoint.
+            refresh_path (str): The path of the refresh endpoint.
+        """
+        self.api_url = api_url
+        self.get_session = get_session
+        self.shared_token: MutableMapping[str, Any] = (
+            shared_token if shared_token is not None else {}
+        )
+        self.shared_lock = shared_lock
+        self.refresh_margin = refresh_margin
+        self.lock_poll_interval = lock_poll_interval
+        self.login_path = login_path
+        self.refresh_path = refresh_path
+        self.logger = logging.getLogger(__name__)
+
+        self.access_token: str | None = None
+        self.refresh_token: str | None = None
+        self.expiry = 0.0
+        self.local_lock = asyncio.Lock()
+
+    def is_usable(self, rejected: str | None = None) -> bool:
+        """
+        Checks whether the local token can be sent without renewal.
+
+        Args:
+            rejected (str | None): A token the API refused.
+
+        Returns:
+            bool: True if there is a token other than the rejected one
+                that does not expire within the refresh margin.
+        """
+        return (
+            bool(self.access_token)
+            and self.access_token != rejected
+            and time.time() < self.expiry - self.refresh_margin
+        )
+
+    async def get_token(self, rejected: str | None = None) -> str:
+        """
+        Returns a valid access token, renewing it when needed.
+
+        Args:
+            rejected (str | None): A token the API refused, e.g. with a
+                401 response. It is renewed unless another coroutine or
+                process has replaced it already.
+
+        Returns:
+            str: The access token.
+
+        Raises:
+            aiohttp.ClientResponseError: If logging in fails.
+            ValueError: If credentials are missing.
+        """
+        if self.is_usable(rejected):
+            return self.access_token  # type: ignore[return-value]
+
+        async with self.local_lock:
+            # Another coroutine or process may have renewed it meanwhile
+            self.load_shared()
+            if self.is_usable(rejected):
+                return self.access_token  # type: ignore[return-value]
+
+            await self.acquire_shared_lock()
+            try:
+                self.load_shared()
+                if not self.is_usable(rejected):
+                    await self.renew(rejected)
+            finally:
+                self.release_shared_lock()
+        return self.access_token  # type: ignore[return-value]
+
+    def load_shared(self) -> None:
+        """
+        Copies the shared token into the local cache.
+        """
+        shared = dict(self.shared_token.items())
+        access_token = shared.get('access_token')
+        if access_token and access_token != self.access_token:
+            self.access_token = access_token
+            self.refresh_token = shared.get('refresh_token')
+            self.expiry = decode_token_expiry(access_token)
+
+    async def renew(self, rejected: str | None = None) -> None:
+        """
+        Renews the token and shares it with the other processes.
+
+        A token that has not expired yet is kept if renewal fails, so a
+        proactive refresh cannot interrupt detection.
+
+        Args:
+            rejected (str | None): A token the API refused.
+        """
+        try:
+            token_data = None
+            if self.refresh_token:
+                token_data = await self.refresh()
+            if token_data is None:
+                token_data = await self.login()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            if (
+                self.access_token
+                and self.access_token != rejected
+                and time.time() < self.expiry
+            ):
+                self.logger.warning(
+                    f"Failed to renew token, using current one: {exc}",
+                )
+                return
+            raise
+
+        self.access_token = token_data['access_token']
+        self.refresh_token = token_data.get(
+            'refresh_token', self.refresh_token,
+        )
+        self.expiry = decode_token_expiry(self.access_token)
+        self.shared_token.update(
+            {
+                'access_token': self.access_token,
+                'refresh_token': self.refresh_token,
+                'token_expiry': (
+                    self.expiry if math.isfinite(self.expiry) else 0
+                ),
+            },
+        )
+
+    async def refresh(self) -> dict[str, Any] | None:
+        """
+        Renews the token with the refresh token.
+
+        Returns:
+            dict[str, Any] | None: The new tokens, or None if the refresh
+                token was refused and a login is needed.
+        """
+        session = self.get_session()
+        async with session.post(
+            f"{self.api_url}{self.refresh_path}",
+            json={'refresh_token': self.refresh_token},
+        ) as response:
+            if response.status in (401, 403, 404):
+                self.logger.info('Refresh token refused. Logging in...')
+                return None
+            response.raise_for_status()
+            token_data = await response.json()
+        self.logger.info('Successfully refreshed token.')
+        return token_data
+
+    async def login(self) -> dict[str, Any]:
+        """
+        Logs in with the credentials in the environment.
+
+        Returns:
+            dict[str, Any]: The tokens returned by the API.
+
+        Raises:
+            aiohttp.ClientResponseError: If the login fails.
+            ValueError: If credentials are missing.
+        """
+        username = os.getenv('API_USERNAME')
+        password = os.getenv('API_PASSWORD')
+        if not username or not password:
+            raise ValueError(
+                'Missing API_USERNAME '
+                'or API_PASSWORD in environment variables',
+            )
+
+        session = self.get_session()
+        async with session.post(
+            f"{self.api_url}{self.login_path}",
+            json={'username': username, 'password': password},
+        ) as response:
+            response.raise_for_status()
+            token_data = await response.json()
+        self.logger.info('Successfully authenticated and retrieved token.')
+        return token_data
+
+    async def acquire_shared_lock(self) -> None:
+        """
+        Acquires the shared lock without blocking the event loop.
+        """
+        if not self.shared_lock:
+            return
+        while not self.shared_lock.acquire(blocking=False):
+            await asyncio.sleep(self.lock_poll_interval)
+
+    def release_shared_lock(self) -> None:
+        """
+        Releases the shared lock.
+        """
+        if self.shared_lock:
+            self.shared_lock.release()
@@ -10,9 +10,9 @@ from typing import Any
 import cv2
 import numpy as np
 import redis.asyncio as redis
-from shapely.geometry import MultiPoint
-from shapely.geometry import Point
+import shapely
 from shapely.geometry import Polygon
+from shapely.strtree import STRtree
 from sklearn.cluster import HDBSCAN
 from watchdog.events import FileSystemEventHandler
 
@@ -150,9 +150,8 @@ class Utils:
         right_x = max(bbox[0], bbox[2])
         top_y = min(bbox[1], bbox[3])
         bottom_y = max(bbox[1], bbox[3])
-        if len(bbox) > 4:
-            return [left_x, top_y, right_x, bottom_y, bbox[4], bbox[5]]
-        return [left_x, top_y, right_x, bottom_y]
+        # Keep the confidence, class and any further columns, e.g. track IDs
+        return [left_x, top_y, right_x, bottom_y, *bbox[4:]]
 
     @staticmethod
     def normalise_data(datas: list[list[float]]) -> list[list[float]]:
@@ -298,6 +297,135 @@ class Utils:
             and vertical_distance <= danger_distance_vertical
         )
 
+    @staticmethod
+    def overlap_percentage_matrix(
+        bboxes1: np.ndarray,
+        bboxes2: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Calculate the pairwise overlap percentage between two sets of boxes.
+
+        This is the broadcasted counterpart of `overlap_percentage`.
+
+        Args:
+            bboxes1 (np.ndarray): An (N, 4) array of bounding boxes.
+            bboxes2 (np.ndarray): An (M, 4) array of bounding boxes.
+
+        Returns:
+            np.ndarray: An (N, M) array of overlap percentages.
+        """
+        a = bboxes1[:, None, :4]
+        b = bboxes2[None, :, :4]
+
+        # Calculate the area of the intersection rectangles
+        overlap_w = np.clip(
+            np.minimum(a[..., 2], b[..., 2])
+            - np.maximum(a[..., 0], b[..., 0]), 0, None,
+        )
+        overlap_h = np.clip(
+            np.minimum(a[..., 3], b[..., 3])
+            - np.maximum(a[..., 1], b[..., 1]), 0, None,
+        )
+        overlap_area = overlap_w * overlap_h
+
+        # Calculate the area of both sets of bounding boxes
+        area1 = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+        area2 = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+
+        # Degenerate pairs (zero union) are treated as no overlap
+        union = area1 + area2 - overlap_area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overlap = overlap_area / union
+        return np.nan_to_num(overlap, nan=0.0, posinf=0.0, neginf=0.0)
+
+    @staticmethod
+    def is_driver_matrix(
+        person_bboxes: np.ndarray,
+        vehicle_bboxes: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Check every person/vehicle pair with the `is_driver` rules at once.
+
+        Args:
+            person_bboxes (np.ndarray): A (P, 4) array of person boxes.
+            vehicle_bboxes (np.ndarray): A (V, 4) array of vehicle boxes.
+
+        Returns:
+            np.ndarray: A (P, V) boolean array, True where the person is
+                likely the driver of the vehicle.
+        """
+        p = person_bboxes[:, None, :4]
+        v = vehicle_bboxes[None, :, :4]
+
+        person_width = p[..., 2] - p[..., 0]
+        person_height = p[..., 3] - p[..., 1]
+        vehicle_height = v[..., 3] - v[..., 1]
+
+        # 1. Person's bottom is above the vehicle's bottom by at least
+        #    half the person's height
+        bottom_ok = (p[..., 3] < v[..., 3]) & (
+            v[..., 3] - p[..., 3] >= person_height / 2
+        )
+        # 2. Person's edges stay within half a person width of the vehicle
+        horizontal_ok = (p[..., 0] >= v[..., 0] - person_width / 2) & (
+            p[..., 2] <= v[..., 2] + person_width / 2
+        )
+        # 3. Person's top is below the vehicle's top
+        top_ok = p[..., 1] > v[..., 1]
+        # 4. Person's height is at most half the vehicle's height
+        height_ok = person_height <= vehicle_height / 2
+
+        return bottom_ok & horizontal_ok & top_ok & height_ok
+
+    @staticmethod
+    def is_dangerously_close_matrix(
+        person_bboxes: np.ndarray,
+        vehicle_bboxes: np.ndarray,
+        vehicle_labels: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Check every person/vehicle pair with the `is_dangerously_close` rules.
+
+        Args:
+            person_bboxes (np.ndarray): A (P, 4) array of person boxes.
+            vehicle_bboxes (np.ndarray): A (V, 4) array of machinery or
+                vehicle boxes.
+            vehicle_labels (np.ndarray): A (V,) array of class labels,
+                where 8 is machinery and 9 is vehicle.
+
+        Returns:
+            np.ndarray: A (P, V) boolean array, True where the person is
+                dangerously close to the machinery or vehicle.
+        """
+        p = person_bboxes[:, None, :4]
+        v = vehicle_bboxes[None, :, :4]
+
+        person_width = p[..., 2] - p[..., 0]
+        person_height = p[..., 3] - p[..., 1]
+        person_area = person_width * person_height
+        vehicle_area = (v[..., 2] - v[..., 0]) * (v[..., 3] - v[..., 1])
+        acceptable_ratio = np.where(vehicle_labels == 8, 0.05, 0.1)[None, :]
+
+        # Person area ratio must be acceptable compared to the vehicle area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio_ok = ~(person_area / vehicle_area > acceptable_ratio)
+
+        # Minimum horizontal/vertical distance between person and vehicle
+        horizontal_distance = np.minimum(
+            np.abs(p[..., 2] - v[..., 0]),
+            np.abs(p[..., 0] - v[..., 2]),
+        )
+        vertical_distance = np.minimum(
+            np.abs(p[..., 3] - v[..., 1]),
+            np.abs(p[..., 1] - v[..., 3]),
+        )
+
+        return (
+            ratio_ok
+            & (horizontal_distance <= 5 * person_width)
+            & (vertical_distance <= 1.5 * person_height)
+        )
+
     @staticmethod
     def detect_polygon_from_cones(
         datas: list[list[float]],
@@ -329,25 +457,30 @@ class Utils:
             return []
 
         # Cluster the safety cones
-        labels = clusterer.fit_predict(cone_positions)
-
-        # Extract clusters
-        clusters: dict[int, list[np.ndarray]] = {}
-        for point, label in zip(cone_positions, labels):
-            if label == -1:
-                continue  # Skip noise points
-            if label not in clusters:
-                clusters[label] = []
-            clusters[label].append(point)
-
-        # Create polygons from clusters
-        polygons = []
-        for cluster_points in clusters.values():
-            if len(cluster_points) >= 3:
-                polygon = MultiPoint(cluster_points).convex_hull
-                polygons.append(polygon)
-
-        return polygons
+        labels = np.asarray(clusterer.fit_predict(cone_positions))
+
+        # Keep clusters of at least three cones, skipping noise points
+        cluster_ids, first_seen, sizes = np.unique(
+            labels[labels != -1], return_index=True, return_counts=True,
+        )
+        # Order clusters by their first cone, as they were built before
+        order = np.argsort(first_seen)
+        cluster_ids = cluster_ids[order][sizes[order] >= 3]
+        if not len(cluster_ids):
+            return []
+
+        # Map each cone to the position of its cluster in the output
+        lookup = np.full(labels.max() + 1, -1)
+        lookup[cluster_ids] = np.arange(len(cluster_ids))
+        indices = np.where(labels != -1, lookup[labels], -1)
+        keep = np.flatnonzero(indices >= 0)
+        keep = keep[np.argsort(indices[keep], kind='stable')]
+
+        # Build the hull of every cluster in one vectorised call
+        hulls = shapely.convex_hull(
+            shapely.multipoints(cone_positions[keep], indices=indices[keep]),
+        )
+        return list(hulls)
 
     @staticmethod
     def calculate_people_in_controlled_area(
@@ -372,22 +505,19 @@ class Utils:
         if not polygons:
             return 0
 
-        # Use a set to track unique people
-        unique_people = set()
-
-        # Count the number of people within the controlled area
-        for data in datas:
-            if data[5] == 5:  # Check if it's a person
-                x_center = (data[0] + data[2]) / 2
-                y_center = (data[1] + data[3]) / 2
-                point = Point(x_center, y_center)
-                for polygon in polygons:
-                    if polygon.contains(point):
-                        # Update the set of unique people
-                        unique_people.add((x_center, y_center))
-                        break  # No need to check other polygons
-
-        return len(unique_people)
+        # Centres of people, counting people at the same spot once
+        centres = np.array([
+            ((data[0] + data[2]) / 2, (data[1] + data[3]) / 2)
+            for data in datas if data[5] == 5
+        ], dtype=float)
+        if not len(centres):
+            return 0
+        centres = np.unique(centres, axis=0)
+
+        # Test every centre against every polygon in one tree query
+        tree = STRtree(polygons)
+        inside, _ = tree.query(shapely.points(centres), predicate='within')
+        return len(np.unique(inside))
 
 
 class FileEventHandler(FileSystemEventHandler):
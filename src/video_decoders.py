@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
+from streamlink.stream.stream import Stream
+
+#: Decoder backends a stream can be captured with.
+DECODER_BACKENDS = ('opencv', 'pyav')
+
+
+class PyAVCapture:
+    """
+    Reads a video stream with PyAV (FFmpeg) behind the subset of the
+    `cv2.VideoCapture` interface used by `FrameGrabber`.
+
+    `grab()` decodes the next frame and `retrieve()` converts it to BGR, so
+    frames the grabber drops skip the colour conversion. In keyframe-only
+    mode packets that are not keyframes are discarded before they reach
+    the decoder, so P and B frames only cost demuxing.
+    """
+
+    def __init__(
+        self,
+        source: str | Stream,
+        keyframes_only: bool = False,
+        options: dict[str, str] | None = None,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialises the capture and opens the source.
+
+        Args:
+            source (str | Stream): A URL or path FFmpeg can open, or a
+                streamlink stream that is read directly.
+            keyframes_only (bool): Whether to decode keyframes only.
+            options (dict[str, str] | None): FFmpeg demuxer options, e.g.
+                {'rtsp_transport': 'tcp'}.
+            timeout (float): Seconds to wait when opening or reading.
+        """
+        self.keyframes_only = keyframes_only
+        self.options = options or {}
+        self.timeout = timeout
+        self.container: Any = None
+        # File object of a streamlink stream, closed with the container
+        self.reader: Any = None
+        self.packets: Iterator[Any] | None = None
+        self.frames: deque[Any] = deque()
+        self.frame: Any = None
+        # Packets discarded without decoding in keyframe-only mode
+        self.packets_skipped = 0
+        self.open(source)
+
+    def open(self, source: str | Stream) -> bool:
+        """
+        Opens a source, closing the previous one.
+
+        Args:
+            source (str | Stream): The URL, path or streamlink stream.
+
+        Returns:
+            bool: Whether the source was opened.
+        """
+        # PyAV is only needed when this backend is selected
+        import av
+
+        self.release()
+        try:
+            # Streamlink streams are read as file-like objects
+            if not isinstance(source, str):
+                self.reader = source.open()
+            self.container = av.open(
+                source if self.reader is None else self.reader,
+                options=self.options,
+                timeout=self.timeout,
+            )
+            stream = self.container.streams.video[0]
+            # Frame threading delays output, so keyframes use slices only
+            stream.thread_type = 'SLICE' if self.keyframes_only else 'AUTO'
+            self.packets = self.container.demux(stream)
+        except Exception as e:
+            print(f"Error opening stream with PyAV: {e}")
+            self.release()
+            return False
+        return True
+
+    def isOpened(self) -> bool:
+        """
+        Returns whether a source is open.
+
+        Returns:
+            bool: True if the source is open.
+        """
+        return self.container is not None
+
+    def set(self, prop_id: int, value: float) -> bool:
+        """
+        Accepts OpenCV capture properties, which PyAV does not use.
+
+        Args:
+            prop_id (int): The OpenCV property identifier.
+            value (float): The property value.
+
+        Returns:
+            bool: Always False, as OpenCV does for unsupported properties.
+        """
+        return False
+
+    def grab(self) -> bool:
+        """
+        Decodes the next frame, or the next keyframe in keyframe-only mode.
+
+        Returns:
+            bool: Whether a frame was decoded.
+        """
+        self.frame = None
+        if self.packets is None:
+            return False
+        try:
+            while not self.frames:
+                packet = next(self.packets, None)
+                if packet is None:
+                    return False
+                if not self.keyframes_only:
+                    self.frames.extend(packet.decode())
+                    continue
+                if not packet.is_keyframe:
+                    self.packets_skipped += 1
+                    continue
+                # Drain the decoder so the keyframe is returned right away
+                # rather than when the next keyframe arrives
+                codec_context = packet.stream.codec_context
+                frames = codec_context.decode(packet)
+                frames.extend(codec_context.decode(None))
+                codec_context.flush_buffers()
+                for frame in frames:
+                    # The codec context does not stamp a time base itself
+                    frame.time_base = packet.time_base
+                self.frames.extend(frames)
+        except Exception as e:
+            print(f"Error decoding frame with PyAV: {e}")
+            return False
+        self.frame = self.frames.popleft()
+        return True
+
+    def retrieve(self) -> tuple[bool, np.ndarray | None]:
+        """
+        Converts the grabbed frame to a BGR image.
+
+        Returns:
+            tuple[bool, np.ndarray | None]: Whether a frame was available
+                and the frame.
+        """
+        if self.frame is None:
+            return False, None
+        try:
+            return True, self.frame.to_ndarray(format='bgr24')
+        except Exception as e:
+            print(f"Error converting frame with PyAV: {e}")
+            return False, None
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        """
+        Grabs and retrieves the next frame.
+
+        Returns:
+            tuple[bool, np.ndarray | None]: Whether a frame was read and
+                the frame.
+        """
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self) -> None:
+        """
+        Closes the source.
+        """
+        if self.container is not None:
+            try:
+                self.container.close()
+            except Exception as e:
+                print(f"Error closing stream with PyAV: {e}")
+        if self.reader is not None:
+            try:
+                self.reader.close()
+            except Exception as e:
+                print(f"Error closing streamlink stream: {e}")
+        self.container = None
+        self.reader = None
+        self.packets = None
+        self.frames.clear()
+        self.frame = None
@@ -179,5 +179,30 @@ class TestCOCOEvaluator(unittest.TestCase):
             )
 
 
+class TestCOCOEvaluatorBackends(unittest.TestCase):
+    """
+    Tests for evaluating models of other backends.
+    """
+
+    @patch('examples.YOLO_evaluation.evaluate_sahi_yolo.OnnxDetectionModel')
+    def test_onnx_backend(self, mock_onnx_model: MagicMock) -> None:
+        """
+        Test that ONNX models, quantised or not, are run on the CPU.
+        """
+        evaluator = COCOEvaluator(
+            model_path='models/onnx/best_yolo11n-int8.onnx',
+            coco_json='tests/dataset/coco_annotations.json',
+            image_dir='tests/dataset/val/images',
+            model_backend='onnx',
+        )
+
+        self.assertIs(evaluator.model, mock_onnx_model.return_value)
+        mock_onnx_model.assert_called_once_with(
+            model_path='models/onnx/best_yolo11n-int8.onnx',
+            confidence_threshold=0.3,
+            device='cpu',
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,27 +1,21 @@
 from __future__ import annotations
 
 import unittest
+from collections import OrderedDict
 from io import BytesIO
-from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
+import cv2
 import numpy as np
 from PIL import Image
 
-from examples.YOLO_server_api.backend.detection import calculate_area
-from examples.YOLO_server_api.backend.detection import calculate_intersection
-from examples.YOLO_server_api.backend.detection import calculate_overlap
-from examples.YOLO_server_api.backend.detection import check_containment
 from examples.YOLO_server_api.backend.detection import compile_detection_data
 from examples.YOLO_server_api.backend.detection import convert_to_image
-from examples.YOLO_server_api.backend.detection import find_contained_indices
-from examples.YOLO_server_api.backend.detection import find_contained_labels
-from examples.YOLO_server_api.backend.detection import find_overlapping_indices
-from examples.YOLO_server_api.backend.detection import find_overlaps
-from examples.YOLO_server_api.backend.detection import get_category_indices
+from examples.YOLO_server_api.backend.detection import get_cascade
 from examples.YOLO_server_api.backend.detection import get_prediction_result
-from examples.YOLO_server_api.backend.detection import is_contained
+from examples.YOLO_server_api.backend.detection import get_slicer
+from examples.YOLO_server_api.backend.detection import pack_detections
 from examples.YOLO_server_api.backend.detection import process_labels
 from examples.YOLO_server_api.backend.detection import (
     remove_completely_contained_labels,
@@ -72,6 +66,41 @@ class TestDetection(unittest.IsolatedAsyncioTestCase):
         mock_imdecode.assert_called_once()
         self.assertIsNotNone(img)
 
+    async def test_convert_to_image_formats(self) -> None:
+        """
+        Tests that PNG, JPEG and WebP uploads decode to the same shape.
+        """
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        for ext in ('.png', '.jpg', '.webp'):
+            _, encoded = cv2.imencode(ext, frame)
+            img = await convert_to_image(encoded.tobytes())
+            self.assertEqual(img.shape, (48, 64, 3))
+
+    async def test_convert_to_image_invalid(self) -> None:
+        """
+        Tests that undecodable data raises a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            await convert_to_image(b'not_an_image')
+
+    def test_pack_detections(self) -> None:
+        """
+        Tests packing the detections of several images.
+        """
+        packed = pack_detections(
+            [[[10, 20, 30, 40, 0.5, 2], [1, 2, 3, 4, 0.9, 7]], []],
+        )
+
+        header = np.frombuffer(packed[:12], dtype='<u4')
+        rows = np.frombuffer(packed[12:], dtype='<f4').reshape(-1, 6)
+        self.assertEqual(header.tolist(), [2, 2, 0])
+        np.testing.assert_allclose(
+            rows, [[10, 20, 30, 40, 0.5, 2], [1, 2, 3, 4, 0.9, 7]],
+        )
+
+        # An empty batch only has the image count
+        self.assertEqual(pack_detections([]), b'\x00' * 4)
+
     @patch('examples.YOLO_server_api.backend.detection.get_sliced_prediction')
     async def test_get_prediction_result(
         self,
@@ -98,6 +127,118 @@ class TestDetection(unittest.IsolatedAsyncioTestCase):
         )
         self.assertIsNotNone(result)
 
+    async def test_get_prediction_result_with_slicer(self) -> None:
+        """
+        Tests that a stream's slicer replaces the default slicing.
+        """
+        slicer = MagicMock()
+        img = MagicMock()
+        model = MagicMock()
+
+        result = await get_prediction_result(img, model, slicer=slicer)
+
+        slicer.predict.assert_called_once_with(img, model)
+        self.assertIs(result, slicer.predict.return_value)
+
+    def test_get_slicer(self) -> None:
+        """
+        Tests choosing the slicer from the request's slice settings.
+        """
+        self.assertIsNone(get_slicer('yolo11n'))
+
+        slicer = get_slicer('yolo11n', slice_size=512)
+        self.assertEqual(slicer.slice_size, 512)
+        self.assertEqual(slicer.overlap_ratio, 0.3)
+        self.assertFalse(slicer.incremental)
+
+        with self.assertRaises(ValueError):
+            get_slicer('yolo11n', slice_overlap=1.5)
+
+    @patch(
+        'examples.YOLO_server_api.backend.detection.MAX_STREAM_SLICERS', 2,
+    )
+    @patch(
+        'examples.YOLO_server_api.backend.detection.stream_slicers',
+        new_callable=OrderedDict,
+    )
+    def test_get_slicer_per_stream(self, stream_slicers: OrderedDict) -> None:
+        """
+        Tests that incremental slicers are kept per stream and bounded.
+        """
+        first = get_slicer('yolo11n', stream_id='a')
+        self.assertTrue(first.incremental)
+        self.assertEqual(first.slice_size, 370)
+        self.assertIs(get_slicer('yolo11n', stream_id='a'), first)
+        self.assertIsNot(get_slicer('yolo11x', stream_id='a'), first)
+
+        # The least recently used stream is dropped beyond the limit
+        with self.assertLogs(
+            'examples.YOLO_server_api.backend.detection', 'WARNING',
+        ) as captured:
+            get_slicer('yolo11n', stream_id='b')
+        self.assertIn("stream 'a'", captured.output[0])
+        self.assertEqual(len(stream_slicers), 2)
+        self.assertIsNot(get_slicer('yolo11n', stream_id='a'), first)
+
+        # The same stream identifier of two users is two streams
+        stream_slicers.clear()
+        alice = get_slicer('yolo11n', stream_id='cam1', owner='alice')
+        self.assertIsNot(
+            get_slicer('yolo11n', stream_id='cam1', owner='bob'), alice,
+        )
+        self.assertIs(
+            get_slicer('yolo11n', stream_id='cam1', owner='alice'), alice,
+        )
+
+    @patch(
+        'examples.YOLO_server_api.backend.detection.stream_cascades',
+        new_callable=OrderedDict,
+    )
+    def test_get_cascade(self, stream_cascades: OrderedDict) -> None:
+        """
+        Tests choosing the cascade and keeping its statistics per stream.
+        """
+        self.assertIsNone(get_cascade('yolo11n'))
+        with patch(
+            'examples.YOLO_server_api.backend.detection.CASCADE_MODE',
+            'sliced',
+        ):
+            self.assertEqual(get_cascade('yolo11n').fallback, 'sliced')
+
+        first = get_cascade('yolo11n', stream_id='a', fallback='regions')
+        self.assertEqual(first.fallback, 'regions')
+        self.assertEqual(first.slice_size, 370)
+        self.assertIs(
+            get_cascade('yolo11n', stream_id='a', fallback='regions'), first,
+        )
+        self.assertEqual(len(stream_cascades), 1)
+        self.assertIsNot(
+            get_cascade(
+                'yolo11n', stream_id='a', fallback='regions', owner='bob',
+            ),
+            first,
+        )
+
+        with self.assertRaises(ValueError):
+            get_cascade('yolo11n', fallback='tiles')
+
+    async def test_get_prediction_result_with_cascade(self) -> None:
+        """
+        Tests that a cascade decides how the image is sliced.
+        """
+        img = np.zeros((10, 10, 3), dtype=np.uint8)
+        model = MagicMock()
+        slicer = MagicMock()
+        cascade = MagicMock()
+
+        result = await get_prediction_result(
+            img, model, slicer=slicer, cascade=cascade,
+        )
+
+        cascade.predict.assert_called_once_with(img, model, slicer)
+        slicer.predict.assert_not_called()
+        self.assertIs(result, cascade.predict.return_value)
+
     def test_compile_detection_data(self) -> None:
         """
         Tests compiling prediction data into structured format.
@@ -114,40 +255,23 @@ class TestDetection(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0], [10, 20, 30, 40, 0.9, 1])
 
-    @patch(
-        'examples.YOLO_server_api.backend.detection.remove_overlapping_labels',
-        new_callable=AsyncMock,
-    )
-    @patch(
-        'examples.YOLO_server_api.backend.detection.'
-        'remove_completely_contained_labels',
-        new_callable=AsyncMock,
-    )
-    async def test_process_labels(
-        self,
-        mock_remove_completely_contained_labels: AsyncMock,
-        mock_remove_overlapping_labels: AsyncMock,
-    ) -> None:
+    async def test_process_labels(self) -> None:
         """
-        Tests label processing by applying overlapping and containment checks.
-
-        Args:
-            mock_remove_completely_contained_labels (AsyncMock):
-                A mock for removing completely contained labels.
-            mock_remove_overlapping_labels (AsyncMock):
-                A mock for removing overlapping labels.
-        """
-        mock_remove_overlapping_labels.side_effect = lambda datas: datas
-        mock_remove_completely_contained_labels.side_effect = (
-            lambda datas: datas
-        )
-
-        datas = [[10, 20, 30, 40, 0.9, 1]]
+        Tests that overlapping and contained labels are removed together.
+        """
+        datas = [
+            [0, 0, 100, 100, 0.9, 0],       # 'hardhat'
+            [10, 10, 90, 90, 0.8, 2],       # 'no_hardhat', contained
+            [200, 200, 300, 300, 0.85, 7],  # 'safety_vest'
+            [190, 190, 290, 290, 0.7, 4],   # 'no_safety_vest', IoU 0.67
+            [10, 20, 30, 40, 0.9, 1],
+        ]
         result = await process_labels(datas)
+        self.assertEqual([d[5] for d in result], [0, 7, 1])
 
-        self.assertEqual(result, datas)
-        mock_remove_overlapping_labels.assert_called()
-        mock_remove_completely_contained_labels.assert_called()
+        # Overlapping labels are kept below a stricter threshold
+        result = await process_labels(datas, iou_threshold=0.8)
+        self.assertEqual([d[5] for d in result], [0, 7, 4, 1])
 
     #
     # ---------------------------
@@ -211,120 +335,6 @@ class TestDetection(unittest.IsolatedAsyncioTestCase):
         result = await remove_completely_contained_labels(datas)
         self.assertIsInstance(result, list)
 
-    #
-    # The rest are mostly coverage for smaller utility functions
-    #
-    def test_get_category_indices(self) -> None:
-        """
-        Tests retrieval of category indices for different labels.
-        """
-        datas = [
-            [10, 20, 30, 40, 0.9, 0],
-            [50, 60, 70, 80, 0.85, 7],
-        ]
-        indices = get_category_indices(datas)
-        self.assertIsInstance(indices, dict)
-
-    def test_calculate_overlap(self) -> None:
-        """
-        Tests calculation of overlapping area between two bounding boxes.
-        """
-        bbox1 = [0, 0, 50, 50]
-        bbox2 = [25, 25, 75, 75]
-        overlap = calculate_overlap(bbox1, bbox2)
-        self.assertGreater(overlap, 0)
-
-    def test_calculate_intersection(self) -> None:
-        """
-        Tests calculation of intersection area between two bounding boxes.
-        """
-        bbox1 = [0, 0, 50, 50]
-        bbox2 = [25, 25, 75, 75]
-        intersection = calculate_intersection(bbox1, bbox2)
-        self.assertEqual(intersection, (25, 25, 50, 50))
-
-    def test_calculate_area(self) -> None:
-        """
-        Tests calculation of area for a bounding box.
-        """
-        x1, y1, x2, y2 = 0, 0, 50, 50
-        area = calculate_area(x1, y1, x2, y2)
-        self.assertEqual(area, 2601)  # 51 * 51 = 2601
-
-    def test_is_contained(self) -> None:
-        """
-        Tests if one bounding box is contained within another.
-        """
-        inner_bbox = [10, 10, 30, 30]
-        outer_bbox = [0, 0, 50, 50]
-        result = is_contained(inner_bbox, outer_bbox)
-        self.assertTrue(result)
-
-    async def test_find_overlaps(self) -> None:
-        """
-        Tests identification of overlapping bounding boxes.
-        """
-        indices1 = [0]
-        indices2 = [1]
-        datas = [
-            [0, 0, 50, 50, 0.9, 1],
-            [25, 25, 75, 75, 0.85, 2],
-        ]
-        result = await find_overlaps(indices1, indices2, datas, 0.5)
-        self.assertIsInstance(result, set)
-
-    async def test_find_contained_labels(self) -> None:
-        """
-        Tests identification of labels that are contained within others.
-        """
-        indices1 = [0]
-        indices2 = [1]
-        datas = [
-            [0, 0, 50, 50, 0.9, 1],
-            [10, 10, 40, 40, 0.85, 2],
-        ]
-        result = await find_contained_labels(indices1, indices2, datas)
-        self.assertIsInstance(result, set)
-
-    async def test_find_overlapping_indices(self) -> None:
-        """
-        Tests finding indices of overlapping bounding boxes.
-        """
-        index1 = 0
-        indices2 = [1]
-        datas = [
-            [0, 0, 50, 50, 0.9, 1],
-            [25, 25, 75, 75, 0.85, 2],
-        ]
-        result = await find_overlapping_indices(index1, indices2, datas, 0.5)
-        self.assertIsInstance(result, set)
-
-    async def test_find_contained_indices(self) -> None:
-        """
-        Tests finding indices of contained bounding boxes.
-        """
-        index1 = 0
-        indices2 = [1]
-        datas = [
-            [0, 0, 50, 50, 0.9, 1],
-            [10, 10, 40, 40, 0.85, 2],
-        ]
-        result = await find_contained_indices(index1, indices2, datas)
-        self.assertIsInstance(result, set)
-
-    async def test_check_containment(self) -> None:
-        """
-        Tests checking if one bounding box is contained within another.
-        """
-        index1 = 0
-        index2 = 1
-        datas = [
-            [0, 0, 50, 50, 0.9, 1],
-            [10, 10, 40, 40, 0.85, 2],
-        ]
-        result = await check_containment(index1, index2, datas)
-        self.assertIsInstance(result, set)
-
     async def test_remove_completely_contained_labels_line_340(self) -> None:
         """
         Test the `remove_completely_contained_labels` function to ensure it
@@ -341,21 +351,16 @@ class TestDetection(unittest.IsolatedAsyncioTestCase):
         remaining_labels = [d[5] for d in result]
         self.assertListEqual(remaining_labels, [0, 7])
 
-    async def test_check_containment_elif_condition(self) -> None:
+    async def test_remove_hardhat_in_no_hardhat(self) -> None:
         """
-        Test the `check_containment` function's `elif` condition to ensure
-        that code lines are covered when index1 is contained by index2.
+        Test that a hardhat inside a no-hardhat box is removed instead.
         """
-        index1: int = 0
-        index2: int = 1
-        datas: list[list[float | int]] = [
-            [70, 70, 130, 130, 0.9, 1],   # bounding box for index1
-            [50, 50, 150, 150, 0.85, 2],  # bounding box for index2
+        datas = [
+            [70, 70, 130, 130, 0.9, 0],   # 'hardhat', fully contained
+            [50, 50, 150, 150, 0.85, 2],  # 'no_hardhat'
         ]
-        result: set[int] = await check_containment(index1, index2, datas)
-        self.assertSetEqual(
-            result, {0}, 'Should identify index1 is contained.',
-        )
+        result = await remove_completely_contained_labels(datas)
+        self.assertEqual(result, [[50, 50, 150, 150, 0.85, 2]])
 
 
 if __name__ == '__main__':
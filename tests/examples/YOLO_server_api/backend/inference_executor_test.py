@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import unittest
+
+from examples.YOLO_server_api.backend.inference_executor import (
+    InferenceExecutor,
+)
+from examples.YOLO_server_api.backend.inference_executor import (
+    InferenceQueueFullError,
+)
+
+
+class Model:
+    """
+    Stands in for a detection model.
+    """
+
+
+class TestInferenceExecutor(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for the bounded inference executor.
+    """
+
+    def setUp(self) -> None:
+        """
+        Creates an executor with one thread and one queue slot.
+        """
+        self.executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Tests that invalid pool sizes are rejected.
+        """
+        with self.assertRaises(ValueError):
+            InferenceExecutor(max_workers=0)
+        with self.assertRaises(ValueError):
+            InferenceExecutor(max_queue_size=-1)
+
+    async def test_run_returns_result_and_timings(self) -> None:
+        """
+        Tests that the result is returned with queue and inference times.
+        """
+        def work(x: int) -> int:
+            time.sleep(0.02)
+            return x * 2
+
+        result, timings = await self.executor.run(work, 21)
+
+        self.assertEqual(result, 42)
+        self.assertGreaterEqual(timings['inference'], 0.02)
+        self.assertGreaterEqual(timings['queue_wait'], 0.0)
+        self.assertEqual(self.executor.pending, 0)
+
+    async def test_event_loop_is_not_blocked(self) -> None:
+        """
+        Tests that other coroutines run while inference blocks a thread.
+        """
+        release = threading.Event()
+        task = asyncio.create_task(self.executor.run(release.wait, 1))
+
+        # The loop can still serve other work during the inference
+        await asyncio.sleep(0.01)
+        self.assertFalse(task.done())
+        release.set()
+        result, _ = await task
+        self.assertTrue(result)
+
+    async def test_queue_full(self) -> None:
+        """
+        Tests backpressure once the worker and queue slot are taken.
+        """
+        release = threading.Event()
+        running = asyncio.create_task(self.executor.run(release.wait, 1))
+        queued = asyncio.create_task(self.executor.run(time.sleep, 0))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.executor.queue_depth, 1)
+
+        with self.assertRaises(InferenceQueueFullError):
+            await self.executor.run(time.sleep, 0)
+
+        release.set()
+        await running
+        _, timings = await queued
+
+        # The queued request waited for the running one to finish
+        self.assertGreater(timings['queue_wait'], 0.005)
+        self.assertEqual(self.executor.pending, 0)
+
+    async def test_cancelled_request_keeps_slot(self) -> None:
+        """
+        Tests that a cancelled request holds its slot until its thread is
+        done.
+        """
+        release = threading.Event()
+        task = asyncio.create_task(self.executor.run(release.wait, 1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        # The inference still runs, so the slot stays taken
+        self.assertEqual(self.executor.pending, 1)
+        release.set()
+        for _ in range(100):
+            if self.executor.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.executor.pending, 0)
+
+    async def test_exclusive_resources(self) -> None:
+        """
+        Tests that requests sharing an object run one at a time, while
+        others run in parallel.
+        """
+        executor = InferenceExecutor(max_workers=3, max_queue_size=0)
+        self.addCleanup(executor.shutdown)
+        model, other_model = Model(), Model()
+        active: dict[int, int] = {id(model): 0, id(other_model): 0}
+        overlaps: list[int] = []
+        lock = threading.Lock()
+
+        def work(resource: object) -> None:
+            with lock:
+                active[id(resource)] += 1
+                overlaps.append(sum(active.values()))
+            time.sleep(0.05)
+            with lock:
+                active[id(resource)] -= 1
+
+        await asyncio.gather(
+            executor.run(work, model, exclusive=(model, None)),
+            executor.run(work, model, exclusive=(model,)),
+            executor.run(work, other_model, exclusive=(other_model,)),
+        )
+
+        # Never both requests for one model, but both models at once
+        self.assertEqual(max(overlaps), 2)
+
+    async def test_exception_releases_slot(self) -> None:
+        """
+        Tests that a failing inference frees its slot.
+        """
+        def fail() -> None:
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            await self.executor.run(fail)
+        self.assertEqual(self.executor.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,10 +36,11 @@ class TestDetectionModelManager(unittest.TestCase):
         Set up the model manager for testing.
         """
         # Patch AutoDetectionModel to avoid actual model loading
-        self.patcher = patch(
-            'examples.YOLO_server_api.backend.models.AutoDetectionModel',
-        )
+        self.patcher = patch('src.model_backends.AutoDetectionModel')
         self.mock_model = self.patcher.start()
+        cuda_patcher = patch('torch.cuda.is_available', return_value=True)
+        cuda_patcher.start()
+        self.addCleanup(cuda_patcher.stop)
         self.model_manager = DetectionModelManager()
 
     def tearDown(self) -> None:
@@ -59,6 +60,37 @@ class TestDetectionModelManager(unittest.TestCase):
             device='cuda:0',
         )
 
+    @patch('torch.cuda.is_available', return_value=False)
+    def test_load_single_model_without_gpu(self, _: Mock) -> None:
+        """
+        Test that models run on the CPU when there is no GPU.
+        """
+        self.model_manager.load_single_model('yolo11s')
+        self.mock_model.from_pretrained.assert_called_with(
+            'yolo11', model_path=str(Path('models/pt/best_yolo11s.pt')),
+            device='cpu',
+        )
+
+    @patch.dict('os.environ', {'MODEL_BACKEND': 'onnx', 'ONNX_THREADS': '2'})
+    @patch('src.model_backends.OnnxDetectionModel')
+    def test_onnx_backend(self, mock_onnx_model: Mock) -> None:
+        """
+        Test that the backend and its threads are read from the
+        environment.
+        """
+        manager = DetectionModelManager()
+
+        self.assertEqual(manager.base_model_path, Path('models/onnx'))
+        self.assertEqual(mock_onnx_model.call_count, 5)
+        mock_onnx_model.assert_any_call(
+            model_path=str(Path('models/onnx/best_yolo11n.onnx')),
+            device='cpu',
+            num_threads=2,
+        )
+
+        with self.assertRaises(ValueError):
+            DetectionModelManager(model_backend='tensorrt')
+
     def test_get_model(self) -> None:
         """
         Test retrieving a model by its key from the manager.
@@ -74,6 +106,28 @@ class TestDetectionModelManager(unittest.TestCase):
         model_none = self.model_manager.get_model('nonexistent')
         self.assertIsNone(model_none)
 
+    @patch('src.model_backends.OnnxDetectionModel')
+    def test_get_quantised_model(self, mock_onnx_model: Mock) -> None:
+        """
+        Test that quantised variants published later load on first use.
+        """
+        with patch('pathlib.Path.is_file', return_value=False):
+            self.assertIsNone(self.model_manager.get_model('yolo11n-int8'))
+
+        with patch('pathlib.Path.is_file', return_value=True):
+            model = self.model_manager.get_model('yolo11n-int8')
+            # Only variants of served models are loaded
+            self.assertIsNone(self.model_manager.get_model('yolo99-int8'))
+
+        self.assertIs(model, mock_onnx_model.return_value)
+        self.assertIs(model, self.model_manager.models['yolo11n-int8'])
+        self.assertIn('yolo11n-int8', self.model_manager.model_names)
+        mock_onnx_model.assert_called_once_with(
+            model_path=str(Path('models/onnx/best_yolo11n-int8.onnx')),
+            device='cpu',
+            num_threads=None,
+        )
+
     @patch.object(DetectionModelManager, 'observer', create=True)
     def test_cleanup_on_delete(self, mock_observer: Mock) -> None:
         """
@@ -131,6 +185,18 @@ class TestModelFileChangeHandler(unittest.TestCase):
         self.model_manager.load_single_model.assert_called_once_with('yolo11n')
         self.assertEqual(self.model_manager.models['yolo11n'], 'dummy_model')
 
+    def test_on_modified_with_onnx_file(self) -> None:
+        """
+        Test that an exported ONNX model is reloaded too.
+        """
+        event = MagicMock()
+        event.is_directory = False
+        event.src_path = 'models/onnx/best_yolo11n.onnx'
+
+        self.handler.on_modified(event)
+
+        self.model_manager.load_single_model.assert_called_once_with('yolo11n')
+
 
 class TestDatabase(unittest.TestCase):
     """
@@ -8,13 +8,18 @@ from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
+import numpy as np
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from fastapi_jwt import JwtAuthorizationCredentials
 
+from examples.YOLO_server_api.backend.inference_executor import (
+    InferenceQueueFullError,
+)
 from examples.YOLO_server_api.backend.routers import custom_rate_limiter
 from examples.YOLO_server_api.backend.routers import detection_router
 from examples.YOLO_server_api.backend.routers import jwt_access
+from examples.YOLO_server_api.backend.routers import MAX_BATCH_SIZE
 from examples.YOLO_server_api.backend.routers import model_loader
 from examples.YOLO_server_api.backend.routers import model_management_router
 
@@ -142,6 +147,120 @@ class TestRouters(unittest.TestCase):
         resp = self.client.post('/api/detect', data=data, files=files)
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json(), [[1.0, 2.0, 3.0, 4.0]])
+        self.assertIn('X-Queue-Wait-Ms', resp.headers)
+        self.assertIn('X-Inference-Ms', resp.headers)
+
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.convert_to_image',
+        new_callable=AsyncMock,
+    )
+    @patch(
+        'examples.YOLO_server_api.backend.routers.get_prediction_result',
+        new_callable=AsyncMock,
+        side_effect=InferenceQueueFullError('Inference queue is full'),
+    )
+    def test_detect_endpoint_queue_full(self, *_) -> None:
+        """
+        Verifies /api/detect returns 503 when the inference queue is full.
+        """
+        files = {'image': ('test.jpg', b'fake_image_data', 'image/jpeg')}
+        data = {'model': 'yolo11n'}
+
+        resp = self.client.post('/api/detect', data=data, files=files)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers['Retry-After'], '1')
+
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.convert_to_image',
+        new_callable=AsyncMock,
+    )
+    @patch('examples.YOLO_server_api.backend.routers.compile_detection_data')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.process_labels',
+        new_callable=AsyncMock,
+        return_value=[],
+    )
+    @patch(
+        'examples.YOLO_server_api.backend.routers.get_prediction_result',
+        new_callable=AsyncMock,
+    )
+    @patch('examples.YOLO_server_api.backend.routers.get_slicer')
+    def test_detect_endpoint_slicing_fields(
+        self,
+        mock_get_slicer: MagicMock,
+        mock_get_prediction_result: AsyncMock,
+        *_,
+    ) -> None:
+        """
+        Verifies the slice settings of the form reach the slicer.
+        """
+        files = {'image': ('test.jpg', b'fake_image_data', 'image/jpeg')}
+        data = {
+            'model': 'yolo11n',
+            'stream_id': 'site_stream',
+            'slice_size': '512',
+            'slice_overlap': '0.2',
+            'diff_threshold': '6',
+            'cascade': 'regions',
+        }
+
+        resp = self.client.post('/api/detect', data=data, files=files)
+        self.assertEqual(resp.status_code, 200)
+        mock_get_slicer.assert_called_once_with(
+            'yolo11n',
+            stream_id='site_stream',
+            slice_size=512,
+            slice_overlap=0.2,
+            diff_threshold=6.0,
+            owner='test_admin',
+        )
+        self.assertIs(
+            mock_get_prediction_result.call_args.kwargs['slicer'],
+            mock_get_slicer.return_value,
+        )
+        cascade = mock_get_prediction_result.call_args.kwargs['cascade']
+        self.assertEqual(cascade.fallback, 'regions')
+
+        # Invalid settings are rejected before inference
+        mock_get_slicer.side_effect = ValueError('bad overlap')
+        resp = self.client.post('/api/detect', data=data, files=files)
+        self.assertEqual(resp.status_code, 400)
+
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.convert_to_image',
+        new_callable=AsyncMock,
+    )
+    @patch('examples.YOLO_server_api.backend.routers.compile_detection_data')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.process_labels',
+        new_callable=AsyncMock,
+        return_value=[],
+    )
+    def test_detect_endpoint_timing_headers(self, *_) -> None:
+        """
+        Verifies the queue wait and inference time reach the headers.
+        """
+        async def fake_prediction(
+            img, model, timings, slicer=None, cascade=None,
+        ):
+            timings.update({'queue_wait': 0.0125, 'inference': 0.25})
+            return 'mock_result'
+
+        with patch(
+            'examples.YOLO_server_api.backend.routers.get_prediction_result',
+            side_effect=fake_prediction,
+        ):
+            files = {'image': ('test.jpg', b'fake_image_data', 'image/jpeg')}
+            resp = self.client.post(
+                '/api/detect', data={'model': 'yolo11n'}, files=files,
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-Queue-Wait-Ms'], '12.5')
+        self.assertEqual(resp.headers['X-Inference-Ms'], '250.0')
 
     @patch.object(model_loader, 'get_model', return_value=None)
     def test_detect_endpoint_model_not_found(self, _) -> None:
@@ -155,6 +274,116 @@ class TestRouters(unittest.TestCase):
         self.assertEqual(resp.status_code, 404)
         self.assertIn('Model not found', resp.text)
 
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    def test_detect_endpoint_invalid_image(self, _) -> None:
+        """
+        Verifies /api/detect returns 400 if the image cannot be decoded.
+        """
+        files = {'image': ('test.webp', b'not_an_image', 'image/webp')}
+        data = {'model': 'yolo11n'}
+
+        resp = self.client.post('/api/detect', data=data, files=files)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Unsupported or corrupt image data', resp.text)
+
+    # ------------------------------------------------------------------------
+    # TEST: /api/detect_batch
+    # ------------------------------------------------------------------------
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.convert_to_image',
+        new_callable=AsyncMock,
+    )
+    @patch(
+        'examples.YOLO_server_api.backend.routers.get_prediction_result',
+        new_callable=AsyncMock,
+    )
+    @patch('examples.YOLO_server_api.backend.routers.compile_detection_data')
+    @patch(
+        'examples.YOLO_server_api.backend.routers.process_labels',
+        new_callable=AsyncMock,
+    )
+    def test_detect_batch_endpoint(
+        self,
+        mock_process_labels: AsyncMock,
+        mock_compile_detection_data: MagicMock,
+        mock_get_prediction_result: AsyncMock,
+        mock_convert_to_image: AsyncMock,
+        mock_get_model: MagicMock,
+    ) -> None:
+        """
+        Verifies /api/detect_batch returns the detections of every image
+        as JSON or as a packed float32 array.
+        """
+        mock_process_labels.side_effect = [
+            [[1, 2, 3, 4, 0.5, 0]], [],
+            [[1, 2, 3, 4, 0.5, 0]], [],
+        ]
+        files = [
+            ('images', ('a.jpg', b'image_a', 'image/jpeg')),
+            ('images', ('b.jpg', b'image_b', 'image/jpeg')),
+        ]
+
+        resp = self.client.post(
+            '/api/detect_batch', data={'model': 'yolo11n'}, files=files,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), [[[1, 2, 3, 4, 0.5, 0]], []])
+
+        resp = self.client.post(
+            '/api/detect_batch',
+            data={'model': 'yolo11n', 'response_format': 'packed'},
+            files=files,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.headers['content-type'], 'application/octet-stream',
+        )
+        header = np.frombuffer(resp.content[:12], dtype='<u4')
+        rows = np.frombuffer(resp.content[12:], dtype='<f4').reshape(-1, 6)
+        self.assertEqual(header.tolist(), [2, 1, 0])
+        np.testing.assert_allclose(rows, [[1, 2, 3, 4, 0.5, 0]])
+        self.assertEqual(mock_get_prediction_result.await_count, 4)
+
+    @patch.object(model_loader, 'get_model', return_value=None)
+    def test_detect_batch_endpoint_model_not_found(self, _) -> None:
+        """
+        Verifies /api/detect_batch returns 404 for an unknown model.
+        """
+        files = [('images', ('a.jpg', b'image_a', 'image/jpeg'))]
+        resp = self.client.post(
+            '/api/detect_batch', data={'model': 'unknown'}, files=files,
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    @patch.object(model_loader, 'get_model', return_value='mock_model')
+    def test_detect_batch_endpoint_bad_requests(self, _) -> None:
+        """
+        Verifies /api/detect_batch returns 400 for an unknown format, too
+        many images or an undecodable image.
+        """
+        files = [('images', ('a.jpg', b'not_an_image', 'image/jpeg'))]
+
+        resp = self.client.post(
+            '/api/detect_batch',
+            data={'model': 'yolo11n', 'response_format': 'xml'},
+            files=files,
+        )
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.post(
+            '/api/detect_batch',
+            data={'model': 'yolo11n'},
+            files=files * (MAX_BATCH_SIZE + 1),
+        )
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.post(
+            '/api/detect_batch', data={'model': 'yolo11n'}, files=files,
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Image 0', resp.text)
+
     # ------------------------------------------------------------------------
     # TEST: /api/model_file_update
     # ------------------------------------------------------------------------
@@ -7,6 +7,7 @@ from unittest.mock import MagicMock
 from fastapi import UploadFile
 from pydantic import ValidationError
 
+from examples.YOLO_server_api.backend.schemas import DetectionBatchRequest
 from examples.YOLO_server_api.backend.schemas import DetectionRequest
 from examples.YOLO_server_api.backend.schemas import ModelFileUpdate
 from examples.YOLO_server_api.backend.schemas import UpdateModelRequest
@@ -52,6 +53,36 @@ class TestDetectionRequest(unittest.TestCase):
         self.assertIs(detection_request.image, mock_file)
 
 
+class TestDetectionBatchRequest(unittest.TestCase):
+    """
+    Tests for the DetectionBatchRequest model in schemas.py
+    """
+
+    def test_as_form_method_manual_args(self):
+        """
+        Tests the as_form classmethod with several images.
+        """
+        files = [MagicMock(spec=UploadFile), MagicMock(spec=UploadFile)]
+        detection_request = DetectionBatchRequest.as_form(
+            model='yolo11n',
+            images=files,
+            response_format='packed',
+        )
+
+        self.assertEqual(detection_request.model, 'yolo11n')
+        self.assertEqual(detection_request.images, files)
+        self.assertEqual(detection_request.response_format, 'packed')
+
+    def test_default_response_format(self):
+        """
+        Tests that results are returned as JSON by default.
+        """
+        detection_request = DetectionBatchRequest(
+            model='yolo11n', images=[MagicMock(spec=UploadFile)],
+        )
+        self.assertEqual(detection_request.response_format, 'json')
+
+
 class TestModelFileUpdate(unittest.TestCase):
     """
     Tests for the ModelFileUpdate model in schemas.py
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import onnx
+from onnx import helper
+from onnx import TensorProto
+
+from examples.YOLO_train.quantise_model import build_quantised_variant
+from examples.YOLO_train.quantise_model import CalibrationImageReader
+from examples.YOLO_train.quantise_model import copy_metadata
+from examples.YOLO_train.quantise_model import quantise_model
+
+CALIBRATION_DIR = 'tests/dataset/train/images'
+
+
+def save_identity_model(path: str, metadata: dict[str, str]) -> None:
+    """
+    Saves a one-node ONNX model with the given metadata.
+    """
+    graph = helper.make_graph(
+        [helper.make_node('Identity', ['images'], ['output0'])],
+        'identity',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, [1])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, [1])],
+    )
+    model = helper.make_model(graph)
+    helper.set_model_props(model, metadata)
+    onnx.save(model, path)
+
+
+class TestQuantiseModel(unittest.TestCase):
+    """
+    Tests for quantising ONNX models.
+    """
+
+    def test_calibration_reader(self) -> None:
+        """
+        Test that calibration images are letterboxed one at a time.
+        """
+        reader = CalibrationImageReader(
+            CALIBRATION_DIR, 'images', (320, 320), max_images=2,
+        )
+        first = reader.get_next()
+        self.assertEqual(first['images'].shape, (1, 3, 320, 320))
+        self.assertIsNotNone(reader.get_next())
+        self.assertIsNone(reader.get_next())
+
+        reader.rewind()
+        self.assertIsNotNone(reader.get_next())
+
+        with tempfile.TemporaryDirectory() as folder:
+            with self.assertRaises(ValueError):
+                CalibrationImageReader(folder, 'images', (320, 320))
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that unknown modes and uncalibrated static runs are rejected.
+        """
+        with self.assertRaises(ValueError):
+            quantise_model('model.onnx', 'model-int8.onnx', mode='int4')
+
+    def test_copy_metadata(self) -> None:
+        """
+        Test that the class names and input size survive quantisation.
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, 'source.onnx')
+            target = os.path.join(folder, 'target.onnx')
+            save_identity_model(
+                source, {'names': "{0: 'Hardhat'}", 'imgsz': '[640, 640]'},
+            )
+            save_identity_model(target, {'imgsz': '[320, 320]'})
+
+            copy_metadata(source, target)
+
+            metadata = {
+                prop.key: prop.value
+                for prop in onnx.load(target).metadata_props
+            }
+            self.assertEqual(
+                metadata,
+                {'names': "{0: 'Hardhat'}", 'imgsz': '[320, 320]'},
+            )
+
+
+class TestBuildQuantisedVariant(unittest.TestCase):
+    """
+    Tests for the accuracy and latency gate of quantised variants.
+    """
+
+    def setUp(self) -> None:
+        """Set up a models folder with an FP32 ONNX model."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.models_dir = Path(self.folder.name)
+        (self.models_dir / 'best_yolo11n.onnx').write_bytes(b'fp32')
+
+        def get_model_path(model_key: str, model_backend: str) -> Path:
+            return self.models_dir / f"best_{model_key}.{model_backend}"
+
+        def quantise(model_path: str, output_path: str, **kwargs) -> str:
+            Path(output_path).write_bytes(b'int8')
+            return output_path
+
+        for target, side_effect in (
+            ('get_model_path', get_model_path),
+            ('quantise_model', quantise),
+        ):
+            patcher = patch(
+                f"examples.YOLO_train.quantise_model.{target}",
+                side_effect=side_effect,
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(
+        self,
+        scores: list[float],
+        latencies: list[float],
+        **kwargs,
+    ) -> dict:
+        """
+        Runs the pipeline with the given scores and latencies.
+        """
+        with patch(
+            'examples.YOLO_train.quantise_model.evaluate_model',
+            side_effect=scores,
+        ), patch(
+            'examples.YOLO_train.quantise_model.measure_latency',
+            side_effect=latencies,
+        ):
+            return build_quantised_variant(
+                'yolo11n',
+                coco_json='tests/dataset/coco_annotations.json',
+                image_dir='tests/dataset/val/images',
+                calibration_dir=CALIBRATION_DIR,
+                tolerance=0.01,
+                **kwargs,
+            )
+
+    def test_publishes_within_tolerance(self) -> None:
+        """
+        Test that an accurate and faster variant is published.
+        """
+        report = self.build([0.50, 0.495], [40.0, 20.0])
+
+        published = self.models_dir / 'best_yolo11n-int8.onnx'
+        self.assertTrue(report['passed'])
+        self.assertTrue(report['published'])
+        self.assertEqual(report['model_path'], str(published))
+        self.assertAlmostEqual(report['drop'], 0.005)
+        self.assertAlmostEqual(report['speedup'], 2.0)
+        self.assertEqual(published.read_bytes(), b'int8')
+
+    def test_rejects_accuracy_drop(self) -> None:
+        """
+        Test that a variant losing too much accuracy is not published.
+        """
+        report = self.build([0.50, 0.48], [40.0, 20.0])
+
+        self.assertFalse(report['passed'])
+        self.assertIsNone(report['model_path'])
+        self.assertFalse((self.models_dir / 'best_yolo11n-int8.onnx').exists())
+
+    def test_rejects_slower_variant_and_dry_run(self) -> None:
+        """
+        Test the latency gate, and that a dry run publishes nothing.
+        """
+        report = self.build([0.50, 0.50], [20.0, 25.0])
+        self.assertFalse(report['passed'])
+
+        report = self.build([0.50, 0.50], [40.0, 20.0], publish=False)
+        self.assertTrue(report['passed'])
+        self.assertFalse(report['published'])
+        self.assertFalse((self.models_dir / 'best_yolo11n-int8.onnx').exists())
+
+    @patch('examples.YOLO_train.quantise_model.YOLOModelHandler')
+    def test_exports_missing_onnx_model(self, mock_handler: MagicMock) -> None:
+        """
+        Test that the FP32 model is exported when there is no ONNX model.
+        """
+        (self.models_dir / 'best_yolo11n.onnx').unlink()
+
+        def export_model(export_format: str, output_path: str) -> str:
+            Path(output_path).write_bytes(b'fp32')
+            return output_path
+
+        mock_handler.return_value.export_model.side_effect = export_model
+
+        self.build([0.50, 0.50], [40.0, 20.0])
+
+        mock_handler.assert_called_once_with(
+            str(self.models_dir / 'best_yolo11n.torch'),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -248,6 +248,31 @@ class TestYOLOModelHandler(unittest.TestCase):
         handler.export_model('onnx')
         mock_model.export.assert_called_with(format='onnx')
 
+    @patch('examples.YOLO_train.train.shutil.move')
+    @patch('examples.YOLO_train.train.YOLO')
+    def test_export_model_to_output_path(
+        self,
+        mock_yolo: unittest.mock.MagicMock,
+        mock_move: unittest.mock.MagicMock,
+    ) -> None:
+        """
+        Test that the exported model is moved to the output path.
+        """
+        mock_model = MagicMock()
+        mock_model.export.return_value = 'models/pt/best_yolo11x.onnx'
+        mock_yolo.return_value = mock_model
+        handler = YOLOModelHandler(self.model_name)
+
+        export_path = handler.export_model(
+            'onnx', output_path='models/onnx/best_yolo11x.onnx', imgsz=640,
+        )
+
+        mock_model.export.assert_called_with(format='onnx', imgsz=640)
+        mock_move.assert_called_once_with(
+            'models/pt/best_yolo11x.onnx', 'models/onnx/best_yolo11x.onnx',
+        )
+        self.assertEqual(export_path, 'models/onnx/best_yolo11x.onnx')
+
     @patch('examples.YOLO_train.train.torch.save')
     @patch('examples.YOLO_train.train.YOLO')
     def test_save_model(
@@ -353,6 +378,7 @@ class TestYOLOModelHandler(unittest.TestCase):
             optimizer='auto',
             cross_validate=False,
             n_splits=5,
+            export_only=False,
         )
 
         main()
@@ -362,6 +388,41 @@ class TestYOLOModelHandler(unittest.TestCase):
         mock_handler.export_model.assert_called_with(export_format='onnx')
         mock_handler.save_model.assert_called_with('model.pt')
 
+    @patch('argparse.ArgumentParser.parse_args')
+    @patch('examples.YOLO_train.train.YOLOModelHandler')
+    def test_main_export_only(
+        self,
+        mock_handler_class: unittest.mock.MagicMock,
+        mock_parse_args: unittest.mock.MagicMock,
+    ) -> None:
+        """
+        Test that a model can be exported without training it.
+        """
+        mock_handler = MagicMock()
+        mock_handler_class.return_value = mock_handler
+        mock_parse_args.return_value = argparse.Namespace(
+            data_config='dataset/data.yaml',
+            epochs=100,
+            model_name='models/pt/best_yolo11n.pt',
+            export_format='onnx',
+            onnx_path='models/onnx/best_yolo11n.onnx',
+            pt_path='model.pt',
+            sahi_image_path='../../assets/IMG_1091.PNG',
+            batch_size=16,
+            optimizer='auto',
+            cross_validate=False,
+            n_splits=5,
+            export_only=True,
+        )
+
+        main()
+
+        mock_handler.train_model.assert_not_called()
+        mock_handler.export_model.assert_called_once_with(
+            export_format='onnx',
+            output_path='models/onnx/best_yolo11n.onnx',
+        )
+
     @patch('argparse.ArgumentParser.parse_args')
     @patch('examples.YOLO_train.train.YOLOModelHandler')
     def test_main_with_cross_validate(
@@ -386,6 +447,7 @@ class TestYOLOModelHandler(unittest.TestCase):
             optimizer='auto',
             cross_validate=True,  # Enable cross-validation
             n_splits=5,
+            export_only=False,
         )
 
         main()
@@ -429,6 +491,7 @@ class TestYOLOModelHandler(unittest.TestCase):
             optimizer='auto',
             cross_validate=False,
             n_splits=5,
+            export_only=False,
         )
 
         # Simulate an exception during training
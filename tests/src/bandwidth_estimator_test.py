@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from src.bandwidth_estimator import BandwidthEstimator
+
+
+class TestBandwidthEstimator(unittest.TestCase):
+    """
+    Tests for the passive bandwidth estimator.
+    """
+
+    def setUp(self) -> None:
+        """Set up an estimator with a cache file of its own."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_path = os.path.join(temp_dir.name, 'bandwidth.json')
+        self.estimator = BandwidthEstimator(
+            cache_path=self.cache_path, ttl=60, smoothing=0.5,
+        )
+
+    def test_record_and_smooth(self) -> None:
+        """
+        Test that measurements are averaged per host.
+        """
+        self.assertIsNone(self.estimator.get('camera.example'))
+
+        # 1 MB in 0.5 s is 16 Mbps
+        self.assertAlmostEqual(
+            self.estimator.record('camera.example', 1_000_000, 0.5), 16.0,
+        )
+        self.assertAlmostEqual(
+            self.estimator.record('camera.example', 1_000_000, 2.0), 10.0,
+        )
+        self.assertAlmostEqual(self.estimator.get('camera.example'), 10.0)
+        self.assertIsNone(self.estimator.get('other.example'))
+
+    def test_small_responses_are_ignored(self) -> None:
+        """
+        Test that playlists and empty durations are not measured.
+        """
+        self.assertIsNone(self.estimator.record('camera.example', 2048, 0.1))
+        self.assertIsNone(
+            self.estimator.record('camera.example', 1_000_000, 0),
+        )
+        self.assertIsNone(self.estimator.get('camera.example'))
+
+    def test_estimates_expire(self) -> None:
+        """
+        Test that an estimate older than the TTL is discarded.
+        """
+        with patch('time.time', return_value=1000.0):
+            self.estimator.record('camera.example', 1_000_000, 0.5)
+        with patch('time.time', return_value=1059.0):
+            self.assertAlmostEqual(
+                self.estimator.get('camera.example'), 16.0,
+            )
+        with patch('time.time', return_value=1061.0):
+            self.assertIsNone(self.estimator.get('camera.example'))
+            # An expired estimate does not weigh on a new measurement
+            self.assertAlmostEqual(
+                self.estimator.record('camera.example', 1_000_000, 1.0),
+                8.0,
+            )
+
+    def test_estimates_are_shared(self) -> None:
+        """
+        Test that estimators on the same cache file share estimates.
+        """
+        other = BandwidthEstimator(cache_path=self.cache_path)
+        self.estimator.record('camera.example', 1_000_000, 0.5)
+        self.assertAlmostEqual(other.get('camera.example'), 16.0)
+
+    def test_unreadable_cache_falls_back(self) -> None:
+        """
+        Test that a corrupt cache file falls back to the local estimates.
+        """
+        self.estimator.record('camera.example', 1_000_000, 0.5)
+        with open(self.cache_path, 'w', encoding='utf-8') as file:
+            file.write('{not json')
+        with patch('builtins.print'):
+            self.assertAlmostEqual(
+                self.estimator.get('camera.example'), 16.0,
+            )
+
+    def test_install_measures_responses(self) -> None:
+        """
+        Test that the session hook measures each downloaded response.
+        """
+        session = MagicMock()
+        session.http.hooks = {'response': []}
+        self.estimator.install(session, 'camera.example')
+        (hook,) = session.http.hooks['response']
+
+        response = MagicMock()
+        response.content = b'\0' * 1_000_000
+        response.elapsed = datetime.timedelta(seconds=0.5)
+        with patch('time.perf_counter', side_effect=[10.0, 10.5]):
+            self.assertIs(hook(response), response)
+        # 1 MB over 0.5 s until the headers and 0.5 s for the body
+        self.assertAlmostEqual(self.estimator.get('camera.example'), 8.0)
+
+    def test_claim_probe(self) -> None:
+        """
+        Test that a host is probed once per TTL, and not while measured.
+        """
+        other = BandwidthEstimator(cache_path=self.cache_path, ttl=60)
+        with patch('time.time', return_value=1000.0):
+            self.assertTrue(self.estimator.claim_probe('camera.example'))
+            self.assertFalse(other.claim_probe('camera.example'))
+            self.assertTrue(other.claim_probe('other.example'))
+        with patch('time.time', return_value=1061.0):
+            self.assertTrue(other.claim_probe('camera.example'))
+            self.estimator.record('measured.example', 1_000_000, 0.5)
+            self.assertFalse(
+                self.estimator.claim_probe('measured.example'),
+            )
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that out-of-range settings are rejected.
+        """
+        with self.assertRaises(ValueError):
+            BandwidthEstimator(ttl=0)
+        with self.assertRaises(ValueError):
+            BandwidthEstimator(smoothing=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
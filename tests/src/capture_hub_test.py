@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import unittest
+from collections.abc import AsyncGenerator
+from unittest import IsolatedAsyncioTestCase
+
+import numpy as np
+
+from src.capture_hub import CaptureHub
+from src.capture_hub import CaptureSubscription
+
+
+class FakeCapture:
+    """
+    Stands in for `StreamCapture`, yielding a new frame on every read.
+    """
+
+    def __init__(self, limit: int | None = None):
+        """
+        Initialises the fake capture.
+
+        Args:
+            limit (int | None): Frames until the stream ends, None for a
+                stream that never ends.
+        """
+        self.limit = limit
+        self.reads = 0
+        self.capture_interval: float = 15
+        self.released = False
+
+    async def execute_capture(
+        self,
+    ) -> AsyncGenerator[tuple[np.ndarray, float]]:
+        while self.limit is None or self.reads < self.limit:
+            self.reads += 1
+            yield np.full((2, 2, 3), self.reads, dtype=np.uint8), time.time()
+
+    def update_capture_interval(self, new_interval: float) -> None:
+        self.capture_interval = new_interval
+
+    async def release_resources(self) -> None:
+        self.released = True
+
+    def get_frame_counters(self) -> dict[str, int]:
+        return {'frames_grabbed': self.reads}
+
+
+async def read_frames(
+    subscription: CaptureSubscription,
+    count: int,
+) -> list[np.ndarray]:
+    """
+    Reads a number of frames from a subscription.
+    """
+    frames = []
+    async for frame, _ in subscription.frames():
+        frames.append(frame)
+        if len(frames) == count:
+            break
+    return frames
+
+
+class TestCaptureHub(IsolatedAsyncioTestCase):
+    """
+    Tests for fanning one source out to several pipelines.
+    """
+
+    def setUp(self) -> None:
+        """Set up a hub on a fake source."""
+        self.capture = FakeCapture()
+        self.hub = CaptureHub(self.capture)
+
+    async def test_frames_are_shared(self) -> None:
+        """
+        Test that pipelines due together share every frame read.
+        """
+        first = self.hub.subscribe('site_a', capture_interval=0)
+        second = self.hub.subscribe('site_b', capture_interval=0)
+
+        first_frames, second_frames = await asyncio.gather(
+            read_frames(first, 3), read_frames(second, 3),
+        )
+
+        self.assertEqual(self.capture.reads, 3)
+        for frame, other in zip(first_frames, second_frames):
+            self.assertIs(frame, other)
+        self.assertEqual(self.hub.frames_read, 3)
+
+    async def test_intervals_are_independent(self) -> None:
+        """
+        Test that a slow pipeline does not slow down a fast one.
+        """
+        fast = self.hub.subscribe('fast', capture_interval=0)
+        slow = self.hub.subscribe('slow', capture_interval=60)
+        slow_task = asyncio.create_task(read_frames(slow, 2))
+        self.addAsyncCleanup(self.hub.stop)
+
+        frames = await read_frames(fast, 5)
+
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(self.capture.reads, 5)
+        self.assertEqual(fast.frames_delivered, 5)
+        self.assertEqual(slow.frames_delivered, 1)
+        # The source is paced by the most frequent pipeline
+        self.assertEqual(self.capture.capture_interval, 0)
+        self.assertFalse(slow_task.done())
+        slow_task.cancel()
+
+    async def test_update_capture_interval_wakes_hub(self) -> None:
+        """
+        Test that a shorter interval is applied to a waiting pipeline.
+        """
+        subscription = self.hub.subscribe('site', capture_interval=60)
+        self.addAsyncCleanup(self.hub.stop)
+        await read_frames(subscription, 1)
+
+        task = asyncio.create_task(read_frames(subscription, 1))
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+
+        subscription.update_capture_interval(0)
+        frames = await asyncio.wait_for(task, 1)
+        self.assertEqual(int(frames[0][0, 0, 0]), 2)
+
+    async def test_source_end_stops_pipelines(self) -> None:
+        """
+        Test that every pipeline stops when the source ends.
+        """
+        self.capture.limit = 2
+        first = self.hub.subscribe('site_a', capture_interval=0)
+        second = self.hub.subscribe('site_b', capture_interval=0)
+
+        first_frames, second_frames = await asyncio.gather(
+            read_frames(first, 10), read_frames(second, 10),
+        )
+
+        self.assertEqual(len(first_frames), 2)
+        self.assertEqual(len(second_frames), 2)
+        self.assertTrue(self.hub.finished)
+        self.assertTrue(self.capture.released)
+
+    async def test_last_pipeline_releases_source(self) -> None:
+        """
+        Test that the source is released once every pipeline has left.
+        """
+        first = self.hub.subscribe('site_a', capture_interval=0)
+        second = self.hub.subscribe('site_b', capture_interval=0)
+        await asyncio.gather(read_frames(first, 1), read_frames(second, 1))
+
+        await first.close()
+        self.assertFalse(self.capture.released)
+        self.assertEqual(len(await read_frames(second, 1)), 1)
+
+        await second.close()
+        self.assertTrue(self.capture.released)
+        self.assertEqual(await read_frames(second, 1), [])
+        self.assertEqual(second.get_frame_counters(), {'frames_grabbed': 2})
+
+    async def test_stop_before_start_releases_source(self) -> None:
+        """
+        Test that a hub that never read a frame still releases the source.
+        """
+        subscription = self.hub.subscribe('site')
+        await subscription.close()
+        self.assertTrue(self.capture.released)
+        self.assertEqual(self.capture.reads, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
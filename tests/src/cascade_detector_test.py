@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import time
+import unittest
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import numpy as np
+from sahi.prediction import ObjectPrediction
+
+from src.cascade_detector import CascadeDetector
+from src.tile_slicer import TileSlicer
+
+
+def make_prediction(
+    bbox: list[int],
+    score: float = 0.9,
+    shift: list[int] | None = None,
+    shape: list[int] | None = None,
+) -> ObjectPrediction:
+    """
+    Builds a SAHI prediction with a box relative to its crop.
+    """
+    return ObjectPrediction(
+        bbox=bbox,
+        category_id=5,
+        category_name='person',
+        score=score,
+        shift_amount=shift or [0, 0],
+        full_shape=shape,
+    )
+
+
+class TestCascadeDetector(unittest.TestCase):
+    """
+    Tests for the CascadeDetector class.
+    """
+
+    def setUp(self) -> None:
+        """
+        Patches SAHI inference on a 1920x1080 frame.
+        """
+        self.frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        self.model = MagicMock()
+        patcher = patch('src.cascade_detector.get_prediction')
+        self.mock_get_prediction = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('src.cascade_detector.get_sliced_prediction')
+        self.mock_get_sliced_prediction = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get_sliced_prediction.return_value = MagicMock(
+            object_prediction_list=[],
+        )
+
+    def full_frame_returns(self, *predictions: ObjectPrediction) -> None:
+        """
+        Makes the full-frame pass find the given predictions, and crops
+        nothing.
+        """
+        def get_prediction(image: Any, model: Any, **kwargs: Any):
+            found = predictions if 'shift_amount' not in kwargs else []
+            return MagicMock(object_prediction_list=list(found))
+
+        self.mock_get_prediction.side_effect = get_prediction
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that out-of-range settings are rejected.
+        """
+        for kwargs in (
+            {'fallback': 'tiles'},
+            {'small_area': 2},
+            {'slice_size': 0},
+            {'max_region_fraction': 0},
+            {'smoothing': 0},
+        ):
+            with self.assertRaises(ValueError):
+                CascadeDetector(**kwargs)  # type: ignore[arg-type]
+
+        cascade = CascadeDetector.from_config(
+            {'fallback': 'regions', 'low_confidence': 0.6},
+        )
+        self.assertEqual(cascade.fallback, 'regions')
+        self.assertEqual(cascade.low_confidence, 0.6)
+
+    def test_full_frame_only(self) -> None:
+        """
+        Test that large confident boxes skip slicing and save latency.
+        """
+        person = make_prediction([800, 300, 1100, 900])
+
+        def slow_prediction(image: Any, model: Any, **kwargs: Any):
+            time.sleep(0.01)
+            return MagicMock(object_prediction_list=[person])
+
+        self.mock_get_prediction.side_effect = slow_prediction
+        cascade = CascadeDetector()
+
+        result = cascade.predict(self.frame, self.model)
+
+        self.assertEqual(result.object_prediction_list, [person])
+        self.mock_get_sliced_prediction.assert_not_called()
+        stats = cascade.get_stats()
+        self.assertEqual(
+            (stats['frames'], stats['full_frame'], stats['sliced']),
+            (1, 1, 0),
+        )
+        # 1920x1080 in 376 px slices takes 28 slices besides the full frame
+        self.assertGreater(stats['latency_saved'], 0.2)
+
+        # Without detections nothing is sliced unless asked for
+        self.full_frame_returns()
+        cascade.predict(self.frame, self.model)
+        self.mock_get_sliced_prediction.assert_not_called()
+        CascadeDetector(slice_when_empty=True).predict(self.frame, self.model)
+        self.mock_get_sliced_prediction.assert_called_once()
+
+    def test_sliced_fallback(self) -> None:
+        """
+        Test that small or uncertain boxes fall back to sliced inference,
+        without repeating the full-frame pass.
+        """
+        small = make_prediction([100, 100, 130, 140])
+        uncertain = make_prediction([800, 300, 1100, 900], score=0.4)
+        tile_person = make_prediction([1500, 500, 1530, 540])
+        self.mock_get_sliced_prediction.return_value = MagicMock(
+            object_prediction_list=[tile_person],
+        )
+        cascade = CascadeDetector()
+
+        for found in (small, uncertain):
+            with self.subTest(found=found):
+                self.full_frame_returns(found)
+                result = cascade.predict(self.frame, self.model)
+                self.assertCountEqual(
+                    result.object_prediction_list, [found, tile_person],
+                )
+        kwargs = self.mock_get_sliced_prediction.call_args.kwargs
+        self.assertFalse(kwargs['perform_standard_pred'])
+        self.assertEqual(kwargs['slice_height'], 376)
+        self.assertEqual(cascade.get_stats()['sliced'], 2)
+        self.assertIsNotNone(cascade.sliced_latency)
+
+    def test_sliced_fallback_with_slicer(self) -> None:
+        """
+        Test that the stream's slicer settings and state are used.
+        """
+        small = make_prediction([100, 100, 130, 140])
+        self.full_frame_returns(small)
+        slicer = TileSlicer(slice_size=512, overlap_ratio=0.2)
+        CascadeDetector().predict(self.frame, self.model, slicer)
+        kwargs = self.mock_get_sliced_prediction.call_args.kwargs
+        self.assertEqual(kwargs['slice_width'], 512)
+        self.assertEqual(kwargs['overlap_width_ratio'], 0.2)
+
+        incremental = MagicMock(spec=TileSlicer)
+        incremental.incremental = True
+        incremental.slice_size = 376
+        incremental.overlap_ratio = 0.3
+        incremental.predict.return_value = MagicMock(
+            object_prediction_list=[],
+        )
+        CascadeDetector().predict(self.frame, self.model, incremental)
+        # The full-frame pass is handed over rather than run again
+        incremental.predict.assert_called_once_with(
+            self.frame, self.model, full_predictions=[small],
+        )
+        self.mock_get_sliced_prediction.assert_called_once()
+
+    def test_regions_fallback(self) -> None:
+        """
+        Test that only crops around small boxes are inferred again.
+        """
+        # Two nearby small boxes share a crop, which stays in the frame
+        first = make_prediction([10, 20, 40, 60])
+        second = make_prediction([200, 100, 230, 140])
+        large = make_prediction([800, 300, 1100, 900])
+        self.full_frame_returns(first, second, large)
+        cascade = CascadeDetector(fallback='regions')
+
+        result = cascade.predict(self.frame, self.model)
+
+        crops = [
+            call for call in self.mock_get_prediction.call_args_list
+            if 'shift_amount' in call.kwargs
+        ]
+        self.assertEqual(len(crops), 1)
+        self.assertEqual(crops[0].kwargs['shift_amount'], [0, 0])
+        self.assertEqual(crops[0].args[0].shape, (376, 403, 3))
+        self.assertEqual(len(result.object_prediction_list), 3)
+        self.mock_get_sliced_prediction.assert_not_called()
+        self.assertEqual(cascade.get_stats()['regions'], 1)
+
+    def test_regions_merge_with_full_frame(self) -> None:
+        """
+        Test that a box found again in its crop is merged, not doubled.
+        """
+        small = make_prediction([1000, 500, 1030, 540], score=0.6)
+
+        def get_prediction(image: Any, model: Any, **kwargs: Any):
+            if 'shift_amount' not in kwargs:
+                return MagicMock(object_prediction_list=[small])
+            x, y = kwargs['shift_amount']
+            found = make_prediction(
+                [1001 - x, 501 - y, 1030 - x, 540 - y],
+                shift=kwargs['shift_amount'],
+                shape=kwargs['full_shape'],
+            )
+            return MagicMock(object_prediction_list=[found])
+
+        self.mock_get_prediction.side_effect = get_prediction
+        result = CascadeDetector(fallback='regions').predict(
+            self.frame, self.model,
+        )
+        self.assertEqual(len(result.object_prediction_list), 1)
+
+    def test_regions_too_large(self) -> None:
+        """
+        Test that crops covering too much of the frame slice it all.
+        """
+        self.full_frame_returns(
+            *(
+                make_prediction([x, y, x + 20, y + 20])
+                for x in (100, 600, 1100, 1600)
+                for y in (100, 800)
+            ),
+        )
+        cascade = CascadeDetector(fallback='regions')
+        cascade.predict(self.frame, self.model)
+        self.mock_get_sliced_prediction.assert_called_once()
+        self.assertEqual(cascade.get_stats()['sliced'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from collections.abc import AsyncGenerator
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.capture_hub import CaptureHub
+from src.clip_recorder import ClipRecorder
+from src.clip_recorder import FrameRingBuffer
+from src.clip_recorder import write_clip
+
+
+class FakeCapture:
+    """
+    Stands in for `StreamCapture`, yielding frames as fast as requested.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.capture_interval: float = 15
+        self.released = False
+
+    async def execute_capture(
+        self,
+    ) -> AsyncGenerator[tuple[np.ndarray, float]]:
+        while True:
+            self.reads += 1
+            frame = np.full((32, 48, 3), self.reads % 255, dtype=np.uint8)
+            yield frame, time.time()
+
+    def update_capture_interval(self, new_interval: float) -> None:
+        self.capture_interval = new_interval
+
+    async def release_resources(self) -> None:
+        self.released = True
+
+    def get_frame_counters(self) -> dict[str, int]:
+        return {'frames_grabbed': self.reads}
+
+
+def encode(value: int) -> bytes:
+    """
+    Returns a small JPEG frame filled with a value.
+    """
+    frame = np.full((32, 48, 3), value, dtype=np.uint8)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+    """
+    Tests for the ring buffer of compressed frames.
+    """
+
+    def test_evicts_old_frames(self) -> None:
+        """
+        Test that frames older than the window are evicted.
+        """
+        buffer = FrameRingBuffer(max_seconds=2, max_bytes=10_000)
+        for timestamp in range(5):
+            buffer.append(float(timestamp), b'x' * 10)
+
+        self.assertEqual([t for t, _ in buffer.frames], [2.0, 3.0, 4.0])
+        self.assertEqual(buffer.nbytes, 30)
+        self.assertEqual(buffer.frames_evicted, 2)
+        self.assertEqual(buffer.get_buffered_seconds(), 2.0)
+
+    def test_evicts_beyond_size(self) -> None:
+        """
+        Test that the oldest frames are evicted to stay within the size.
+        """
+        buffer = FrameRingBuffer(max_seconds=60, max_bytes=25)
+        for timestamp in range(3):
+            buffer.append(float(timestamp), b'x' * 10)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.nbytes, 20)
+
+        buffer.resize(15)
+        self.assertEqual([t for t, _ in buffer.frames], [2.0])
+
+    def test_get_frames(self) -> None:
+        """
+        Test that frames are selected by their capture time.
+        """
+        buffer = FrameRingBuffer(max_seconds=60, max_bytes=1000)
+        for timestamp in range(6):
+            buffer.append(float(timestamp), bytes([timestamp]))
+        self.assertEqual(
+            buffer.get_frames(1.5, 4.0),
+            [(2.0, b'\x02'), (3.0, b'\x03'), (4.0, b'\x04')],
+        )
+
+
+class TestWriteClip(unittest.TestCase):
+    """
+    Tests for writing buffered frames to a file.
+    """
+
+    def setUp(self) -> None:
+        """Set up a temporary folder and frames."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.folder = temp_dir.name
+        self.frames = [(float(i), encode(i * 40)) for i in range(4)]
+
+    def test_mjpeg(self) -> None:
+        """
+        Test that MJPEG clips are the JPEG frames without re-encoding.
+        """
+        path = os.path.join(self.folder, 'clip.mjpeg')
+        write_clip(path, self.frames, 2.0, 'mjpeg')
+        with open(path, 'rb') as file:
+            self.assertEqual(
+                file.read(), b''.join(jpeg for _, jpeg in self.frames),
+            )
+
+    def test_mp4(self) -> None:
+        """
+        Test that MP4 clips contain every frame.
+        """
+        path = os.path.join(self.folder, 'clip.mp4')
+        write_clip(path, self.frames, 2.0, 'mp4')
+        cap = cv2.VideoCapture(path)
+        self.addCleanup(cap.release)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 4)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 48)
+
+
+class TestClipRecorder(IsolatedAsyncioTestCase):
+    """
+    Tests for recording clips around violations.
+    """
+
+    def setUp(self) -> None:
+        """Set up a hub on a fake source and a clip folder."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.folder = temp_dir.name
+        self.capture = FakeCapture()
+        self.hub = CaptureHub(self.capture)
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that unsupported settings are rejected.
+        """
+        with self.assertRaises(ValueError):
+            ClipRecorder(self.hub, 'site_stream', clip_format='gif')
+        with self.assertRaises(ValueError):
+            ClipRecorder(self.hub, 'site_stream', fps=0)
+        with self.assertRaises(ValueError):
+            ClipRecorder(self.hub, 'site_stream', pre_seconds=-1)
+
+    def test_from_config(self) -> None:
+        """
+        Test that the configuration entry maps onto the recorder.
+        """
+        recorder = ClipRecorder.from_config(
+            {'format': 'mp4', 'pre_seconds': 3, 'max_buffer_mb': 1},
+            self.hub,
+            'site_stream',
+        )
+        self.assertEqual(recorder.clip_format, 'mp4')
+        self.assertEqual(recorder.pre_seconds, 3)
+        self.assertEqual(recorder.buffer.max_bytes, 1024 * 1024)
+
+    async def test_records_clip_around_event(self) -> None:
+        """
+        Test that a clip covers the frames before and after the event.
+        """
+        recorder = ClipRecorder(
+            self.hub,
+            'site_stream',
+            output_folder=self.folder,
+            pre_seconds=0.2,
+            post_seconds=0.2,
+            fps=20,
+        )
+        recorder.start()
+        await asyncio.sleep(0.3)
+
+        event_time = time.time()
+        with patch(
+            'src.clip_recorder.write_clip', side_effect=write_clip,
+        ) as mock_write:
+            self.assertTrue(recorder.trigger(event_time))
+            # Events while the clip is recording do not start another one
+            self.assertFalse(recorder.trigger(event_time + 0.1))
+            await recorder.stop()
+
+        self.assertEqual(recorder.clips_written, 1)
+        (clip_name,) = os.listdir(self.folder)
+        self.assertTrue(clip_name.startswith('site_stream_'))
+        self.assertTrue(clip_name.endswith('.mjpeg'))
+        # Frames from both sides of the event went into the clip
+        frames = mock_write.call_args.args[1]
+        self.assertTrue(any(t < event_time for t, _ in frames))
+        self.assertTrue(any(t > event_time for t, _ in frames))
+        with open(os.path.join(self.folder, clip_name), 'rb') as file:
+            self.assertEqual(
+                file.read().count(b'\xff\xd8\xff'), len(frames),
+            )
+        # The source is released once the recorder leaves it
+        self.assertTrue(self.capture.released)
+
+    async def test_node_budget_is_shared(self) -> None:
+        """
+        Test that the buffer keeps to its share of the node limit.
+        """
+        node_usage = {'other_stream': 0}
+        recorder = ClipRecorder(
+            self.hub,
+            'site_stream',
+            fps=50,
+            max_buffer_mb=1,
+            node_usage=node_usage,
+            node_limit_mb=0.01,
+        )
+        recorder.start()
+        await asyncio.sleep(0.3)
+
+        stats = recorder.get_stats()
+        # Half of the 10 KB node limit, shared with the other stream
+        self.assertEqual(stats['max_bytes'], 5242)
+        self.assertLessEqual(stats['buffer_bytes'], 5242)
+        self.assertGreater(stats['frames'], 0)
+        self.assertEqual(node_usage['site_stream'], stats['buffer_bytes'])
+
+        await recorder.stop()
+        self.assertNotIn('site_stream', node_usage)
+
+
+if __name__ == '__main__':
+    unittest.main()
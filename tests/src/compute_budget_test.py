@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from src.compute_budget import compute_allocations
+from src.compute_budget import ComputeBudgetScheduler
+from src.compute_budget import MAX_INTERVAL
+from src.compute_budget import StreamDemand
+
+
+def demand(
+    cost: float,
+    latency: float,
+    priority: float = 1.0,
+    min_fps: float = 0.0,
+    max_fps: float = 1.0,
+) -> StreamDemand:
+    """
+    Builds the report of a stream.
+    """
+    return {
+        'cost': cost,
+        'latency': latency,
+        'priority': priority,
+        'min_fps': min_fps,
+        'max_fps': max_fps,
+        'updated_at': 0.0,
+    }
+
+
+class TestComputeAllocations(unittest.TestCase):
+    """
+    Tests for splitting the compute budget between streams.
+    """
+
+    def test_priorities_share_device_time(self) -> None:
+        """
+        Test that device time is shared in proportion to priorities.
+        """
+        allocations = compute_allocations(
+            {
+                'a': demand(0.1, 0.1, priority=1, max_fps=100),
+                'b': demand(0.2, 0.2, priority=3, max_fps=100),
+            },
+            budget=0.4,
+        )
+        self.assertAlmostEqual(allocations['a']['share'], 0.25)
+        self.assertAlmostEqual(allocations['b']['share'], 0.75)
+        self.assertAlmostEqual(allocations['a']['fps'], 1.0)
+        self.assertAlmostEqual(allocations['b']['interval'], 1 / 1.5)
+
+    def test_saturated_streams_pass_on_budget(self) -> None:
+        """
+        Test that a stream at its maximum rate leaves budget to others.
+        """
+        allocations = compute_allocations(
+            {
+                'a': demand(0.2, 0.5, priority=3),
+                'b': demand(0.2, 0.5, priority=1),
+            },
+            budget=0.3,
+        )
+        self.assertAlmostEqual(allocations['a']['fps'], 1.0)
+        self.assertAlmostEqual(allocations['b']['fps'], 0.5)
+        self.assertAlmostEqual(
+            allocations['a']['share'] + allocations['b']['share'], 1.0,
+        )
+
+    def test_latency_caps_rate(self) -> None:
+        """
+        Test that a stream is never asked for frames faster than it runs.
+        """
+        allocations = compute_allocations(
+            {'a': demand(0.1, 2.0, max_fps=10)}, budget=1.0,
+        )
+        self.assertAlmostEqual(allocations['a']['interval'], 2.0)
+        self.assertAlmostEqual(allocations['a']['share'], 0.05)
+
+    def test_minimum_rates_scaled_when_overloaded(self) -> None:
+        """
+        Test that minimum rates beyond the budget are scaled down evenly.
+        """
+        allocations = compute_allocations(
+            {
+                'a': demand(1.0, 1.0, min_fps=1.0),
+                'b': demand(1.0, 1.0, min_fps=0.5, priority=10),
+            },
+            budget=0.75,
+        )
+        self.assertAlmostEqual(allocations['a']['fps'], 0.5)
+        self.assertAlmostEqual(allocations['b']['fps'], 0.25)
+
+    def test_interval_is_capped(self) -> None:
+        """
+        Test that a stream without budget keeps the longest interval.
+        """
+        allocations = compute_allocations(
+            {'a': demand(1.0, 1.0)}, budget=1e-12,
+        )
+        self.assertLessEqual(allocations['a']['interval'], MAX_INTERVAL)
+
+
+class TestComputeBudgetScheduler(unittest.TestCase):
+    """
+    Tests for the node scheduler of capture intervals.
+    """
+
+    def setUp(self) -> None:
+        """Set up a scheduler with one device-second per second."""
+        self.scheduler = ComputeBudgetScheduler(budget=1.0, smoothing=0.5)
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that out-of-range settings are rejected.
+        """
+        with self.assertRaises(ValueError):
+            ComputeBudgetScheduler(budget=0)
+        with self.assertRaises(ValueError):
+            self.scheduler.report('a', 0.1, 0.1, priority=0)
+        with self.assertRaises(ValueError):
+            self.scheduler.report('a', 0.1, 0.1, min_fps=2, max_fps=1)
+
+    def test_report_smooths_costs(self) -> None:
+        """
+        Test that reported costs and latencies are averaged.
+        """
+        self.scheduler.report('a', cost=0.2, latency=1.0)
+        self.scheduler.report('a', cost=0.4, latency=2.0, priority=2)
+        self.assertAlmostEqual(self.scheduler.demands['a']['cost'], 0.3)
+        self.assertAlmostEqual(self.scheduler.demands['a']['latency'], 1.5)
+        self.assertEqual(self.scheduler.demands['a']['priority'], 2)
+
+    def test_allocate_and_get_interval(self) -> None:
+        """
+        Test that streams read the interval allocated to them.
+        """
+        self.assertEqual(self.scheduler.get_interval('a', default=3), 3)
+
+        self.scheduler.report('a', cost=0.5, latency=0.5, max_fps=4)
+        self.scheduler.report('b', cost=0.5, latency=0.5, max_fps=4)
+        allocations = self.scheduler.allocate()
+
+        self.assertAlmostEqual(allocations['a']['fps'], 1.0)
+        self.assertAlmostEqual(self.scheduler.get_interval('a', 3), 1.0)
+        self.assertAlmostEqual(self.scheduler.get_utilisation(), 1.0)
+        self.assertEqual(self.scheduler.get_allocations(), allocations)
+
+    def test_stale_and_unregistered_streams_are_dropped(self) -> None:
+        """
+        Test that streams that stopped reporting release their budget.
+        """
+        with patch('time.time', return_value=1000.0):
+            self.scheduler.report('a', cost=0.5, latency=0.5)
+        with patch('time.time', return_value=1200.0):
+            self.scheduler.report('b', cost=0.5, latency=0.5)
+            self.scheduler.allocate()
+        self.assertEqual(set(self.scheduler.get_allocations()), {'a', 'b'})
+
+        with patch('time.time', return_value=1301.0):
+            self.scheduler.allocate()
+        self.assertEqual(set(self.scheduler.get_allocations()), {'b'})
+        self.assertNotIn('a', self.scheduler.demands)
+
+        self.scheduler.unregister('b')
+        self.assertEqual(self.scheduler.get_allocations(), {})
+        self.assertEqual(self.scheduler.get_interval('b', default=5), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
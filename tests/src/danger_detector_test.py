@@ -137,6 +137,95 @@ class TestDangerDetector(unittest.TestCase):
         warnings, polygons = self.detector.detect_danger(normalised_data)
         self.assertIn('Warning: Someone is too close to machinery!', warnings)
 
+    def test_track_ids(self) -> None:
+        """
+        Test that track IDs after the class do not change the warnings.
+        """
+        data: list[list[float]] = [
+            [120, 120, 100, 100, 0.95, 5, 1],  # Person, track 1
+            [110, 110, 200, 200, 0.85, 8, 2],  # Machinery, track 2
+        ]
+        self.assertEqual(
+            Utils.normalise_data(data)[0], [100, 100, 120, 120, 0.95, 5, 1],
+        )
+        for engine in ('python', 'numpy'):
+            warnings, _ = DangerDetector(engine=engine).detect_danger(data)
+            self.assertIn(
+                'Warning: Someone is too close to machinery!', warnings,
+            )
+
+    def test_invalid_engine(self) -> None:
+        """
+        Test case for rejecting an unsupported engine.
+        """
+        with self.assertRaises(ValueError):
+            DangerDetector(engine='invalid')
+
+    def test_numpy_engine_matches_python_engine(self) -> None:
+        """
+        Test case for checking both engines produce the same warnings.
+        """
+        numpy_detector = DangerDetector(engine='numpy')
+        cases: list[list[list[float]]] = [
+            [],
+            # Person close to machinery, first of two nearby objects
+            [
+                [100, 100, 120, 120, 0.95, 5],
+                [110, 110, 200, 200, 0.85, 8],
+                [110, 110, 200, 200, 0.85, 9],
+            ],
+            # Person close to a vehicle only
+            [
+                [100, 100, 120, 120, 0.95, 5],
+                [110, 110, 200, 200, 0.85, 9],
+            ],
+            # Driver inside the vehicle is ignored
+            [
+                [150, 250, 170, 350, 0.9, 5],
+                [100, 200, 300, 400, 0.9, 9],
+                [155, 255, 165, 265, 0.8, 2],
+            ],
+            # Violations with and without matching persons
+            [
+                [706.87, 445.07, 976.32, 1073.6, 0.91, 2.0],
+                [0.45513, 471.77, 662.03, 1071.4, 0.75853, 4.0],
+                [0.45513, 471.77, 662.03, 1071.4, 0.9, 5.0],
+                [500, 500, 700, 700, 0.95, 8],
+            ],
+            # Violations only
+            [
+                [400, 400, 500, 500, 0.75, 2],
+                [10, 10, 20, 20, 0.75, 4],
+            ],
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                python_warnings, _ = self.detector.detect_danger(data)
+                numpy_warnings, _ = numpy_detector.detect_danger(data)
+                self.assertCountEqual(numpy_warnings, python_warnings)
+
+    def test_numpy_engine_respects_detection_items(self) -> None:
+        """
+        Test case for checking disabled items are skipped by the numpy engine.
+        """
+        detector = DangerDetector(
+            {
+                'detect_no_safety_vest_or_helmet': False,
+                'detect_near_machinery_or_vehicle': True,
+                'detect_in_restricted_area': False,
+            },
+            engine='numpy',
+        )
+        data: list[list[float]] = [
+            [100, 100, 120, 120, 0.95, 5],  # Person
+            [110, 110, 200, 200, 0.85, 8],  # Machinery
+            [400, 400, 500, 500, 0.75, 2],  # NO-Hardhat
+        ]
+        warnings, _ = detector.detect_danger(data)
+        self.assertEqual(
+            warnings, ['Warning: Someone is too close to machinery!'],
+        )
+
     @patch('builtins.print')
     def test_main(self, mock_print: MagicMock) -> None:
         """
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+
+from src.detection_tracker import DetectionTracker
+from src.detection_tracker import KalmanBoxTrack
+from src.label_postprocessing import iou_matrix
+
+
+def person_at(x: float) -> list[float]:
+    """
+    Builds a person detection with its left edge at x.
+    """
+    return [x, 100, x + 40, 180, 0.9, 5]
+
+
+class TestKalmanBoxTrack(unittest.TestCase):
+    """
+    Tests for the constant-velocity box filter.
+    """
+
+    def test_learns_velocity(self) -> None:
+        """
+        Test that updates at a steady pace predict the next box.
+        """
+        track = KalmanBoxTrack(1, person_at(0))
+        for step in range(1, 6):
+            track.predict()
+            track.update(person_at(4 * step))
+        track.predict()
+
+        np.testing.assert_allclose(track.box, person_at(24)[:4], atol=1.5)
+        self.assertAlmostEqual(track.speed, 4 / 80, delta=0.01)
+
+
+class TestDetectionTracker(unittest.TestCase):
+    """
+    Tests for detecting every K frames and tracking in between.
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up a static background frame.
+        """
+        self.frame = np.full((360, 640, 3), 100, dtype=np.uint8)
+
+    def run_frames(
+        self,
+        tracker: DetectionTracker,
+        count: int,
+        speed: float,
+    ) -> tuple[int, list[float]]:
+        """
+        Feeds a moving person, detecting when the tracker asks.
+
+        Returns:
+            tuple[int, list[float]]: Frames detected, and the IoUs of the
+                tracked boxes with the true ones.
+        """
+        detected, ious = 0, []
+        for frame_index in range(count):
+            truth = person_at(50 + speed * frame_index)
+            datas = tracker.propagate(self.frame)
+            if datas is None:
+                datas = tracker.update(self.frame, [truth])
+                detected += 1
+            else:
+                ious.append(
+                    iou_matrix(
+                        np.array([datas[0][:4]]), np.array([truth[:4]]),
+                    )[0, 0],
+                )
+            self.assertEqual(len(datas[0]), 7)
+        return detected, ious
+
+    def test_skips_detection_on_steady_scene(self) -> None:
+        """
+        Test that K grows for slow objects and tracks stay on them.
+        """
+        tracker = DetectionTracker(max_interval=8)
+        detected, ious = self.run_frames(tracker, 60, speed=3)
+
+        self.assertLess(detected, 15)
+        self.assertEqual(tracker.interval, 8)
+        self.assertGreater(min(ious), 0.7)
+        self.assertEqual(tracker.next_id, 2)
+        self.assertEqual(
+            tracker.get_stats(),
+            {'frames': 60, 'detections': detected, 'interval': 8,
+             'tracks': 1},
+        )
+
+    def test_fast_objects_limit_interval(self) -> None:
+        """
+        Test that fast objects keep K small.
+        """
+        tracker = DetectionTracker(max_interval=8, max_drift=0.5)
+        self.run_frames(tracker, 40, speed=20)
+        self.assertLessEqual(tracker.interval, 2)
+
+    def test_interval_halves_on_poor_prediction(self) -> None:
+        """
+        Test that a detection far from the prediction halves K.
+        """
+        tracker = DetectionTracker(max_interval=8)
+        self.run_frames(tracker, 30, speed=0)
+        self.assertEqual(tracker.interval, 8)
+
+        # The object jumps, so the next detection matches nothing
+        while tracker.propagate(self.frame) is not None:
+            pass
+        datas = tracker.update(self.frame, [person_at(400)])
+        self.assertEqual(tracker.interval, 4)
+        self.assertEqual(datas[0][6], 2)
+
+    def test_scene_change_forces_detection(self) -> None:
+        """
+        Test that a changed frame is detected before K frames pass.
+        """
+        tracker = DetectionTracker(min_interval=8, max_interval=8)
+        self.assertIsNone(tracker.propagate(self.frame))
+        tracker.update(self.frame, [person_at(0)])
+        self.assertEqual(len(tracker.propagate(self.frame)), 1)
+        self.assertIsNone(tracker.propagate(self.frame + 50))
+
+    def test_tracks_keep_ids_and_expire(self) -> None:
+        """
+        Test that IDs follow their class and lost tracks are dropped.
+        """
+        tracker = DetectionTracker(max_misses=1)
+        hardhat = [10, 10, 30, 30, 0.8, 0]
+        first = tracker.update(self.frame, [person_at(0), hardhat])
+        self.assertEqual([data[6] for data in first], [1, 2])
+
+        # Same place, different class: a new track
+        second = tracker.update(self.frame, [person_at(0)[:5] + [2]])
+        self.assertEqual(second[0][6], 3)
+
+        tracker.update(self.frame, [])
+        self.assertEqual(tracker.get_stats()['tracks'], 1)
+        tracker.update(self.frame, [])
+        self.assertEqual(tracker.get_stats()['tracks'], 0)
+
+    def test_invalid_intervals(self) -> None:
+        """
+        Test that an empty interval range is rejected.
+        """
+        with self.assertRaises(ValueError):
+            DetectionTracker(min_interval=4, max_interval=2)
+        self.assertEqual(
+            DetectionTracker.from_config({'max_interval': 3}).max_interval, 3,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
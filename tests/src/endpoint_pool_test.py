@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.endpoint_pool import Endpoint
+from src.endpoint_pool import EndpointPool
+from src.endpoint_pool import NoEndpointAvailableError
+from src.live_stream_detection import LiveStreamDetector
+
+
+def server_error(status: int = 500) -> aiohttp.ClientResponseError:
+    """
+    Builds the error raised for a failed response.
+    """
+    return aiohttp.ClientResponseError(
+        request_info=None,  # type: ignore[arg-type]
+        history=(),
+        status=status,
+    )
+
+
+def create_stub_app(
+    delay: float = 0.0,
+    status: int = 200,
+    label: int = 0,
+) -> tuple[web.Application, dict[str, int]]:
+    """
+    Creates a detection server stub answering after a delay.
+
+    Args:
+        delay (float): Seconds to wait before answering detections.
+        status (int): The status of detection responses.
+        label (int): The label of the detection returned.
+
+    Returns:
+        tuple[web.Application, dict[str, int]]: The stub application and
+            the number of detection requests it received.
+    """
+    counts = {'detections': 0}
+
+    async def token(request: web.Request) -> web.Response:
+        return web.json_response({'access_token': 'stub'})
+
+    async def detect(request: web.Request) -> web.Response:
+        counts['detections'] += 1
+        await request.post()
+        await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response(
+            [[10, 10, 50, 50, 0.9, label]],
+        )
+
+    app = web.Application()
+    app.router.add_post('/api/token', token)
+    app.router.add_post('/api/detect', detect)
+    return app, counts
+
+
+class TestEndpointPool(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for choosing, breaking, hedging and retrying endpoints.
+    """
+
+    def test_least_outstanding(self) -> None:
+        """
+        Test that idle endpoints take turns and busy ones are avoided.
+        """
+        pool = EndpointPool(['a', 'http://b/', 'c'])
+        self.assertEqual(pool.endpoints[1].url, 'http://b')
+        picks = [pool.choose().url for _ in range(4)]  # type: ignore
+        self.assertEqual(
+            picks, ['http://a', 'http://b', 'http://c', 'http://a'],
+        )
+
+        pool.endpoints[1].outstanding = 2
+        pool.endpoints[2].outstanding = 1
+        pool.endpoints[0].outstanding = 1
+        self.assertIs(pool.choose(), pool.endpoints[2])
+
+    def test_latency_strategy(self) -> None:
+        """
+        Test that the expected wait decides, unmeasured endpoints first.
+        """
+        pool = EndpointPool(['a', 'b'], strategy='latency')
+        pool.record_success(pool.endpoints[0], 0.1)
+        self.assertIs(pool.choose(), pool.endpoints[1])
+
+        pool.record_success(pool.endpoints[1], 0.3)
+        self.assertIs(pool.choose(), pool.endpoints[0])
+        pool.endpoints[0].outstanding = 3
+        self.assertIs(pool.choose(), pool.endpoints[1])
+
+    def test_circuit_breaker(self) -> None:
+        """
+        Test opening after repeated failures and a single probe.
+        """
+        pool = EndpointPool(['a'], failure_threshold=2, reset_timeout=10)
+        endpoint = pool.endpoints[0]
+        pool.record_failure(endpoint)
+        self.assertEqual(endpoint.state, 'closed')
+        pool.record_failure(endpoint)
+        self.assertEqual(endpoint.state, 'open')
+        self.assertIsNone(pool.choose())
+
+        # One probe after the reset timeout, which fails and reopens
+        endpoint.opened_at = time.monotonic() - 10
+        self.assertIs(pool.choose(), endpoint)
+        self.assertEqual(endpoint.state, 'half-open')
+        self.assertIsNone(pool.choose())
+        pool.record_failure(endpoint)
+        self.assertEqual(endpoint.state, 'open')
+
+        # A successful probe closes it
+        endpoint.opened_at = time.monotonic() - 10
+        pool.choose()
+        pool.record_success(endpoint, 0.1)
+        self.assertEqual(endpoint.state, 'closed')
+        self.assertEqual(endpoint.failures, 0)
+
+    def test_hedge_delay(self) -> None:
+        """
+        Test the latency percentile after enough samples.
+        """
+        pool = EndpointPool(['a', 'b'], hedge_percentile=0.9)
+        for latency in range(1, 20):
+            pool.record_success(pool.endpoints[0], latency / 100)
+        self.assertIsNone(pool.hedge_delay())
+        pool.record_success(pool.endpoints[0], 0.2)
+        self.assertAlmostEqual(pool.hedge_delay(), 0.19)  # type: ignore
+
+        self.assertIsNone(EndpointPool(['a']).hedge_delay())
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that unusable settings are rejected.
+        """
+        for kwargs in (
+            {'urls': []},
+            {'urls': ['a'], 'strategy': 'random'},
+            {'urls': ['a'], 'hedge_percentile': 1.5},
+            {'urls': ['a'], 'max_retries': -1},
+            {'urls': ['a'], 'request_timeout': 0},
+        ):
+            with self.assertRaises(ValueError):
+                EndpointPool(**kwargs)  # type: ignore[arg-type]
+
+        pool = EndpointPool.from_config({'max_retries': 0}, 'http://x')
+        self.assertEqual(pool.endpoints[0].url, 'http://x')
+        self.assertEqual(pool.max_retries, 0)
+
+    async def test_retries_are_capped(self) -> None:
+        """
+        Test that failures move to other endpoints up to max_retries.
+        """
+        pool = EndpointPool(['a', 'b'], max_retries=2, failure_threshold=5)
+        calls: list[str] = []
+
+        async def send(endpoint: Endpoint) -> str:
+            calls.append(endpoint.url)
+            raise server_error(503)
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await pool.request(send)
+        self.assertEqual(calls, ['http://a', 'http://b', 'http://a'])
+        self.assertEqual(pool.retries, 2)
+
+        # Errors that are not the fault of the endpoint are not retried
+        calls.clear()
+
+        async def reject(endpoint: Endpoint) -> str:
+            calls.append(endpoint.url)
+            raise server_error(422)
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await pool.request(reject)
+        self.assertEqual(len(calls), 1)
+
+    async def test_stalled_request_times_out(self) -> None:
+        """
+        Test that a request hanging past the timeout fails its endpoint.
+        """
+        pool = EndpointPool(
+            ['a'], request_timeout=0.05, failure_threshold=1, max_retries=0,
+        )
+
+        async def stall(endpoint: Endpoint) -> str:
+            await asyncio.sleep(30)
+            return 'late'
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await pool.request(stall)
+        self.assertEqual(pool.endpoints[0].state, 'open')
+        self.assertEqual(pool.endpoints[0].outstanding, 0)
+
+    async def test_all_open(self) -> None:
+        """
+        Test failing fast while every circuit breaker is open.
+        """
+        pool = EndpointPool(['a'], failure_threshold=1)
+        pool.record_failure(pool.endpoints[0])
+
+        async def send(endpoint: Endpoint) -> str:
+            return 'ok'
+
+        with self.assertRaises(NoEndpointAvailableError):
+            await pool.request(send)
+
+    async def test_hedging(self) -> None:
+        """
+        Test that a slow request is hedged and the loser cancelled.
+        """
+        pool = EndpointPool(
+            ['slow', 'fast'], hedge_percentile=0.5, hedge_min_samples=1,
+        )
+        pool.latencies.append(0.01)
+        cancelled = asyncio.Event()
+
+        async def send(endpoint: Endpoint) -> str:
+            if endpoint.url == 'http://slow':
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+            return endpoint.url
+
+        start = time.perf_counter()
+        self.assertEqual(await pool.request(send), 'http://fast')
+        self.assertLess(time.perf_counter() - start, 1)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(pool.hedges, 1)
+        self.assertEqual(pool.endpoints[0].outstanding, 0)
+
+
+class TestEndpointPoolWithStubServers(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests of server detection against local stub servers.
+    """
+
+    async def asyncSetUp(self) -> None:
+        """
+        Set up credentials for the stub servers.
+        """
+        patcher_env = patch.dict(
+            os.environ,
+            {'API_USERNAME': 'test_user', 'API_PASSWORD': 'test_pass'},
+        )
+        patcher_env.start()
+        self.addCleanup(patcher_env.stop)
+        self.frame = np.zeros((32, 32, 3), dtype=np.uint8)
+
+    async def start_server(self, app: web.Application) -> str:
+        """
+        Starts a stub server and returns its URL.
+        """
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        return str(server.make_url('')).rstrip('/')
+
+    def create_detector(
+        self,
+        urls: list[str],
+        **kwargs,
+    ) -> LiveStreamDetector:
+        """
+        Builds a detector spreading detection over the given servers.
+        """
+        detector = LiveStreamDetector(
+            api_url=urls[0],
+            detect_with_server=True,
+            endpoint_pool=EndpointPool(urls, **kwargs),
+        )
+        self.addAsyncCleanup(detector.close)
+        return detector
+
+    async def test_hedges_slow_server(self) -> None:
+        """
+        Test that a stalled server does not stall detection.
+        """
+        slow_app, slow_counts = create_stub_app(delay=2.0)
+        fast_app, fast_counts = create_stub_app(label=1)
+        urls = [
+            await self.start_server(slow_app),
+            await self.start_server(fast_app),
+        ]
+        detector = self.create_detector(
+            urls, hedge_percentile=0.9, hedge_min_samples=1,
+        )
+        detector.endpoint_pool.latencies.append(0.05)
+
+        start = time.perf_counter()
+        datas = await detector.generate_detections_cloud(self.frame)
+
+        self.assertLess(time.perf_counter() - start, 1.5)
+        self.assertEqual(datas, [[10, 10, 50, 50, 0.9, 1]])
+        self.assertEqual(slow_counts['detections'], 1)
+        self.assertEqual(fast_counts['detections'], 1)
+
+    async def test_breaks_failing_server(self) -> None:
+        """
+        Test that a failing server is retried elsewhere, then skipped.
+        """
+        failing_app, failing_counts = create_stub_app(status=500)
+        healthy_app, healthy_counts = create_stub_app()
+        urls = [
+            await self.start_server(failing_app),
+            await self.start_server(healthy_app),
+        ]
+        detector = self.create_detector(urls, failure_threshold=2)
+
+        for _ in range(6):
+            datas = await detector.generate_detections_cloud(self.frame)
+            self.assertEqual(len(datas), 1)
+
+        self.assertEqual(failing_counts['detections'], 2)
+        self.assertEqual(healthy_counts['detections'], 6)
+        stats = detector.endpoint_pool.get_stats()
+        self.assertEqual(stats['endpoints'][0]['state'], 'open')
+        self.assertEqual(stats['retries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
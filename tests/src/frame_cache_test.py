@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+
+from src.frame_cache import fingerprint_frame
+from src.frame_cache import FrameCache
+
+
+def make_frame(seed: int = 0) -> np.ndarray:
+    """
+    Builds a textured BGR frame.
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    return np.repeat(np.repeat(small, 40, axis=0), 40, axis=1)
+
+
+class TestFingerprintFrame(unittest.TestCase):
+    """
+    Tests for the difference hash of frames.
+    """
+
+    def test_noise_keeps_hash_close(self) -> None:
+        """
+        Test that sensor noise barely changes the hash, unlike a new scene.
+        """
+        frame = make_frame()
+        noise = np.random.default_rng(1).integers(-3, 4, frame.shape)
+        noisy = np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+        reference = fingerprint_frame(frame)
+        self.assertLessEqual(
+            (reference ^ fingerprint_frame(noisy)).bit_count(), 4,
+        )
+        self.assertGreater(
+            (reference ^ fingerprint_frame(make_frame(2))).bit_count(), 40,
+        )
+        self.assertLessEqual(
+            fingerprint_frame(frame[..., 0], hash_size=8).bit_length(), 64,
+        )
+
+
+class TestFrameCache(unittest.TestCase):
+    """
+    Tests for reusing the results of unchanged frames.
+    """
+
+    def test_hits_and_misses(self) -> None:
+        """
+        Test that matching frames reuse results and new scenes do not.
+        """
+        cache = FrameCache()
+        frame = make_frame()
+
+        self.assertIsNone(cache.lookup(frame, 0))
+        cache.store('results', 0)
+        self.assertEqual(cache.lookup(frame.copy(), 1), 'results')
+        self.assertIsNone(cache.lookup(make_frame(2), 2))
+
+        self.assertEqual(
+            cache.get_stats(),
+            {
+                'hits': 1,
+                'misses': 2,
+                'hit_rate': 1 / 3,
+                'identical_frames': 0,
+                'frozen': False,
+            },
+        )
+
+    def test_max_age(self) -> None:
+        """
+        Test that results expire unless the camera is frozen.
+        """
+        cache = FrameCache(max_age=10, frozen_after=3)
+        frame = make_frame()
+        cache.lookup(frame, 0)
+        cache.store('results', 0)
+
+        self.assertEqual(cache.lookup(frame, 5), 'results')
+        self.assertIsNone(cache.lookup(frame, 10))
+        cache.store('refreshed', 10)
+
+        # Frozen cameras keep their results
+        cache.lookup(frame, 11)
+        self.assertTrue(cache.frozen)
+        self.assertEqual(cache.lookup(frame, 100), 'refreshed')
+
+    def test_frozen_camera(self) -> None:
+        """
+        Test that identical frames flag the camera until the picture
+        changes, while frames that only match the hash do not.
+        """
+        cache = FrameCache(frozen_after=2)
+        frame = make_frame()
+        cache.lookup(frame, 0)
+        cache.lookup(frame, 1)
+        self.assertFalse(cache.frozen)
+        cache.lookup(frame, 2)
+        self.assertTrue(cache.frozen)
+        self.assertEqual(cache.get_stats()['identical_frames'], 2)
+
+        changed = frame.copy()
+        changed[0, 0, 0] ^= 1
+        cache.lookup(changed, 3)
+        self.assertFalse(cache.frozen)
+
+    def test_from_config(self) -> None:
+        """
+        Test building caches from stream configuration.
+        """
+        cache = FrameCache.from_config({'max_distance': 2, 'max_age': 5})
+        self.assertEqual(cache.max_distance, 2)
+        self.assertEqual(cache.max_age, 5)
+        self.assertEqual(FrameCache.from_config(None).hash_size, 16)
+
+        with self.assertRaises(ValueError):
+            FrameCache(frozen_after=0)
+        with self.assertRaises(ValueError):
+            FrameCache(max_distance=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import queue
+import time
+import unittest
+from collections import OrderedDict
+from typing import Any
+from unittest.mock import AsyncMock
+from unittest.mock import call
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import numpy as np
+
+from src.inference_scheduler import collect_batch
+from src.inference_scheduler import default_detector_factory
+from src.inference_scheduler import get_stream_state
+from src.inference_scheduler import InferenceScheduler
+from src.inference_scheduler import run_inference_worker
+from src.inference_scheduler import SchedulerClient
+
+
+class FakeDetector:
+    """
+    A detector that returns the frame's first pixel as its label.
+    """
+
+    def __init__(self, model_key: str, model_backend: str = 'torch'):
+        self.model_key = model_key
+        self.model_backend = model_backend
+
+    async def generate_detections_local(
+        self,
+        frame: np.ndarray,
+    ) -> list[list[float]]:
+        if frame[0, 0, 0] == 255:
+            raise ValueError('bad frame')
+        return [[0, 0, 10, 10, 0.9, int(frame[0, 0, 0])]]
+
+
+def fake_factory(model_key: str, model_backend: str = 'torch') -> Any:
+    if model_key == 'missing':
+        raise FileNotFoundError('missing model')
+    return FakeDetector(model_key, model_backend)
+
+
+def make_request(
+    request_id: int,
+    response_queue: Any,
+    model_key: str = 'yolo11n',
+    value: int = 1,
+) -> dict[str, Any]:
+    return {
+        'request_id': request_id,
+        'stream_id': 'site_stream',
+        'model_key': model_key,
+        'frame': np.full((4, 4, 3), value, dtype=np.uint8),
+        'submitted_at': time.time(),
+        'response_queue': response_queue,
+    }
+
+
+class TestCollectBatch(unittest.TestCase):
+    """
+    Tests for the micro-batch collection.
+    """
+
+    def test_collects_up_to_max_batch_size(self) -> None:
+        """
+        Test that a batch never exceeds the maximum batch size.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        for i in range(5):
+            request_queue.put({'request_id': i})
+
+        batch = collect_batch(request_queue, 3, 50)
+
+        self.assertIsNotNone(batch)
+        self.assertEqual([r['request_id'] for r in batch or []], [0, 1, 2])
+        self.assertEqual(request_queue.qsize(), 2)
+
+    def test_stops_after_max_wait(self) -> None:
+        """
+        Test that a partial batch is returned after the maximum wait.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        request_queue.put({'request_id': 0})
+
+        start = time.monotonic()
+        batch = collect_batch(request_queue, 8, 20)
+
+        self.assertEqual(len(batch or []), 1)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_sentinel(self) -> None:
+        """
+        Test that the stop sentinel ends the worker loop.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        request_queue.put(None)
+        self.assertIsNone(collect_batch(request_queue, 8, 20))
+
+        # A sentinel behind a request ends the batch and is kept
+        request_queue.put({'request_id': 0})
+        request_queue.put(None)
+        batch = collect_batch(request_queue, 8, 20)
+        self.assertEqual(len(batch or []), 1)
+        self.assertIsNone(request_queue.get_nowait())
+
+
+class TestRunInferenceWorker(unittest.TestCase):
+    """
+    Tests for the model-owning worker loop.
+    """
+
+    def test_serves_batches_and_records_stats(self) -> None:
+        """
+        Test that a batch is grouped by model and answered per request.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        request_queue.put(make_request(0, response_queue, value=5))
+        request_queue.put(make_request(1, response_queue, 'yolo11s', 7))
+        request_queue.put(make_request(2, response_queue, value=255))
+        request_queue.put(make_request(3, response_queue, 'missing'))
+        request_queue.put(None)
+        factory = MagicMock(side_effect=fake_factory)
+        stats: dict[int, dict[str, float]] = {}
+
+        run_inference_worker(0, request_queue, stats, 8, 50, factory)
+
+        responses = {}
+        while not response_queue.empty():
+            response = response_queue.get_nowait()
+            responses[response['request_id']] = response
+
+        self.assertEqual(responses[0]['datas'], [[0, 0, 10, 10, 0.9, 5]])
+        self.assertEqual(responses[1]['datas'], [[0, 0, 10, 10, 0.9, 7]])
+        self.assertEqual(responses[2]['error'], 'bad frame')
+        self.assertEqual(responses[3]['error'], 'missing model')
+        self.assertEqual(responses[0]['batch_size'], 4)
+
+        # Each model is loaded once, however many requests use it
+        self.assertEqual(factory.call_count, 3)
+        self.assertEqual(stats[0]['frames'], 4)
+        self.assertEqual(stats[0]['batches'], 1)
+
+    def test_detector_per_backend(self) -> None:
+        """
+        Test that a model is loaded once for each backend it runs on.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        for request_id, backend in enumerate(['torch', 'onnx', 'onnx']):
+            request = make_request(request_id, response_queue)
+            request['model_backend'] = backend
+            request_queue.put(request)
+        request_queue.put(make_request(3, response_queue))
+        request_queue.put(None)
+        factory = MagicMock(side_effect=fake_factory)
+
+        run_inference_worker(0, request_queue, {}, 8, 50, factory)
+
+        self.assertEqual(
+            factory.call_args_list,
+            [call('yolo11n', 'torch'), call('yolo11n', 'onnx')],
+        )
+        self.assertEqual(response_queue.qsize(), 4)
+
+    @patch('src.inference_scheduler.TileSlicer.from_config')
+    def test_slicer_per_stream(self, mock_from_config: MagicMock) -> None:
+        """
+        Test that each stream with slicing settings keeps its own slicer.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        slicing = {'incremental': True}
+        for request_id, stream_id in enumerate(['a', 'b', 'a']):
+            request = make_request(request_id, response_queue)
+            request['stream_id'] = stream_id
+            request['slicing'] = slicing
+            request_queue.put(request)
+        request_queue.put(None)
+        detector = MagicMock()
+        detector.generate_detections_local = AsyncMock(return_value=[])
+        mock_from_config.side_effect = lambda config: MagicMock()
+
+        run_inference_worker(
+            0, request_queue, {}, 8, 50, lambda *key: detector,
+        )
+
+        # One slicer per stream, reused for the stream's later frames
+        self.assertEqual(mock_from_config.call_count, 2)
+        calls = detector.generate_detections_local.call_args_list
+        self.assertIs(calls[0].kwargs['slicer'], calls[2].kwargs['slicer'])
+        self.assertIsNot(
+            calls[0].kwargs['slicer'], calls[1].kwargs['slicer'],
+        )
+
+    @patch('src.inference_scheduler.TileSlicer.from_config')
+    def test_slicer_rebuilt_on_switch(
+        self,
+        mock_from_config: MagicMock,
+    ) -> None:
+        """
+        Test that a stream switching model or slicing gets a new slicer.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        settings = [
+            ('yolo11m', {'slice_size': 376}),
+            ('yolo11m', {'slice_size': 376}),
+            ('yolo11s', {'slice_size': 376}),
+            ('yolo11s', {'slice_size': 512}),
+        ]
+        for request_id, (model_key, slicing) in enumerate(settings):
+            request = make_request(request_id, response_queue, model_key)
+            request['slicing'] = slicing
+            request_queue.put(request)
+        request_queue.put(None)
+        detector = MagicMock()
+        detector.generate_detections_local = AsyncMock(return_value=[])
+
+        run_inference_worker(
+            0, request_queue, {}, 1, 0, lambda *key: detector,
+        )
+
+        self.assertEqual(
+            [call.args[0] for call in mock_from_config.call_args_list],
+            [{'slice_size': 376}, {'slice_size': 376}, {'slice_size': 512}],
+        )
+
+    @patch('src.inference_scheduler.CascadeDetector.from_config')
+    def test_cascade_per_stream(self, mock_from_config: MagicMock) -> None:
+        """
+        Test that each stream with a cascade keeps its own statistics.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        for request_id, stream_id in enumerate(['a', 'b', 'a']):
+            request = make_request(request_id, response_queue)
+            request['stream_id'] = stream_id
+            request['cascade'] = {'fallback': 'regions'}
+            request_queue.put(request)
+        request_queue.put(None)
+        detector = MagicMock()
+        detector.generate_detections_local = AsyncMock(return_value=[])
+        mock_from_config.side_effect = lambda config: MagicMock()
+
+        run_inference_worker(
+            0, request_queue, {}, 8, 50, lambda *key: detector,
+        )
+
+        self.assertEqual(mock_from_config.call_count, 2)
+        calls = detector.generate_detections_local.call_args_list
+        self.assertIs(calls[0].kwargs['cascade'], calls[2].kwargs['cascade'])
+        self.assertNotIn('slicer', calls[0].kwargs)
+
+    @patch('src.inference_scheduler.CascadeDetector.from_config')
+    def test_cascade_rebuilt_on_switch(
+        self,
+        mock_from_config: MagicMock,
+    ) -> None:
+        """
+        Test that a stream changing its cascade settings starts over.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue: queue.Queue = queue.Queue()
+        for request_id, fallback in enumerate(
+            ['regions', 'regions', 'sliced'],
+        ):
+            request = make_request(request_id, response_queue)
+            request['cascade'] = {'fallback': fallback}
+            request_queue.put(request)
+        request_queue.put(None)
+        detector = MagicMock()
+        detector.generate_detections_local = AsyncMock(return_value=[])
+
+        run_inference_worker(
+            0, request_queue, {}, 1, 0, lambda *key: detector,
+        )
+
+        self.assertEqual(
+            [call.args[0] for call in mock_from_config.call_args_list],
+            [{'fallback': 'regions'}, {'fallback': 'sliced'}],
+        )
+
+    @patch('src.inference_scheduler.MAX_STREAM_SLICERS', 2)
+    def test_stream_state_evicted(self) -> None:
+        """
+        Test that the least recently used stream state is dropped.
+        """
+        states: OrderedDict = OrderedDict()
+        for stream_id in ['a', 'b', 'a', 'c']:
+            get_stream_state(states, stream_id, 'config', object)
+
+        self.assertEqual(list(states), ['a', 'c'])
+
+    def test_dropped_response(self) -> None:
+        """
+        Test that a response for a stopped stream is dropped with a warning.
+        """
+        request_queue: queue.Queue = queue.Queue()
+        response_queue = MagicMock()
+        response_queue.put.side_effect = BrokenPipeError('closed')
+        request_queue.put(make_request(0, response_queue))
+        request_queue.put(None)
+
+        with self.assertLogs('src.inference_scheduler', 'WARNING'):
+            run_inference_worker(0, request_queue, {}, 8, 10, fake_factory)
+
+
+class TestSchedulerClient(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for the stream-side scheduler client.
+    """
+
+    def setUp(self) -> None:
+        self.request_queue: queue.Queue = queue.Queue()
+        self.response_queue: queue.Queue = queue.Queue()
+        self.client = SchedulerClient(
+            'site_stream', 'yolo11n',
+            self.request_queue, self.response_queue, timeout=1.0,
+        )
+
+    def respond(self, request_id: int, **kwargs: Any) -> None:
+        response = {
+            'request_id': request_id,
+            'datas': [[1, 2, 3, 4, 0.5, 5]],
+            'error': None,
+            'queue_time': 0.0,
+            'inference_time': 0.0,
+            'batch_size': 1,
+        }
+        response.update(kwargs)
+        self.response_queue.put(response)
+
+    async def test_generate_detections(self) -> None:
+        """
+        Test submitting a frame and receiving its detections.
+        """
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        # A stale response from an earlier request is skipped
+        self.respond(-1, datas=[])
+        self.respond(0)
+
+        datas, returned_frame = await self.client.generate_detections(frame)
+
+        self.assertEqual(datas, [[1, 2, 3, 4, 0.5, 5]])
+        self.assertIs(returned_frame, frame)
+        request = self.request_queue.get_nowait()
+        self.assertEqual(request['stream_id'], 'site_stream')
+        self.assertEqual(request['model_key'], 'yolo11n')
+        self.assertIs(request['response_queue'], self.response_queue)
+
+    async def test_generate_detections_error(self) -> None:
+        """
+        Test that a scheduler error is raised to the pipeline.
+        """
+        self.respond(0, error='boom')
+        with self.assertRaises(RuntimeError):
+            await self.client.generate_detections(np.zeros((1, 1, 3)))
+
+    async def test_generate_detections_timeout(self) -> None:
+        """
+        Test that a missing result raises a timeout.
+        """
+        self.client.timeout = 0.05
+        with self.assertRaises(TimeoutError):
+            await self.client.generate_detections(np.zeros((1, 1, 3)))
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    """
+    Tests for the scheduler with real worker processes.
+    """
+
+    def setUp(self) -> None:
+        self.manager = multiprocessing.Manager()
+        self.addCleanup(self.manager.shutdown)
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that invalid scheduler arguments are rejected.
+        """
+        with self.assertRaises(ValueError):
+            InferenceScheduler(self.manager, max_batch_size=0)
+        with self.assertRaises(ValueError):
+            InferenceScheduler(self.manager, num_workers=0)
+
+    def test_end_to_end(self) -> None:
+        """
+        Test detections served by worker processes and throughput reporting.
+        """
+        scheduler = InferenceScheduler(
+            self.manager,
+            max_batch_size=4,
+            max_wait_ms=5,
+            num_workers=2,
+            detector_factory=fake_factory,
+        )
+        scheduler.start()
+        self.addCleanup(scheduler.stop)
+
+        client = scheduler.create_client('site_stream', 'yolo11n')
+        frame = np.full((4, 4, 3), 3, dtype=np.uint8)
+
+        for _ in range(3):
+            datas, _ = asyncio.run(client.generate_detections(frame))
+            self.assertEqual(datas, [[0, 0, 10, 10, 0.9, 3]])
+
+        self.assertEqual(scheduler.total_frames(), 3)
+        with self.assertLogs('src.inference_scheduler', 'INFO'):
+            report = scheduler.report_throughput()
+        self.assertEqual(report['total_frames'], 3)
+        self.assertGreater(report['frames_per_second'], 0)
+
+        scheduler.stop()
+        self.assertEqual(scheduler.workers, [])
+
+    @patch('src.inference_scheduler.LiveStreamDetector')
+    def test_default_detector_factory(self, mock_detector: MagicMock) -> None:
+        """
+        Test that the default factory builds a local detector.
+        """
+        default_detector_factory('yolo11s', 'onnx', num_threads=2)
+        mock_detector.assert_called_once_with(
+            model_key='yolo11s',
+            detect_with_server=False,
+            model_backend='onnx',
+            num_threads=2,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import random
+import unittest
+
+import numpy as np
+
+from src.label_postprocessing import containment_matrix
+from src.label_postprocessing import iou_matrix
+from src.label_postprocessing import LOCAL_IOU_THRESHOLD
+from src.label_postprocessing import remove_conflicting_labels
+from src.label_postprocessing import SERVER_IOU_THRESHOLD
+
+PAIRS = ((0, 2), (7, 4))
+
+
+def overlap(bbox1: list[float], bbox2: list[float]) -> float:
+    """
+    The per-pair IoU the label post-processing used before.
+    """
+    x1, y1 = max(bbox1[0], bbox2[0]), max(bbox1[1], bbox2[1])
+    x2, y2 = min(bbox1[2], bbox2[2]), min(bbox1[3], bbox2[3])
+    intersection = max(0, x2 - x1 + 1) * max(0, y2 - y1 + 1)
+    area1 = (bbox1[2] - bbox1[0] + 1) * (bbox1[3] - bbox1[1] + 1)
+    area2 = (bbox2[2] - bbox2[0] + 1) * (bbox2[3] - bbox2[1] + 1)
+    return intersection / float(area1 + area2 - intersection)
+
+
+def contained(inner: list[float], outer: list[float]) -> bool:
+    """
+    The per-pair containment check used before.
+    """
+    return (
+        inner[0] >= outer[0] and inner[2] <= outer[2]
+        and inner[1] >= outer[1] and inner[3] <= outer[3]
+    )
+
+
+def remove_overlaps(datas: list, threshold: float) -> list:
+    """
+    The overlap pass of the previous post-processing.
+    """
+    to_remove = set()
+    for positive, negative in PAIRS:
+        for i, a in enumerate(datas):
+            for j, b in enumerate(datas):
+                if a[5] == positive and b[5] == negative:
+                    if overlap(a[:4], b[:4]) > threshold:
+                        to_remove.add(j)
+    return [d for i, d in enumerate(datas) if i not in to_remove]
+
+
+def remove_contained(datas: list) -> list:
+    """
+    The containment pass of the previous post-processing.
+    """
+    to_remove = set()
+    for positive, negative in PAIRS:
+        for i, a in enumerate(datas):
+            for j, b in enumerate(datas):
+                if a[5] != positive or b[5] != negative:
+                    continue
+                if contained(b[:4], a[:4]):
+                    to_remove.add(j)
+                elif contained(a[:4], b[:4]):
+                    to_remove.add(i)
+    return [d for i, d in enumerate(datas) if i not in to_remove]
+
+
+def random_detections(count: int, seed: int) -> list[list[float]]:
+    """
+    Builds clustered detections so that overlaps and containment occur.
+    """
+    rng = random.Random(seed)
+    datas = []
+    for _ in range(count):
+        x, y = rng.randint(0, 60), rng.randint(0, 60)
+        w, h = rng.randint(1, 40), rng.randint(1, 40)
+        datas.append(
+            [
+                x, y, x + w, y + h,
+                round(rng.random(), 2), rng.choice([0, 2, 4, 7, 5]),
+            ],
+        )
+    return datas
+
+
+class TestMatrices(unittest.TestCase):
+    """
+    Tests for the pairwise box matrices.
+    """
+
+    def test_iou_matrix(self) -> None:
+        """
+        Test that IoUs count the last pixel of each box.
+        """
+        boxes1 = np.array([[10, 10, 50, 50], [0, 0, 5, 5]])
+        boxes2 = np.array([[20, 20, 40, 40]])
+        iou = iou_matrix(boxes1, boxes2)
+        self.assertEqual(iou.shape, (2, 1))
+        self.assertAlmostEqual(iou[0, 0], 0.262344, places=6)
+        self.assertEqual(iou[1, 0], 0)
+
+    def test_containment_matrix(self) -> None:
+        """
+        Test that boxes on the edges of another count as contained.
+        """
+        outer = np.array([[10, 10, 50, 50]])
+        inner = np.array(
+            [
+                [20, 20, 40, 40],
+                [5, 5, 40, 40],
+                [10, 10, 50, 50],
+                [0, 0, 60, 60],
+            ],
+        )
+        np.testing.assert_array_equal(
+            containment_matrix(inner, outer)[:, 0],
+            [True, False, True, False],
+        )
+
+
+class TestRemoveConflictingLabels(unittest.TestCase):
+    """
+    Tests for removing contradicting labels in one pass.
+    """
+
+    def test_positive_inside_negative(self) -> None:
+        """
+        Test that a Hardhat inside a NO-Hardhat box is dropped instead.
+        """
+        datas = [[10, 10, 50, 50, 0.8, 2], [20, 20, 30, 30, 0.9, 0]]
+        self.assertEqual(
+            remove_conflicting_labels(datas), [[10, 10, 50, 50, 0.8, 2]],
+        )
+
+    def test_options(self) -> None:
+        """
+        Test that each check can be turned off and pairs configured.
+        """
+        datas = [
+            [0, 0, 100, 100, 0.9, 0],
+            [10, 10, 90, 90, 0.8, 2],
+            [0, 0, 10, 10, 0.8, 5],
+        ]
+        self.assertEqual(len(remove_conflicting_labels(datas)), 2)
+        self.assertEqual(
+            len(
+                remove_conflicting_labels(
+                    datas, iou_threshold=None, remove_contained=False,
+                ),
+            ),
+            3,
+        )
+        self.assertEqual(
+            len(remove_conflicting_labels(datas, label_pairs=[(7, 4)])), 3,
+        )
+        self.assertEqual(remove_conflicting_labels([]), [])
+
+    def test_equivalent_to_local_passes(self) -> None:
+        """
+        Test that one pass matches the overlap then containment passes of
+        local detection.
+        """
+        for seed in range(200):
+            datas = random_detections(random.Random(seed).randint(0, 30), seed)
+            expected = remove_contained(
+                remove_overlaps(datas, LOCAL_IOU_THRESHOLD),
+            )
+            self.assertEqual(
+                remove_conflicting_labels(datas, LOCAL_IOU_THRESHOLD),
+                expected,
+                f"seed {seed}",
+            )
+
+    def test_equivalent_to_server_passes(self) -> None:
+        """
+        Test that one pass matches the three passes of the server.
+        """
+        for seed in range(200):
+            datas = random_detections(random.Random(seed).randint(0, 30), seed)
+            expected = remove_overlaps(
+                remove_contained(
+                    remove_overlaps(datas, SERVER_IOU_THRESHOLD),
+                ),
+                SERVER_IOU_THRESHOLD,
+            )
+            self.assertEqual(
+                remove_conflicting_labels(datas, SERVER_IOU_THRESHOLD),
+                expected,
+                f"seed {seed}",
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
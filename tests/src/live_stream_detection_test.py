@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
+import threading
 import unittest
 from typing import Any
 from unittest.mock import AsyncMock
@@ -15,8 +17,10 @@ import yarl
 from multidict import CIMultiDict
 from multidict import CIMultiDictProxy
 
+from src.cascade_detector import CascadeDetector
 from src.live_stream_detection import LiveStreamDetector
 from src.live_stream_detection import main
+from src.tile_slicer import TileSlicer
 
 
 class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
@@ -49,6 +53,7 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
             output_folder=self.output_folder,
             detect_with_server=self.detect_with_server,
         )
+        self.addAsyncCleanup(self.detector.close)
 
     ########################################################################
     # Initialisation tests
@@ -92,13 +97,13 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
         # Validate that the shared token is set correctly
         self.assertEqual(detector.shared_token, shared_token)
 
-    def test_shared_lock(self):
+    async def test_shared_lock(self):
         """
-        Test shared lock acquire and release methods.
+        Test that the token manager acquires and releases the shared lock.
         """
         # Mock a shared lock for testing
         shared_lock = MagicMock()
-        shared_lock.acquire = MagicMock()
+        shared_lock.acquire = MagicMock(return_value=True)
         shared_lock.release = MagicMock()
 
         # Initialise the detector with a shared lock
@@ -108,14 +113,88 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
             shared_lock=shared_lock,
         )
 
-        # Test acquiring the lock
-        detector.acquire_shared_lock()
-        shared_lock.acquire.assert_called_once()
+        # Test acquiring the lock without blocking the event loop
+        await detector.token_manager.acquire_shared_lock()
+        shared_lock.acquire.assert_called_once_with(blocking=False)
 
         # Test releasing the lock
-        detector.release_shared_lock()
+        detector.token_manager.release_shared_lock()
         shared_lock.release.assert_called_once()
 
+    ########################################################################
+    # Session tests
+    ########################################################################
+
+    async def test_get_session_is_reused(self) -> None:
+        """
+        Test that one pooled session is shared by all API requests.
+        """
+        detector = LiveStreamDetector(
+            api_url=self.api_url,
+            connection_limit=4,
+            connection_limit_per_host=2,
+            dns_cache_ttl=60,
+        )
+        session = detector.get_session()
+
+        self.assertIs(detector.get_session(), session)
+        connector = session.connector
+        assert isinstance(connector, aiohttp.TCPConnector)
+        self.assertEqual(connector.limit, 4)
+        self.assertEqual(connector.limit_per_host, 2)
+        self.assertTrue(connector.use_dns_cache)
+
+        await detector.close()
+        self.assertTrue(session.closed)
+        self.assertIsNone(detector.session)
+
+    async def test_get_session_after_close(self) -> None:
+        """
+        Test that a new session is created after the previous one closed.
+        """
+        session = self.detector.get_session()
+        await session.close()
+
+        new_session = self.detector.get_session()
+        self.assertIsNot(new_session, session)
+        self.assertFalse(new_session.closed)
+
+        await self.detector.close()
+        # Closing twice is harmless
+        await self.detector.close()
+
+    @patch('aiohttp.ClientSession.post')
+    async def test_cloud_requests_share_session(
+        self,
+        mock_post: MagicMock,
+    ) -> None:
+        """
+        Test that login and detection requests reuse the same session.
+        """
+        mock_token_response = MagicMock()
+        mock_token_response.json = AsyncMock(
+            return_value={'access_token': 'fake_token'},
+        )
+        mock_detection_response = MagicMock()
+        mock_detection_response.status = 200
+        mock_detection_response.json = AsyncMock(return_value=[])
+        mock_post.return_value.__aenter__.side_effect = [
+            mock_token_response,
+            mock_detection_response,
+            mock_detection_response,
+        ]
+
+        with patch.object(
+            aiohttp, 'ClientSession', wraps=aiohttp.ClientSession,
+        ) as mock_session:
+            frame = np.zeros((32, 32, 3), dtype=np.uint8)
+            await self.detector.generate_detections_cloud(frame)
+            await self.detector.generate_detections_cloud(frame)
+
+        mock_session.assert_called_once()
+        self.assertEqual(mock_post.call_count, 3)
+        await self.detector.close()
+
     ########################################################################
     # Authentication tests
     ########################################################################
@@ -301,6 +380,176 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
             self.assertIsInstance(data[4], float)
             self.assertIsInstance(data[5], int)
 
+    def test_invalid_upload_codec(self) -> None:
+        """
+        Test that an unsupported upload codec is rejected.
+        """
+        with self.assertRaises(ValueError):
+            LiveStreamDetector(upload_codec='bmp')
+
+    def test_encode_frame_codecs(self) -> None:
+        """
+        Test that every upload codec produces a decodable frame.
+        """
+        frame = np.random.default_rng(0).integers(
+            0, 255, (48, 64, 3), dtype=np.uint8,
+        )
+        for codec in LiveStreamDetector.UPLOAD_CODECS:
+            detector = LiveStreamDetector(upload_codec=codec)
+            frame_bytes, scale = detector.encode_frame(frame)
+
+            self.assertEqual(scale, 1.0)
+            decoded = cv2.imdecode(
+                np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR,
+            )
+            self.assertEqual(decoded.shape, frame.shape)
+
+    def test_encode_frame_downscale(self) -> None:
+        """
+        Test that frames larger than the max side are downscaled.
+        """
+        detector = LiveStreamDetector(
+            upload_codec='jpeg', upload_quality=80, upload_max_side=960,
+        )
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+        frame_bytes, scale = detector.encode_frame(frame)
+
+        self.assertEqual(scale, 0.5)
+        decoded = cv2.imdecode(
+            np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR,
+        )
+        self.assertEqual(decoded.shape, (540, 960, 3))
+
+    def test_rescale_detections(self) -> None:
+        """
+        Test that boxes are mapped back to the original frame size.
+        """
+        datas = LiveStreamDetector.rescale_detections(
+            [[10, 20, 30, 40, 0.9, 5]], 0.5,
+        )
+        self.assertEqual(datas, [[20, 40, 60, 80, 0.9, 5]])
+
+    @patch('aiohttp.ClientSession.post')
+    async def test_generate_detections_cloud_downscaled(
+        self,
+        mock_post: MagicMock,
+    ) -> None:
+        """
+        Test that detections on a downscaled upload are scaled back.
+        """
+        self.detector.shared_token['access_token'] = 'token'
+        self.detector.upload_codec = 'webp'
+        self.detector.upload_max_side = 320
+
+        mock_response = MagicMock()
+        mock_response.status = 200
+        mock_response.json = AsyncMock(
+            return_value=[[10, 10, 50, 50, 0.9, 0]],
+        )
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        datas = await self.detector.generate_detections_cloud(frame)
+
+        self.assertEqual(datas, [[20, 20, 100, 100, 0.9, 0]])
+        form = mock_post.call_args.kwargs['data']
+        self.assertEqual(form._fields[0][1]['Content-Type'], 'image/webp')
+
+    def test_unpack_detections(self) -> None:
+        """
+        Test unpacking a packed /api/detect_batch response.
+        """
+        header = np.array([3, 2, 0, 1], dtype='<u4')
+        rows = np.array(
+            [
+                [10, 20, 30, 40, 0.5, 2],
+                [1, 2, 3, 4, 0.25, 7],
+                [5, 6, 7, 8, 0.75, 0],
+            ],
+            dtype='<f4',
+        )
+
+        results = LiveStreamDetector.unpack_detections(
+            header.tobytes() + rows.tobytes(),
+        )
+
+        self.assertEqual(
+            results,
+            [
+                [[10, 20, 30, 40, 0.5, 2], [1, 2, 3, 4, 0.25, 7]],
+                [],
+                [[5, 6, 7, 8, 0.75, 0]],
+            ],
+        )
+        self.assertIsInstance(results[0][0][0], int)
+        self.assertIsInstance(results[0][0][5], int)
+
+    @patch('aiohttp.ClientSession.post')
+    async def test_generate_detections_cloud_batch(
+        self,
+        mock_post: MagicMock,
+    ) -> None:
+        """
+        Test sending several frames in one batch request.
+        """
+        self.detector.shared_token['access_token'] = 'token'
+        self.detector.upload_max_side = 320
+        packed = (
+            np.array([2, 1, 0], dtype='<u4').tobytes()
+            + np.array([[10, 10, 50, 50, 0.5, 0]], dtype='<f4').tobytes()
+        )
+        mock_response = MagicMock()
+        mock_response.status = 200
+        mock_response.read = AsyncMock(return_value=packed)
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        frames = [
+            np.zeros((480, 640, 3), dtype=np.uint8),
+            np.zeros((240, 320, 3), dtype=np.uint8),
+        ]
+        results = await self.detector.generate_detections_cloud_batch(frames)
+
+        # Only the first frame was downscaled before upload
+        self.assertEqual(results, [[[20, 20, 100, 100, 0.5, 0]], []])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertTrue(
+            mock_post.call_args.args[0].endswith('/api/detect_batch'),
+        )
+
+        # No request is sent for an empty batch
+        self.assertEqual(
+            await self.detector.generate_detections_cloud_batch([]), [],
+        )
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch('aiohttp.ClientSession.post')
+    async def test_generate_detections_cloud_batch_json(
+        self,
+        mock_post: MagicMock,
+    ) -> None:
+        """
+        Test a batch request with JSON results and a token refresh.
+        """
+        self.detector.shared_token['access_token'] = 'expired'
+        mock_expired = MagicMock()
+        mock_expired.status = 401
+        mock_token = MagicMock()
+        mock_token.json = AsyncMock(return_value={'access_token': 'new'})
+        mock_response = MagicMock()
+        mock_response.status = 200
+        mock_response.json = AsyncMock(return_value=[[[1, 2, 3, 4, 0.5, 0]]])
+        mock_post.return_value.__aenter__.side_effect = [
+            mock_expired, mock_token, mock_response,
+        ]
+
+        results = await self.detector.generate_detections_cloud_batch(
+            [np.zeros((32, 32, 3), dtype=np.uint8)], response_format='json',
+        )
+
+        self.assertEqual(results, [[[1, 2, 3, 4, 0.5, 0]]])
+        self.assertEqual(self.detector.shared_token['access_token'], 'new')
+
     @patch('aiohttp.ClientSession.post')
     async def test_generate_detections_cloud_retry_on_token_expiry(
         self,
@@ -419,7 +668,7 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
         self.assertIn('Failed to send detection request:', combined_logs)
 
     @patch('src.live_stream_detection.get_sliced_prediction')
-    @patch('src.live_stream_detection.AutoDetectionModel.from_pretrained')
+    @patch('src.model_backends.AutoDetectionModel.from_pretrained')
     async def test_generate_detections_local_with_predictions(
         self,
         mock_from_pretrained: MagicMock,
@@ -493,6 +742,144 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
             overlap_width_ratio=0.3,
         )
 
+    @patch('src.live_stream_detection.get_sliced_prediction')
+    @patch('src.model_backends.AutoDetectionModel.from_pretrained')
+    async def test_generate_detections_local_does_not_block_loop(
+        self,
+        mock_from_pretrained: MagicMock,
+        mock_get_sliced_prediction: MagicMock,
+    ) -> None:
+        """
+        Test that other pipelines on the loop run during local inference.
+        """
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def predict(*args: Any, **kwargs: Any) -> MagicMock:
+            release.wait(30)
+            return MagicMock(object_prediction_list=[])
+
+        mock_get_sliced_prediction.side_effect = predict
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        detection = asyncio.create_task(
+            self.detector.generate_detections_local(frame),
+        )
+        await asyncio.sleep(0.05)
+
+        # The loop got here while the inference is still blocked
+        self.assertFalse(detection.done())
+        release.set()
+        self.assertEqual(await detection, [])
+
+    @patch('src.live_stream_detection.get_sliced_prediction')
+    @patch('src.model_backends.AutoDetectionModel.from_pretrained')
+    async def test_generate_detections_local_with_slicer(
+        self,
+        mock_from_pretrained: MagicMock,
+        mock_get_sliced_prediction: MagicMock,
+    ) -> None:
+        """
+        Test that local detection runs through the stream's slicer.
+        """
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        own_slicer = MagicMock(spec=TileSlicer)
+        own_slicer.predict.return_value = MagicMock(object_prediction_list=[])
+        self.detector.slicer = own_slicer
+
+        await self.detector.generate_detections_local(frame)
+        own_slicer.predict.assert_called_once_with(
+            frame, mock_from_pretrained.return_value,
+        )
+
+        # A slicer passed in by a shared caller takes precedence
+        stream_slicer = MagicMock(spec=TileSlicer)
+        stream_slicer.predict.return_value = MagicMock(
+            object_prediction_list=[],
+        )
+        await self.detector.generate_detections_local(
+            frame, slicer=stream_slicer,
+        )
+        stream_slicer.predict.assert_called_once()
+        self.assertEqual(own_slicer.predict.call_count, 1)
+        mock_get_sliced_prediction.assert_not_called()
+
+    @patch('src.live_stream_detection.load_detection_model')
+    async def test_set_model_key(self, mock_load: MagicMock) -> None:
+        """
+        Test that switching models keeps the ones already loaded.
+        """
+        mock_load.side_effect = lambda key, *args: MagicMock(name=key)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.detector.slicer = MagicMock(spec=TileSlicer)
+        self.detector.slicer.predict.return_value = MagicMock(
+            object_prediction_list=[],
+        )
+
+        await self.detector.generate_detections_local(frame)
+        first = self.detector.model
+        self.detector.set_model_key('yolo11s')
+        self.assertIsNone(self.detector.model)
+        await self.detector.generate_detections_local(frame)
+        self.assertEqual(mock_load.call_args.args[0], 'yolo11s')
+
+        # Switching back reuses the loaded weights
+        self.detector.set_model_key('yolo11n')
+        self.assertIs(self.detector.model, first)
+        self.assertEqual(mock_load.call_count, 2)
+
+    def test_add_slicing_fields(self) -> None:
+        """
+        Test that the slice settings are sent with cloud detection.
+        """
+        data = MagicMock(spec=aiohttp.FormData)
+        self.detector.add_slicing_fields(data)
+        data.add_field.assert_not_called()
+
+        self.detector.slicer = TileSlicer(slice_size=512, overlap_ratio=0.2)
+        self.detector.stream_id = 'site_stream'
+        self.detector.add_slicing_fields(data)
+        fields = {c.args[0]: c.args[1] for c in data.add_field.call_args_list}
+        self.assertEqual(fields, {'slice_size': '512', 'slice_overlap': '0.2'})
+
+        # Incremental slicing also needs the stream to keep state for
+        data.reset_mock()
+        self.detector.slicer.incremental = True
+        self.detector.add_slicing_fields(data)
+        fields = {c.args[0]: c.args[1] for c in data.add_field.call_args_list}
+        self.assertEqual(fields['stream_id'], 'site_stream')
+        self.assertEqual(fields['diff_threshold'], '4.0')
+
+        # The cascade asks the server for the same fallback
+        data.reset_mock()
+        self.detector.slicer = None
+        self.detector.cascade = CascadeDetector(fallback='regions')
+        self.detector.add_slicing_fields(data)
+        data.add_field.assert_called_once_with('cascade', 'regions')
+
+    @patch('src.live_stream_detection.get_sliced_prediction')
+    @patch('src.model_backends.AutoDetectionModel.from_pretrained')
+    async def test_generate_detections_local_with_cascade(
+        self,
+        mock_from_pretrained: MagicMock,
+        mock_get_sliced_prediction: MagicMock,
+    ) -> None:
+        """
+        Test that local detection runs through the stream's cascade.
+        """
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        slicer = MagicMock(spec=TileSlicer)
+        cascade = MagicMock(spec=CascadeDetector)
+        cascade.predict.return_value = MagicMock(object_prediction_list=[])
+        self.detector.slicer = slicer
+
+        await self.detector.generate_detections_local(frame, cascade=cascade)
+
+        cascade.predict.assert_called_once_with(
+            frame, mock_from_pretrained.return_value, slicer,
+        )
+        slicer.predict.assert_not_called()
+        mock_get_sliced_prediction.assert_not_called()
+
     async def test_generate_detections(self) -> None:
         """
         Test the generate_detections method.
@@ -651,32 +1038,6 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
         for fd, ed in zip(filter_datas_sorted, expected_datas_sorted):
             self.assertEqual(fd, ed)
 
-    def test_overlap_percentage(self) -> None:
-        """
-        Test the overlap_percentage method.
-        """
-        bbox1 = [10, 10, 50, 50]
-        bbox2 = [20, 20, 40, 40]
-        overlap = self.detector.overlap_percentage(bbox1, bbox2)
-        self.assertAlmostEqual(overlap, 0.262344, places=6)
-
-    def test_is_contained(self) -> None:
-        """
-        Test the is_contained method.
-        """
-        outer_bbox = [10, 10, 50, 50]
-        inner_bbox = [20, 20, 40, 40]
-        self.assertTrue(self.detector.is_contained(inner_bbox, outer_bbox))
-
-        inner_bbox = [5, 5, 40, 40]
-        self.assertFalse(self.detector.is_contained(inner_bbox, outer_bbox))
-
-        inner_bbox = [10, 10, 50, 50]
-        self.assertTrue(self.detector.is_contained(inner_bbox, outer_bbox))
-
-        inner_bbox = [0, 0, 60, 60]
-        self.assertFalse(self.detector.is_contained(inner_bbox, outer_bbox))
-
     def test_remove_completely_contained_labels(self) -> None:
         """
         Test the remove_completely_contained_labels method.
@@ -820,6 +1181,8 @@ class TestLiveStreamDetector(unittest.IsolatedAsyncioTestCase):
             output_folder=None,
             detect_with_server=True,
             shared_token={'access_token': ''},
+            model_backend='torch',
+            num_threads=None,
         )
 
         # Ensure the run_detection method was called with the expected URL
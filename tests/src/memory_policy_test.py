@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from src.memory_policy import MemoryPolicy
+
+
+class TestMemoryPolicy(unittest.TestCase):
+    """
+    Tests for the MemoryPolicy class.
+    """
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that an unknown mode or interval is rejected.
+        """
+        with self.assertRaises(ValueError):
+            MemoryPolicy(mode='always')
+        with self.assertRaises(ValueError):
+            MemoryPolicy(interval=0)
+
+    @patch('gc.collect')
+    def test_off_mode(self, mock_collect: MagicMock) -> None:
+        """
+        Test that the 'off' mode never collects.
+        """
+        policy = MemoryPolicy(mode='off', interval=1)
+        for _ in range(10):
+            self.assertFalse(policy.step())
+        mock_collect.assert_not_called()
+        self.assertEqual(policy.get_stats()['frames'], 10)
+
+    @patch('gc.collect')
+    def test_interval_mode(self, mock_collect: MagicMock) -> None:
+        """
+        Test that the 'interval' mode collects once every N frames.
+        """
+        policy = MemoryPolicy(mode='interval', interval=3)
+        collected = [policy.step() for _ in range(9)]
+
+        self.assertEqual(
+            collected,
+            [False, False, True, False, False, True, False, False, True],
+        )
+        self.assertEqual(mock_collect.call_count, 3)
+        stats = policy.get_stats()
+        self.assertEqual(stats['collections'], 3)
+        self.assertGreaterEqual(stats['collection_time'], 0.0)
+
+    @patch('gc.collect')
+    def test_rss_mode(self, mock_collect: MagicMock) -> None:
+        """
+        Test that the 'rss' mode collects only above the RSS threshold.
+        """
+        policy = MemoryPolicy(mode='rss', interval=2, rss_threshold_mb=100)
+
+        with patch.object(policy, 'get_rss_mb', return_value=50.0):
+            self.assertFalse(any(policy.step() for _ in range(4)))
+
+        with patch.object(policy, 'get_rss_mb', return_value=150.0):
+            collected = [policy.step() for _ in range(4)]
+
+        # The interval limits how often a high RSS triggers a collection
+        self.assertEqual(collected, [True, False, True, False])
+        self.assertEqual(mock_collect.call_count, 2)
+
+    def test_from_config(self) -> None:
+        """
+        Test building a policy from a stream configuration entry.
+        """
+        policy = MemoryPolicy.from_config(
+            {'mode': 'rss', 'rss_threshold_mb': 2048},
+        )
+        self.assertEqual(policy.mode, 'rss')
+        self.assertEqual(policy.rss_threshold_mb, 2048)
+
+        default_policy = MemoryPolicy.from_config(None)
+        self.assertEqual(default_policy.mode, 'interval')
+        self.assertEqual(default_policy.interval, 100)
+
+    def test_get_stats_reports_rss(self) -> None:
+        """
+        Test that the statistics include the process RSS.
+        """
+        stats = MemoryPolicy().get_stats()
+        self.assertGreater(stats['rss_mb'], 0)
+        self.assertEqual(stats['collections'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import numpy as np
+from sahi.predict import get_prediction
+
+from src.model_backends import get_model_path
+from src.model_backends import load_detection_model
+from src.model_backends import OnnxDetectionModel
+
+
+def fake_session(output: np.ndarray) -> MagicMock:
+    """
+    Builds an ONNX Runtime session that always returns the given output.
+    """
+    session = MagicMock()
+    session.get_inputs.return_value = [
+        SimpleNamespace(name='images', shape=[1, 3, 64, 64]),
+    ]
+    session.get_modelmeta.return_value = SimpleNamespace(
+        custom_metadata_map={
+            'imgsz': '[64, 64]',
+            'names': "{0: 'Hardhat', 1: 'Mask'}",
+        },
+    )
+    session.run.return_value = [output[np.newaxis]]
+    return session
+
+
+def raw_output(*boxes: tuple[float, float, float, float, int, float]):
+    """
+    Builds a raw YOLO output from (cx, cy, w, h, class, score) boxes.
+    """
+    output = np.zeros((6, len(boxes)), dtype=np.float32)
+    for index, (cx, cy, w, h, class_id, score) in enumerate(boxes):
+        output[:4, index] = [cx, cy, w, h]
+        output[4 + class_id, index] = score
+    return output
+
+
+class TestOnnxDetectionModel(unittest.TestCase):
+    """
+    Tests for running ONNX models through SAHI.
+    """
+
+    def setUp(self) -> None:
+        """Set up boxes on a 64x64 input of a 128x64 image."""
+        self.output = raw_output(
+            (32, 24, 16, 16, 0, 0.9),
+            # Overlaps the first box, so NMS removes it
+            (33, 24, 16, 16, 0, 0.8),
+            # Same place but another class, so it is kept
+            (33, 24, 16, 16, 1, 0.7),
+            (10, 40, 4, 4, 1, 0.1),
+        )
+        self.model = OnnxDetectionModel(
+            model=fake_session(self.output),
+            confidence_threshold=0.3,
+        )
+        self.image = np.zeros((64, 128, 3), dtype=np.uint8)
+
+    def test_metadata(self) -> None:
+        """
+        Test that the input size and class names come from the metadata.
+        """
+        self.assertEqual(self.model.input_shape, (64, 64))
+        self.assertEqual(
+            self.model.category_mapping, {'0': 'Hardhat', '1': 'Mask'},
+        )
+        self.assertEqual(self.model.num_categories, 2)
+        self.assertFalse(self.model.has_mask)
+
+    def test_preprocess_letterboxes(self) -> None:
+        """
+        Test that images are scaled and padded into the model input.
+        """
+        blob, ratio, padding = self.model.preprocess(self.image)
+        self.assertEqual(blob.shape, (1, 3, 64, 64))
+        self.assertEqual(blob.dtype, np.float32)
+        self.assertEqual(ratio, 0.5)
+        self.assertEqual(padding, (0, 16))
+        self.assertAlmostEqual(float(blob[0, 0, 0, 0]), 114 / 255)
+
+    def test_postprocess(self) -> None:
+        """
+        Test that boxes are filtered and mapped to the original image.
+        """
+        boxes = self.model.postprocess(
+            self.output, 0.5, (0, 16), self.image.shape,
+        )
+        self.assertEqual(boxes.shape, (2, 6))
+        np.testing.assert_allclose(
+            boxes[0], [48, 0, 80, 32, 0.9, 0], rtol=1e-5,
+        )
+        self.assertEqual(boxes[1, 5], 1)
+
+        empty = self.model.postprocess(
+            raw_output((10, 10, 4, 4, 0, 0.1)), 1.0, (0, 0), (64, 64),
+        )
+        self.assertEqual(empty.shape, (0, 6))
+
+    def test_get_prediction(self) -> None:
+        """
+        Test that predictions work with SAHI and are shifted for slices.
+        """
+        result = get_prediction(
+            self.image,
+            self.model,
+            shift_amount=[100, 200],
+            full_shape=[512, 512],
+        )
+        predictions = result.object_prediction_list
+        self.assertEqual(len(predictions), 2)
+        self.assertEqual(predictions[0].category.name, 'Hardhat')
+        bbox = predictions[0].bbox.shift_amount
+        self.assertEqual(list(bbox), [100, 200])
+
+    def test_inference_without_session(self) -> None:
+        """
+        Test that inference fails before the model is loaded.
+        """
+        model = OnnxDetectionModel(load_at_init=False)
+        with self.assertRaises(ValueError):
+            model.perform_inference(self.image)
+
+
+class TestLoadDetectionModel(unittest.TestCase):
+    """
+    Tests for choosing and loading the model of a backend.
+    """
+
+    def test_get_model_path(self) -> None:
+        """
+        Test that each backend keeps its weights in its own folder.
+        """
+        self.assertEqual(
+            get_model_path('yolo11n'), Path('models/pt/best_yolo11n.pt'),
+        )
+        self.assertEqual(
+            get_model_path('yolo11n', 'onnx'),
+            Path('models/onnx/best_yolo11n.onnx'),
+        )
+        with self.assertRaises(ValueError):
+            get_model_path('yolo11n', 'tensorrt')
+        with self.assertRaises(ValueError):
+            load_detection_model('yolo11n', 'tensorrt')
+
+    @patch('src.model_backends.torch.cuda.is_available', return_value=False)
+    @patch('src.model_backends.AutoDetectionModel.from_pretrained')
+    def test_torch_falls_back_to_cpu(
+        self,
+        mock_from_pretrained: MagicMock,
+        mock_cuda: MagicMock,
+    ) -> None:
+        """
+        Test that the PyTorch backend runs on the CPU without a GPU.
+        """
+        model = load_detection_model('yolo11n')
+        self.assertIs(model, mock_from_pretrained.return_value)
+        mock_from_pretrained.assert_called_once_with(
+            'yolo11',
+            model_path=str(Path('models/pt/best_yolo11n.pt')),
+            device='cpu',
+        )
+
+    @patch('src.model_backends.OnnxDetectionModel')
+    def test_quantised_keys_run_on_onnx(
+        self,
+        mock_onnx_model: MagicMock,
+    ) -> None:
+        """
+        Test that quantised variants run on ONNX Runtime on any backend.
+        """
+        load_detection_model('yolo11n-int8', 'torch')
+        mock_onnx_model.assert_called_once_with(
+            model_path=str(Path('models/onnx/best_yolo11n-int8.onnx')),
+            device='cpu',
+            num_threads=None,
+        )
+
+    @patch('src.model_backends.OnnxDetectionModel')
+    def test_onnx(self, mock_onnx_model: MagicMock) -> None:
+        """
+        Test that the ONNX backend is given its thread count.
+        """
+        model = load_detection_model('yolo11n', 'onnx', num_threads=2)
+        self.assertIs(model, mock_onnx_model.return_value)
+        mock_onnx_model.assert_called_once_with(
+            model_path=str(Path('models/onnx/best_yolo11n.onnx')),
+            device='cpu',
+            num_threads=2,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
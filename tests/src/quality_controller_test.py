@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import unittest
+
+from src.quality_controller import QualityController
+
+
+class TestQualityController(unittest.TestCase):
+    """
+    Tests for moving streams between quality levels.
+    """
+
+    def make_controller(self, **kwargs) -> QualityController:
+        """
+        Builds a yolo11m stream with a 1 s SLO that may go down to
+        yolo11s and then to 512 and 640 px slices.
+        """
+        options = {
+            'model_key': 'yolo11m',
+            'latency_slo': 1.0,
+            'floor': 'yolo11s',
+            'slice_sizes': [512, 640],
+            'degrade_after': 2,
+            'upgrade_after': 3,
+            'cooldown': 10.0,
+            'smoothing': 1.0,
+        }
+        options.update(kwargs)
+        return QualityController(**options)
+
+    def feed(
+        self,
+        controller: QualityController,
+        latencies: list[float],
+        start: float,
+    ) -> list[str]:
+        """
+        Feeds one latency per second and returns the models switched to.
+        """
+        switches = []
+        for offset, latency in enumerate(latencies):
+            switch = controller.update(latency, now=start + offset)
+            if switch:
+                switches.append(switch['current']['model_key'])
+        return switches
+
+    def test_levels(self) -> None:
+        """
+        Test the levels from the ceiling to the coarsest slices.
+        """
+        controller = self.make_controller(ceiling='yolo11l')
+        self.assertEqual(
+            [
+                (level['model_key'], level['slice_size'])
+                for level in controller.levels
+            ],
+            [
+                ('yolo11l', None),
+                ('yolo11m', None),
+                ('yolo11s', None),
+                ('yolo11s', 512),
+                ('yolo11s', 640),
+            ],
+        )
+        self.assertEqual(controller.level['model_key'], 'yolo11m')
+
+        # Quantised streams stay quantised, and finer slices are skipped
+        controller = QualityController(
+            'yolo11s-int8', 1.0, slice_size=512, slice_sizes=[376, 640],
+        )
+        self.assertEqual(
+            [level['model_key'] for level in controller.levels],
+            ['yolo11s-int8', 'yolo11n-int8', 'yolo11n-int8'],
+        )
+        self.assertEqual(controller.levels[-1]['slice_size'], 640)
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that unusable settings are rejected.
+        """
+        for kwargs in (
+            {'model_key': 'yolov8n'},
+            {'floor': 'yolo11l'},
+            {'ceiling': 'yolo11n'},
+            {'latency_slo': 0},
+            {'upgrade_ratio': 0.95},
+            {'degrade_after': 0},
+            {'slice_sizes': [640, 512]},
+        ):
+            with self.assertRaises(ValueError):
+                self.make_controller(**kwargs)
+
+        controller = QualityController.from_config(
+            {'latency_slo': 2.0, 'floor': 'yolo11s'},
+            'yolo11m',
+            {'slice_size': 376},
+        )
+        self.assertEqual(controller.level['slice_size'], 376)
+        self.assertEqual(controller.levels[-1]['model_key'], 'yolo11s')
+
+    def test_degrade_and_recover(self) -> None:
+        """
+        Test moving down under load and back with headroom, one level per
+        cooldown.
+        """
+        controller = self.make_controller()
+
+        # A single slow frame is not enough
+        self.assertEqual(self.feed(controller, [2.0, 0.7], 0), [])
+        self.assertEqual(self.feed(controller, [2.0, 2.0], 2), ['yolo11s'])
+        stats = controller.get_stats()
+        self.assertTrue(stats['degraded'])
+        self.assertEqual(stats['switches'], 1)
+
+        # No further switch within the cooldown, then down to 512 px slices
+        self.assertEqual(self.feed(controller, [2.0] * 9, 4), [])
+        switch = controller.update(2.0, now=14)
+        self.assertIsNotNone(switch)
+        self.assertEqual(switch['current']['slice_size'], 512)
+        self.assertEqual(switch['reason'], 'latency at risk')
+
+        # Between the thresholds nothing changes
+        self.assertEqual(self.feed(controller, [0.7] * 20, 30), [])
+
+        # Headroom brings the stream back, a level per cooldown
+        self.assertEqual(
+            self.feed(controller, [0.2] * 30, 50), ['yolo11s', 'yolo11m'],
+        )
+        self.assertFalse(controller.get_stats()['degraded'])
+        self.assertEqual(len(controller.history), 4)
+
+        # It never goes above the ceiling
+        self.assertEqual(self.feed(controller, [0.2] * 30, 100), [])
+
+    def test_flapping_level_waits_longer(self) -> None:
+        """
+        Test that a level left soon after moving up to it needs twice the
+        headroom before it is tried again.
+        """
+        controller = self.make_controller(flap_window=100.0)
+        self.feed(controller, [2.0, 2.0], 0)
+        self.assertEqual(self.feed(controller, [0.2] * 3, 20), ['yolo11m'])
+        self.assertEqual(self.feed(controller, [2.0] * 2, 40), ['yolo11s'])
+        self.assertEqual(controller.upgrade_holds[0], 6)
+
+        self.assertEqual(self.feed(controller, [0.2] * 5, 60), [])
+        self.assertEqual(self.feed(controller, [0.2], 65), ['yolo11m'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from src.replay_benchmark import format_report
+from src.replay_benchmark import InMemoryRedis
+from src.replay_benchmark import read_video_frames
+from src.replay_benchmark import run_replay
+from src.replay_benchmark import StageTimer
+from src.replay_benchmark import summarise_latencies
+from src.replay_benchmark import write_report
+
+VIDEO_PATH = 'tests/videos/test.mp4'
+
+
+class TestStageTimer(unittest.TestCase):
+    """
+    Tests for timing pipeline stages.
+    """
+
+    def test_summarise_latencies(self) -> None:
+        """
+        Test that latencies are summarised in milliseconds.
+        """
+        stats = summarise_latencies([i / 1000 for i in range(1, 101)])
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['mean_ms'], 50.5)
+        self.assertAlmostEqual(stats['p50_ms'], 50.5)
+        self.assertAlmostEqual(stats['p99_ms'], 99.01)
+        self.assertAlmostEqual(stats['max_ms'], 100)
+        self.assertEqual(summarise_latencies([])['count'], 0)
+
+    def test_stages_in_pipeline_order(self) -> None:
+        """
+        Test that stages are reported in pipeline order, paused or not.
+        """
+        timer = StageTimer()
+        with timer.measure('encode'):
+            pass
+        timer.record('decode', 0.01)
+        timer.enabled = False
+        timer.record('decode', 1.0)
+
+        summary = timer.summarise()
+        self.assertEqual(list(summary), ['decode', 'encode'])
+        self.assertEqual(summary['decode']['count'], 1)
+
+
+class TestInMemoryRedis(IsolatedAsyncioTestCase):
+    """
+    Tests for the in-memory Redis stand-in.
+    """
+
+    async def test_streams_are_capped(self) -> None:
+        """
+        Test that streams keep their latest entries only.
+        """
+        redis = InMemoryRedis()
+        for i in range(5):
+            await redis.xadd('stream', {'frame': bytes([i])}, maxlen=3)
+        (name, entries), = await redis.xread({'stream': '0'})
+
+        self.assertEqual(name, b'stream')
+        self.assertEqual(
+            [fields['frame'] for _, fields in entries],
+            [b'\x02', b'\x03', b'\x04'],
+        )
+        await redis.delete('stream')
+        self.assertEqual(await redis.xread({'stream': '0'}), [])
+
+
+class TestReplay(IsolatedAsyncioTestCase):
+    """
+    Tests for replaying a video through the pipeline.
+    """
+
+    async def test_read_video_frames(self) -> None:
+        """
+        Test that frames are read in order and paced to the replay speed.
+        """
+        timer = StageTimer()
+        start = time.perf_counter()
+        frames = [
+            media_time
+            async for _, media_time in read_video_frames(
+                VIDEO_PATH, speed=4.0, max_frames=5, timer=timer,
+            )
+        ]
+
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames, sorted(frames))
+        self.assertEqual(timer.summarise()['decode']['count'], 5)
+        # The fifth frame is due 4 frame intervals in at 4x real time
+        self.assertGreaterEqual(time.perf_counter() - start, frames[-1] / 4)
+
+        with self.assertRaises(ValueError):
+            async for _ in read_video_frames('missing.mp4'):
+                pass
+
+    @patch('src.replay_benchmark.LiveStreamDetector')
+    async def test_run_replay(self, mock_detector) -> None:
+        """
+        Test that every stage is timed for every replayed frame.
+        """
+        detector = mock_detector.return_value
+        detector.generate_detections = AsyncMock(
+            return_value=([[10, 10, 50, 50, 0.9, 0]], None),
+        )
+        detector.close = AsyncMock()
+
+        report = await run_replay(VIDEO_PATH, max_frames=4, warmup_frames=2)
+
+        # Warm-up frames are processed but not timed
+        self.assertEqual(detector.generate_detections.await_count, 6)
+        self.assertEqual(report['frames'], 4)
+        self.assertEqual(
+            list(report['stages']),
+            ['decode', 'detect', 'danger', 'draw', 'encode', 'redis'],
+        )
+        for stats in report['stages'].values():
+            self.assertEqual(stats['count'], 4)
+        self.assertEqual(report['total']['count'], 4)
+        self.assertGreater(report['fps'], 0)
+        detector.close.assert_awaited_once()
+
+        # The report is readable as JSON and as a table
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'report.json')
+            write_report(report, path)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(json.load(file)['frames'], 4)
+        self.assertIn('4 frames in', format_report(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import itertools
+import os
 import sys
+import tempfile
+import threading
 import time
 import unittest
+from functools import partial
 from typing import cast
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import AsyncMock
@@ -11,11 +17,25 @@ from unittest.mock import MagicMock
 from unittest.mock import patch
 
 import numpy as np
+from streamlink.stream.hls import HLSStream
 
+from src.bandwidth_estimator import BandwidthEstimator
+from src.stream_capture import FrameGrabber
 from src.stream_capture import main as stream_capture_main
 from src.stream_capture import StreamCapture
 
 
+def grab_frame() -> bool:
+    """
+    Simulates `cv2.VideoCapture.grab` on a live stream at about 1000 fps.
+
+    Returns:
+        bool: Always True.
+    """
+    time.sleep(0.001)
+    return True
+
+
 class TestStreamCapture(IsolatedAsyncioTestCase):
     """
     Tests for the StreamCapture class.
@@ -24,8 +44,13 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
     def setUp(self) -> None:
         """Set up a StreamCapture instance for use in tests."""
         # Initialise StreamCapture instance with a presumed stream URL
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
         self.stream_capture: StreamCapture = StreamCapture(
             'http://example.com/stream',
+            bandwidth_estimator=BandwidthEstimator(
+                cache_path=os.path.join(temp_dir.name, 'bandwidth.json'),
+            ),
         )
 
     @patch('cv2.VideoCapture')
@@ -76,12 +101,12 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         # Mock `isOpened()` to always return True
         mock_video_capture.return_value.isOpened.return_value = True
 
-        # Set `read()` to return two frames successfully
+        # Set `retrieve()` to return frames successfully
         mock_frame = MagicMock(name='MockFrame')
-        mock_video_capture.return_value.read.side_effect = [
-            (True, mock_frame),  # First iteration
-            (True, mock_frame),  # Second iteration
-        ]
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.return_value = (
+            True, mock_frame,
+        )
 
         # Set `capture_interval` to 0
         # to allow immediate yielding during each iteration
@@ -131,8 +156,9 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         Returns:
             None
         """
-        # Mock VideoCapture object's read method to return False 5 times
-        mock_video_capture.return_value.read.side_effect = [(False, None)] * 6
+        # Mock VideoCapture object's retrieve method to always fail
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.return_value = (False, None)
         mock_video_capture.return_value.isOpened.return_value = True
 
         # Set capture interval to 0 to avoid delays during the test.
@@ -230,9 +256,12 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
             mock_sleep (MagicMock): Mock for time.sleep.
             mock_video_capture (MagicMock): Mock for cv2.VideoCapture.
         """
-        # Mock VideoCapture object's read method to
+        # Mock VideoCapture object's retrieve method to
         # return a frame and True indicating successful read
-        mock_video_capture.return_value.read.return_value = (True, mock_mat)
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.return_value = (
+            True, mock_mat,
+        )
         mock_video_capture.return_value.isOpened.return_value = True
 
         # Execute capture frame generator and get the first frame and timestamp
@@ -247,28 +276,20 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         # Release resources
         await self.stream_capture.release_resources()
 
-    @patch('speedtest.Speedtest')
-    def test_check_internet_speed(self, mock_speedtest: MagicMock) -> None:
+    def test_get_download_speed(self) -> None:
         """
-        Test that internet speed is correctly checked and returned.
-
-        Args:
-            mock_speedtest (MagicMock): Mock for speedtest.Speedtest.
+        Test that the download speed is read from the stream host.
         """
-        # Mock Speedtest object's download and upload methods
-        # to return download and upload speeds
-        mock_speedtest.return_value.download.return_value = 50_000_000
-        mock_speedtest.return_value.upload.return_value = 10_000_000
+        self.assertIsNone(self.stream_capture.get_download_speed())
 
-        # Check internet speed and assert that
-        # the returned speeds are correct
-        download_speed, upload_speed = (
-            self.stream_capture.check_internet_speed()
+        self.stream_capture.bandwidth_estimator.record(
+            'example.com', 1_000_000, 0.5,
+        )
+        self.assertAlmostEqual(
+            self.stream_capture.get_download_speed(), 16.0,
         )
-        self.assertEqual(download_speed, 50.0)
-        self.assertEqual(upload_speed, 10.0)
 
-    @patch('streamlink.streams')
+    @patch('streamlink.Streamlink')
     def test_select_quality_based_on_speed_high_speed(
         self,
         mock_streams: MagicMock,
@@ -278,21 +299,21 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         for high internet speed.
 
         Args:
-            mock_streams (MagicMock): Mock for streamlink.streams.
+            mock_streams (MagicMock): Mock for streamlink.Streamlink.
         """
         # Mock streamlink to return different quality streams
-        mock_streams.return_value = {
+        mock_streams.return_value.streams.return_value = {
             'best': MagicMock(url='http://best.stream'),
             '1080p': MagicMock(url='http://1080p.stream'),
             '720p': MagicMock(url='http://720p.stream'),
             '480p': MagicMock(url='http://480p.stream'),
         }
 
-        # Mock internet speed check result
+        # Mock the measured download speed
         with patch.object(
             self.stream_capture,
-            'check_internet_speed',
-            return_value=(20, 5),
+            'get_download_speed',
+            return_value=20,
         ):
             # Select the best stream quality based on internet speed
             selected_quality = (
@@ -300,7 +321,7 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
             )
             self.assertEqual(selected_quality, 'http://best.stream')
 
-    @patch('streamlink.streams')
+    @patch('streamlink.Streamlink')
     def test_select_quality_based_on_speed_medium_speed(
         self,
         mock_streams: MagicMock,
@@ -310,20 +331,20 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         for medium internet speed.
 
         Args:
-            mock_streams (MagicMock): Mock for streamlink.streams.
+            mock_streams (MagicMock): Mock for streamlink.Streamlink.
         """
         # Mock streamlink to return medium quality streams
-        mock_streams.return_value = {
+        mock_streams.return_value.streams.return_value = {
             '720p': MagicMock(url='http://720p.stream'),
             '480p': MagicMock(url='http://480p.stream'),
             '360p': MagicMock(url='http://360p.stream'),
         }
 
-        # Mock internet speed check result
+        # Mock the measured download speed
         with patch.object(
             self.stream_capture,
-            'check_internet_speed',
-            return_value=(7, 5),
+            'get_download_speed',
+            return_value=7,
         ):
             # Select the appropriate stream quality based on internet speed
             selected_quality = (
@@ -331,7 +352,7 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
             )
             self.assertEqual(selected_quality, 'http://720p.stream')
 
-    @patch('streamlink.streams')
+    @patch('streamlink.Streamlink')
     def test_select_quality_based_on_speed_low_speed(
         self,
         mock_streams: MagicMock,
@@ -340,20 +361,20 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         Test that a lower quality stream is selected for low internet speed.
 
         Args:
-            mock_streams (MagicMock): Mock for streamlink.streams.
+            mock_streams (MagicMock): Mock for streamlink.Streamlink.
         """
         # Mock streamlink to return low quality streams
-        mock_streams.return_value = {
+        mock_streams.return_value.streams.return_value = {
             '480p': MagicMock(url='http://480p.stream'),
             '360p': MagicMock(url='http://360p.stream'),
             '240p': MagicMock(url='http://240p.stream'),
         }
 
-        # Mock internet speed check result
+        # Mock the measured download speed
         with patch.object(
             self.stream_capture,
-            'check_internet_speed',
-            return_value=(3, 5),
+            'get_download_speed',
+            return_value=3,
         ):
             # Select the lower quality stream based on internet speed
             selected_quality = (
@@ -361,8 +382,272 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
             )
             self.assertEqual(selected_quality, 'http://480p.stream')
 
-    @patch('streamlink.streams', return_value={})
-    @patch.object(StreamCapture, 'check_internet_speed', return_value=(20, 5))
+    def test_invalid_decoder(self) -> None:
+        """
+        Test that an unknown decoder backend is rejected.
+        """
+        with self.assertRaises(ValueError):
+            StreamCapture('test_stream_url', decoder='gstreamer')
+
+    def test_use_keyframes_only(self) -> None:
+        """
+        Test that keyframe-only decoding follows the capture interval.
+        """
+        stream_capture = StreamCapture('test_stream_url', capture_interval=1)
+        self.assertFalse(stream_capture.use_keyframes_only())
+
+        stream_capture.update_capture_interval(
+            StreamCapture.KEYFRAME_ONLY_INTERVAL,
+        )
+        self.assertTrue(stream_capture.use_keyframes_only())
+
+        # An explicit setting overrides the interval
+        stream_capture.keyframes_only = False
+        self.assertFalse(stream_capture.use_keyframes_only())
+
+    @patch('src.stream_capture.FrameGrabber')
+    @patch('src.stream_capture.PyAVCapture')
+    @patch('cv2.VideoCapture')
+    async def test_initialise_stream_pyav(
+        self,
+        mock_video_capture: MagicMock,
+        mock_pyav_capture: MagicMock,
+        mock_grabber: MagicMock,
+    ) -> None:
+        """
+        Test that the PyAV backend opens the stream instead of OpenCV.
+        """
+        stream_capture = StreamCapture(
+            'test_stream_url', capture_interval=15, decoder='pyav',
+        )
+        await stream_capture.initialise_stream('test_stream_url')
+
+        mock_pyav_capture.assert_called_once_with(
+            'test_stream_url', keyframes_only=True,
+        )
+        mock_video_capture.assert_not_called()
+        mock_grabber.assert_called_once_with(mock_pyav_capture.return_value)
+
+    @patch('streamlink.Streamlink')
+    @patch.object(StreamCapture, 'get_download_speed', return_value=20)
+    def test_select_stream_source(
+        self,
+        mock_check_speed: MagicMock,
+        mock_streams: MagicMock,
+    ) -> None:
+        """
+        Test that PyAV gets the streamlink stream and OpenCV its URL.
+        """
+        stream = MagicMock(url='http://best.stream')
+        mock_streams.return_value.streams.return_value = {'best': stream}
+
+        self.assertEqual(
+            self.stream_capture.select_stream_source(), 'http://best.stream',
+        )
+        self.stream_capture.decoder = 'pyav'
+        self.assertIs(self.stream_capture.select_stream_source(), stream)
+
+    def test_choose_quality_unmeasured(self) -> None:
+        """
+        Test that a stream without a measured speed starts at 720p.
+        """
+        qualities = ['best', '1080p', '720p', '480p']
+        self.assertEqual(
+            self.stream_capture.choose_quality(qualities, None), '720p',
+        )
+        self.assertIsNone(self.stream_capture.choose_quality(['1080p'], 3))
+
+    @patch('streamlink.Streamlink')
+    def test_select_stream_measures_session(
+        self,
+        mock_streams: MagicMock,
+    ) -> None:
+        """
+        Test that the segments of the selected stream are measured.
+        """
+        mock_streams.return_value.streams.return_value = {
+            '720p': MagicMock(url='http://720p.stream'),
+        }
+        with patch.object(
+            self.stream_capture.bandwidth_estimator, 'install',
+        ) as mock_install:
+            self.stream_capture.select_stream_based_on_speed()
+
+        mock_install.assert_called_once_with(
+            mock_streams.return_value, 'example.com',
+        )
+        mock_streams.return_value.streams.assert_called_once_with(
+            'http://example.com/stream',
+        )
+        self.assertEqual(self.stream_capture.selected_quality, '720p')
+
+    def test_probe_download_speed(self) -> None:
+        """
+        Test that the first segments of a segmented stream are read, and
+        other streams are not opened.
+        """
+        stream = MagicMock(spec=HLSStream)
+        stream_io = stream.open.return_value
+        stream_io.read.side_effect = [b'x' * 1000, b'']
+        with patch.object(
+            self.stream_capture, 'get_download_speed', return_value=12.0,
+        ):
+            self.assertEqual(
+                self.stream_capture.probe_download_speed(stream), 12.0,
+            )
+            stream_io.read.assert_called_with(
+                StreamCapture.PROBE_BYTES - 1000,
+            )
+            stream_io.close.assert_called_once()
+
+            progressive = MagicMock()
+            self.stream_capture.probe_download_speed(progressive)
+            progressive.open.assert_not_called()
+
+        stream.open.side_effect = OSError('offline')
+        self.assertIsNone(self.stream_capture.probe_download_speed(stream))
+
+    @patch('streamlink.Streamlink')
+    def test_select_stream_starts_probe(
+        self,
+        mock_streams: MagicMock,
+    ) -> None:
+        """
+        Test that an unmeasured stream starts at 720p without waiting for
+        the probe of its host.
+        """
+        streams = {
+            'best': MagicMock(url='http://best.stream'),
+            '720p': MagicMock(url='http://720p.stream'),
+        }
+        mock_streams.return_value.streams.return_value = streams
+        with patch.object(self.stream_capture, 'start_probe') as mock_start:
+            self.assertEqual(
+                self.stream_capture.select_stream_source(),
+                'http://720p.stream',
+            )
+        mock_start.assert_called_once_with(streams['720p'])
+
+    def test_start_probe_once_per_host(self) -> None:
+        """
+        Test that only the first OpenCV stream of a host probes it, in the
+        background.
+        """
+        stream = MagicMock(spec=HLSStream)
+        other_stream = StreamCapture(
+            'http://example.com/other',
+            bandwidth_estimator=self.stream_capture.bandwidth_estimator,
+        )
+        probed = threading.Event()
+        with patch.object(
+            StreamCapture,
+            'probe_download_speed',
+            side_effect=lambda stream: probed.set(),
+        ):
+            self.assertTrue(self.stream_capture.start_probe(stream))
+            self.assertFalse(other_stream.start_probe(stream))
+            self.assertTrue(probed.wait(5))
+
+        # PyAV measures its own segments, and progressive streams are not
+        # probed
+        self.assertFalse(self.stream_capture.start_probe(MagicMock()))
+        self.stream_capture.decoder = 'pyav'
+        self.assertFalse(self.stream_capture.start_probe(stream))
+
+    @patch('streamlink.Streamlink')
+    def test_reselect_stream_source(self, mock_streams: MagicMock) -> None:
+        """
+        Test that the quality follows the measured throughput mid-stream.
+        """
+        streams = {
+            'best': MagicMock(url='http://best.stream'),
+            '720p': MagicMock(url='http://720p.stream'),
+            '480p': MagicMock(url='http://480p.stream'),
+        }
+        mock_streams.return_value.streams.return_value = streams
+        stream_capture = self.stream_capture
+        self.assertEqual(
+            stream_capture.select_stream_source(), 'http://720p.stream',
+        )
+
+        # Checks within the interval do not even read the estimate
+        with patch.object(
+            stream_capture, 'get_download_speed', return_value=20,
+        ) as mock_speed:
+            self.assertIsNone(stream_capture.reselect_stream_source())
+            mock_speed.assert_not_called()
+
+        stream_capture.QUALITY_CHECK_INTERVAL = 0
+        # No recent measurement keeps the current quality
+        with patch.object(
+            stream_capture, 'get_download_speed', return_value=None,
+        ):
+            self.assertIsNone(stream_capture.reselect_stream_source())
+
+        # An expired estimate starts a probe for a later check
+        with patch.object(
+            stream_capture, 'get_download_speed', return_value=None,
+        ), patch.object(stream_capture, 'start_probe') as mock_start:
+            self.assertIsNone(stream_capture.reselect_stream_source())
+        mock_start.assert_called_once_with(streams['720p'])
+
+        with patch.object(
+            stream_capture, 'get_download_speed', return_value=20,
+        ):
+            self.assertEqual(
+                stream_capture.reselect_stream_source(), 'http://best.stream',
+            )
+            # The same tier does not reopen the stream
+            self.assertIsNone(stream_capture.reselect_stream_source())
+
+        stream_capture.decoder = 'pyav'
+        with patch.object(
+            stream_capture, 'get_download_speed', return_value=3,
+        ):
+            self.assertIs(
+                stream_capture.reselect_stream_source(), streams['480p'],
+            )
+        self.assertEqual(stream_capture.selected_quality, '480p')
+
+    @patch('cv2.VideoCapture')
+    @patch.object(
+        StreamCapture,
+        'select_quality_based_on_speed',
+        return_value='http://720p.stream',
+    )
+    async def test_capture_generic_frames_switches_quality(
+        self,
+        mock_quality: MagicMock,
+        mock_video_capture: MagicMock,
+    ) -> None:
+        """
+        Test that the generic stream is reopened at a new quality.
+        """
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.return_value = (
+            True, MagicMock(),
+        )
+        mock_video_capture.return_value.isOpened.return_value = True
+        self.stream_capture.capture_interval = 0
+
+        with patch.object(
+            self.stream_capture,
+            'reselect_stream_source',
+            side_effect=['http://best.stream', None],
+        ):
+            generator = self.stream_capture.capture_generic_frames()
+            await generator.__anext__()
+            await generator.__anext__()
+            await generator.aclose()
+        await self.stream_capture.release_resources()
+
+        self.assertEqual(
+            [call.args[0] for call in mock_video_capture.call_args_list],
+            ['http://720p.stream', 'http://best.stream'],
+        )
+
+    @patch('streamlink.Streamlink')
+    @patch.object(StreamCapture, 'get_download_speed', return_value=20)
     def test_select_quality_based_on_speed_no_quality(
         self,
         mock_check_speed: MagicMock,
@@ -372,21 +657,16 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         Test that None is returned if no suitable stream quality is available.
 
         Args:
-            mock_check_speed (MagicMock): Mock for check_internet_speed method.
-            mock_streams (MagicMock): Mock for streamlink.streams.
+            mock_check_speed (MagicMock): Mock for get_download_speed method.
+            mock_streams (MagicMock): Mock for streamlink.Streamlink.
         """
         # Mock internet speed and stream quality check result to be empty
+        mock_streams.return_value.streams.return_value = {}
         selected_quality = self.stream_capture.select_quality_based_on_speed()
         self.assertIsNone(selected_quality)
 
-    @patch(
-        'streamlink.streams', return_value={
-            'best': MagicMock(url='http://best.stream'),
-            '720p': MagicMock(url='http://720p.stream'),
-            '480p': MagicMock(url='http://480p.stream'),
-        },
-    )
-    @patch.object(StreamCapture, 'check_internet_speed', return_value=(20, 5))
+    @patch('streamlink.Streamlink')
+    @patch.object(StreamCapture, 'get_download_speed', return_value=20)
     @patch('cv2.VideoCapture')
     @patch('time.sleep', return_value=None)
     async def test_capture_generic_frames(
@@ -402,11 +682,20 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         Args:
             mock_sleep (MagicMock): Mock for time.sleep.
             mock_video_capture (MagicMock): Mock for cv2.VideoCapture.
-            mock_check_speed (MagicMock): Mock for check_internet_speed method.
-            mock_streams (MagicMock): Mock for streamlink.streams.
+            mock_check_speed (MagicMock): Mock for get_download_speed method.
+            mock_streams (MagicMock): Mock for streamlink.Streamlink.
         """
+        mock_streams.return_value.streams.return_value = {
+            'best': MagicMock(url='http://best.stream'),
+            '720p': MagicMock(url='http://720p.stream'),
+            '480p': MagicMock(url='http://480p.stream'),
+        }
+
         # Mock VideoCapture object's behaviour
-        mock_video_capture.return_value.read.return_value = (True, MagicMock())
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.return_value = (
+            True, MagicMock(),
+        )
         mock_video_capture.return_value.isOpened.return_value = True
 
         # Execute capture frame generator
@@ -450,6 +739,7 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         # Mock parse_args method to return a stream URL
         mock_parse_args.return_value = argparse.Namespace(
             url='test_stream_url',
+            decoder='opencv',
         )
 
         # Mock frame and timestamp
@@ -488,7 +778,10 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         """
         # Mock VideoCapture object's multiple failures and one success read
         instance: MagicMock = mock_video_capture.return_value
-        instance.read.side_effect = [(False, None)] * 5 + [(True, MagicMock())]
+        instance.grab.side_effect = grab_frame
+        instance.retrieve.side_effect = itertools.chain(
+            [(False, None)] * 5, itertools.repeat((True, MagicMock())),
+        )
         instance.isOpened.return_value = True
 
         # Mock capture_generic_frames method and execute
@@ -526,17 +819,14 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         async for _ in self.stream_capture.capture_generic_frames():
             self.fail('No frame should be yielded when quality is None.')
 
-    @patch('speedtest.Speedtest')
-    @patch('streamlink.streams', side_effect=Exception('Streamlink error'))
+    @patch('streamlink.Streamlink')
     def test_select_quality_based_on_speed_exception(
         self,
         mock_streams: MagicMock,
-        mock_speedtest: MagicMock,
     ) -> None:
-        # Mock Speedtest object's download and upload methods
-        mock_speedtest.return_value.get_best_server.return_value = {}
-        mock_speedtest.return_value.download.return_value = 20_000_000
-        mock_speedtest.return_value.upload.return_value = 5_000_000
+        mock_streams.return_value.streams.side_effect = Exception(
+            'Streamlink error',
+        )
 
         selected_quality = self.stream_capture.select_quality_based_on_speed()
         self.assertIsNone(selected_quality)
@@ -561,10 +851,13 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
             'http://example.com/stream', capture_interval=0,
         )
 
-        # Mock VideoCapture object's read method to
+        # Mock VideoCapture object's retrieve method to
         # return False 5 times and then True
-        mock_video_capture.return_value.read.side_effect = (
-            [(False, None)] * 5 + [(True, MagicMock())] * 5
+        mock_video_capture.return_value.grab.side_effect = grab_frame
+        mock_video_capture.return_value.retrieve.side_effect = (
+            itertools.chain(
+                [(False, None)] * 5, itertools.repeat((True, MagicMock())),
+            )
         )
         mock_video_capture.return_value.isOpened.return_value = True
 
@@ -605,5 +898,151 @@ class TestStreamCapture(IsolatedAsyncioTestCase):
         mock_video_capture.assert_not_called()
 
 
+class TestFrameGrabber(IsolatedAsyncioTestCase):
+    """
+    Tests for the FrameGrabber class.
+    """
+
+    def setUp(self) -> None:
+        """Set up a mocked capture that grabs a new frame every 1 ms."""
+        self.cap = MagicMock()
+        self.cap.grab.side_effect = grab_frame
+        self.frames = itertools.count()
+        self.cap.retrieve.side_effect = lambda: (True, next(self.frames))
+        self.grabber = FrameGrabber(self.cap)
+        self.grabber.start()
+        self.addCleanup(self.grabber.stop)
+
+    async def test_read_returns_fresh_frames(self) -> None:
+        """
+        Test that each read returns a frame retrieved after the request.
+        """
+        first = await self.grabber.read(timeout=1)
+        second = await self.grabber.read(timeout=1)
+
+        self.assertIsNotNone(first)
+        self.assertGreater(second, first)
+
+    async def test_only_requested_frames_are_decoded(self) -> None:
+        """
+        Test that frames nobody asked for are dropped without retrieval.
+        """
+        await self.grabber.read(timeout=1)
+        await asyncio.sleep(0.05)
+        await self.grabber.read(timeout=1)
+
+        self.assertEqual(self.grabber.frames_decoded, 2)
+        self.assertEqual(self.cap.retrieve.call_count, 2)
+        self.assertGreater(self.grabber.frames_dropped, 0)
+        self.assertGreaterEqual(
+            self.grabber.frames_grabbed,
+            self.grabber.frames_decoded + self.grabber.frames_dropped,
+        )
+
+    async def test_read_does_not_block_event_loop(self) -> None:
+        """
+        Test that the event loop keeps running while a read waits.
+        """
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        # A capture whose grab blocks until released, from the first one
+        release = threading.Event()
+        cap = MagicMock()
+        cap.grab.side_effect = lambda: release.wait(30) or True
+        cap.retrieve.return_value = (True, 'frame')
+        grabber = FrameGrabber(cap)
+        grabber.start()
+        self.addCleanup(grabber.stop)
+        self.addCleanup(release.set)
+        ticker = asyncio.create_task(tick())
+        read = asyncio.create_task(grabber.read(timeout=30))
+        await asyncio.sleep(0.05)
+
+        # The loop keeps running while the read waits for a frame
+        self.assertFalse(read.done())
+        self.assertGreater(ticks, 1)
+        release.set()
+        self.assertEqual(await read, 'frame')
+        ticker.cancel()
+
+    async def test_stop_while_grab_is_stuck(self) -> None:
+        """
+        Test that a capture still in use by the reader is released by the
+        reader once its grab returns, not by the caller.
+        """
+        self.assertTrue(self.grabber.stop())
+
+        release = threading.Event()
+        self.addCleanup(release.set)
+        cap = MagicMock()
+        cap.grab.side_effect = lambda: release.wait(30) or True
+        grabber = FrameGrabber(cap)
+        grabber.start()
+        stream_capture = StreamCapture('test_stream_url')
+        stream_capture.cap = cap
+        stream_capture.grabber = grabber
+
+        # Give up waiting for the stuck grab
+        stop = partial(FrameGrabber.stop, grabber, timeout=0.05)
+        with patch.object(grabber, 'stop', stop):
+            await stream_capture.release_resources()
+
+        cap.release.assert_not_called()
+        self.assertIsNone(stream_capture.cap)
+        release.set()
+        grabber._thread.join(5)
+        cap.release.assert_called_once()
+
+    async def test_read_after_failure(self) -> None:
+        """
+        Test that a failed capture makes reads return None.
+        """
+        cap = MagicMock()
+        cap.grab.return_value = False
+        grabber = FrameGrabber(cap)
+        grabber.start()
+
+        self.assertIsNone(await grabber.read(timeout=1))
+        self.assertTrue(grabber.failed)
+        self.assertIsNone(await grabber.read(timeout=1))
+        cap.retrieve.assert_not_called()
+
+    async def test_failed_retrieve_keeps_stream_open(self) -> None:
+        """
+        Test that a failed retrieve returns None without stopping the reader.
+        """
+        self.cap.retrieve.side_effect = [(False, None), (True, 'frame')]
+
+        self.assertIsNone(await self.grabber.read(timeout=1))
+        self.assertFalse(self.grabber.failed)
+        self.assertEqual(await self.grabber.read(timeout=1), 'frame')
+        self.assertEqual(self.grabber.frames_decoded, 1)
+
+    async def test_frame_counters_survive_release(self) -> None:
+        """
+        Test that StreamCapture keeps counters of released grabbers.
+        """
+        stream_capture = StreamCapture('test_stream_url')
+        stream_capture.cap = self.cap
+        stream_capture.grabber = self.grabber
+        await stream_capture.read_latest_frame()
+
+        await stream_capture.release_resources()
+
+        counters = stream_capture.get_frame_counters()
+        self.assertEqual(counters['frames_decoded'], 1)
+        self.assertEqual(
+            set(counters),
+            {'frames_grabbed', 'frames_decoded', 'frames_dropped'},
+        )
+        self.assertIsNone(await stream_capture.read_latest_frame())
+
+
 if __name__ == '__main__':
     unittest.main()
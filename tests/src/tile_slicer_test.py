@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import numpy as np
+from sahi.prediction import ObjectPrediction
+
+from src.tile_slicer import TileSlicer
+
+
+def make_prediction(
+    bbox: list[int],
+    shift: list[int],
+    shape: list[int],
+) -> ObjectPrediction:
+    """
+    Builds a SAHI prediction with a box relative to its slice.
+    """
+    return ObjectPrediction(
+        bbox=bbox,
+        category_id=0,
+        category_name='hardhat',
+        score=0.9,
+        shift_amount=shift,
+        full_shape=shape,
+    )
+
+
+class TestTileSlicer(unittest.TestCase):
+    """
+    Tests for the TileSlicer class.
+    """
+
+    def setUp(self) -> None:
+        """
+        Creates an incremental slicer over a 640x480 frame (four tiles).
+        """
+        self.slicer = TileSlicer(
+            slice_size=376,
+            overlap_ratio=0.3,
+            incremental=True,
+            diff_threshold=4.0,
+            max_age=5,
+        )
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.model = MagicMock()
+        patcher = patch('src.tile_slicer.get_prediction')
+        self.mock_get_prediction = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get_prediction.return_value = MagicMock(
+            object_prediction_list=[],
+        )
+
+    def test_invalid_arguments(self) -> None:
+        """
+        Test that out-of-range settings are rejected.
+        """
+        with self.assertRaises(ValueError):
+            TileSlicer(slice_size=0)
+        with self.assertRaises(ValueError):
+            TileSlicer(overlap_ratio=1.0)
+        with self.assertRaises(ValueError):
+            TileSlicer(diff_threshold=-1)
+        with self.assertRaises(ValueError):
+            TileSlicer(diff_scale=0)
+        with self.assertRaises(ValueError):
+            TileSlicer(max_age=0)
+
+    def test_from_config(self) -> None:
+        """
+        Test building a slicer from a stream configuration entry.
+        """
+        slicer = TileSlicer.from_config(
+            {'slice_size': 512, 'overlap': 0.2, 'incremental': True},
+        )
+        self.assertEqual(slicer.slice_size, 512)
+        self.assertEqual(slicer.overlap_ratio, 0.2)
+        self.assertTrue(slicer.incremental)
+
+        default_slicer = TileSlicer.from_config(None, slice_size=370)
+        self.assertEqual(default_slicer.slice_size, 370)
+        self.assertEqual(default_slicer.overlap_ratio, 0.3)
+        self.assertFalse(default_slicer.incremental)
+
+    @patch('src.tile_slicer.get_sliced_prediction')
+    def test_full_slicing(self, mock_sliced: MagicMock) -> None:
+        """
+        Test that without incremental mode every frame is fully sliced.
+        """
+        slicer = TileSlicer(slice_size=512, overlap_ratio=0.2)
+        result = slicer.predict(self.frame, self.model)
+
+        self.assertIs(result, mock_sliced.return_value)
+        mock_sliced.assert_called_once_with(
+            self.frame,
+            self.model,
+            slice_height=512,
+            slice_width=512,
+            overlap_height_ratio=0.2,
+            overlap_width_ratio=0.2,
+            perform_standard_pred=True,
+        )
+
+    def test_static_frames_reuse_tiles(self) -> None:
+        """
+        Test that an unchanged frame does not run the model again.
+        """
+        self.slicer.predict(self.frame, self.model)
+        # Four tiles and the full-frame pass
+        self.assertEqual(self.mock_get_prediction.call_count, 5)
+
+        self.mock_get_prediction.reset_mock()
+        self.slicer.predict(self.frame.copy(), self.model)
+        self.mock_get_prediction.assert_not_called()
+
+        stats = self.slicer.get_stats()
+        self.assertEqual(stats['frames'], 2)
+        self.assertEqual(stats['tiles_inferred'], 4)
+        self.assertEqual(stats['tiles_reused'], 4)
+
+    def test_only_changed_tiles_are_inferred(self) -> None:
+        """
+        Test that a change in one corner re-runs only the tiles over it.
+        """
+        self.slicer.predict(self.frame, self.model)
+        self.mock_get_prediction.reset_mock()
+
+        # The box lies only in the top-left tile, above the others' overlap
+        changed = self.frame.copy()
+        changed[0:100, 0:200] = 255
+        self.slicer.predict(changed, self.model)
+
+        calls = self.mock_get_prediction.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0].kwargs['shift_amount'], [0, 0])
+        self.assertEqual(calls[0].args[0].shape, (376, 376, 3))
+        # The full-frame pass follows the changed tile
+        self.assertEqual(calls[1].args[0].shape, (480, 640, 3))
+
+    def test_small_changes_are_ignored(self) -> None:
+        """
+        Test that noise below the threshold does not trigger inference.
+        """
+        self.slicer.predict(self.frame, self.model)
+        self.mock_get_prediction.reset_mock()
+
+        self.slicer.predict(self.frame + 2, self.model)
+        self.mock_get_prediction.assert_not_called()
+
+    def test_stale_tiles_are_refreshed(self) -> None:
+        """
+        Test that tiles are re-run after max_age frames without change.
+        """
+        for _ in range(5):
+            self.slicer.predict(self.frame, self.model)
+        self.mock_get_prediction.reset_mock()
+
+        self.slicer.predict(self.frame, self.model)
+        self.assertEqual(self.mock_get_prediction.call_count, 5)
+
+    def test_frame_size_change_resets(self) -> None:
+        """
+        Test that a new frame size lays out the tiles again.
+        """
+        self.slicer.predict(self.frame, self.model)
+        self.mock_get_prediction.reset_mock()
+
+        # A single tile needs no full-frame pass
+        self.slicer.predict(np.zeros((300, 300, 3), np.uint8), self.model)
+        self.assertEqual(self.mock_get_prediction.call_count, 1)
+        self.assertEqual(self.slicer.tiles, [[0, 0, 300, 300]])
+
+    def test_cached_detections_are_returned(self) -> None:
+        """
+        Test that detections of reused tiles stay in the result.
+        """
+        tile_result = MagicMock(
+            object_prediction_list=[
+                make_prediction([10, 10, 50, 50], [264, 104], [480, 640]),
+            ],
+        )
+        empty_result = MagicMock(object_prediction_list=[])
+        self.mock_get_prediction.side_effect = [
+            empty_result, empty_result, empty_result, tile_result,
+            empty_result,
+        ]
+
+        self.slicer.predict(self.frame, self.model)
+        result = self.slicer.predict(self.frame, self.model)
+
+        self.assertEqual(len(result.object_prediction_list), 1)
+        bbox = result.object_prediction_list[0].bbox.to_voc_bbox()
+        # The box is shifted from the bottom-right tile onto the frame
+        self.assertEqual(bbox, [274, 114, 314, 154])
+
+    def test_given_full_predictions_are_reused(self) -> None:
+        """
+        Test that a full-frame pass run by the caller is not run again.
+        """
+        full = make_prediction([5, 5, 40, 40], [0, 0], [480, 640])
+        result = self.slicer.predict(
+            self.frame, self.model, full_predictions=[full],
+        )
+
+        # Only the four tiles go through the model
+        self.assertEqual(self.mock_get_prediction.call_count, 4)
+        self.assertEqual(len(result.object_prediction_list), 1)
+        bbox = result.object_prediction_list[0].bbox.to_voc_bbox()
+        self.assertEqual(bbox, [5, 5, 40, 40])
+
+    @patch('src.tile_slicer.get_sliced_prediction')
+    def test_full_slicing_with_full_predictions(
+        self,
+        mock_sliced: MagicMock,
+    ) -> None:
+        """
+        Test that full slicing skips its standard pass when given one.
+        """
+        full = make_prediction([5, 5, 40, 40], [0, 0], [480, 640])
+        tile = make_prediction([300, 200, 340, 260], [0, 0], [480, 640])
+        mock_sliced.return_value = MagicMock(object_prediction_list=[tile])
+        slicer = TileSlicer(slice_size=512, overlap_ratio=0.2)
+        result = slicer.predict(
+            self.frame, self.model, full_predictions=[full],
+        )
+
+        self.assertFalse(
+            mock_sliced.call_args.kwargs['perform_standard_pred'],
+        )
+        self.assertEqual(len(result.object_prediction_list), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
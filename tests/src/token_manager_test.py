@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import math
+import os
+import threading
+import time
+import unittest
+from typing import Any
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import aiohttp
+
+from src.token_manager import decode_token_expiry
+from src.token_manager import TokenManager
+
+
+def make_jwt(expiry: float, name: str = 'token') -> str:
+    """
+    Builds an unsigned JWT expiring at the given time.
+    """
+    def encode(data: dict[str, Any]) -> str:
+        raw = base64.urlsafe_b64encode(json.dumps(data).encode())
+        return raw.decode().rstrip('=')
+
+    return '.'.join(
+        [encode({'alg': 'HS256'}), encode({'exp': expiry, 'n': name}), 'sig'],
+    )
+
+
+class CountingDict(dict):
+    """
+    A dictionary counting reads, like round trips to a manager process.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def items(self):  # type: ignore[override]
+        self.reads += 1
+        return super().items()
+
+
+def make_response(status: int, data: dict[str, Any]) -> MagicMock:
+    """
+    Builds a mocked aiohttp response.
+    """
+    response = MagicMock()
+    response.status = status
+    response.raise_for_status = MagicMock()
+    response.json = AsyncMock(return_value=data)
+    return response
+
+
+class TestDecodeTokenExpiry(unittest.TestCase):
+    """
+    Tests for reading the expiry of tokens.
+    """
+
+    def test_decode(self) -> None:
+        """
+        Test the exp claim of JWTs and tokens without one.
+        """
+        self.assertEqual(decode_token_expiry(make_jwt(1234.0)), 1234.0)
+        self.assertEqual(decode_token_expiry('opaque'), math.inf)
+        self.assertEqual(decode_token_expiry('a.!!!.c'), math.inf)
+
+
+class TestTokenManager(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for caching, renewing and sharing API tokens.
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up credentials and a mocked session.
+        """
+        patcher_env = patch.dict(
+            os.environ,
+            {'API_USERNAME': 'test_user', 'API_PASSWORD': 'test_pass'},
+        )
+        patcher_env.start()
+        self.addCleanup(patcher_env.stop)
+
+        self.session = MagicMock()
+        self.shared = CountingDict(access_token=None, token_expiry=0)
+
+    def make_manager(self, **kwargs: Any) -> TokenManager:
+        """
+        Builds a token manager sharing the test session and token.
+        """
+        return TokenManager(
+            'http://mocked-api.com',
+            get_session=lambda: self.session,
+            shared_token=self.shared,
+            **kwargs,
+        )
+
+    def urls(self) -> list[str]:
+        """
+        Returns the URLs posted to.
+        """
+        return [call.args[0] for call in self.session.post.call_args_list]
+
+    async def test_cached_token_skips_shared_reads(self) -> None:
+        """
+        Test that a fresh token is reused without reading the shared one.
+        """
+        token = make_jwt(time.time() + 3600)
+        self.session.post.return_value.__aenter__.return_value = (
+            make_response(200, {'access_token': token})
+        )
+        manager = self.make_manager()
+
+        self.assertEqual(await manager.get_token(), token)
+        reads = self.shared.reads
+        for _ in range(10):
+            self.assertEqual(await manager.get_token(), token)
+
+        self.assertEqual(self.shared.reads, reads)
+        self.assertEqual(self.urls(), ['http://mocked-api.com/api/token'])
+        self.assertEqual(self.shared['access_token'], token)
+        self.assertGreater(self.shared['token_expiry'], time.time())
+
+    async def test_refresh_ahead_of_expiry(self) -> None:
+        """
+        Test that a token close to expiry is renewed with the refresh
+        token, and a refused refresh token falls back to logging in.
+        """
+        self.shared.update(
+            access_token=make_jwt(time.time() + 60, 'old'),
+            refresh_token='refresh',
+        )
+        new_token = make_jwt(time.time() + 3600, 'new')
+        self.session.post.return_value.__aenter__.return_value = (
+            make_response(
+                200, {'access_token': new_token, 'refresh_token': 'next'},
+            )
+        )
+        manager = self.make_manager(refresh_margin=300)
+
+        self.assertEqual(await manager.get_token(), new_token)
+        self.assertEqual(self.urls(), ['http://mocked-api.com/api/refresh'])
+        self.assertEqual(
+            self.session.post.call_args.kwargs['json'],
+            {'refresh_token': 'refresh'},
+        )
+        self.assertEqual(self.shared['refresh_token'], 'next')
+
+        # A refused refresh token leads to a login
+        self.session.post.reset_mock()
+        self.session.post.return_value.__aenter__.side_effect = [
+            make_response(401, {}),
+            make_response(200, {'access_token': 'login'}),
+        ]
+        self.assertEqual(await manager.get_token(rejected=new_token), 'login')
+        self.assertEqual(
+            self.urls(),
+            [
+                'http://mocked-api.com/api/refresh',
+                'http://mocked-api.com/api/token',
+            ],
+        )
+
+    async def test_keeps_valid_token_if_renewal_fails(self) -> None:
+        """
+        Test that a failed proactive refresh keeps an unexpired token.
+        """
+        token = make_jwt(time.time() + 60)
+        self.shared.update(access_token=token, refresh_token='refresh')
+        self.session.post.return_value.__aenter__.side_effect = (
+            aiohttp.ClientConnectionError()
+        )
+        manager = self.make_manager()
+
+        self.assertEqual(await manager.get_token(), token)
+        with self.assertRaises(aiohttp.ClientConnectionError):
+            await manager.get_token(rejected=token)
+
+    async def test_single_flight_across_processes(self) -> None:
+        """
+        Test that concurrent renewals log in once and share the token.
+        """
+        token = make_jwt(time.time() + 3600)
+
+        async def slow_json() -> dict[str, str]:
+            await asyncio.sleep(0.05)
+            return {'access_token': token}
+
+        response = make_response(200, {})
+        response.json = slow_json
+        self.session.post.return_value.__aenter__.return_value = response
+
+        # Two processes sharing the token and lock, one coroutine pair each
+        shared_lock = threading.Lock()
+        managers = [
+            self.make_manager(shared_lock=shared_lock, lock_poll_interval=0)
+            for _ in range(2)
+        ]
+        tokens = await asyncio.gather(
+            *(manager.get_token() for manager in managers for _ in range(2)),
+        )
+
+        self.assertEqual(tokens, [token] * 4)
+        self.assertEqual(self.session.post.call_count, 1)
+        self.assertFalse(shared_lock.locked())
+
+    async def test_rejected_token_replaced_elsewhere(self) -> None:
+        """
+        Test that a refused token already replaced by another process is
+        picked up without logging in again.
+        """
+        manager = self.make_manager()
+        self.shared['access_token'] = 'old'
+        self.assertEqual(await manager.get_token(), 'old')
+
+        self.shared['access_token'] = 'new'
+        self.assertEqual(await manager.get_token(rejected='old'), 'new')
+        self.session.post.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -318,6 +318,75 @@ class TestUtils(unittest.IsolatedAsyncioTestCase):
             ),
         )
 
+    def test_overlap_percentage_matrix(self) -> None:
+        """
+        Test the pairwise overlap matrix against the scalar implementation.
+        """
+        bboxes1 = np.array([[100, 100, 200, 200], [0, 0, 10, 10]], float)
+        bboxes2 = np.array(
+            [[150, 150, 250, 250], [300, 300, 400, 400], [5, 5, 5, 5]],
+            float,
+        )
+        matrix = Utils.overlap_percentage_matrix(bboxes1, bboxes2)
+        self.assertEqual(matrix.shape, (2, 3))
+        for i, bbox1 in enumerate(bboxes1.tolist()):
+            for j, bbox2 in enumerate(bboxes2.tolist()):
+                self.assertAlmostEqual(
+                    matrix[i, j], Utils.overlap_percentage(bbox1, bbox2),
+                )
+
+        # Degenerate boxes with no union are treated as no overlap
+        empty = np.array([[5, 5, 5, 5]], float)
+        self.assertEqual(
+            Utils.overlap_percentage_matrix(empty, empty)[0, 0], 0.0,
+        )
+
+    def test_is_driver_matrix(self) -> None:
+        """
+        Test the pairwise driver matrix against the scalar implementation.
+        """
+        persons = np.array(
+            [
+                [150, 250, 170, 350],
+                [50, 250, 90, 300],
+                [150, 210, 180, 300],
+                [150, 300, 180, 450],
+            ],
+            float,
+        )
+        vehicles = np.array(
+            [[100, 200, 300, 400], [190, 150, 250, 300]], float,
+        )
+        matrix = Utils.is_driver_matrix(persons, vehicles)
+        for i, person in enumerate(persons.tolist()):
+            for j, vehicle in enumerate(vehicles.tolist()):
+                self.assertEqual(
+                    bool(matrix[i, j]), Utils.is_driver(person, vehicle),
+                )
+
+    def test_is_dangerously_close_matrix(self) -> None:
+        """
+        Test the pairwise proximity matrix against the scalar implementation.
+        """
+        persons = np.array(
+            [[100, 100, 120, 120], [0, 0, 10, 10], [205, 150, 215, 170]],
+            float,
+        )
+        vehicles = np.array(
+            [[100, 100, 200, 200, 0.9, 8], [100, 100, 200, 200, 0.9, 9]],
+            float,
+        )
+        matrix = Utils.is_dangerously_close_matrix(
+            persons, vehicles, vehicles[:, 5],
+        )
+        for i, person in enumerate(persons.tolist()):
+            for j, vehicle in enumerate(vehicles.tolist()):
+                label = 'machinery' if vehicle[5] == 8 else 'vehicle'
+                self.assertEqual(
+                    bool(matrix[i, j]),
+                    Utils.is_dangerously_close(person, vehicle, label),
+                )
+
     def test_calculate_people_in_controlled_area(self) -> None:
         """
         Test case for calculating the number of people in the controlled area.
@@ -390,6 +459,50 @@ class TestUtils(unittest.IsolatedAsyncioTestCase):
         )
         self.assertEqual(people_count, 1)
 
+    def test_people_in_overlapping_polygons(self) -> None:
+        """
+        Test that each person is counted once across overlapping areas.
+        """
+        polygons = [
+            Polygon([(0, 0), (10, 0), (10, 10), (0, 10)]),
+            Polygon([(5, 5), (15, 5), (15, 15), (5, 15)]),
+        ]
+        data: list[list[float]] = [
+            [6, 6, 8, 8, 0.9, 5],      # Inside both areas
+            [6, 6, 8, 8, 0.8, 5],      # Same spot as the first person
+            [12, 12, 14, 14, 0.9, 5],  # Inside the second area
+            [0, 4, 0, 6, 0.9, 5],      # On the boundary, so not inside
+            [20, 20, 22, 22, 0.9, 5],  # Outside both areas
+            [1, 1, 3, 3, 0.9, 0],      # Hardhat, not a person
+        ]
+        people_count = Utils.calculate_people_in_controlled_area(
+            polygons, data,
+        )
+        self.assertEqual(people_count, 2)
+
+    def test_detect_polygon_from_cones_clusters(self) -> None:
+        """
+        Test that cone clusters become hulls in the order first seen.
+        """
+        cones = [
+            (100, 100), (0, 0), (110, 100), (10, 0), (100, 110),
+            (0, 10), (500, 500), (600, 600), (505, 500),
+        ]
+        data = [[x - 5, y - 5, x + 5, y + 5, 0.9, 6] for x, y in cones]
+        clusterer = MagicMock()
+        # Cluster 2 has only two cones and -1 marks noise
+        clusterer.fit_predict.return_value = [4, 1, 4, 1, 4, 1, 2, -1, 2]
+
+        polygons = Utils.detect_polygon_from_cones(data, clusterer)
+
+        self.assertEqual(len(polygons), 2)
+        self.assertTrue(polygons[0].equals(
+            Polygon([(100, 100), (110, 100), (100, 110)]),
+        ))
+        self.assertTrue(polygons[1].equals(
+            Polygon([(0, 0), (10, 0), (0, 10)]),
+        ))
+
 
 class TestFileEventHandler(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
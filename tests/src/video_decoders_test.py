@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+
+from src.video_decoders import PyAVCapture
+
+VIDEO_PATH = 'tests/videos/test.mp4'
+
+
+class TestPyAVCapture(unittest.TestCase):
+    """
+    Tests for the PyAV decoder backend.
+    """
+
+    def test_reads_every_frame(self) -> None:
+        """
+        Test that the full mode decodes every frame as a BGR image.
+        """
+        cap = PyAVCapture(VIDEO_PATH)
+        self.addCleanup(cap.release)
+        self.assertTrue(cap.isOpened())
+
+        ret, frame = cap.read()
+        self.assertTrue(ret)
+        self.assertEqual(frame.shape, (352, 640, 3))
+
+        frames = 1
+        while cap.grab():
+            frames += 1
+        self.assertEqual(frames, 886)
+        self.assertEqual(cap.packets_skipped, 0)
+
+        # Nothing is left to retrieve at the end of the stream
+        self.assertEqual(cap.retrieve(), (False, None))
+
+    def test_keyframes_only(self) -> None:
+        """
+        Test that the keyframe-only mode skips the frames in between.
+        """
+        cap = PyAVCapture(VIDEO_PATH, keyframes_only=True)
+        self.addCleanup(cap.release)
+
+        keyframes = []
+        while cap.grab():
+            keyframes.append(cap.frame)
+            ret, frame = cap.retrieve()
+            self.assertTrue(ret)
+            self.assertEqual(frame.shape, (352, 640, 3))
+
+        self.assertEqual(len(keyframes), 7)
+        self.assertTrue(all(frame.key_frame for frame in keyframes))
+        # Keyframes keep their presentation time
+        self.assertEqual(keyframes[0].time, 0.0)
+        self.assertGreater(keyframes[-1].time, keyframes[1].time)
+        self.assertEqual(cap.packets_skipped, 880)
+
+    def test_open_failure(self) -> None:
+        """
+        Test that a source that cannot be opened leaves the capture closed.
+        """
+        cap = PyAVCapture('tests/videos/missing.mp4')
+        self.assertFalse(cap.isOpened())
+        self.assertFalse(cap.grab())
+        self.assertEqual(cap.read(), (False, None))
+
+    def test_reads_streamlink_stream(self) -> None:
+        """
+        Test that a streamlink stream is read through its file object.
+        """
+        stream = MagicMock()
+        video = open(VIDEO_PATH, 'rb')
+        self.addCleanup(video.close)
+        stream.open.return_value = video
+        cap = PyAVCapture(stream, keyframes_only=True)
+
+        stream.open.assert_called_once_with()
+        ret, frame = cap.read()
+        self.assertTrue(ret)
+        self.assertEqual(frame.shape, (352, 640, 3))
+
+        # Releasing the capture closes the streamlink stream as well
+        cap.release()
+        self.assertTrue(video.closed)
+
+    def test_set_is_ignored(self) -> None:
+        """
+        Test that OpenCV capture properties are accepted and ignored.
+        """
+        cap = PyAVCapture(VIDEO_PATH)
+        self.addCleanup(cap.release)
+        self.assertFalse(cap.set(38, 1))
+        self.assertTrue(cap.grab())
+
+
+if __name__ == '__main__':
+    unittest.main()